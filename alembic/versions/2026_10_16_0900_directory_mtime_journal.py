@@ -0,0 +1,29 @@
+"""Directory mtime journal for fast refreshes.
+
+A fast refresh compares each directory's mtime (and the number of files it held) to the values
+recorded by the previous fast refresh, and skips listing the files of any directory which has not
+changed.  The journal lives in the existing `directory` table.
+
+Revision ID: 2026_10_16_0900
+Revises: 2026_07_14_0900
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '2026_10_16_0900'
+down_revision = '2026_07_14_0900'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('directory', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('mtime', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('child_count', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('directory', schema=None) as batch_op:
+        batch_op.drop_column('child_count')
+        batch_op.drop_column('mtime')
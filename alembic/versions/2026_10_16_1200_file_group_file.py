@@ -0,0 +1,49 @@
+"""Normalized `file_group_file` table.
+
+One row per member file of a FileGroup, mirroring the JSON `file_group.files` column so member files
+can be found by index (e.g. `FileGroup.get_by_any_file_path`, the refresh comparison).  `files` remains
+the source of truth; triggers (see `wrolpi.schema_ddl`) keep this table in sync.
+
+Revision ID: 2026_10_16_1200
+Revises: 2026_10_16_0900
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '2026_10_16_1200'
+down_revision = '2026_10_16_0900'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    from wrolpi.schema_ddl import FILE_GROUP_FILE_SELECT, FILE_GROUP_FILE_TRIGGER_DDL
+
+    op.create_table(
+        'file_group_file',
+        sa.Column('file_group_id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'),
+                  sa.ForeignKey('file_group.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('filename', sa.String(), primary_key=True),
+        sa.Column('suffix', sa.String(), nullable=True),
+        sa.Column('size', sa.BigInteger(), nullable=True),
+        sa.Column('mtime', sa.Float(), nullable=True),
+        sa.Column('mimetype', sa.String(), nullable=True),
+    )
+    op.create_index('file_group_file_filename_idx', 'file_group_file', ['filename'])
+    op.create_index('file_group_file_mimetype_idx', 'file_group_file', ['mimetype'])
+    op.create_index('file_group_file_suffix_idx', 'file_group_file', ['suffix'])
+
+    # Backfill from the existing JSON, then keep in sync.
+    select = FILE_GROUP_FILE_SELECT.format(file_group_id='fg.id', files='fg.files').replace(
+        'FROM json_each(', 'FROM file_group fg, json_each(', 1)
+    op.execute(f'INSERT OR IGNORE INTO file_group_file (file_group_id, filename, suffix, size, mtime, mimetype)'
+               f' {select}')
+    for statement in FILE_GROUP_FILE_TRIGGER_DDL:
+        op.execute(statement)
+
+
+def downgrade():
+    op.execute('DROP TRIGGER IF EXISTS file_group_file_update')
+    op.execute('DROP TRIGGER IF EXISTS file_group_file_insert')
+    op.drop_table('file_group_file')
@@ -0,0 +1,97 @@
+"""Move the searched texts of FileGroups into `file_group_text`.
+
+`file_group.a_text..d_text` made every `file_group` row wide (the body of a document, the captions of a video), so
+browse, sort and filter queries paged in far more of the database than the metadata they read.  The texts now live
+in the narrow side table `file_group_text`, which is the content table of `file_group_fts` (see `wrolpi.fts`).
+
+The dropped columns leave free pages in the database file; `VACUUM` returns them to the filesystem.
+
+Revision ID: 2026_10_17_0900
+Revises: 2026_10_16_1200
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '2026_10_17_0900'
+down_revision = '2026_10_16_1200'
+branch_labels = None
+depends_on = None
+
+TEXT_COLUMNS = ('a_text', 'b_text', 'c_text', 'd_text')
+
+
+def upgrade():
+    from wrolpi import fts
+
+    connection = op.get_bind()
+    file_group_columns = {i['name'] for i in sa.inspect(connection).get_columns('file_group')}
+
+    # The old index and its triggers on `file_group`.
+    for trigger in ('file_group_fts_ai', 'file_group_fts_ad', 'file_group_fts_au'):
+        op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    op.execute('DROP TABLE IF EXISTS file_group_fts')
+
+    # Creates `file_group_text`, `file_group_fts` on it, and their triggers.
+    for statement in fts.FTS_DDL:
+        op.execute(statement)
+
+    if set(TEXT_COLUMNS) <= file_group_columns:
+        # The triggers index the copied texts.
+        op.execute('INSERT INTO file_group_text (file_group_id, a_text, b_text, c_text, d_text)'
+                   ' SELECT id, a_text, b_text, c_text, d_text FROM file_group'
+                   ' WHERE COALESCE(a_text, b_text, c_text, d_text) IS NOT NULL'
+                   ' ON CONFLICT (file_group_id) DO NOTHING')
+        # Not batch mode: copying `file_group` into a new table would delete (ON DELETE CASCADE) the rows of every
+        # table which references it.
+        for name in TEXT_COLUMNS:
+            op.execute(f'ALTER TABLE file_group DROP COLUMN {name}')
+    else:
+        op.execute("INSERT INTO file_group_fts(file_group_fts) VALUES('rebuild')")
+
+
+def downgrade():
+    from wrolpi.fts import FILE_GROUP_BM25_WEIGHTS, TOKENIZER
+
+    for name in TEXT_COLUMNS:
+        op.execute(f'ALTER TABLE file_group ADD COLUMN {name} VARCHAR')
+    op.execute('UPDATE file_group SET (a_text, b_text, c_text, d_text) ='
+               ' (SELECT a_text, b_text, c_text, d_text FROM file_group_text t WHERE t.file_group_id = file_group.id)'
+               ' WHERE id IN (SELECT file_group_id FROM file_group_text)')
+
+    for trigger in ('file_group_text_fts_ai', 'file_group_text_fts_ad', 'file_group_text_fts_au'):
+        op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    op.execute('DROP TABLE IF EXISTS file_group_fts')
+    op.execute('DROP TABLE file_group_text')
+
+    op.execute(f'''
+        CREATE VIRTUAL TABLE file_group_fts USING fts5(
+            a_text, b_text, c_text, d_text,
+            content='file_group',
+            content_rowid='id',
+            tokenize='{TOKENIZER}'
+        )
+    ''')
+    op.execute(f"INSERT INTO file_group_fts(file_group_fts, rank) VALUES('rank', '{FILE_GROUP_BM25_WEIGHTS}')")
+    op.execute('''
+        CREATE TRIGGER file_group_fts_ai AFTER INSERT ON file_group BEGIN
+            INSERT INTO file_group_fts(rowid, a_text, b_text, c_text, d_text)
+            VALUES (new.id, new.a_text, new.b_text, new.c_text, new.d_text);
+        END
+    ''')
+    op.execute('''
+        CREATE TRIGGER file_group_fts_ad AFTER DELETE ON file_group BEGIN
+            INSERT INTO file_group_fts(file_group_fts, rowid, a_text, b_text, c_text, d_text)
+            VALUES ('delete', old.id, old.a_text, old.b_text, old.c_text, old.d_text);
+        END
+    ''')
+    op.execute('''
+        CREATE TRIGGER file_group_fts_au
+        AFTER UPDATE OF a_text, b_text, c_text, d_text ON file_group BEGIN
+            INSERT INTO file_group_fts(file_group_fts, rowid, a_text, b_text, c_text, d_text)
+            VALUES ('delete', old.id, old.a_text, old.b_text, old.c_text, old.d_text);
+            INSERT INTO file_group_fts(rowid, a_text, b_text, c_text, d_text)
+            VALUES (new.id, new.a_text, new.b_text, new.c_text, new.d_text);
+        END
+    ''')
+    op.execute("INSERT INTO file_group_fts(file_group_fts) VALUES('rebuild')")
@@ -0,0 +1,74 @@
+"""Normalized `channel_catalog_entry` table.
+
+One row per video listed by a Channel's host website.  These were the `entries` of `channel.info_json`, which was
+rewritten whole (tens of thousands of entries for large channels) every time the catalog was refreshed, and parsed
+whole to find missing or censored videos.  `channel.info_json` keeps the channel-level info.
+
+Revision ID: 2026_10_17_1200
+Revises: 2026_10_17_0900
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '2026_10_17_1200'
+down_revision = '2026_10_17_0900'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'channel_catalog_entry',
+        sa.Column('channel_id', sa.Integer(), sa.ForeignKey('channel.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('source_id', sa.String(), primary_key=True),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(), nullable=True),
+        sa.Column('duration', sa.Integer(), nullable=True),
+        sa.Column('view_count', sa.BigInteger(), nullable=True),
+        sa.Column('upload_date', sa.Date(), nullable=True),
+        sa.Column('url', sa.String(), nullable=True),
+    )
+    op.create_index('channel_catalog_entry_channel_position_idx', 'channel_catalog_entry', ['channel_id', 'position'])
+    op.create_index('channel_catalog_entry_channel_duration_idx', 'channel_catalog_entry', ['channel_id', 'duration'])
+    op.create_index('channel_catalog_entry_source_id_idx', 'channel_catalog_entry', ['source_id'])
+
+    # Copy the entries; `position` is counted from the oldest (last) entry.  yt-dlp dates are YYYYMMDD.
+    op.execute('''
+        INSERT OR REPLACE INTO channel_catalog_entry
+            (channel_id, source_id, position, title, duration, view_count, upload_date, url)
+        SELECT c.id,
+               CAST(json_extract(e.value, '$.id') AS TEXT),
+               json_array_length(c.info_json, '$.entries') - 1 - e.key,
+               json_extract(e.value, '$.title'),
+               CAST(json_extract(e.value, '$.duration') AS INTEGER),
+               CAST(json_extract(e.value, '$.view_count') AS INTEGER),
+               CASE
+                   WHEN length(json_extract(e.value, '$.upload_date')) = 8 THEN
+                       substr(json_extract(e.value, '$.upload_date'), 1, 4) || '-' ||
+                       substr(json_extract(e.value, '$.upload_date'), 5, 2) || '-' ||
+                       substr(json_extract(e.value, '$.upload_date'), 7, 2)
+                   END,
+               COALESCE(json_extract(e.value, '$.webpage_url'), json_extract(e.value, '$.url'))
+        FROM channel c, json_each(c.info_json, '$.entries') e
+        WHERE json_valid(c.info_json)
+          AND json_type(c.info_json, '$.entries') = 'array'
+          AND e.type = 'object'
+          AND json_extract(e.value, '$.id') IS NOT NULL
+        ORDER BY c.id, e.key DESC
+    ''')
+    op.execute("UPDATE channel SET info_json = json_remove(info_json, '$.entries')"
+               " WHERE json_valid(info_json) AND json_type(info_json, '$.entries') IS NOT NULL")
+
+
+def downgrade():
+    op.execute('''
+        UPDATE channel
+        SET info_json = json_set(COALESCE(info_json, '{}'), '$.entries', (
+            SELECT json_group_array(json_object(
+                'id', e.source_id, 'title', e.title, 'duration', e.duration, 'view_count', e.view_count,
+                'upload_date', replace(e.upload_date, '-', ''), 'url', e.url))
+            FROM (SELECT * FROM channel_catalog_entry WHERE channel_id = channel.id ORDER BY position DESC) e))
+        WHERE id IN (SELECT channel_id FROM channel_catalog_entry)
+    ''')
+    op.drop_table('channel_catalog_entry')
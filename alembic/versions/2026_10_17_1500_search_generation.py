@@ -0,0 +1,32 @@
+"""Count the writes of the searched tables in `search_generation`.
+
+Search totals are cached in each process (see `wrolpi.files.lib.get_search_total`).  The generation is part of the key
+of a cached total, so a total is not used after any process writes a table the search counts (see
+`wrolpi.schema_ddl.SEARCH_GENERATION_DDL`).
+
+Revision ID: 2026_10_17_1500
+Revises: 2026_10_17_1200
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '2026_10_17_1500'
+down_revision = '2026_10_17_1200'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    from wrolpi.schema_ddl import SEARCH_GENERATION_DDL
+
+    for statement in SEARCH_GENERATION_DDL:
+        op.execute(statement)
+
+
+def downgrade():
+    from wrolpi.schema_ddl import SEARCH_GENERATION_TABLES
+
+    for table in SEARCH_GENERATION_TABLES:
+        for event in ('insert', 'update', 'delete'):
+            op.execute(f'DROP TRIGGER IF EXISTS {table}_search_generation_{event}')
+    op.execute('DROP TABLE IF EXISTS search_generation')
@@ -0,0 +1,40 @@
+"""Drop the row triggers of `search_generation`.
+
+Each row written to a searched table bumped the one `search_generation` row, so a refresh or modeler batch updated it
+thousands of times.  The generation is now bumped once by each write transaction of these tables (see
+`wrolpi.db.bump_search_generation`).
+
+Revision ID: 2026_10_17_1800
+Revises: 2026_10_17_1500
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '2026_10_17_1800'
+down_revision = '2026_10_17_1500'
+branch_labels = None
+depends_on = None
+
+EVENTS = ('INSERT', 'UPDATE', 'DELETE')
+
+
+def upgrade():
+    from wrolpi.schema_ddl import SEARCH_GENERATION_TABLES
+
+    for table in SEARCH_GENERATION_TABLES:
+        for event in EVENTS:
+            op.execute(f'DROP TRIGGER IF EXISTS {table}_search_generation_{event.lower()}')
+
+
+def downgrade():
+    from wrolpi.schema_ddl import SEARCH_GENERATION_TABLES
+
+    for table in SEARCH_GENERATION_TABLES:
+        for event in EVENTS:
+            op.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_search_generation_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE search_generation SET generation = generation + 1 WHERE id = 1;
+                END
+            ''')
@@ -2,6 +2,7 @@ import React, {useEffect} from 'react';
 import {useRecurringTimeout} from "./hooks/customHooks";
 import {ApiDownError, getEvents} from "./api";
 import {toast} from "./components/ui";
+import {API_URI} from "./components/Vars";
 
 const apiEventName = 'apiEvent';
 
@@ -150,13 +151,19 @@ export function useEventsInterval() {
         localStorage.setItem('events_now', now.current);
     }
 
+    // `sequence` is the sequence number of the last event we received.
+    const sequence = React.useRef(null);
+    // Events are polled only when the event stream is not connected.
+    const streaming = React.useRef(false);
+
     const fetchEvents = async () => {
-        if (window.apiDown) { // apiDown is set in useStatus
+        if (window.apiDown || streaming.current) { // apiDown is set in useStatus
             return;
         }
         try {
-            const response = await getEvents(now.current);
+            const response = await getEvents(now.current, sequence.current);
             setNow(response['now']);
+            sequence.current = response['sequence'];
             setEvents(response['events']);
         } catch (e) {
             setEvents(null);
@@ -173,6 +180,29 @@ export function useEventsInterval() {
 
     useRecurringTimeout(fetchEvents, 1000 * 5);
 
+    useEffect(() => {
+        if (!window.EventSource) {
+            return;
+        }
+        // The browser reconnects (sending the id of the last event it received) when the stream ends.
+        const afterSeq = sequence.current !== null ? `?after_seq=${sequence.current}` : '';
+        const source = new EventSource(`${API_URI}/events/stream${afterSeq}`);
+        source.onopen = () => {
+            streaming.current = true;
+        };
+        source.onmessage = (message) => {
+            const event = JSON.parse(message.data);
+            sequence.current = event['seq'];
+            // Handled now, several events may arrive before the next render.
+            handleEvents([event]);
+        };
+        source.onerror = () => {
+            // Poll until the stream reconnects.
+            streaming.current = false;
+        };
+        return () => source.close();
+    }, []);
+
     useEffect(() => {
         if (events && events.length >= 1) {
             handleEvents(events);
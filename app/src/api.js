@@ -98,6 +98,34 @@ let apiPatch = async (url, body) => {
     return await apiCall(url, 'PATCH', body)
 };
 
+// The `next_cursor` of the searched pages, by search (its body without the offset), then by the offset of the page
+// which follows.  The next page of a search is fetched after the cursor, so the API seeks to it instead of counting
+// through every page before it.  Only a jump to another page is fetched by its offset.
+const searchCursors = new Map();
+const SEARCH_CURSORS_LIMIT = 20;
+
+let apiSearch = async (url, body) => {
+    const {offset, ...search} = body;
+    const key = url + JSON.stringify(search);
+    const cursors = searchCursors.get(key) || {};
+    const cursor = offset ? cursors[offset] : null;
+    // The offset is still sent with a cursor; it is the position of the page, which counts the total.
+    const response = await apiPost(url, cursor ? {...body, cursor} : body);
+    if (response.ok) {
+        const data = await response.clone().json();
+        if (data['next_cursor']) {
+            cursors[(offset || 0) + body.limit] = data['next_cursor'];
+        }
+        // Keep the cursors of the most recent searches.
+        searchCursors.delete(key);
+        searchCursors.set(key, cursors);
+        if (searchCursors.size > SEARCH_CURSORS_LIMIT) {
+            searchCursors.delete(searchCursors.keys().next().value);
+        }
+    }
+    return response;
+};
+
 async function getErrorMessage(response, fallbackMessage) {
     try {
         const json = await response.clone().json();
@@ -214,7 +242,7 @@ export async function searchVideos(offset, limit, channelId, searchStr, order_by
 
     console.debug('searching videos', body);
 
-    const response = await apiPost(`${VIDEOS_API}/search`, body);
+    const response = await apiSearch(`${VIDEOS_API}/search`, body);
     if (response.status === 200) {
         let data = await response.json();
         return [data['file_groups'], data['totals']['file_groups']];
@@ -725,7 +753,7 @@ export async function searchArchives(offset, limit, domain, searchStr, order, ta
     }
 
     console.debug('searching archives', body);
-    const response = await apiPost(`${ARCHIVES_API}/search`, body);
+    const response = await apiSearch(`${ARCHIVES_API}/search`, body);
     if (response.ok) {
         let data = await response.json();
         return [data['file_groups'], data['totals']['file_groups']];
@@ -1254,7 +1282,7 @@ export async function filesSearch(offset, limit, searchStr, mimetypes, model, ta
         body['deep'] = true;
     }
     console.info('searching files', body);
-    const response = await apiPost(`${API_URI}/files/search`, body);
+    const response = await apiSearch(`${API_URI}/files/search`, body);
 
     if (response.ok) {
         let data = await response.json();
@@ -1684,9 +1712,11 @@ export async function getStatistics() {
     }
 }
 
-export async function getEvents(after) {
+export async function getEvents(after, afterSeq) {
     let uri = `${API_URI}/events/feed`;
-    if (after) {
+    if (afterSeq !== null && afterSeq !== undefined) {
+        uri = `${uri}?after_seq=${encodeURIComponent(afterSeq)}`
+    } else if (after) {
         uri = `${uri}?after=${encodeURIComponent(after)}`
     }
     const response = await apiGet(uri);
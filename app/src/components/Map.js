@@ -289,6 +289,7 @@ function ManageMap() {
     const [allRegionsOpen, setAllRegionsOpen] = useState(false);
     const {status} = React.useContext(StatusContext);
     const searchBuilding = status?.flags?.map_search_building;
+    const searchProgress = status?.map_search_progress;
 
     const fetchFiles = async () => {
         try {
@@ -352,7 +353,9 @@ function ManageMap() {
                                      disabled={searchBuilding}
                                      loading={searchBuilding}
                                      onClick={() => handleBuildSearch(file.name)}>
-                            {searchBuilding ? 'Building...' : 'Build'}
+                            {searchBuilding
+                                ? searchProgress?.name === file.name ? `Building ${searchProgress.percent}%` : 'Building...'
+                                : 'Build'}
                         </APIButton>
                 }
             </Table.Cell>
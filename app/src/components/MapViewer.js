@@ -478,6 +478,8 @@ function MapSearch({map}) {
         if (detail && !r.region) parts.push(detail.replace(/_/g, " "));
         const pop = formatPopulation(r.population);
         if (pop) parts.push(`pop. ${pop}`);
+        // Results of a "near me" search have their distance from the map center.
+        if (r.distance_km != null) parts.push(`${r.distance_km.toFixed(1)} km`);
         return parts.join(" \u00b7 ");
     };
 
@@ -55,6 +55,7 @@ export const settingsFixture = (overrides = {}) => ({
     download_wait: 20,
     download_window_start: null,
     download_window_end: null,
+    ffprobe_workers: 3,
     hotspot_device: 'wlan0',
     hotspot_on_startup: true,
     hotspot_password: 'wrolpi hotspot',
@@ -62,6 +63,7 @@ export const settingsFixture = (overrides = {}) => ({
     ignore_outdated_zims: false,
     // Relative to the media directory, as the API returns them.
     ignored_directories: [],
+    indexer_workers: 2,
     // Python logging integers: 40 error, 30 warning, 20 info, 10 debug, 5 trace.
     log_level: 20,
     map_default_location: null,
@@ -129,6 +131,8 @@ export const statusFixture = (overrides = {}) => ({
     git_branch: null,
     latest_commit: null,
     update_available: false,
+    // Progress of the map search index build, null when no build is running.
+    map_search_progress: null,
     ...overrides,
 });
 
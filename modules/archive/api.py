@@ -12,6 +12,7 @@ from wrolpi.cmd import get_installed_browsers
 from wrolpi.common import logger, wrol_mode_check, api_param_limiter, TRACE_LEVEL
 from wrolpi.db import get_db_session
 from wrolpi.events import Events
+from wrolpi.files.lib import search_page_next_cursor
 from wrolpi.schema import JSONErrorResponse
 from wrolpi.switches import register_switch_handler, ActivateSwitchMethod
 from wrolpi.vars import DOCKERIZED
@@ -61,8 +62,9 @@ async def search_archives(_: Request, body: schema.ArchiveSearchRequest):
     offset = body.offset or 0
 
     file_groups, total = lib.search_archives(search_str, domain, limit, offset, body.order_by, body.tag_names,
-                                             body.headline, body.deep)
-    ret = dict(file_groups=file_groups, totals=dict(file_groups=total))
+                                             body.headline, body.deep, body.cursor)
+    ret = dict(file_groups=file_groups, totals=dict(file_groups=total),
+               next_cursor=search_page_next_cursor(file_groups, limit))
     return json_response(ret)
 
 
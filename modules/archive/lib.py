@@ -30,8 +30,9 @@ from wrolpi.dates import now, Seconds
 from wrolpi.db import get_db_session, get_db_curs
 from wrolpi.errors import UnknownArchive, InvalidOrderBy, InvalidDatetime
 from wrolpi.events import Events
-from wrolpi.files.lib import handle_file_group_search_results
+from wrolpi.files.lib import handle_file_group_search_results, get_search_total
 from wrolpi.files.models import FileGroup
+from wrolpi.pagination import Keyset
 from wrolpi.switches import register_switch_handler, ActivateSwitchMethod
 from wrolpi.tags import tag_append_sub_select_where
 from wrolpi.vars import PYTEST, DOCKERIZED
@@ -1390,17 +1391,22 @@ NO_NULL_ORDERS = {
 
 
 def search_archives(search_str: str, domain: str, limit: int, offset: int, order: str, tag_names: List[str],
-                    headline: bool = False, deep: bool = False) \
+                    headline: bool = False, deep: bool = False, cursor: str = None) \
         -> Tuple[List[dict], int]:
+    """Search Archives.  Continue after the result which has `cursor`, if provided; otherwise skip `offset`
+    results."""
     # Always filter FileGroups to Archives.
     wheres = []
 
     # Explicit JSON nulls bypass the schema defaults; SQLite rejects LIMIT/OFFSET NULL.
-    params = dict(search_str=search_str, offset=int(offset) if offset else 0, limit=int(limit) if limit else 20)
+    limit = int(limit) if limit else 20
+    offset = int(offset) if offset else 0
+    params = dict(search_str=search_str)
     order_by = ARCHIVE_ORDERS['-published_datetime']
 
     select_columns = ''
     fts_join = ''
+    count_fts_join = ''
     headline_columns = ''
     # The fast (deep=False) search only matches the a/b/c FTS columns; deep also matches d
     # (page contents).  `file_group_search` returns None when the search string is unusable, in
@@ -1408,14 +1414,17 @@ def search_archives(search_str: str, domain: str, limit: int, offset: int, order
     file_group_search = fts.file_group_search(search_str, deep=deep) if search_str else None
     if file_group_search:
         # A search_str was provided by the user, modify the query to filter by it.  The rank and
-        # snippets come from a subquery because FTS5 auxiliary functions (snippet) cannot appear
-        # in a query that also uses window functions (COUNT(*) OVER()).
-        headline_selects = fts.file_group_headline_selects() if headline else ''
-        fts_join = f'''JOIN (
+        # snippets come from a subquery so the keyset can compare `fts.ts_rank`.
+        def fts_subquery(headline_selects: str = '') -> str:
+            return f'''JOIN (
                 SELECT fts.rowid AS id, {file_group_search.rank_select}{headline_selects}
                 FROM file_group_fts fts
                 WHERE {file_group_search.where}
             ) fts ON fts.id = fg.id'''
+
+        fts_join = fts_subquery(fts.file_group_headline_selects() if headline else '')
+        # The total does not need the snippets.
+        count_fts_join = fts_subquery()
         select_columns = 'fts.ts_rank AS ts_rank'  # positive, higher is better.
         params.update(file_group_search.params)
         if headline:
@@ -1441,34 +1450,51 @@ def search_archives(search_str: str, domain: str, limit: int, offset: int, order
         wheres.append(
             "a.collection_id = (select id from collection where collection.name = :domain and collection.kind = 'domain' LIMIT 1)")
 
-    select_columns = f"{select_columns}," if select_columns else ""
-    wheres = '\n AND '.join(wheres)
-    where = f'WHERE\n{wheres}' if wheres else ''
-    if where or fts_join:
-        from_clause = f'''FROM archive a
+    # The rank is only selected when searching.
+    keyset = Keyset.from_order_by(order_by, columns={'2': 'fts.ts_rank' if file_group_search else None},
+                                  cursor=cursor)
+    page_wheres = list(wheres)
+    page_params = dict(params, offset=offset, limit=limit)
+    if keyset.values is not None:
+        # Seek past the previous page instead of counting through it.
+        keyset_where, keyset_params = keyset.where()
+        page_wheres.append(keyset_where)
+        page_params.update(keyset_params, offset=0)
+        # The offset sent with a cursor is the position of the page (for the total), if the client knows it.
+        offset = offset or None
+
+    select_columns = f", {select_columns}" if select_columns else ""
+
+    # Browse (no filters): CROSS JOIN pins file_group as the outer table so SQLite walks its
+    # date index and probes archive's covering index -- both sides stay index-only.  Driving
+    # from archive probes every file_group row for the sort key, which took ~90 seconds cold on
+    # a Pi with 124k archives (when the rows still carried their texts, see `FileGroupText`).
+    browse = not wheres and not fts_join
+
+    def from_clause(fts_join_: str, wheres_: List[str]) -> str:
+        if browse:
+            from_ = 'FROM file_group fg CROSS JOIN archive a ON a.file_group_id = fg.id'
+        else:
+            from_ = f'''FROM archive a
             LEFT JOIN file_group fg ON fg.id = a.file_group_id
-            {fts_join}'''
-    else:
-        # Browse (no filters): CROSS JOIN pins file_group as the outer table so SQLite walks its
-        # date index and probes archive's covering index -- both sides stay index-only.  Driving
-        # from archive probes every (large) file_group row for the sort key, which takes ~90
-        # seconds cold on a Pi with 124k archives.
-        from_clause = 'FROM file_group fg CROSS JOIN archive a ON a.file_group_id = fg.id'
+            {fts_join_}'''
+        wheres_ = '\n AND '.join(wheres_)
+        return f'{from_}\n WHERE\n{wheres_}' if wheres_ else from_
 
     stmt = f'''
             SELECT
-                a.file_group_id AS id, -- always get `file_group.id` for `handle_file_group_search_results`
+                a.file_group_id AS id -- always get `file_group.id` for `handle_file_group_search_results`
                 {select_columns}
-                COUNT(*) OVER() AS total
+                {keyset.selects()}
                 {headline_columns}
-            {from_clause}
-            {where}
-            ORDER BY {order_by}
+            {from_clause(fts_join, page_wheres)}
+            ORDER BY {keyset.order_by()}
             LIMIT :limit OFFSET :offset
         '''.strip()
-    logger.debug(f'{stmt} {params}')
+    logger.debug(f'{stmt} {page_params}')
 
-    results, total = handle_file_group_search_results(stmt, params)
+    results, _ = handle_file_group_search_results(stmt, page_params, keyset)
+    total = get_search_total(from_clause(count_fts_join, wheres), params, limit, offset, len(results))
 
     if file_group_search and headline and results:
         # Highlight the plain titles like the FTS snippets above (Postgres used ts_headline).
@@ -13,7 +13,7 @@ from wrolpi.common import ModelHelper, Base, logger, get_title_from_html, get_wr
     strip_surrogates
 from wrolpi.dates import now
 from wrolpi.errors import UnknownArchive
-from wrolpi.files.models import FileGroup
+from wrolpi.files.models import FileGroup, resolve_files
 from wrolpi.tags import TagFile
 from wrolpi.vars import PYTEST
 from .errors import InvalidArchive
@@ -26,6 +26,31 @@ MATCH_URL = re.compile(r'^\s+?url:\s+?(http.*)', re.MULTILINE)
 MATCH_DATE = re.compile(r'^\s+?saved date:\s+?(.*)', re.MULTILINE)
 
 
+
+def archive_json(directory: Optional[pathlib.Path], files: List[dict], *, id: int, collection_id: Optional[int],
+                 domain: Optional[str]) -> dict:
+    """The "archive" of the JSON of an Archive, from the columns of its Archive and FileGroup (see
+    `wrolpi.files.lib.hydrate_file_group_search_results`)."""
+    # Local import to avoid circular import within archive module
+    from modules.archive.lib import is_singlefile_file
+
+    def my_files(*mimetypes: str) -> List[dict]:
+        return resolve_files(directory, files, *mimetypes)
+
+    html_files = [i for i in my_files('text/html', 'application/octet-stream') if i['path'].name.endswith('.html')]
+    singlefile_file = next((i for i in html_files if is_singlefile_file(i['path'])), None)
+    readability_txt_file = next(
+        (i for i in my_files('text/plain', 'text/html') if i['path'].name.endswith('.readability.txt')), None)
+    screenshot_file = next(iter(my_files('image/')), None)
+    return dict(
+        id=id,
+        collection_id=collection_id,
+        domain=domain,
+        singlefile_path=singlefile_file['path'].name if singlefile_file else None,
+        readability_txt_path=readability_txt_file['path'].name if readability_txt_file else None,
+        screenshot_path=screenshot_file['path'].name if screenshot_file else None,
+    )
+
 class Archive(Base, ModelHelper):
     __tablename__ = 'archive'
     __table_args__ = (
@@ -41,14 +66,8 @@ class Archive(Base, ModelHelper):
 
     def __json__(self) -> dict:
         d = self.file_group.__json__()
-        d['archive'] = dict(
-            id=self.id,
-            collection_id=self.collection_id,
-            domain=self.domain,
-            singlefile_path=self.singlefile_path.name if self.singlefile_path else None,
-            readability_txt_path=self.readability_txt_path.name if self.readability_txt_path else None,
-            screenshot_path=self.screenshot_path.name if self.screenshot_path else None,
-        )
+        d['archive'] = archive_json(self.file_group.directory, self.file_group.files, id=self.id,
+                                    collection_id=self.collection_id, domain=self.domain)
         return d
 
     def __repr__(self):
@@ -19,7 +19,8 @@ class ArchiveDict:
 class ArchiveSearchRequest:
     search_str: Optional[str] = None
     domain: Optional[str] = None
-    offset: Optional[int] = None
+    cursor: Optional[str] = None  # The `next_cursor` of the previous page; pages are fetched by cursor.
+    offset: Optional[int] = None  # Jumps to a page when there is no cursor; otherwise the position of the page.
     limit: Optional[int] = None
     order_by: Optional[str] = None
     tag_names: List[str] = field(default_factory=list)
@@ -31,6 +32,7 @@ class ArchiveSearchRequest:
 class ArchiveSearchResponse:
     file_groups: List[ArchiveDict]
     totals: dict
+    next_cursor: Optional[str] = None
 
 
 @dataclass
@@ -160,6 +160,30 @@ async def test_search_offset(test_session, archive_factory, async_client):
     await check_results(async_client, data, [])
 
 
+@pytest.mark.asyncio
+async def test_search_cursor(test_session, archive_factory, async_client):
+    """Archive search pages can be fetched using the `next_cursor` of the previous page."""
+    for i in range(50):
+        archive_factory('example.com', f'https://example.com/{i}', contents='foo bar')
+    test_session.commit()
+
+    ids, cursor = [], None
+    for _ in range(3):
+        data = {'search_str': None, 'cursor': cursor}
+        request, response = await async_client.post('/api/archive/search', content=json.dumps(data))
+        assert response.status_code == HTTPStatus.OK, response.json
+        assert response.json['totals']['file_groups'] == 50
+        ids.extend(i['id'] for i in response.json['file_groups'])
+        cursor = response.json['next_cursor']
+    assert ids == list(range(50, 0, -1))
+    assert cursor is None
+
+    data = {'search_str': None, 'cursor': 'bad cursor'}
+    request, response = await async_client.post('/api/archive/search', content=json.dumps(data))
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert response.json['code'] == 'INVALID_CURSOR'
+
+
 @pytest.mark.asyncio
 async def test_archives_search_no_query(test_session, archive_factory, async_client):
     """Archive Search API endpoint does not require data in the body."""
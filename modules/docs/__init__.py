@@ -1,18 +1,22 @@
 import asyncio
+import dataclasses
+import functools
 import logging
-from typing import Callable, List
+import pathlib
+from typing import Callable, List, Optional
 
 from sqlalchemy import or_
-from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session
 
 from wrolpi.common import register_modeler, register_refresh_cleanup, \
     truncate_object_bytes, split_lines_by_length
 from wrolpi.db import get_db_session
+from wrolpi.db_writer import write
+from wrolpi.files.index_cache import get_cache_key, get_cached, put_cached, flush_index_cache
 from wrolpi.files.indexers import Indexer
 from wrolpi.files.models import FileGroup
 from wrolpi.vars import PYTEST, FILE_MAX_TEXT_SIZE
-from .extractors import extract_metadata
+from .extractors import extract_metadata, metadata_from_cache, metadata_to_cache, DocMetadata
 from .lib import get_or_create_subject_collection, get_or_create_author_collection, is_valid_author, split_authors, \
     normalize_author, normalize_subject, split_subjects, is_valid_subject, discover_calibre_cover
 from .models import Doc, DocSection, DOC_MIMETYPES, COMIC_BOOK_SUFFIXES, EPUB_MIMETYPE, MOBI_MIMETYPE
@@ -20,21 +24,16 @@ from .models import Doc, DocSection, DOC_MIMETYPES, COMIC_BOOK_SUFFIXES, EPUB_MI
 logger = logging.getLogger(__name__)
 
 DOC_PROCESSING_LIMIT = 10
-# Retries for a single doc when it hits SQLite's "database is locked" (SQLITE_BUSY_SNAPSHOT).
-DOC_LOCK_RETRIES = 3
 
 
 @register_modeler
 async def doc_modeler(progress_callback: Callable[[int], None] = None):
     """Searches for doc files (epub, mobi, pdf, docx, doc, odt, cbz, cbr) and models them.
 
-    Each doc is modeled in its own short transaction.  Modeling reads a large file (a PDF/epub can
-    be tens of MB) and can take seconds; holding one write transaction across a whole batch let
-    another connection commit in the meantime, so the deferred transaction failed to upgrade to a
-    write with SQLite's `SQLITE_BUSY_SNAPSHOT` ("database is locked", which `busy_timeout` does not
-    absorb) -- and the error handler then crashed on the rolled-back session, aborting the entire
-    modeler run.  Per-doc transactions keep the write window short and isolate failures so one
-    locked/broken doc cannot poison the rest of the run.
+    Each doc is written separately by the DB writer.  Modeling reads a large file (a PDF/epub can
+    be tens of MB) and can take seconds, so the metadata is extracted before the write; the write
+    only stores it, keeping the write lock briefly.  Each write is isolated (the writer retries it
+    when the database is locked) so one locked/broken doc cannot poison the rest of the run.
     """
     total_processed = 0
     # Ids of docs that failed to model this run.  A failed doc keeps matching the `Doc.id IS NULL`
@@ -71,37 +70,25 @@ async def doc_modeler(progress_callback: Callable[[int], None] = None):
             break
 
         for fg_id in fg_ids:
-            for attempt in range(DOC_LOCK_RETRIES):
-                try:
-                    # One short write transaction per doc.
-                    with get_db_session(commit=True) as session:
-                        file_group = session.query(FileGroup).get(fg_id)
-                        if file_group is None:
-                            # Deleted between discovery and now; nothing to model.
-                            break
-                        doc = _model_doc(file_group, session)
-                        session.add(doc)
-                        file_group.model = Doc.__tablename__
-                        file_group.indexed = True
-                    break
-                except OperationalError as e:
-                    # Another connection committed during our transaction.  Retrying with a fresh
-                    # transaction gets a fresh snapshot and usually succeeds.
-                    if 'locked' in str(e).lower() and attempt < DOC_LOCK_RETRIES - 1:
-                        await asyncio.sleep(0.2 * (attempt + 1))
+            try:
+                # Extract the metadata and write the cover (the slow parts, and the only file writes) before writing
+                # to the DB; the write only applies them, and may be retried.
+                with get_db_session() as session:
+                    file_group = session.query(FileGroup).get(fg_id)
+                    if file_group is None:
+                        # Deleted between discovery and now; nothing to model.
                         continue
-                    logger.error(f'Failed to model doc file_group_id={fg_id}: database error', exc_info=e)
-                    failed_ids.add(fg_id)
-                    break
-                except Exception as e:
-                    # Never reference the ORM object here: after a failed flush the session is
-                    # rolled back, so touching a lazy/expired attribute (e.g. in its repr) raises a
-                    # second exception that would abort the whole modeler.  Log the plain id only.
-                    logger.error(f'Failed to model doc file_group_id={fg_id}', exc_info=e)
-                    failed_ids.add(fg_id)
-                    if PYTEST:
-                        raise
-                    break
+                    metadata = get_doc_metadata(file_group)
+                    files = prepare_doc_files(file_group, metadata)
+                await write(functools.partial(_model_doc_by_id, fg_id, metadata, files))
+            except Exception as e:
+                # Never reference the ORM object here: after a failed flush the session is
+                # rolled back, so touching a lazy/expired attribute (e.g. in its repr) raises a
+                # second exception that would abort the whole modeler.  Log the plain id only.
+                logger.error(f'Failed to model doc file_group_id={fg_id}', exc_info=e)
+                failed_ids.add(fg_id)
+                if PYTEST:
+                    raise
             # Yield so a cancel/other tasks can run between docs.
             await asyncio.sleep(0)
 
@@ -109,15 +96,81 @@ async def doc_modeler(progress_callback: Callable[[int], None] = None):
         if progress_callback:
             progress_callback(total_processed)
 
+    flush_index_cache()
 
-def _model_doc(file_group: FileGroup, session: Session) -> Doc:
-    """Creates a Doc model from a FileGroup. Extracts metadata and creates collections."""
+
+def get_doc_metadata(file_group: FileGroup) -> DocMetadata:
+    """Like `extract_metadata`, but read from the index cache when this file was extracted before."""
+    key = get_cache_key(DocMetadata.__name__, file_group.primary_path)
+    if (cached := get_cached(key)) is not None:
+        return metadata_from_cache(cached)
+
+    metadata = extract_metadata(file_group)
+    put_cached(key, metadata_to_cache(metadata))
+    return metadata
+
+
+@dataclasses.dataclass
+class DocFiles:
+    """What modeling a doc reads from (or writes to) the filesystem, see `prepare_doc_files`."""
+    size: Optional[int] = None
+    cover_path: Optional[pathlib.Path] = None
+    # The cover was written from the metadata, it is not yet a file of the FileGroup.
+    new_cover: bool = False
+    # The cover is the cover of a Calibre ebook directory, whose metadata FileGroups are hidden.
+    calibre_cover: bool = False
+
+
+def prepare_doc_files(file_group: FileGroup, metadata: DocMetadata) -> DocFiles:
+    """Find the cover of a doc, or write the cover extracted from it (`metadata.cover_bytes`) beside it.
+
+    The Calibre cover of an epub is used first, then an existing poster file, then the extracted cover."""
+    primary_path = file_group.primary_path
+    files = DocFiles(size=primary_path.stat().st_size if primary_path.exists() else None)
+
+    # Calibre cover must be checked before the posters because it has a different stem ("cover.jpg" does not match
+    # the epub's stem).
+    if file_group.mimetype and file_group.mimetype.startswith('application/epub'):
+        if calibre_cover := discover_calibre_cover(primary_path):
+            files.cover_path, files.new_cover, files.calibre_cover = calibre_cover, True, True
+            return files
+
+    if poster_files := file_group.my_poster_files():
+        files.cover_path = poster_files[0]['path']
+        return files
+
+    # Use cover from metadata extraction (epub internal cover, PDF first page, etc.)
+    if metadata.cover_bytes:
+        files.cover_path = primary_path.with_suffix('.jpeg')
+        files.cover_path.write_bytes(metadata.cover_bytes)
+        files.new_cover = True
+    return files
+
+
+def _model_doc_by_id(file_group_id: int, metadata: DocMetadata, files: DocFiles, session: Session):
+    """Model the FileGroup (if it still exists) with its extracted `metadata` and prepared `files`.  A write of
+    `doc_modeler`."""
+    file_group = session.query(FileGroup).get(file_group_id)
+    if file_group is None:
+        return
+    doc = _model_doc(file_group, session, metadata, files)
+    session.add(doc)
+    file_group.model = Doc.__tablename__
+    file_group.indexed = True
+
+
+def _model_doc(file_group: FileGroup, session: Session, metadata: DocMetadata = None, files: DocFiles = None) -> Doc:
+    """Creates a Doc model from a FileGroup. Extracts metadata and prepares its files (unless provided) and creates
+    collections."""
     doc = session.query(Doc).filter_by(file_group_id=file_group.id).one_or_none()
     if not doc:
         doc = Doc(file_group=file_group)
         session.add(doc)
 
-    metadata = extract_metadata(file_group)
+    if metadata is None:
+        metadata = get_doc_metadata(file_group)
+    if files is None:
+        files = prepare_doc_files(file_group, metadata)
 
     if metadata.title:
         file_group.title = file_group.a_text = metadata.title
@@ -144,10 +197,10 @@ def _model_doc(file_group: FileGroup, session: Session) -> Doc:
     doc.page_count = metadata.page_count
     doc.subject = metadata.subject
     doc.description = metadata.description
-    doc.size = file_group.primary_path.stat().st_size if file_group.primary_path.exists() else None
+    doc.size = files.size
 
     # Handle cover.
-    _handle_doc_cover(doc, file_group, metadata)
+    _handle_doc_cover(doc, file_group, files, session)
 
     # Store data dict.
     data = file_group.data or {}
@@ -191,34 +244,16 @@ def _replace_doc_sections(session: Session, doc: Doc, sections):
     ])
 
 
-def _handle_doc_cover(doc: Doc, file_group: FileGroup, metadata):
-    """Handle cover extraction and storage for a doc."""
-
-    # Check for Calibre cover first (epub only) — must happen before poster check
-    # since Calibre cover has a different stem ("cover.jpg" not matching epub stem).
-    if file_group.mimetype and file_group.mimetype.startswith('application/epub'):
-        if calibre_cover := discover_calibre_cover(file_group.primary_path):
-            doc._hide_calibre_files(file_group)
-            file_group.append_files(calibre_cover)
-            file_group.data = file_group.data or {}
-            file_group.data['cover_path'] = calibre_cover.name
-            return
-
-    # Use existing poster files if present.
-    poster_files = file_group.my_poster_files()
-    if poster_files:
-        file_group.data = file_group.data or {}
-        file_group.data['cover_path'] = poster_files[0]['path'].name
+def _handle_doc_cover(doc: Doc, file_group: FileGroup, files: DocFiles, session: Session):
+    """Store the cover found (or written) by `prepare_doc_files`."""
+    if not files.cover_path:
         return
-
-    # Use cover from metadata extraction (epub internal cover, PDF first page, etc.)
-    cover_bytes = metadata.cover_bytes
-    if cover_bytes:
-        cover_path = file_group.primary_path.with_suffix('.jpeg')
-        cover_path.write_bytes(cover_bytes)
-        file_group.append_files(cover_path)
-        file_group.data = file_group.data or {}
-        file_group.data['cover_path'] = cover_path.name
+    if files.calibre_cover:
+        doc._hide_calibre_files(file_group, session)
+    if files.new_cover:
+        file_group.append_files(files.cover_path)
+    file_group.data = file_group.data or {}
+    file_group.data['cover_path'] = files.cover_path.name
 
 
 def _auto_create_collections(session: Session, file_group: FileGroup, metadata):
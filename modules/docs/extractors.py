@@ -1,3 +1,4 @@
+import base64
 import dataclasses
 import datetime
 import logging
@@ -93,6 +94,25 @@ def extract_metadata(file_group: FileGroup) -> DocMetadata:
     return DocMetadata(title=Indexer.get_title(path))
 
 
+def metadata_to_cache(metadata: DocMetadata) -> dict:
+    """Convert DocMetadata to JSON-serializable values for the index cache."""
+    cached = dataclasses.asdict(metadata)
+    if metadata.published_date:
+        cached['published_date'] = metadata.published_date.isoformat()
+    if metadata.cover_bytes:
+        cached['cover_bytes'] = base64.b64encode(metadata.cover_bytes).decode()
+    return cached
+
+
+def metadata_from_cache(cached: dict) -> DocMetadata:
+    if cached.get('published_date'):
+        cached['published_date'] = datetime.datetime.fromisoformat(cached['published_date'])
+    if cached.get('cover_bytes'):
+        cached['cover_bytes'] = base64.b64decode(cached['cover_bytes'])
+    cached['sections'] = [DocSection(**i) for i in cached.get('sections') or []]
+    return DocMetadata(**cached)
+
+
 def _extract_text_from_html(html: str) -> str:
     soup = get_html_soup(html)
     return soup.get_text()
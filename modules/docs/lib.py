@@ -350,7 +350,7 @@ def _get_doc(session, file_group_id: int):
 def _search_docs(search_str=None, author=None, subject=None, language=None, mimetype=None,
                  limit=20, offset=0, order_by='published_datetime', tag_names=None, deep=False):
     from .models import Doc
-    from wrolpi.files.models import FileGroup
+    from wrolpi.files.models import FileGroup, FileGroupText
 
     # Deep search matches all FTS columns (including d_text, the document contents); the default matches only
     # the much smaller a/b/c columns.
@@ -368,8 +368,11 @@ def _search_docs(search_str=None, author=None, subject=None, language=None, mime
                 .alias('fts')
             query = query.join(fts_sq, fts_sq.c.id == FileGroup.id)
 
+        if author or order_by == 'title':
+            query = query.outerjoin(FileGroupText, FileGroupText.file_group_id == FileGroup.id)
+
         if author:
-            query = query.filter(FileGroup.b_text.ilike(f'%{author}%'))
+            query = query.filter(FileGroupText.b_text.ilike(f'%{author}%'))
 
         if subject:
             query = query.filter(Doc.subject.ilike(f'%{subject}%'))
@@ -401,7 +404,7 @@ def _search_docs(search_str=None, author=None, subject=None, language=None, mime
         elif order_by == 'size':
             query = query.order_by(nullslast(desc(Doc.size)))
         elif order_by == 'title':
-            query = query.order_by(nullslast(asc(FileGroup.a_text)))
+            query = query.order_by(nullslast(asc(FileGroupText.a_text)))
         else:
             query = query.order_by(desc(FileGroup.id))
 
@@ -5,7 +5,6 @@ from sqlalchemy import Column, Integer, BigInteger, ForeignKey, String, Text, In
 from sqlalchemy.orm import relationship, Session
 
 from wrolpi.common import ModelHelper, Base
-from wrolpi.db import get_db_session
 from wrolpi.files.models import FileGroup
 
 EPUB_MIMETYPE = 'application/epub'
@@ -110,23 +109,19 @@ class Doc(ModelHelper, Base):
             return cover['path']
         return None
 
-    def _hide_calibre_files(self, file_group: FileGroup):
-        """Delete FileGroups of the cover/metadata when this is a Calibre ebook directory."""
-        from modules.docs.lib import discover_calibre_cover
+    def _hide_calibre_files(self, file_group: FileGroup, session: Session):
+        """Delete FileGroups of the cover/metadata of a Calibre ebook directory.  The caller must have found the
+        Calibre cover (see `discover_calibre_cover`)."""
         path = file_group.primary_path
-        if not discover_calibre_cover(path):
-            raise ValueError(f'Refusing to hide Calibre files when we do not have a Calibre ebook directory!')
-
         metadata = path.parent / 'metadata.opf'
         cover = path.parent / 'cover.jpg'
 
-        with get_db_session(commit=True) as session:
-            file_groups = session.query(FileGroup).filter(or_(
-                FileGroup.primary_path == str(metadata),
-                FileGroup.primary_path == str(cover),
-            ))
-            for fg in file_groups:
-                session.delete(fg)
+        file_groups = session.query(FileGroup).filter(or_(
+            FileGroup.primary_path == str(metadata),
+            FileGroup.primary_path == str(cover),
+        ))
+        for fg in file_groups:
+            session.delete(fg)
 
 
 # Section kinds.
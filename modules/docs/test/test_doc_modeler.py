@@ -182,32 +182,37 @@ async def test_doc_modeler_survives_database_locked(async_client, test_session,
     Regression: doc_modeler held one write transaction across a whole batch of slow extractions.
     When another connection committed mid-batch, the deferred transaction failed to upgrade with
     SQLITE_BUSY_SNAPSHOT ("database is locked"), the error handler crashed on the rolled-back
-    session, and the entire run aborted -- so no further docs were modeled.  Each doc now runs in
-    its own short transaction and a lock is retried.
+    session, and the entire run aborted -- so no further docs were modeled.  Each doc is now its
+    own write, and the DB writer retries a write when the database is locked.
     """
     ebook_dir = test_directory / 'ebooks'
     ebook_dir.mkdir(parents=True)
     for i in range(3):
         shutil.copy(PROJECT_DIR / 'test/ebook example.epub', ebook_dir / f'book_{i:03d}.epub')
 
-    from modules.docs import _model_doc as real_model_doc
+    from modules.docs import _model_doc as real_model_doc, prepare_doc_files
 
     calls = {'n': 0}
 
-    def flaky_model_doc(file_group, session):
+    def flaky_model_doc(file_group, session, metadata=None, files=None):
         # Fail the very first modeling attempt with a lock error, then behave normally.  Proves the
         # run recovers (retries the doc, keeps modeling the rest) instead of aborting.
         calls['n'] += 1
         if calls['n'] == 1:
             raise OperationalError('stmt', {}, sqlite3.OperationalError('database is locked'))
-        return real_model_doc(file_group, session)
+        return real_model_doc(file_group, session, metadata, files)
 
-    with patch('modules.docs._model_doc', side_effect=flaky_model_doc):
+    with patch('modules.docs._model_doc', side_effect=flaky_model_doc), \
+            patch('modules.docs.prepare_doc_files', side_effect=prepare_doc_files) as mock_prepare_doc_files:
         await refresh_files()
 
     # All three ebooks were modeled despite the initial lock error.
     assert test_session.query(Doc).count() == 3
     assert calls['n'] >= 4  # 1 failed attempt + 1 retry + 2 more docs.
+    # The covers were written once, before the (retried) writes.
+    assert mock_prepare_doc_files.call_count == 3
+    assert sorted(i.name for i in ebook_dir.glob('*.jpeg')) == ['book_000.jpeg', 'book_001.jpeg', 'book_002.jpeg']
+    assert all(len(i.file_group.my_poster_files()) == 1 for i in test_session.query(Doc))
 
 
 @pytest.mark.asyncio
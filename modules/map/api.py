@@ -30,6 +30,8 @@ async def delete_file(_: Request, filename: str):
         return response.json({'error': str(e)}, HTTPStatus.BAD_REQUEST)
 
     if deleted:
+        # The merged search index was deleted with the region; merge the remaining regions.
+        search.rebuild_merged_search_index()
         return response.empty()
     return response.json({'error': 'File not found'}, HTTPStatus.NOT_FOUND)
 
@@ -112,10 +114,19 @@ async def search_places(request: Request):
         offset = int(request.args.get('offset', 0))
         lat = float(request.args.get('lat')) if request.args.get('lat') is not None else None
         lon = float(request.args.get('lon')) if request.args.get('lon') is not None else None
+        radius_km = float(request.args.get('radius_km', search.NEAR_RADIUS_KM))
     except (ValueError, TypeError):
         return json_response({'error': 'Invalid query parameters'}, HTTPStatus.BAD_REQUEST)
 
-    data = search.search_places(q.strip(), limit=limit, offset=offset, lat=lat, lon=lon)
+    near = request.args.get('near', '').lower() in ('1', 'true')
+    if near and (lat is None or lon is None):
+        return json_response({'error': 'Query parameters "lat" and "lon" are required with "near"'},
+                             HTTPStatus.BAD_REQUEST)
+    if not 0 < radius_km <= 20_000:
+        return json_response({'error': 'Invalid query parameters'}, HTTPStatus.BAD_REQUEST)
+
+    data = search.search_places(q.strip(), limit=limit, offset=offset, lat=lat, lon=lon, near=near,
+                                radius_km=radius_km)
     return json_response(data, HTTPStatus.OK)
 
 
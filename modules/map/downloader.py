@@ -514,6 +514,12 @@ class MapSearchIndexDownloader(Downloader):
                           executed: ExecutedMapSearchIndex) -> DownloadResult:
         if executed.error:
             return DownloadResult(success=False, error=executed.error)
+        if not executed.skipped:
+            try:
+                from modules.map.search import rebuild_merged_search_index
+                rebuild_merged_search_index()
+            except Exception as e:
+                logger.error(f'Failed to start merging search indexes after {executed.region}: {e}')
         return DownloadResult(success=True, location='/map')
 
 
@@ -8,6 +8,7 @@ from sqlalchemy.orm import Session
 from modules.map.catalog import MAP_REGIONS, MAP_REGIONS_BY_NAME, MAP_REGIONS_BY_REGION, MANIFEST_URL
 from wrolpi.common import get_media_directory, walk, logger, get_wrolpi_config, aiohttp_get, verify_gpg_signature
 from wrolpi.downloader import DownloadFrequency, Download, save_downloads_config, download_manager
+from wrolpi.scripts.build_map_search import MERGED_INDEX_NAME
 
 logger = logger.getChild(__name__)
 
@@ -42,7 +43,7 @@ def get_pmtiles_files() -> List[dict]:
 def delete_pmtiles_file(filename: str) -> bool:
     """Delete a PMTiles file from the map directory.  Returns True if the file was deleted.
 
-    Also deletes the companion .search.db file if it exists."""
+    Also deletes the companion .search.db file if it exists, and the merged search index which contains it."""
     map_directory = get_map_directory()
     # Prevent path traversal.
     path = (map_directory / filename).resolve()
@@ -57,6 +58,9 @@ def delete_pmtiles_file(filename: str) -> bool:
         if search_db.is_file():
             search_db.unlink()
             logger.warning(f'Deleted search index: {search_db}')
+            # The merged search index contains the deleted region, the remaining regions must be merged again (see
+            # `rebuild_merged_search_index`).
+            (map_directory / MERGED_INDEX_NAME).unlink(missing_ok=True)
         return True
 
     return False
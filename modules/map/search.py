@@ -1,21 +1,31 @@
 import asyncio
-import contextlib
+import collections
 import math
+import os
+import re
 import shutil
 import sqlite3
 import sys
+import threading
+from dataclasses import dataclass
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Tuple
 
 from modules.map.lib import get_map_directory
+from wrolpi.api_utils import api_app
 from wrolpi.common import logger, background_task
+from wrolpi.downloader import make_progress_callback
 from wrolpi.events import Events
 from wrolpi.flags import map_search_building
+from wrolpi.scripts.build_map_search import MERGED_INDEX_NAME
 
 logger = logger.getChild(__name__)
 
 BUILD_SCRIPT = Path(__file__).parent.parent.parent / 'wrolpi' / 'scripts' / 'build_map_search.py'
 
+# Printed by `print_progress` of the build script, e.g. "  Progress: usa.pmtiles 42%"
+BUILD_PROGRESS_RE = re.compile(r'^Progress: (\S+) (\d+)%$')
+
 
 def get_search_db_files() -> List[Path]:
     """Find all .search.db files in the map directory."""
@@ -23,16 +33,238 @@ def get_search_db_files() -> List[Path]:
     return sorted(map_directory.glob('*.search.db'))
 
 
-def search_places(query: str, limit: int = 12, offset: int = 0, lat: float = None, lon: float = None) -> dict:
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.195
+# The default radius of a search near a location.
+NEAR_RADIUS_KM = 100
+NEAR_QUERY_RE = re.compile(r'\s+(near\s+(me|here)|nearby)\s*$', re.IGNORECASE)
+
+PLACE_COLUMNS = 'p.name, p.kind, p.lat, p.lon, p.min_zoom, p.source, p.kind_detail, p.population, p.region'
+
+
+class SearchConnection:
+    """A read-only connection to a search database, cached by `get_search_connection` until the file changes."""
+
+    def __init__(self, path: Path, key: tuple):
+        self.path = path
+        self.key = key
+        self.conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        tables = {row[0] for row in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        # Indexes built before `places_trigram` was added are searched with LIKE.
+        self.has_trigram = 'places_trigram' in tables
+        # Indexes built before `places_rtree` was added are searched near a location without it.
+        self.has_rtree = 'places_rtree' in tables
+        # The region databases of a merged database: {name: (size, mtime_ns)}
+        self.sources = None
+        if 'merged_sources' in tables:
+            self.sources = {row['name']: (row['size'], row['mtime_ns'])
+                            for row in self.conn.execute('SELECT name, size, mtime_ns FROM merged_sources')}
+
+    def close(self):
+        self.conn.close()
+
+
+# The search connections of this process.  A rebuilt index is a new file (see `build_search_index`), so the
+# connection is replaced when the inode, size or modification time change.
+_search_connections: Dict[Path, SearchConnection] = dict()
+_search_connections_lock = threading.Lock()
+
+
+def _search_db_key(path: Path) -> tuple | None:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def get_search_connection(db_path: Path) -> SearchConnection | None:
+    """Return the cached read-only connection to a search database, or None if it cannot be opened."""
+    key = _search_db_key(db_path)
+    with _search_connections_lock:
+        cached = _search_connections.get(db_path)
+        if cached and cached.key == key:
+            return cached
+        if cached:
+            _search_connections.pop(db_path).close()
+        if key is None:
+            return None
+        try:
+            _search_connections[db_path] = search_connection = SearchConnection(db_path, key)
+        except sqlite3.Error as e:
+            logger.warning(f'Unable to open search index {db_path.name}: {e}')
+            return None
+        return search_connection
+
+
+def close_search_connections():
+    """Close all cached search connections of this process."""
+    with _search_connections_lock:
+        for search_connection in _search_connections.values():
+            search_connection.close()
+        _search_connections.clear()
+
+
+def _forget_search_connections_after_fork():
+    """The connections of the parent must not be used (or closed) by a forked child; it opens its own."""
+    global _search_connections, _search_connections_lock
+    _search_connections_lock = threading.Lock()
+    _search_connections = dict()
+
+
+os.register_at_fork(after_in_child=_forget_search_connections_after_fork)
+
+
+def get_search_connections(db_files: List[Path]) -> List[SearchConnection]:
+    """Return the connection to the merged search database when it is current, otherwise a connection to each region's
+    search database."""
+    merged_path = get_map_directory() / MERGED_INDEX_NAME
+
+    # Close the connections of deleted (or no longer current) search databases.
+    wanted = {merged_path, *db_files}
+    with _search_connections_lock:
+        for path in [i for i in _search_connections if i not in wanted]:
+            _search_connections.pop(path).close()
+
+    if len(db_files) > 1 and (merged := get_search_connection(merged_path)) and merged.sources:
+        current = dict()
+        for db_path in db_files:
+            if (key := _search_db_key(db_path)) is not None:
+                current[db_path.name] = key[1:]
+        if current == merged.sources:
+            return [merged]
+
+    return [i for i in map(get_search_connection, db_files) if i]
+
+
+def _fts_query(query: str) -> str:
+    # FTS5 match query with prefix matching.  Escape embedded double quotes.
+    escaped = query.replace('"', '""')
+    return f'"{escaped}"*'
+
+
+@dataclass
+class Near:
+    """Places within `radius_km` of a location, found with the R*Tree of the search database."""
+    lat: float
+    lon: float
+    radius_km: float = NEAR_RADIUS_KM
+
+    def bbox(self) -> Tuple[float, float, float, float]:
+        """The (south, north, west, east) bounds of the circle.  Does not wrap around the antimeridian."""
+        dlat = self.radius_km / KM_PER_DEGREE
+        cos_lat = math.cos(math.radians(self.lat))
+        dlon = 180 if cos_lat < 0.01 else min(self.radius_km / (KM_PER_DEGREE * cos_lat), 180)
+        return max(self.lat - dlat, -90), min(self.lat + dlat, 90), max(self.lon - dlon, -180), min(self.lon + dlon, 180)
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """The great-circle distance between two locations, in kilometers."""
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def parse_near_query(query: str) -> Tuple[str, bool]:
+    """Remove "near me", "near here" or "nearby" from the end of a query; return the query and if it was removed.
+
+    >>> parse_near_query('gas station near here')
+    ('gas station', True)
+    """
+    stripped = NEAR_QUERY_RE.sub('', query)
+    return (stripped, True) if stripped and stripped != query else (query, False)
+
+
+def _near_rows(search_connection: SearchConnection, matches_sql: str, match_param: str, near: Near,
+               cap: int) -> List[sqlite3.Row]:
+    """The matches (`matches_sql` selects their ids) within the bounding box of `near`, nearest first.
+
+    The order is by the flat (equirectangular) distance, which is exact enough to choose the nearest `cap`
+    places; they are ranked by `haversine_km` later."""
+    south, north, west, east = near.bbox()
+    lon_scale = math.cos(math.radians(near.lat)) ** 2
+    return search_connection.conn.execute(f"""
+        SELECT {PLACE_COLUMNS}, 0 AS fts_rank
+        FROM places_rtree r
+        JOIN places p ON p.id = r.id
+        WHERE r.min_lat >= ? AND r.max_lat <= ? AND r.min_lon >= ? AND r.max_lon <= ?
+          AND r.id IN ({matches_sql})
+        ORDER BY (p.lat - ?) * (p.lat - ?) + (p.lon - ?) * (p.lon - ?) * ?
+        LIMIT ?
+    """, (south, north, west, east, match_param, near.lat, near.lat, near.lon, near.lon, lon_scale, cap)).fetchall()
+
+
+def _fts_rows(search_connection: SearchConnection, query: str, cap: int, near: Near = None) -> List[sqlite3.Row]:
+    """Places with a word of the name or kind starting with the query, best FTS5 rank first (or nearest first)."""
+    fts_query = _fts_query(query)
+    if near and search_connection.has_rtree:
+        return _near_rows(search_connection, 'SELECT rowid FROM places_fts WHERE places_fts MATCH ?', fts_query,
+                          near, cap)
+    return search_connection.conn.execute(f"""
+        SELECT {PLACE_COLUMNS},
+               places_fts.rank AS fts_rank
+        FROM places_fts
+        JOIN places p ON p.id = places_fts.rowid
+        WHERE places_fts MATCH ?
+        ORDER BY places_fts.rank
+        LIMIT ?
+    """, (fts_query, cap)).fetchall()
+
+
+def _fuzzy_rows(search_connection: SearchConnection, query: str, cap: int, near: Near = None) -> List[sqlite3.Row]:
+    """Substring (LIKE) matches of the place names.  The trigram index is used for queries of at least 3 characters,
+    otherwise every name is scanned."""
+    like_pattern = f'%{query}%'
+    if search_connection.has_trigram and len(query) >= 3:
+        matches_sql = 'SELECT rowid FROM places_trigram WHERE name LIKE ?'
+        from_where = 'places_trigram t JOIN places p ON p.id = t.rowid WHERE t.name LIKE ?'
+    else:
+        matches_sql = 'SELECT id FROM places WHERE name LIKE ?'
+        from_where = 'places p WHERE p.name LIKE ?'
+    if near and search_connection.has_rtree:
+        return _near_rows(search_connection, matches_sql, like_pattern, near, cap)
+    return search_connection.conn.execute(f"""
+        SELECT {PLACE_COLUMNS}, 0 AS fts_rank
+        FROM {from_where}
+        ORDER BY p.min_zoom, p.population DESC
+        LIMIT ?
+    """, (like_pattern, cap)).fetchall()
+
+
+def _fuzzy_count(search_connection: SearchConnection, query: str) -> int:
+    like_pattern = f'%{query}%'
+    if search_connection.has_trigram and len(query) >= 3:
+        sql = 'SELECT COUNT(*) FROM places_trigram WHERE name LIKE ?'
+    else:
+        sql = 'SELECT COUNT(*) FROM places WHERE name LIKE ?'
+    row = search_connection.conn.execute(sql, (like_pattern,)).fetchone()
+    return row[0] if row else 0
+
+
+def search_places(query: str, limit: int = 12, offset: int = 0, lat: float = None, lon: float = None,
+                  near: bool = False, radius_km: float = NEAR_RADIUS_KM) -> dict:
     """Search all .search.db files for places matching the query.
 
     Results are ranked by importance (min_zoom) and optionally by proximity to lat/lon.
+
+    `near` (or a query ending with "near me", "near here" or "nearby") requires lat/lon, and searches only the places
+    within `radius_km` of lat/lon, nearest first.  These results have their `distance_km`.
+
     Returns {"results": [...], "total": N}.
     """
-    db_files = get_search_db_files()
-    if not db_files:
+    search_connections = get_search_connections(get_search_db_files())
+    if not search_connections:
         return {'results': [], 'total': 0}
 
+    has_location = lat is not None and lon is not None
+    if has_location:
+        query, near_query = parse_near_query(query)
+        near = Near(lat, lon, radius_km) if near or near_query else None
+    else:
+        near = None
+
     results = []
 
     # Cap the number of rows fetched per DB to bound memory on large regional indexes
@@ -41,69 +273,36 @@ def search_places(query: str, limit: int = 12, offset: int = 0, lat: float = Non
     # cross-DB deduplication before pagination.
     per_db_cap = max((offset + limit) * 5, 100)
 
-    # FTS5 match query with prefix matching.  Escape embedded double quotes.
-    escaped = query.replace('"', '""')
-    fts_query = f'"{escaped}"*'
-
-    for db_path in db_files:
+    for search_connection in search_connections:
         try:
-            with contextlib.closing(sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)) as conn:
-                conn.row_factory = sqlite3.Row
-
-                rows = conn.execute("""
-                    SELECT p.name, p.kind, p.lat, p.lon, p.min_zoom, p.source,
-                           p.kind_detail, p.population, p.region,
-                           places_fts.rank AS fts_rank
-                    FROM places_fts
-                    JOIN places p ON p.id = places_fts.rowid
-                    WHERE places_fts MATCH ?
-                    ORDER BY places_fts.rank
-                    LIMIT ?
-                """, (fts_query, per_db_cap)).fetchall()
-
-                for row in rows:
-                    result = dict(row)
-                    if lat is not None and lon is not None:
-                        dlat = result['lat'] - lat
-                        dlon = result['lon'] - lon
-                        result['distance'] = math.sqrt(dlat ** 2 + dlon ** 2)
-                    results.append(result)
+            results.extend(map(dict, _fts_rows(search_connection, query, per_db_cap, near)))
         except sqlite3.OperationalError as e:
-            logger.warning(f'Search error in {db_path.name}: {e}')
+            logger.warning(f'Search error in {search_connection.path.name}: {e}')
             continue
 
-    # Fuzzy fallback: if FTS5 found nothing, try LIKE substring matching.
+    # Fuzzy fallback: if FTS5 found nothing, try substring matching.
     if not results:
-        like_pattern = f'%{query}%'
-        for db_path in db_files:
+        for search_connection in search_connections:
             try:
-                with contextlib.closing(sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)) as conn:
-                    conn.row_factory = sqlite3.Row
-
-                    rows = conn.execute("""
-                        SELECT p.name, p.kind, p.lat, p.lon, p.min_zoom, p.source,
-                               p.kind_detail, p.population, p.region, 0 AS fts_rank
-                        FROM places p
-                        WHERE p.name LIKE ?
-                        ORDER BY p.min_zoom, p.population DESC
-                        LIMIT ?
-                    """, (like_pattern, per_db_cap)).fetchall()
-
-                    for row in rows:
-                        result = dict(row)
-                        if lat is not None and lon is not None:
-                            dlat = result['lat'] - lat
-                            dlon = result['lon'] - lon
-                            result['distance'] = math.sqrt(dlat ** 2 + dlon ** 2)
-                        results.append(result)
+                results.extend(map(dict, _fuzzy_rows(search_connection, query, per_db_cap, near)))
             except sqlite3.OperationalError as e:
-                logger.warning(f'LIKE search error in {db_path.name}: {e}')
+                logger.warning(f'LIKE search error in {search_connection.path.name}: {e}')
                 continue
 
+    capped = len(results) >= per_db_cap
+
+    if has_location:
+        for result in results:
+            result['distance'] = haversine_km(lat, lon, result['lat'], result['lon'])
+
     # Sort by importance (lower min_zoom = more important), then by proximity or FTS rank.
     # Coerce NULL min_zoom (possible from older schemas) to a default; `dict.get` returns
     # None rather than the default for explicit NULL values.
-    if lat is not None and lon is not None:
+    if near:
+        # Indexes without an R*Tree (built before it was added) return matches outside the radius.
+        results = [r for r in results if r['distance'] <= near.radius_km]
+        results.sort(key=lambda r: r['distance'])
+    elif has_location:
         results.sort(key=lambda r: (r.get('min_zoom') or 10, r.get('distance') or 0))
     else:
         results.sort(key=lambda r: (r.get('min_zoom') or 10, r.get('fts_rank') or 0))
@@ -124,8 +323,9 @@ def search_places(query: str, limit: int = 12, offset: int = 0, lat: float = Non
 
     # Use the DB-wide count for `total` so pagination isn't capped by `per_db_cap`.
     # Fall back to the deduped length if the count query fails (e.g. the per-DB cap
-    # was never hit, in which case they agree anyway).
-    if len(results) >= per_db_cap:
+    # was never hit, in which case they agree anyway).  The count of a near search is
+    # not known, it is the count of the nearest places which were fetched.
+    if capped and not near:
         total = search_places_count(query)
     else:
         total = len(deduped)
@@ -134,7 +334,9 @@ def search_places(query: str, limit: int = 12, offset: int = 0, lat: float = Non
     final = []
     for r in deduped[offset:offset + limit]:
         r.pop('fts_rank', None)
-        r.pop('distance', None)
+        distance = r.pop('distance', None)
+        if near:
+            r['distance_km'] = round(distance, 3)
         final.append(r)
 
     return {'results': final, 'total': total}
@@ -142,33 +344,24 @@ def search_places(query: str, limit: int = 12, offset: int = 0, lat: float = Non
 
 def search_places_count(query: str) -> int:
     """Return the count of places matching the query across all search indexes."""
-    db_files = get_search_db_files()
-    if not db_files:
-        return 0
-
-    escaped = query.replace('"', '""')
-    fts_query = f'"{escaped}"*'
+    search_connections = get_search_connections(get_search_db_files())
+    fts_query = _fts_query(query)
     total = 0
 
-    for db_path in db_files:
+    for search_connection in search_connections:
         try:
-            with contextlib.closing(sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)) as conn:
-                row = conn.execute("""
-                    SELECT COUNT(*) FROM places_fts WHERE places_fts MATCH ?
-                """, (fts_query,)).fetchone()
-                total += row[0] if row else 0
+            row = search_connection.conn.execute("""
+                SELECT COUNT(*) FROM places_fts WHERE places_fts MATCH ?
+            """, (fts_query,)).fetchone()
+            total += row[0] if row else 0
         except sqlite3.OperationalError:
             continue
 
     # LIKE fallback count if FTS5 found nothing.
     if total == 0:
-        like_pattern = f'%{query}%'
-        for db_path in db_files:
+        for search_connection in search_connections:
             try:
-                with contextlib.closing(sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)) as conn:
-                    row = conn.execute("SELECT COUNT(*) FROM places WHERE name LIKE ?",
-                                       (like_pattern,)).fetchone()
-                    total += row[0] if row else 0
+                total += _fuzzy_count(search_connection, query)
             except sqlite3.OperationalError:
                 continue
 
@@ -220,10 +413,23 @@ def _should_enrich() -> bool:
         return False
 
 
+def parse_build_progress(line: str) -> dict | None:
+    """Parse a progress line of the build script and return a dict, or None if not a progress line."""
+    if m := BUILD_PROGRESS_RE.match(line):
+        return dict(name=m.group(1), percent=int(m.group(2)))
+    return None
+
+
+def set_search_build_progress(progress: dict | None):
+    """Store the progress of the running build in shared_ctx, it is reported by the status API."""
+    api_app.shared_ctx.status['map_search_progress'] = progress
+
+
 async def _run_build(cmd: list, description: str):
     """Run a build subprocess with the map_search_building flag set.
 
-    The flag is automatically cleared when the build finishes (success or failure).
+    The flag is automatically cleared when the build finishes (success or failure).  The progress printed by the
+    build script is reported as `map_search_progress` of the status.
     """
     with map_search_building:
         logger.warning(f'Starting search index build: {description}')
@@ -232,8 +438,18 @@ async def _run_build(cmd: list, description: str):
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.STDOUT,
         )
-        stdout, _ = await proc.communicate()
-        output = stdout.decode()[-500:] if stdout else ''
+        on_stdout = make_progress_callback(set_search_build_progress, parse_build_progress)
+        # Keep only the end of the output for the error log.
+        tail = collections.deque(maxlen=20)
+        try:
+            while line := await proc.stdout.readline():
+                line = line.decode(errors='replace')
+                tail.append(line)
+                on_stdout(line)
+            await proc.wait()
+        finally:
+            set_search_build_progress(None)
+        output = ''.join(tail)[-500:]
         if proc.returncode == 0:
             logger.warning(f'Search index build completed: {description}')
             Events.send_map_search_complete(f'Search index built for {description}')
@@ -263,7 +479,7 @@ def rebuild_search_index(pmtiles_name: str, max_zoom: int = 10) -> bool:
     if not _check_tippecanoe():
         return False
 
-    cmd = [sys.executable, str(BUILD_SCRIPT), str(pmtiles_path), '--max-zoom', str(max_zoom)]
+    cmd = [sys.executable, str(BUILD_SCRIPT), str(pmtiles_path), '--max-zoom', str(max_zoom), '--merge']
     if _should_enrich():
         cmd.append('--enrich')
 
@@ -285,7 +501,7 @@ def rebuild_all_search_indexes(max_zoom: int = 10) -> bool:
     if not _check_tippecanoe():
         return False
 
-    cmd = [sys.executable, str(BUILD_SCRIPT), str(map_directory), '--max-zoom', str(max_zoom)]
+    cmd = [sys.executable, str(BUILD_SCRIPT), str(map_directory), '--max-zoom', str(max_zoom), '--merge']
     if _should_enrich():
         cmd.append('--enrich')
 
@@ -293,3 +509,19 @@ def rebuild_all_search_indexes(max_zoom: int = 10) -> bool:
     return True
 
 
+def rebuild_merged_search_index() -> bool:
+    """Merge the search indexes of all regions (see `build_merged_index`) as a background task.
+
+    Builds of search indexes also merge them, this is for indexes which were downloaded."""
+    map_directory = get_map_directory()
+
+    if len(list(map_directory.glob('*.search.db'))) < 2:
+        return False
+
+    if map_search_building.is_set():
+        logger.warning('Search index build already running — ignoring merge request')
+        return False
+
+    cmd = [sys.executable, str(BUILD_SCRIPT), str(map_directory), '--merge-only']
+    background_task(_run_build(cmd, 'merged search index'))
+    return True
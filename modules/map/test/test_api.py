@@ -1,5 +1,6 @@
 import json
 from http import HTTPStatus
+from unittest import mock
 
 import pytest
 
@@ -47,6 +48,13 @@ async def test_delete_file(async_client, test_directory, make_files_structure):
     request, response = await async_client.get('/api/map/files')
     assert len(response.json['files']) == 0
 
+    # The remaining regions are merged again after a region is deleted.
+    make_files_structure(['map/oregon.pmtiles', 'map/oregon.search.db'])
+    with mock.patch('modules.map.search.rebuild_merged_search_index') as mock_rebuild:
+        request, response = await async_client.delete('/api/map/files/oregon.pmtiles')
+    assert response.status_code == HTTPStatus.NO_CONTENT
+    mock_rebuild.assert_called_once_with()
+
 
 @pytest.mark.asyncio
 async def test_delete_nonexistent_file(async_client, test_directory):
@@ -43,6 +43,14 @@ def test_delete_pmtiles_file(test_directory, make_files_structure):
     assert lib.delete_pmtiles_file('oregon.pmtiles') is True
     assert not pmtiles_file.is_file()
 
+    # The search index of the region, and the merged search index which contains it, are deleted.
+    pmtiles_file, search_db, merged_index, other_search_db = make_files_structure(
+        ['map/oregon.pmtiles', 'map/oregon.search.db', 'map/merged-search-index.db', 'map/maine.search.db'])
+    assert lib.delete_pmtiles_file('oregon.pmtiles') is True
+    assert not search_db.is_file()
+    assert not merged_index.is_file()
+    assert other_search_db.is_file()
+
 
 def test_delete_nonexistent_file(test_directory):
     """Deleting a nonexistent file returns False."""
@@ -1,4 +1,8 @@
+import contextlib
+import json
+import os
 import sqlite3
+import sys
 from http import HTTPStatus
 from pathlib import Path
 from unittest import mock
@@ -164,3 +168,225 @@ async def test_delete_pmtiles_also_deletes_search_db(async_client, test_director
 
     # Search DB should also be deleted.
     assert not search_db.exists()
+
+
+def _decoded_feature(name, kind, lon, lat):
+    return {'type': 'Feature', 'properties': {'name': name, 'kind': kind, 'min_zoom': 4},
+            'geometry': {'type': 'Point', 'coordinates': [lon, lat]}}
+
+
+def test_build_search_index_streams_features(test_directory, monkeypatch, capsys):
+    """The decoded GeoJSON is parsed one feature at a time, and inserted in batches."""
+    from wrolpi.scripts import build_map_search
+
+    decoded = {'type': 'FeatureCollection', 'properties': {}, 'features': [
+        {'type': 'FeatureCollection', 'properties': {'zoom': 2}, 'features': [
+            {'type': 'FeatureCollection', 'properties': {'layer': 'places'}, 'features': [
+                _decoded_feature('Portland', 'locality', -122.6733, 45.5217),
+                # Duplicate of the first within ~1.1km.
+                _decoded_feature('Portland', 'locality', -122.6734, 45.5218),
+                _decoded_feature('Springfield', 'locality', -89.6436, 39.7990),
+            ]},
+            {'type': 'FeatureCollection', 'properties': {'layer': 'roads'}, 'features': [
+                _decoded_feature('Interstate 5', 'highway', -122.6, 45.5),
+            ]},
+        ]},
+        {'type': 'FeatureCollection', 'properties': {'zoom': 3}, 'features': [
+            {'type': 'FeatureCollection', 'properties': {'layer': 'pois'}, 'features': [
+                _decoded_feature('Yellowstone', 'park', -110.5616, 44.6222),
+            ]},
+        ]},
+    ]}
+    decoded_path = test_directory / 'decoded.json'
+    decoded_path.write_text(json.dumps(decoded, indent=1))
+
+    # A fake tippecanoe-decode which outputs the decoded GeoJSON.
+    bin_directory = test_directory / 'bin'
+    bin_directory.mkdir()
+    fake_decode = bin_directory / 'tippecanoe-decode'
+    fake_decode.write_text(f'#!/bin/sh\ncat {decoded_path}\n')
+    fake_decode.chmod(0o755)
+    monkeypatch.setenv('PATH', f'{bin_directory}:{os.environ["PATH"]}')
+
+    # Read and insert a few features at a time.
+    monkeypatch.setattr(build_map_search, 'READ_CHUNK_SIZE', 64)
+    monkeypatch.setattr(build_map_search, 'FEATURE_BATCH_SIZE', 2)
+
+    pmtiles_path = test_directory / 'usa.pmtiles'
+    pmtiles_path.touch()
+    output_path = build_map_search.build_search_index(pmtiles_path)
+    assert output_path == test_directory / 'usa.search.db'
+
+    with contextlib.closing(sqlite3.connect(output_path)) as conn:
+        names = [i for i, in conn.execute('SELECT name FROM places ORDER BY id')]
+        assert names == ['Portland', 'Springfield', 'Yellowstone']
+        assert conn.execute("SELECT COUNT(*) FROM places_fts WHERE places_fts MATCH 'spring*'").fetchone()[0] == 1
+    assert not (test_directory / 'usa.search.db.tmp').exists()
+
+    # Progress is printed, and parsed by the API.
+    from modules.map.search import parse_build_progress
+    progress = [parse_build_progress(i.strip()) for i in capsys.readouterr().out.splitlines()]
+    progress = [i for i in progress if i]
+    assert progress[-1] == dict(name='usa.pmtiles', percent=100)
+    assert len(progress) > 2
+
+
+@pytest.mark.asyncio
+async def test_run_build_reports_progress(async_client, test_directory, events_fixture):
+    """The progress printed by the build script is stored for the status, and cleared when the build finishes."""
+    from modules.map import search
+
+    cmd = [sys.executable, '-c', 'print("Building search index for usa.pmtiles..."); print("  Progress: usa.pmtiles 50%")']
+    with mock.patch('modules.map.search.set_search_build_progress') as mock_set_progress:
+        await search._run_build(cmd, 'usa.pmtiles')
+    assert [i.args[0] for i in mock_set_progress.call_args_list] == [dict(name='usa.pmtiles', percent=50), None]
+    events_fixture.assert_has_event('map_search_complete')
+
+
+def _write_region_db(path: Path, features: list):
+    """Write a .search.db like the build script does."""
+    from wrolpi.scripts.build_map_search import write_search_db
+    rows = [(name, kind, lat, lon, min_zoom, path.name.split('.')[0], '', population, '')
+            for name, kind, lat, lon, min_zoom, population in features]
+    write_search_db(rows, path)
+
+
+def test_search_connection_cache(test_directory, search_db):
+    """Connections are reused until the search database is replaced."""
+    from modules.map import search
+
+    assert search.search_places('Portland')['total'] == 2
+    connection = search.get_search_connection(search_db)
+    assert search.search_places('Springfield')['total'] == 2
+    assert search.get_search_connection(search_db) is connection
+
+    # The index is rebuilt.
+    search_db.unlink()
+    _write_region_db(search_db, [('Portland', 'locality', 45.5217, -122.6733, 4.0, 652503)])
+    assert search.search_places('Portland')['total'] == 1
+    assert search.get_search_connection(search_db) is not connection
+    # The old connection was closed.
+    with pytest.raises(sqlite3.ProgrammingError):
+        connection.conn.execute('SELECT 1')
+
+    # The index is deleted.
+    search_db.unlink()
+    assert search.search_places('Portland') == {'results': [], 'total': 0}
+    assert search_db not in search._search_connections
+
+
+def test_search_fuzzy_trigram(test_directory, search_db):
+    """Substrings are matched with the trigram index, or LIKE for older indexes and short queries."""
+    from modules.map import search
+
+    # The `search_db` fixture has no trigram index.
+    assert search.get_search_connection(search_db).has_trigram is False
+    assert [i['name'] for i in search.search_places('ringfie')['results']] == ['Springfield', 'Springfield']
+
+    search_db.unlink()
+    _write_region_db(search_db, [
+        ('Portland', 'locality', 45.5217, -122.6733, 4.0, 652503),
+        ('Springfield', 'locality', 39.7990, -89.6436, 6.0, 114230),
+        ('South Portland', 'locality', 43.6415, -70.2409, 7.0, 26498),
+    ])
+    assert search.get_search_connection(search_db).has_trigram is True
+    # "rtland" starts no word, so FTS5 finds nothing.
+    assert [i['name'] for i in search.search_places('RTLAND')['results']] == ['Portland', 'South Portland']
+    assert search.search_places_count('rtland') == 2
+    assert [i['name'] for i in search.search_places('fi')['results']] == ['Springfield']
+    assert search.search_places('nowhere') == {'results': [], 'total': 0}
+
+
+def test_search_merged_index(test_directory):
+    """The merged index is searched while it is current, otherwise each region's index is searched."""
+    from modules.map import search
+    from wrolpi.scripts.build_map_search import build_merged_index, MERGED_INDEX_NAME
+
+    map_directory = test_directory / 'map'
+    map_directory.mkdir()
+    east, west = map_directory / 'east.search.db', map_directory / 'west.search.db'
+    _write_region_db(east, [
+        ('Portland', 'locality', 43.6559, -70.2576, 5.0, 78408),
+        # Also in the west region, with a larger population.
+        ('Springfield', 'locality', 39.7990, -89.6436, 6.0, 100),
+    ])
+    _write_region_db(west, [
+        ('Portland', 'locality', 45.5217, -122.6733, 4.0, 652503),
+        ('Springfield', 'locality', 39.7991, -89.6437, 6.0, 114230),
+    ])
+    # One region is not merged.
+    assert build_merged_index(map_directory) is not None
+    east.unlink()
+    assert build_merged_index(map_directory) is None
+    assert not (map_directory / MERGED_INDEX_NAME).exists()
+    _write_region_db(east, [
+        ('Portland', 'locality', 43.6559, -70.2576, 5.0, 78408),
+        ('Springfield', 'locality', 39.7990, -89.6436, 6.0, 100),
+    ])
+
+    merged_path = build_merged_index(map_directory)
+    assert merged_path == map_directory / MERGED_INDEX_NAME
+    connections = search.get_search_connections(search.get_search_db_files())
+    assert [i.path for i in connections] == [merged_path]
+    assert search.search_places('Portland')['total'] == 2
+    assert search.search_places('Springfield')['results'][0]['population'] == 114230
+    assert search.search_places('Springfield')['total'] == 1
+
+    # A region changed after it was merged.
+    os.utime(east, ns=(1, 1))
+    connections = search.get_search_connections(search.get_search_db_files())
+    assert [i.path for i in connections] == [east, west]
+    assert search.search_places('Portland')['total'] == 2
+
+
+def test_search_near(test_directory, search_db):
+    """A near search ranks the places within the radius by distance."""
+    from modules.map import search
+
+    map_directory = test_directory / 'map'
+    search_db.unlink()
+    _write_region_db(map_directory / 'usa.search.db', [
+        ('Shell', 'fuel', 45.5230, -122.6760, 14.0, None),
+        ('Chevron', 'fuel', 45.6000, -122.7000, 14.0, None),
+        ('Shell', 'fuel', 45.9000, -122.5000, 14.0, None),
+        ('Shell', 'fuel', 43.6600, -70.2600, 14.0, None),
+        ('Shell Beach', 'locality', 35.1500, -120.6700, 8.0, 7000),
+    ])
+    assert search.get_search_connection(map_directory / 'usa.search.db').has_rtree is True
+
+    # Without "near", importance is ranked first.
+    results = search.search_places('shell', lat=45.52, lon=-122.67)['results']
+    assert [i['name'] for i in results] == ['Shell Beach', 'Shell', 'Shell', 'Shell']
+    assert 'distance_km' not in results[0]
+
+    # Only places within the radius, nearest first.
+    data = search.search_places('shell near me', lat=45.52, lon=-122.67)
+    assert [(i['name'], i['lat']) for i in data['results']] == [('Shell', 45.5230), ('Shell', 45.9000)]
+    assert data['results'][0]['distance_km'] == pytest.approx(0.58, abs=0.01)
+    assert data['results'][1]['distance_km'] == pytest.approx(44.27, abs=0.01)
+    assert data['total'] == 2
+    data = search.search_places('fuel', lat=45.52, lon=-122.67, near=True, radius_km=20)
+    assert [i['name'] for i in data['results']] == ['Shell', 'Chevron']
+
+    # The fuzzy fallback is also near.
+    assert [i['name'] for i in search.search_places('hevro nearby', lat=45.52, lon=-122.67)['results']] == ['Chevron']
+    assert search.search_places('hevro nearby', lat=10, lon=10)['results'] == []
+
+    # Indexes without an R*Tree are filtered by distance.
+    search.close_search_connections()
+    with contextlib.closing(sqlite3.connect(map_directory / 'usa.search.db')) as conn:
+        conn.execute('DROP TABLE places_rtree')
+    data = search.search_places('shell near here', lat=45.52, lon=-122.67)
+    assert [(i['name'], i['lat']) for i in data['results']] == [('Shell', 45.5230), ('Shell', 45.9000)]
+
+
+@pytest.mark.asyncio
+async def test_search_near_api(async_client, test_directory, search_db):
+    """A near search requires a location."""
+    request, response = await async_client.get('/api/map/search?q=Portland&near=true')
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+    request, response = await async_client.get('/api/map/search?q=Portland&near=true&lat=45.5&lon=-122.6')
+    assert response.status_code == HTTPStatus.OK
+    assert [i['region'] for i in response.json['results']] == ['Oregon']
+    assert response.json['results'][0]['distance_km'] == pytest.approx(6.2, abs=0.1)
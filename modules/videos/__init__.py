@@ -1,15 +1,16 @@
 import asyncio
 import json
 import pathlib
-from typing import Callable, List, Tuple
+import time
+from typing import Callable, Dict, List, Optional, Tuple
 
 from sqlalchemy import or_
 from sqlalchemy.orm import Session
 
 from modules.videos.common import get_or_create_ffprobe_json
 from modules.videos.models import Video
-from wrolpi.common import logger, limit_concurrent, register_modeler, register_refresh_cleanup
-from wrolpi.db import get_db_curs, get_db_session
+from wrolpi.common import logger, limit_concurrent, register_modeler, register_refresh_cleanup, get_wrolpi_config
+from wrolpi.db import get_db_curs, get_db_session, bump_search_generation
 from wrolpi.files.models import FileGroup
 from wrolpi.vars import PYTEST
 from .downloader import video_downloader  # Import downloaders so they are registered.
@@ -21,8 +22,31 @@ __all__ = ['video_modeler']
 VIDEO_PROCESSING_LIMIT = 20
 
 
+async def _probe_videos(batch: List[Tuple[int, pathlib.Path]], workers: int) \
+        -> Dict[int, Tuple[dict, Optional[pathlib.Path]]]:
+    """ffprobe the videos of `batch`, running at most `workers` ffprobe subprocesses at once.
+
+    Returns {file_group_id: (ffprobe data, the cache file written)} of the videos which could be probed."""
+    semaphore = asyncio.Semaphore(workers)
+
+    async def probe(file_group_id: int, primary_path: pathlib.Path):
+        async with semaphore:
+            try:
+                return file_group_id, await get_or_create_ffprobe_json(pathlib.Path(str(primary_path)))
+            except Exception as e:
+                if PYTEST:
+                    raise
+                logger.error(f'Unable to ffprobe Video: {primary_path}', exc_info=e)
+                return file_group_id, None
+
+    results = await asyncio.gather(*(probe(file_group_id, primary_path) for file_group_id, primary_path in batch))
+    return {file_group_id: result for file_group_id, result in results if result is not None}
+
+
 @register_modeler
 async def video_modeler(progress_callback: Callable[[int], None] = None):
+    workers = max(1, get_wrolpi_config().ffprobe_workers or 1)
+    started = time.monotonic()
     total_processed = 0
     while True:
         # Read the batch; nothing is claimed yet, so the write lock stays free while ffprobe runs.
@@ -38,16 +62,7 @@ async def video_modeler(progress_callback: Callable[[int], None] = None):
         # ffprobe each file with no transaction open.  This is a subprocess per video and can run
         # for seconds; inside the write transaction below it would hold the write lock for the whole
         # batch, and every other writer on the box would wait out `busy_timeout` (30s).
-        probed = dict()
-        for file_group_id, primary_path in batch:
-            try:
-                probed[file_group_id] = await get_or_create_ffprobe_json(pathlib.Path(str(primary_path)))
-            except Exception as e:
-                if PYTEST:
-                    raise
-                logger.error(f'Unable to ffprobe Video: {primary_path}', exc_info=e)
-            # Sleep to catch cancel.
-            await asyncio.sleep(0)
+        probed = await _probe_videos(batch, workers)
 
         with get_db_session(commit=True) as session:
             file_groups: List[Tuple[FileGroup, Video]] = list(
@@ -89,7 +104,8 @@ async def video_modeler(progress_callback: Callable[[int], None] = None):
         if progress_callback:
             progress_callback(total_processed)
 
-        logger.debug(f'Modeled {len(batch)} videos')
+        elapsed = time.monotonic() - started
+        logger.debug(f'Modeled {len(batch)} videos ({total_processed / elapsed if elapsed else 0:.1f} videos/s)')
 
         if len(batch) < VIDEO_PROCESSING_LIMIT:
             # Did not reach limit, do not query again.
@@ -141,6 +157,7 @@ def _claim_videos(claims: List[Tuple[int, int]]):
         with get_db_curs(commit=True) as curs:
             curs.executemany('UPDATE video SET channel_id = ? WHERE id = ? AND channel_id IS NULL',
                              [(channel_id, video_id) for video_id, channel_id in chunk])
+            bump_search_generation(curs)
         claimed += len(chunk)
     logger.debug(f'Claimed {claimed} Videos for their Channels')
 
@@ -185,6 +202,7 @@ def video_cleanup():
                          FROM video
                          WHERE file_group_id IN (SELECT value FROM json_each(:ids))
                          ''', dict(ids=ids))
+            bump_search_generation(curs)
 
     # Claim all Videos in a Channel's directory for that Channel.  But, only if they have not yet
     # been claimed.  The join is the slow part, so it runs as a read; only the writes take the lock.
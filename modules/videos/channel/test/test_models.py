@@ -1,9 +1,10 @@
 import json
+from datetime import date
 from http import HTTPStatus
 
 import pytest
 
-from modules.videos.models import Channel
+from modules.videos.models import Channel, ChannelCatalogEntry
 from modules.videos.models import Video
 from wrolpi.downloader import Download, DownloadFrequency
 
@@ -198,3 +199,38 @@ def test_channel_info_json(test_session, test_directory):
     assert channel.directory.is_dir()
     # info json file is not yet created.
     assert not channel.info_json_path.exists()
+
+
+def test_channel_replace_catalog(test_session, channel_factory):
+    """A Channel's catalog is replaced by the entries of its info; entries no longer listed are deleted."""
+    channel = channel_factory()
+    entries = [
+        {'id': 'new', 'title': 'Newest', 'duration': 61.5, 'upload_date': '20240102', 'url': 'https://example.com/3'},
+        {'id': 'mid', 'title': 'Middle', 'view_count': 100, 'webpage_url': 'https://example.com/2'},
+        {'id': 'old', 'title': 'Oldest', 'url': 'https://example.com/1'},
+        {'title': 'No id is ignored'},
+    ]
+    assert channel.replace_catalog(test_session, entries) == 3
+    test_session.commit()
+
+    assert channel.get_video_entry_by_id('new') == dict(
+        id='new', title='Newest', duration=61, view_count=None, upload_date=date(2024, 1, 2),
+        url='https://example.com/3')
+    assert channel.get_video_entry_by_id('mid')['url'] == 'https://example.com/2'
+    assert channel.get_video_entry_by_id('does not exist') is None
+    # Positions count from the oldest entry.
+    assert [i.source_id for i in test_session.query(ChannelCatalogEntry).order_by(ChannelCatalogEntry.position)] \
+           == ['old', 'mid', 'new']
+
+    # A new upload does not move the others; 'mid' was removed from the website.
+    entries = [{'id': 'newer', 'title': 'Newer'}, entries[0], entries[2]]
+    assert channel.replace_catalog(test_session, entries) == 3
+    test_session.commit()
+    assert {i.source_id: i.position for i in test_session.query(ChannelCatalogEntry)} \
+           == {'old': 0, 'new': 1, 'newer': 2}
+    assert channel.get_video_entry_by_id('mid') is None
+
+    # The catalog is deleted with its Channel.
+    test_session.delete(channel)
+    test_session.commit()
+    assert test_session.query(ChannelCatalogEntry).count() == 0
@@ -18,7 +18,7 @@ from wrolpi.captions import FFMPEG_BIN
 from wrolpi.cmd import FFPROBE_BIN, run_command
 from wrolpi.common import logger, get_media_directory
 from wrolpi.dates import seconds_to_timestamp
-from wrolpi.db import get_db_session, get_db_curs
+from wrolpi.db import get_db_session, get_db_curs, bump_search_generation
 from wrolpi.vars import DEFAULT_FILE_PERMISSIONS
 from .errors import ChannelNameConflict, ChannelURLConflict, ChannelDirectoryConflict, ChannelSourceIdConflict
 
@@ -370,47 +370,49 @@ def extract_video_duration(video_path: Path) -> Optional[int]:
 
 
 async def update_view_counts_and_censored(channel_id: int):
-    """Update view_count for all Videos in a channel using its info_json file.  Also sets FileGroup.censored
-    if Video is no longer available on the Channel."""
+    """Update view_count for all Videos in a channel using its catalog.  Also sets FileGroup.censored if Video is no
+    longer available on the Channel."""
     from .models import Channel
 
     with get_db_session() as session:
         channel: Channel = session.query(Channel).filter_by(id=channel_id).one()
         channel_name = channel.name
-        info = channel.info_json
-
-    if not info:
-        logger.info(f'No info_json for channel {channel.name}')
-        return
-
-    view_counts = [{'id': i['id'], 'view_count': i['view_count']} for i in info['entries'] if i.get('view_count') is not None]
-    view_counts_str = json.dumps(view_counts)
 
     with get_db_curs(commit=True) as curs:
+        curs.execute('SELECT 1 FROM channel_catalog_entry WHERE channel_id = :channel_id LIMIT 1',
+                     dict(channel_id=channel_id))
+        if not curs.fetchone():
+            logger.info(f'No catalog for channel {channel_name}')
+            return
+
         # Update the view_count for each video.
         stmt = '''
                UPDATE video
-               SET view_count = CAST(json_extract(s.value, '$.view_count') AS INTEGER)
-               FROM json_each(:view_counts) AS s
-               WHERE video.source_id = json_extract(s.value, '$.id')
+               SET view_count = e.view_count
+               FROM channel_catalog_entry e
+               WHERE e.channel_id = :channel_id
+                 AND e.source_id = video.source_id
+                 AND e.view_count IS NOT NULL
                  AND video.channel_id = :channel_id
                RETURNING video.id \
                '''
-        curs.execute(stmt, {'view_counts': view_counts_str, 'channel_id': channel_id})
+        curs.execute(stmt, {'channel_id': channel_id})
         count = len(curs.fetchall())
         logger.info(f'Updated {count} view counts in DB for {channel_name}.')
 
-    source_ids = [i['id'] for i in info['entries']]
-    with get_db_curs(commit=True) as curs:
         # Set FileGroup.censored if the video is no longer on the Channel.
         stmt = '''
                UPDATE file_group AS fg
-               SET censored = (v.source_id NOT IN (SELECT value FROM json_each(:source_ids)))
+               SET censored = (v.source_id IS NOT NULL AND NOT EXISTS (SELECT 1
+                                                                      FROM channel_catalog_entry e
+                                                                      WHERE e.channel_id = :channel_id
+                                                                        AND e.source_id = v.source_id))
                FROM video v
                WHERE v.file_group_id = fg.id
                  AND v.channel_id = :channel_id
                RETURNING id, censored \
                '''
-        curs.execute(stmt, {'channel_id': channel_id, 'source_ids': json.dumps(source_ids)})
+        curs.execute(stmt, {'channel_id': channel_id})
         censored = len([i for i in curs.fetchall() if i['censored']])
         logger.info(f'Set {censored} censored videos for {channel_name}.')
+        bump_search_generation(curs)
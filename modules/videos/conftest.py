@@ -16,6 +16,7 @@ from wrolpi.api_utils import api_app
 from wrolpi.cmd import CommandResult
 from wrolpi.downloader import DownloadFrequency, DownloadManager
 from wrolpi.files.models import FileGroup, Directory
+from wrolpi.shared_snapshot import SharedSnapshotDict
 from wrolpi.vars import PROJECT_DIR
 
 
@@ -260,7 +261,7 @@ def test_channels_config(test_directory, async_client):
     (test_directory / 'config').mkdir(exist_ok=True)
     config_path = test_directory / 'config/channels.yaml'
     with set_test_channels_config() as config:
-        config.initialize(api_app.shared_ctx.channels_config)
+        config.initialize(SharedSnapshotDict(*api_app.shared_ctx.channels_config))
         yield config_path
 
 
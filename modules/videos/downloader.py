@@ -1,4 +1,5 @@
 #! /usr/bin/env python3
+import asyncio
 import copy
 import dataclasses
 import json
@@ -28,7 +29,7 @@ from wrolpi.common import logger, get_media_directory, escape_file_name, resolve
 from wrolpi.dates import now
 from wrolpi.db import get_db_session
 from wrolpi.downloader import Downloader, Download, DownloadContext, DownloadResult, \
-    clear_download_progress, _parse_size, make_progress_callback, get_download_cache_config
+    clear_download_progress, _parse_size, make_progress_callback
 from wrolpi.errors import UnrecoverableDownloadError, BotBlockedDownloadError, ValidationError
 from wrolpi.files.lib import glob_shared_stem, split_path_stem_and_suffix
 from wrolpi.files.models import FileGroup
@@ -40,6 +41,7 @@ from .common import get_no_channel_directory, update_view_counts_and_censored, \
 from .errors import UnknownChannel, ChannelDirectoryConflict, ChannelNameConflict, ChannelURLConflict, \
     ChannelSourceIdConflict
 from .cookies import cookies_unlocked, cookies_for_download
+from .duration_cache import get_video_duration, put_video_durations, flush_video_durations
 from .lib import get_videos_downloader_config, get_effective_video_settings, CHANNEL_INHERITABLE_SETTINGS, YDL, \
     ydl_logger, format_videos_destination, get_yt_dlp_http_headers, get_yt_dlp_sleep_opts
 from .models import Video, Channel
@@ -157,6 +159,10 @@ VIDEO_RESOLUTION_MAP = {
 DEFAULT_CAPTION_FORMAT = 'vtt'
 DEFAULT_POSTER_FORMAT = 'jpg'
 DEFAULT_CHANNEL_DOWNLOAD_ORDER = 'newest'
+# Old yt-dlp (< 2026.07) does not extract view_count from YouTube's lockupViewModel listings.  Fail cleanly rather than
+# downloading in arbitrary order.
+VIEW_COUNTS_MISSING_ERROR = 'yt-dlp did not report view counts for this channel/playlist.  Update yt-dlp' \
+                            ' (or change this download to "Newest"/"Oldest").'
 
 
 def format_selector(video_resolutions: List[str]) -> str:
@@ -453,24 +459,31 @@ def preview_filename(filename_format: str) -> str:
         raise RuntimeError(f'Invalid variable: {e}')
 
 
-VIDEO_DURATION_CACHE_MAX_SIZE = 1_000
+def cache_catalog_durations(info_json: dict):
+    """Cache the durations of the videos of a Channel/playlist catalog, so an RSS feed of the same videos can be
+    filtered by duration without fetching each video."""
+    durations = dict()
+    for entry in info_json.get('entries') or []:
+        url = entry.get('webpage_url') or entry.get('url')
+        if url and (duration := entry.get('duration')):
+            durations[url] = duration
+    if durations:
+        put_video_durations(durations)
+        flush_video_durations()
 
 
-def _cache_video_duration(url: str, duration: int):
-    """Persist a video duration to the download cache config.  Evicts oldest entries when over the max size."""
-    cache_config = get_download_cache_config()
-    entries = [e for e in cache_config.video_durations if e[0] != url]
-    entries.append([url, duration])
-    if len(entries) > VIDEO_DURATION_CACHE_MAX_SIZE:
-        entries = entries[-VIDEO_DURATION_CACHE_MAX_SIZE:]
-    cache_config.video_durations = entries
+def cache_fetched_duration(url: str, duration: int):
+    """Cache a duration which was fetched from the video's website.  It is written now; it was slow to fetch and
+    would be lost if WROLPi stopped before the buffer was written."""
+    put_video_durations({url: duration})
+    flush_video_durations()
 
 
 @cached_multiprocessing_result
 async def fetch_video_duration(url: str) -> int:
     """Get video duration in seconds. Checks persistent cache, then DB, then YouTube API, then yt-dlp."""
     # Check persistent cache first (survives restarts).
-    cached_duration = dict(get_download_cache_config().video_durations).get(url)
+    cached_duration = await asyncio.to_thread(get_video_duration, url)
     if cached_duration is not None:
         logger.debug(f'Using cached duration {cached_duration} for {url}')
         return cached_duration
@@ -480,14 +493,14 @@ async def fetch_video_duration(url: str) -> int:
         video = Video.get_by_url(session, url)
         if video and (duration := video.file_group.length):
             logger.debug(f'Using already-known duration {duration} for {url} from FileGroup')
-            _cache_video_duration(url, duration)
+            put_video_durations({url: duration})
             return duration
 
     # Try YouTube API first (faster than yt-dlp)
     duration = await get_youtube_duration(url)
     if duration is not None:
         logger.info(f'Fetched video duration of {duration} from {url} using YouTube API')
-        _cache_video_duration(url, duration)
+        await asyncio.to_thread(cache_fetched_duration, url, duration)
         return duration
 
     # Fall back to yt-dlp for non-YouTube URLs or API failures
@@ -495,7 +508,7 @@ async def fetch_video_duration(url: str) -> int:
     info = extract_info(url, process=False)
     duration = info['duration']
     logger.info(f'Fetched video duration of {duration} from {url}')
-    _cache_video_duration(url, duration)
+    await asyncio.to_thread(cache_fetched_duration, url, duration)
     return duration
 
 
@@ -663,7 +676,11 @@ class ChannelDownloader(Downloader, ABC):
         """Mutate the parent Download (sub_downloader / info_json / collection_id) and
         return the list of missing video URLs as child downloads."""
         download.sub_downloader = video_downloader.name
-        download.info_json = executed.info_json
+        # The entries of a Channel are in its catalog (see `update_channel_catalog`), a playlist's are only here.
+        catalog_channel_id = executed.channel_id \
+            if executed.channel_id and not executed.error and not self.is_a_playlist(executed.info_json) else None
+        download.info_json = {k: v for k, v in executed.info_json.items() if k != 'entries'} \
+            if catalog_channel_id else executed.info_json
         if executed.collection_id and not download.collection_id:
             download.collection_id = executed.collection_id
 
@@ -675,7 +692,7 @@ class ChannelDownloader(Downloader, ABC):
                 settings=executed.child_settings,
             )
 
-        downloads = self.get_missing_videos(session, download)
+        downloads = self.get_missing_videos(session, download, catalog_channel_id)
         return DownloadResult(
             success=True,
             location=executed.location,
@@ -695,6 +712,7 @@ class ChannelDownloader(Downloader, ABC):
             logger.debug(f'Preparing {channel} for downloads')
 
             update_channel_catalog(channel, info_json)
+            await asyncio.to_thread(cache_catalog_durations, info_json)
 
             if not channel.videos or not channel.refreshed:
                 logger.warning(f'Refreshing videos in {channel.directory} for channel {channel}')
@@ -703,70 +721,76 @@ class ChannelDownloader(Downloader, ABC):
                 session.refresh(channel)
 
     @staticmethod
-    def get_missing_videos(session: Session, download: Download) -> List[str]:
+    def get_missing_videos(session: Session, download: Download, channel_id: int = None) -> List[str]:
         """
-        Return all URLs of Videos in the `info_json` which need to be downloaded.
+        Return all URLs of Videos in the catalog of the Channel (or the `info_json` of a playlist) which need to be
+        downloaded.
         """
-        downloads = download.info_json['entries']
-        total_downloads = len(downloads)
-
         settings = download.settings or dict()
         title_exclude = settings.get('title_exclude', '')
         title_exclude = [i.lower() for i in title_exclude.split(',') if i]
         title_include = settings.get('title_include', '')
         title_include = [i.lower() for i in title_include.split(',') if i]
-        if title_exclude or title_include:
-            new_downloads = []
-            for i in downloads:
-                title = i.get('title', '').lower()
-                if title and title_exclude and any(i in title for i in title_exclude):
-                    logger.debug(f'Video with title {str(repr(title))} matches {title_exclude=}')
-                    continue
-                if title and title_include and not any(i in title for i in title_include):
-                    logger.debug(f'Video with title {str(repr(title))} matches {title_include=}')
-                    continue
-                new_downloads.append(i)
-            downloads = new_downloads
-
-        # Filter videos by their length.
-        try:
-            if minimum_duration := settings.get('minimum_duration'):
-                downloads = [i for i in downloads if (d := i.get('duration')) and int(d) >= minimum_duration]
-            if maximum_duration := settings.get('maximum_duration'):
-                downloads = [i for i in downloads if (d := i.get('duration')) and int(d) <= maximum_duration]
-        except KeyError as e:
-            raise RuntimeError('Unable to filter videos because there is no duration') from e
-
-        # Sort videos now that we have reduced the number necessary to sort, but before we limit count.
-        sort_key = settings.get('download_order', DEFAULT_CHANNEL_DOWNLOAD_ORDER)
         # Default is videos are sorted by newest first.
+        sort_key = settings.get('download_order', DEFAULT_CHANNEL_DOWNLOAD_ORDER)
+        video_count_limit = int(i) if (i := settings.get('video_count_limit')) else None
         if sort_key == 'oldest':
             logger.debug(f'Downloading oldest videos from {download.url}')
-            downloads = downloads.reverse()
         elif sort_key == 'views':
-            # Listing view counts are approximate ("3K" -> 3000); good enough for ordering.
             logger.debug(f'Downloading most viewed videos from {download.url}')
-            if not any(i.get('view_count') is not None for i in downloads):
-                # Old yt-dlp (< 2026.07) does not extract view_count from YouTube's lockupViewModel
-                # listings.  Fail cleanly rather than downloading in arbitrary order.
-                raise UnrecoverableDownloadError(
-                    'yt-dlp did not report view counts for this channel/playlist.  Update yt-dlp '
-                    '(or change this download to "Newest"/"Oldest").')
-            downloads = sorted(downloads, key=lambda i: i.get('view_count') or 0, reverse=True)
-
-        # Limit the videos that will be downloads (this allows the user to download the "top 100" videos of a Channel)
-        if video_count_limit := settings.get('video_count_limit'):
+        if video_count_limit:
             logger.debug(f'Limiting video count to {video_count_limit}: {download.url}')
-            video_count_limit = int(video_count_limit)
-            downloads = downloads[:video_count_limit]
+
+        if channel_id:
+            downloads, total_downloads = get_channel_catalog_urls(
+                session, channel_id, title_include, title_exclude, settings.get('minimum_duration'),
+                settings.get('maximum_duration'), sort_key, video_count_limit)
+        else:
+            downloads = download.info_json['entries']
+            total_downloads = len(downloads)
+            if title_exclude or title_include:
+                new_downloads = []
+                for i in downloads:
+                    title = i.get('title', '').lower()
+                    if title and title_exclude and any(i in title for i in title_exclude):
+                        logger.debug(f'Video with title {str(repr(title))} matches {title_exclude=}')
+                        continue
+                    if title and title_include and not any(i in title for i in title_include):
+                        logger.debug(f'Video with title {str(repr(title))} matches {title_include=}')
+                        continue
+                    new_downloads.append(i)
+                downloads = new_downloads
+
+            # Filter videos by their length.
+            try:
+                if minimum_duration := settings.get('minimum_duration'):
+                    downloads = [i for i in downloads if (d := i.get('duration')) and int(d) >= minimum_duration]
+                if maximum_duration := settings.get('maximum_duration'):
+                    downloads = [i for i in downloads if (d := i.get('duration')) and int(d) <= maximum_duration]
+            except KeyError as e:
+                raise RuntimeError('Unable to filter videos because there is no duration') from e
+
+            # Sort videos now that we have reduced the number necessary to sort, but before we limit count.
+            if sort_key == 'oldest':
+                downloads = list(reversed(downloads))
+            elif sort_key == 'views':
+                # Listing view counts are approximate ("3K" -> 3000); good enough for ordering.
+                if not any(i.get('view_count') is not None for i in downloads):
+                    raise UnrecoverableDownloadError(VIEW_COUNTS_MISSING_ERROR)
+                downloads = sorted(downloads, key=lambda i: i.get('view_count') or 0, reverse=True)
+
+            # Limit the videos that will be downloads (this allows the user to download the "top 100" videos of a
+            # Channel)
+            if video_count_limit:
+                downloads = downloads[:video_count_limit]
+
+            # Prefer `webpage_url` before `url` for all entries.
+            downloads = [i.get('webpage_url') or i.get('url') for i in downloads]
 
         filtered_entries = len(downloads)
         if filtered_entries != total_downloads:
             logger.info(f'Downloaded channel.  Total downloaded reduced to {filtered_entries} from {total_downloads}')
 
-        # Prefer `webpage_url` before `url` for all entries.
-        downloads = [i.get('webpage_url') or i.get('url') for i in downloads]
-
         # YouTube Shorts are handled specially.
         downloads = [normalize_video_url(i) for i in downloads]
 
@@ -1403,22 +1427,25 @@ def update_channel_catalog(channel: Channel, info: dict):
             if entry['title'] == 'Uploads':
                 logger.info('Youtube-DL gave back a list of URLs, found the "Uploads" URL and using it.')
                 info = extract_info(entry['url'])
+                entries = info['entries'] = list(info['entries'])
                 break
 
     with get_db_session(commit=True) as session:
         # Get the channel in this new context.
         channel: Channel = session.query(Channel).filter_by(id=channel.id).one()
 
-        channel.info_json = info
+        # The entries are stored in the catalog table, the Channel keeps only its own info.
+        channel.info_json = {k: v for k, v in info.items() if k != 'entries'}
         channel.info_date = now()
         channel.source_id = info.get('id')
+        channel.replace_catalog(session, entries)
         channel_id = channel.id
 
     # Write the Channel's info to a JSON file.
     if channel.directory:
         info_json_path = channel.info_json_path
         with info_json_path.open('wt') as fh:
-            json.dump(info, fh, indent=2, sort_keys=True)
+            json.dump(info, fh, sort_keys=True)
         logger.debug(f'Wrote channel info json to {info_json_path}')
     else:
         logger.debug(f'Skipping channel info json because it does not have a directory: {channel}')
@@ -1429,6 +1456,50 @@ def update_channel_catalog(channel: Channel, info: dict):
     background_task(update_view_counts_and_censored(channel_id))
 
 
+def get_channel_catalog_urls(session: Session, channel_id: int, title_include: List[str] = None,
+                             title_exclude: List[str] = None, minimum_duration: int = None,
+                             maximum_duration: int = None, sort_key: str = DEFAULT_CHANNEL_DOWNLOAD_ORDER,
+                             limit: int = None) -> Tuple[List[str], int]:
+    """Get the URLs of the Channel's catalog entries which match the download's filters, in the download's order.
+
+    Titles match case-insensitively; entries without a title match any title filter.  Entries without a duration do
+    not match a duration filter.  Returns the URLs, and the count of all entries of the catalog."""
+    conditions = ['channel_id = :channel_id', 'url IS NOT NULL']
+    params = dict(channel_id=channel_id, limit=limit or -1)
+    if title_exclude:
+        params.update({f'exclude_{idx}': i for idx, i in enumerate(title_exclude)})
+        matches = ' OR '.join(f'instr(lower(title), :exclude_{idx}) > 0' for idx in range(len(title_exclude)))
+        conditions.append(f"(COALESCE(title, '') = '' OR NOT ({matches}))")
+    if title_include:
+        params.update({f'include_{idx}': i for idx, i in enumerate(title_include)})
+        matches = ' OR '.join(f'instr(lower(title), :include_{idx}) > 0' for idx in range(len(title_include)))
+        conditions.append(f"(COALESCE(title, '') = '' OR {matches})")
+    if minimum_duration:
+        conditions.append('duration >= :minimum_duration')
+        params['minimum_duration'] = int(minimum_duration)
+    if maximum_duration:
+        conditions.append('duration <= :maximum_duration')
+        params['maximum_duration'] = int(maximum_duration)
+    where = ' AND '.join(conditions)
+
+    if sort_key == 'oldest':
+        order_by = 'position'
+    elif sort_key == 'views':
+        # Listing view counts are approximate ("3K" -> 3000); good enough for ordering.
+        order_by = 'view_count DESC NULLS LAST, position DESC'
+        if not session.execute(f'SELECT 1 FROM channel_catalog_entry WHERE {where} AND view_count IS NOT NULL LIMIT 1',
+                               params).fetchone():
+            raise UnrecoverableDownloadError(VIEW_COUNTS_MISSING_ERROR)
+    else:
+        order_by = 'position DESC'
+
+    urls = [i[0] for i in session.execute(
+        f'SELECT url FROM channel_catalog_entry WHERE {where} ORDER BY {order_by} LIMIT :limit', params)]
+    total, = session.execute('SELECT COUNT(*) FROM channel_catalog_entry WHERE channel_id = :channel_id',
+                             params).fetchone()
+    return urls, total
+
+
 UNRECOVERABLE_ERRORS = {
     '404: Not Found',
     'requires payment',
@@ -0,0 +1,221 @@
+"""A persistent cache of the durations of videos which have not been downloaded, keyed by URL.
+
+RSS feeds do not have the durations of their videos, so filtering an RSS download by duration must fetch each video's
+duration (YouTube API or yt-dlp), which is slow and rate-limited.  The cache is a separate SQLite file beside the DB
+(`<media directory>/config/video_duration_cache.db`) so it survives a DB reset.  The least recently used entries are
+evicted when the cache holds more than `VIDEO_DURATION_CACHE_MAX_SIZE` entries.
+
+Each process keeps one connection to the cache.  Lookups only read (no write lock is taken); new durations (and the
+access times of hits) are kept in memory and written together, so filtering a feed does not write to the (SD card)
+drive for every video.  Lookups see the buffered durations.  What is still buffered is written when the process
+exits.
+
+URLs are normalized (see `normalize_video_url`), so a feed's link of a video finds the duration cached from its
+Channel's catalog.
+
+These functions block on the cache file; async callers run them in a thread.
+"""
+import atexit
+import contextlib
+import json
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+from typing import Dict, Generator, Iterable, Optional, Tuple
+
+from wrolpi.common import logger, get_media_directory
+from .normalize_video_url import normalize_video_url
+
+logger = logger.getChild(__name__)
+
+__all__ = ['get_video_duration', 'get_video_durations', 'put_video_durations', 'flush_video_durations',
+           'VIDEO_DURATION_CACHE_MAX_SIZE']
+
+VIDEO_DURATION_CACHE_MAX_SIZE = 100_000
+# Buffered durations/hits are written when this many are pending (or by `flush_video_durations`).
+VIDEO_DURATION_FLUSH_SIZE = 100
+
+_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS video_duration (
+        url      TEXT    PRIMARY KEY,
+        duration INTEGER NOT NULL,
+        accessed REAL    NOT NULL
+    ) WITHOUT ROWID
+    ''',
+    'CREATE INDEX IF NOT EXISTS video_duration_accessed_idx ON video_duration (accessed)',
+]
+
+def get_video_duration_cache_file() -> pathlib.Path:
+    return get_media_directory() / 'config' / 'video_duration_cache.db'
+
+
+def _legacy_video_durations() -> Dict[str, int]:
+    """The durations of the `download_cache.yaml` config, which cached them before this cache existed."""
+    from wrolpi.downloader import get_download_cache_config
+    try:
+        return {url: duration for url, duration in get_download_cache_config().video_durations
+                if url and duration is not None}
+    except Exception as e:
+        logger.warning('Unable to read the legacy video durations', exc_info=e)
+        return dict()
+
+
+# The connection of this process to the cache, and what has not been written to it yet:
+# {url: (duration, accessed)}; the duration is None when only the access time of a cached entry changed.
+_connection: Optional[Tuple[pathlib.Path, sqlite3.Connection]] = None
+_pending: Dict[str, tuple] = dict()
+# Held while the connection or the pending durations are used.
+_lock = threading.RLock()
+
+
+def _reset_after_fork():
+    """A forked child must not use the connection (or the lock) of its parent."""
+    global _connection, _pending, _lock
+    _connection, _pending = None, dict()
+    _lock = threading.RLock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _get_connection() -> sqlite3.Connection:
+    """The connection of this process to the cache (`_lock` must be held).  The schema is created (and the legacy
+    durations imported) by the first connection.  The media directory changes only in tests; what is pending for the
+    previous cache is dropped with its connection."""
+    from wrolpi.db import _configure_sqlite_connection
+
+    global _connection
+    path = get_video_duration_cache_file()
+    if _connection and _connection[0] == path:
+        return _connection[1]
+    if _connection:
+        _connection[1].close()
+        _connection = None
+        _pending.clear()
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    _configure_sqlite_connection(conn)
+    created = not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'video_duration'").fetchone()
+    for statement in _SCHEMA:
+        conn.execute(statement)
+    if created and (legacy := _legacy_video_durations()):
+        with _write_curs(conn) as curs:
+            _write(curs, {url: (duration, 0) for url, duration in legacy.items()})
+        logger.info(f'Imported {len(legacy)} video durations from the download cache config')
+    _connection = (path, conn)
+    return conn
+
+
+@contextlib.contextmanager
+def _write_curs(conn: sqlite3.Connection) -> Generator[sqlite3.Cursor, None, None]:
+    """Everything executed is committed as one transaction."""
+    curs = conn.cursor()
+    curs.execute('BEGIN IMMEDIATE')
+    try:
+        yield curs
+    except BaseException:
+        curs.execute('ROLLBACK')
+        raise
+    curs.execute('COMMIT')
+
+
+def _write(curs: sqlite3.Cursor, entries: Dict[str, tuple]):
+    durations = [(url, duration, accessed) for url, (duration, accessed) in entries.items() if duration is not None]
+    touched = [(accessed, url) for url, (duration, accessed) in entries.items() if duration is None]
+    curs.executemany('INSERT INTO video_duration (url, duration, accessed) VALUES (?, ?, ?)'
+                     ' ON CONFLICT (url) DO UPDATE SET duration = EXCLUDED.duration, accessed = EXCLUDED.accessed',
+                     durations)
+    curs.executemany('UPDATE video_duration SET accessed = MAX(accessed, ?) WHERE url = ?', touched)
+    if durations:
+        _evict(curs)
+
+
+def _evict(curs: sqlite3.Cursor, max_size: int = None):
+    """Delete the least recently used entries until the cache has `max_size` entries."""
+    max_size = max_size or VIDEO_DURATION_CACHE_MAX_SIZE
+    count = curs.execute('SELECT COUNT(*) FROM video_duration').fetchone()[0]
+    if count <= max_size:
+        return
+    curs.execute('DELETE FROM video_duration WHERE url IN'
+                 ' (SELECT url FROM video_duration ORDER BY accessed, url LIMIT ?)', (count - max_size,))
+    logger.debug(f'Evicted {curs.rowcount} video durations')
+
+
+def _write_pending(conn: sqlite3.Connection):
+    """Write the buffered durations and access times in one transaction (`_lock` must be held)."""
+    if _pending:
+        with _write_curs(conn) as curs:
+            _write(curs, _pending)
+        _pending.clear()
+
+
+def flush_video_durations():
+    """Write the buffered durations and access times."""
+    with _lock:
+        if not _pending:
+            return
+        if not get_video_duration_cache_file().parent.parent.is_dir():
+            # The media directory is gone (unmounted, or changed).
+            return
+        _write_pending(_get_connection())
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        flush_video_durations()
+    except Exception as e:
+        logger.error('Unable to write the buffered video durations', exc_info=e)
+
+
+def _buffer(entries: Dict[str, tuple]):
+    """Buffer `entries` ({url: (duration, accessed)}) of the current cache (`_lock` must be held)."""
+    conn = _get_connection()
+    for url, (duration, accessed) in entries.items():
+        if duration is None and (old := _pending.get(url)):
+            # Keep the buffered duration of this URL.
+            duration = old[0]
+        _pending[url] = (duration, accessed)
+    if len(_pending) >= VIDEO_DURATION_FLUSH_SIZE:
+        _write_pending(conn)
+
+
+def get_video_durations(urls: Iterable[str]) -> Dict[str, int]:
+    """Get the cached durations of `urls`; returns {url: duration} of the hits, keyed by the URLs as given.
+
+    This only reads; the access times of the hits are written later (see `flush_video_durations`)."""
+    normalized = {url: normalize_video_url(url) for url in set(urls) if url}
+    if not normalized:
+        return dict()
+
+    with _lock:
+        conn = _get_connection()
+        keys = set(normalized.values())
+        hits = {key: entry[0] for key in keys if (entry := _pending.get(key)) and entry[0] is not None}
+        if missing := [key for key in keys if key not in hits]:
+            rows = conn.execute('SELECT url, duration FROM video_duration'
+                                ' WHERE url IN (SELECT value FROM json_each(?))', (json.dumps(missing),))
+            hits.update(rows.fetchall())
+        if hits:
+            now_ = time.time()
+            _buffer({key: (None, now_) for key in hits})
+    return {url: hits[key] for url, key in normalized.items() if key in hits}
+
+
+def get_video_duration(url: str) -> Optional[int]:
+    """Get the cached duration of `url`, or None."""
+    return get_video_durations([url]).get(url)
+
+
+def put_video_durations(durations: Dict[str, int]):
+    """Cache the durations of `durations` ({url: duration}).  They are buffered; see `flush_video_durations`."""
+    now_ = time.time()
+    entries = {normalize_video_url(url): (int(duration), now_) for url, duration in durations.items()
+               if url and duration is not None}
+    if entries:
+        with _lock:
+            _buffer(entries)
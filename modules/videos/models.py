@@ -1,6 +1,6 @@
 import json
 import pathlib
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 
 from sqlalchemy import Column, Integer, String, Boolean, Date, ForeignKey, BigInteger, Index, text, JSON
 from sqlalchemy.orm import relationship, Session, deferred
@@ -14,7 +14,7 @@ from wrolpi.db import get_db_curs, get_db_session
 from wrolpi.downloader import Download
 from wrolpi.files.lib import split_path_stem_and_suffix
 from wrolpi.files.worker import file_worker
-from wrolpi.files.models import FileGroup
+from wrolpi.files.models import FileGroup, resolve_files
 from wrolpi.tags import Tag, TagFile
 from wrolpi.vars import PYTEST, VIDEO_INFO_JSON_KEYS_TO_CLEAN
 
@@ -23,6 +23,62 @@ logger = logger.getChild(__name__)
 __all__ = ['Video', 'Channel']
 
 
+
+def read_info_json(info_json_path: Optional[pathlib.Path]) -> Optional[Dict]:
+    """Return the contents of a Video's info_json file, if it has one."""
+    if not info_json_path:
+        return
+
+    try:
+        with info_json_path.open('rb') as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        logger.warning(f'Unable to find info json file!  {info_json_path}')
+        return None
+    except Exception as e:
+        logger.warning(f'Unable to parse info json {info_json_path}', exc_info=e)
+        return None
+
+
+def read_video_description(info_json_path: Optional[pathlib.Path]) -> Optional[str]:
+    if (info_json := read_info_json(info_json_path)) and (description := info_json.get('description')):
+        return description
+
+
+def video_json(directory: Optional[pathlib.Path], files: List[dict], video_path: pathlib.Path,
+               c_text: Optional[str], *, id: int, channel: Optional[dict], channel_id: Optional[int],
+               codecs: List[Tuple[str, str]], comments_failed: bool, have_comments: bool, source_id: Optional[str],
+               view_count: Optional[int]) -> dict:
+    """The "video" of the JSON of a Video, from the columns of its Video and FileGroup (see
+    `wrolpi.files.lib.hydrate_file_group_search_results`).  `codecs` are the names and types of its streams."""
+
+    def my_files(*mimetypes: str) -> List[dict]:
+        return resolve_files(directory, files, *mimetypes)
+
+    info_json_file = next((i for i in my_files('application/json') if i['path'].name.endswith('.info.json')), None)
+    info_json_path = info_json_file['path'] if info_json_file else None
+    poster_file = next(iter(my_files('image/')), None)
+    return dict(
+        caption_files=my_files('text/vtt') + my_files('text/srt') + my_files('application/x-subrip'),
+        channel=channel,
+        channel_id=channel_id,
+        codec_names=[i[0] for i in codecs],
+        codec_types=[i[1] for i in codecs],
+        comments_failed=comments_failed,
+        # The modeler stores the description in c_text; the info json is read only if the Video was not modeled.
+        description=c_text or read_video_description(info_json_path),
+        have_comments=have_comments,
+        id=id,
+        info_json_file=info_json_file,
+        info_json_path=info_json_path,
+        poster_file=poster_file,
+        poster_path=poster_file['path'] if poster_file else None,
+        source_id=source_id,
+        stem=split_path_stem_and_suffix(video_path)[0],
+        video_path=video_path,
+        view_count=view_count,
+    )
+
 class Video(ModelHelper, Base):
     __tablename__ = 'video'
     __table_args__ = (
@@ -59,34 +115,23 @@ class Video(ModelHelper, Base):
         if self.channel:
             channel = dict(id=self.channel.id, name=self.channel.name)
 
-        codec_names = []
-        codec_types = []
-
+        codecs = []
         try:
             if self.ffprobe_json:
-                codec_names = [i['codec_name'] for i in self.ffprobe_json['streams']]
-                codec_types = [i['codec_type'] for i in self.ffprobe_json['streams']]
+                codecs = [(i['codec_name'], i['codec_type']) for i in self.ffprobe_json['streams']]
         except Exception as e:
             logger.error(f'{self} ffprobe_json is invalid', exc_info=e)
 
         # Put live data in "video" instead of "data" to avoid confusion on the frontend.
-        d['video'] = dict(
-            caption_files=self.caption_files,
+        d['video'] = video_json(
+            self.file_group.directory, self.file_group.files, self.video_path, self.file_group.c_text,
+            id=self.id,
             channel=channel,
             channel_id=self.channel_id,
-            codec_names=codec_names,
-            codec_types=codec_types,
+            codecs=codecs,
             comments_failed=self.comments_failed,
-            description=self.file_group.c_text or self.get_video_description(),
             have_comments=self.have_comments,
-            id=self.id,
-            info_json_file=self.info_json_file,
-            info_json_path=self.info_json_path,
-            poster_file=self.poster_file,
-            poster_path=self.poster_path,
             source_id=self.source_id,
-            stem=split_path_stem_and_suffix(self.video_path)[0],
-            video_path=self.video_path,
             view_count=self.view_count,
         )
         return d
@@ -117,26 +162,13 @@ class Video(ModelHelper, Base):
 
     def get_info_json(self) -> Optional[Dict]:
         """If this Video has an info_json file, return its contents.  Otherwise, return None."""
-        info_json_path = self.info_json_path
-        if not info_json_path:
-            return
-
-        try:
-            with info_json_path.open('rb') as fh:
-                return json.load(fh)
-        except FileNotFoundError:
-            logger.warning(f'Unable to find info json file!  {info_json_path}')
-            return None
-        except Exception as e:
-            logger.warning(f'Unable to parse info json {self.info_json_path}', exc_info=e)
-            return None
+        return read_info_json(self.info_json_path)
 
     def get_video_description(self) -> Optional[str]:
         """
         Get the Video description from the file system.
         """
-        if (info_json := self.get_info_json()) and (description := info_json.get('description')):
-            return description
+        return read_video_description(self.info_json_path)
 
     def get_surrounding_videos(self):
         """
@@ -592,7 +624,7 @@ class Channel(ModelHelper, Base):
     total_size = Column(BigInteger, default=0, nullable=False)  # update_channel_size
     minimum_frequency = Column(Integer)  # update_channel_minimum_frequency
 
-    info_json = deferred(Column(JSON))
+    info_json = deferred(Column(JSON))  # The channel-level yt-dlp info; its entries are in `ChannelCatalogEntry`.
     info_date = Column(Date)
 
     videos: InstrumentedList = relationship('Video', primaryjoin='Channel.id==Video.channel_id')
@@ -1056,13 +1088,30 @@ class Channel(ModelHelper, Base):
         raise UnknownChannel(f'Cannot find channel with id {id_}')
 
     def get_video_entry_by_id(self, video_source_id: str) -> Optional[Dict]:
-        """Search my info_json for the entry with the provided id."""
-        if self.info_json:
-            matching_entries = [i for i in self.info_json['entries'] if i['id'] == video_source_id]
-            if len(matching_entries) == 1:
-                return matching_entries[0]
-            elif len(matching_entries) > 1:
-                raise RuntimeError(f'More than one info_json entry matches {video_source_id}')
+        """Get the entry of my catalog with the provided id."""
+        session = Session.object_session(self)
+        if not session or not self.id:
+            return None
+        entry = session.query(ChannelCatalogEntry) \
+            .filter_by(channel_id=self.id, source_id=video_source_id) \
+            .one_or_none()
+        if entry:
+            return entry.__json__()
+
+    def replace_catalog(self, session: Session, entries: List[dict]) -> int:
+        """Replace my catalog with the `entries` of my yt-dlp info.  Unchanged entries are not written, and entries
+        which are no longer in the catalog are deleted.  Returns the count of entries."""
+        rows = dict()
+        for position, entry in enumerate(reversed(entries)):
+            if isinstance(entry, dict) and (row := ChannelCatalogEntry.entry_to_row(self.id, position, entry)):
+                rows[row['source_id']] = row
+
+        if rows:
+            session.execute(CHANNEL_CATALOG_UPSERT, list(rows.values()))
+        session.execute('DELETE FROM channel_catalog_entry'
+                        ' WHERE channel_id = :channel_id AND source_id NOT IN (SELECT value FROM json_each(:source_ids))',
+                        dict(channel_id=self.id, source_ids=json.dumps(list(rows))))
+        return len(rows)
 
     def get_or_create_download(self, session: Session, url: str, frequency: int,
                                reset_attempts: bool = False) -> Download:
@@ -1117,3 +1166,79 @@ class Channel(ModelHelper, Base):
     @staticmethod
     def get_by_source_id(session: Session, source_id: str) -> Optional['Channel']:
         return session.query(Channel).filter_by(source_id=source_id).one_or_none()
+
+
+# Only entries which changed are written, so refreshing a large catalog writes little.
+CHANNEL_CATALOG_UPSERT = '''
+    INSERT INTO channel_catalog_entry
+        (channel_id, source_id, position, title, duration, view_count, upload_date, url)
+    VALUES (:channel_id, :source_id, :position, :title, :duration, :view_count, :upload_date, :url)
+    ON CONFLICT (channel_id, source_id) DO UPDATE SET
+        position = excluded.position,
+        title = excluded.title,
+        duration = excluded.duration,
+        view_count = excluded.view_count,
+        upload_date = excluded.upload_date,
+        url = excluded.url
+    WHERE (position, title, duration, view_count, upload_date, url)
+        IS NOT (excluded.position, excluded.title, excluded.duration, excluded.view_count, excluded.upload_date,
+                excluded.url)
+'''
+
+
+class ChannelCatalogEntry(Base):
+    """A video listed by a Channel's host website (an entry of the Channel's yt-dlp info), downloaded or not.
+
+    The catalog is kept out of `channel` so its rows stay small; the download filters, missing videos and censorship
+    detection query it by index.  See `Channel.replace_catalog`."""
+    __tablename__ = 'channel_catalog_entry'
+    __table_args__ = (
+        Index('channel_catalog_entry_channel_position_idx', 'channel_id', 'position'),
+        Index('channel_catalog_entry_channel_duration_idx', 'channel_id', 'duration'),
+        Index('channel_catalog_entry_source_id_idx', 'source_id'),
+    )
+
+    channel_id = Column(Integer, ForeignKey('channel.id', ondelete='CASCADE'), primary_key=True)
+    source_id = Column(String, primary_key=True)
+    # Counted from the oldest entry, so new uploads do not renumber the others.  Newest first is `position DESC`.
+    position = Column(Integer, nullable=False)
+    title = Column(String)
+    duration = Column(Integer)
+    view_count = Column(BigInteger)
+    upload_date = Column(Date)
+    url = Column(String)
+
+    def __repr__(self):
+        return f'<ChannelCatalogEntry channel_id={self.channel_id} source_id={repr(self.source_id)}>'
+
+    def __json__(self) -> dict:
+        return dict(
+            id=self.source_id,
+            title=self.title,
+            duration=self.duration,
+            view_count=self.view_count,
+            upload_date=self.upload_date,
+            url=self.url,
+        )
+
+    @staticmethod
+    def entry_to_row(channel_id: int, position: int, entry: dict) -> Optional[dict]:
+        """Convert an entry of a yt-dlp info to the values of a row.  Returns None if the entry has no id."""
+        if not (source_id := entry.get('id')):
+            return None
+        duration = entry.get('duration')
+        view_count = entry.get('view_count')
+        # yt-dlp uses YYYYMMDD.
+        upload_date = str(entry.get('upload_date') or '')
+        upload_date = f'{upload_date[:4]}-{upload_date[4:6]}-{upload_date[6:]}' \
+            if len(upload_date) == 8 and upload_date.isdigit() else None
+        return dict(
+            channel_id=channel_id,
+            source_id=str(source_id),
+            position=position,
+            title=entry.get('title'),
+            duration=int(duration) if duration is not None else None,
+            view_count=int(view_count) if view_count is not None else None,
+            upload_date=upload_date,
+            url=entry.get('webpage_url') or entry.get('url'),
+        )
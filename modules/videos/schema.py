@@ -171,7 +171,8 @@ class VideoCaptionsResponse:
 class VideoSearchRequest:
     search_str: Optional[str] = None
     tags: List[str] = field(default_factory=list)
-    offset: Optional[int] = None
+    cursor: Optional[str] = None  # The `next_cursor` of the previous page; pages are fetched by cursor.
+    offset: Optional[int] = None  # Jumps to a page when there is no cursor; otherwise the position of the page.
     limit: Optional[int] = VIDEO_QUERY_LIMIT
     order_by: Optional[str] = DEFAULT_VIDEO_ORDER
     channel_id: Optional[int] = None
@@ -100,9 +100,9 @@ async def test_update_view_count(test_session, channel_factory, video_factory):
     video_factory(channel_id=channel2.id, title='vid2')
     video_factory(channel_id=channel3.id, with_poster_ext='jpg', title='vid3')
     video_factory(channel_id=channel3.id, title='vid4')
-    channel1.info_json = {'entries': [{'id': 'vid1', 'view_count': 10}]}
-    channel2.info_json = {'entries': [{'id': 'vid2', 'view_count': 11}, {'id': 'bad_id', 'view_count': 12}]}
-    channel3.info_json = {'entries': [{'id': 'vid3', 'view_count': 13}, {'id': 'vid4', 'view_count': 14}]}
+    channel1.replace_catalog(test_session, [{'id': 'vid1', 'view_count': 10}])
+    channel2.replace_catalog(test_session, [{'id': 'vid2', 'view_count': 11}, {'id': 'bad_id', 'view_count': 12}])
+    channel3.replace_catalog(test_session, [{'id': 'vid3', 'view_count': 13}, {'id': 'vid4', 'view_count': 14}])
     test_session.commit()
 
     # Check all videos are empty.
@@ -135,11 +135,11 @@ async def test_update_view_count_missing_view_count(test_session, channel_factor
     """Entries without a view_count key (e.g. private/unavailable videos) are skipped without error."""
     channel = channel_factory()
     video_factory(channel_id=channel.id, with_poster_ext='jpg', title='vid1')
-    channel.info_json = {'entries': [
+    channel.replace_catalog(test_session, [
         {'id': 'vid1', 'view_count': 42},
         {'id': 'vid_private'},  # No view_count key.
         {'id': 'vid_null', 'view_count': None},
-    ]}
+    ])
     test_session.commit()
 
     # Should not raise KeyError.
@@ -150,6 +150,29 @@ async def test_update_view_count_missing_view_count(test_session, channel_factor
     assert video.view_count == 42
 
 
+@pytest.mark.asyncio
+async def test_update_censored(test_session, channel_factory, make_files_structure):
+    """Videos which are no longer in their Channel's catalog are censored."""
+    from wrolpi.files.models import FileGroup
+
+    channel = channel_factory()
+    for path in make_files_structure(['listed.mp4', 'removed.mp4', 'no source id.mp4']):
+        file_group = FileGroup.from_paths(test_session, path)
+        file_group.model = 'video'
+        test_session.add(Video(file_group=file_group, channel_id=channel.id,
+                               source_id=path.stem if path.stem != 'no source id' else None))
+    channel.replace_catalog(test_session, [{'id': 'listed', 'view_count': 3}, {'id': 'not downloaded'}])
+    test_session.commit()
+
+    await update_view_counts_and_censored(channel.id)
+
+    test_session.expire_all()
+    videos = {i.file_group.primary_path.stem: i for i in test_session.query(Video)}
+    assert {k: v.file_group.censored for k, v in videos.items()} \
+           == {'listed': False, 'removed': True, 'no source id': False}
+    assert videos['listed'].view_count == 3
+
+
 def test_generate_video_poster(video_file):
     """
     A poster can be generated from a video file.
@@ -644,3 +667,39 @@ async def test_video_modeler_does_not_hold_write_lock_during_ffprobe(async_clien
     assert lock_held_during_ffprobe, 'ffprobe never ran, so the test proves nothing'
     assert not any(lock_held_during_ffprobe), \
         'the write lock was held while ffprobe ran; every other writer waits out busy_timeout'
+
+
+@pytest.mark.asyncio
+async def test_video_modeler_probes_concurrently(async_client, test_session, video_factory, test_wrolpi_config):
+    """`video_modeler` overlaps ffprobe subprocesses, but never runs more than `ffprobe_workers` at once."""
+    import asyncio
+    import modules.videos as videos_module
+    from modules.videos import video_modeler
+
+    for _ in range(5):
+        video = video_factory(with_video_file=True)
+        video.file_group.indexed = False
+        video.file_group.model = None
+        test_session.delete(video)
+    test_session.commit()
+    get_wrolpi_config().ffprobe_workers = 2
+
+    running, most_running = 0, 0
+    real_get_or_create_ffprobe_json = videos_module.get_or_create_ffprobe_json
+
+    async def slow_ffprobe(video_path):
+        nonlocal running, most_running
+        running += 1
+        most_running = max(most_running, running)
+        try:
+            await asyncio.sleep(0.1)
+            return await real_get_or_create_ffprobe_json(video_path)
+        finally:
+            running -= 1
+
+    with mock.patch.object(videos_module, 'get_or_create_ffprobe_json', slow_ffprobe):
+        await video_modeler()
+
+    assert most_running == 2
+    assert test_session.query(Video).count() == 5
+    assert all(i.ffprobe_json for i in test_session.query(Video))
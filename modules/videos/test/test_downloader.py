@@ -1,6 +1,7 @@
 import asyncio
 import json
 import shutil
+import sqlite3
 from copy import copy
 from http import HTTPStatus
 from unittest import mock
@@ -16,6 +17,7 @@ from modules.videos.models import Channel, Video
 from wrolpi.conftest import test_directory, await_switches
 from wrolpi.downloader import Download, DownloadResult, get_download_manager_config
 from wrolpi.errors import InvalidDownload, UnrecoverableDownloadError
+from wrolpi.files.models import FileGroup
 from wrolpi.test.common import skip_circleci
 from wrolpi.vars import PROJECT_DIR
 
@@ -751,6 +753,45 @@ def test_get_missing_videos_views_order_no_view_counts(test_session):
         channel_downloader.get_missing_videos(test_session, download)
 
 
+def test_get_missing_videos_from_channel_catalog(test_session, test_directory, channel_factory,
+                                                 make_files_structure):
+    """The missing videos of a Channel download are found in the Channel's catalog, filtered and ordered by SQL."""
+    from modules.videos.downloader import channel_downloader
+    channel = channel_factory()
+    channel.replace_catalog(test_session, [
+        {'id': 'e', 'title': 'E Clip', 'duration': 50, 'view_count': 5, 'url': 'https://youtube.com/watch?v=e'},
+        {'id': 'd', 'title': 'D Live Stream', 'duration': 500, 'view_count': 1,
+         'url': 'https://youtube.com/watch?v=d'},
+        {'id': 'c', 'title': '', 'duration': 300, 'url': 'https://youtube.com/watch?v=c'},
+        {'id': 'b', 'title': 'B video', 'duration': 200, 'view_count': 9, 'url': 'https://youtube.com/watch?v=b'},
+        {'id': 'a', 'title': 'A video', 'view_count': 7, 'url': 'https://youtube.com/watch?v=a'},  # No duration.
+    ])
+    video_b, = make_files_structure({'b.mp4': 'fake video'})
+    file_group = FileGroup.from_paths(test_session, video_b)
+    file_group.model, file_group.url = 'video', 'https://youtube.com/watch?v=b'
+    test_session.add(file_group)
+    test_session.commit()
+
+    def get_missing_videos(**settings):
+        download = Download(url='https://www.youtube.com/@example/videos', settings=settings)
+        return channel_downloader.get_missing_videos(test_session, download, channel.id)
+
+    # Newest first, 'b' was already downloaded.
+    assert get_missing_videos() == ['https://youtube.com/watch?v=e', 'https://youtube.com/watch?v=d',
+                                    'https://youtube.com/watch?v=c', 'https://youtube.com/watch?v=a']
+    assert get_missing_videos(download_order='oldest', video_count_limit=2) == ['https://youtube.com/watch?v=a']
+    # Untitled entries are not filtered by title; entries without a duration are filtered by duration.
+    assert get_missing_videos(title_exclude='live,CLIP', minimum_duration=100) == ['https://youtube.com/watch?v=c']
+    assert get_missing_videos(title_include='video,clip', maximum_duration=250) == \
+           ['https://youtube.com/watch?v=e']
+    # Most viewed first, those without a view count last.
+    assert get_missing_videos(download_order='views') == [
+        'https://youtube.com/watch?v=a', 'https://youtube.com/watch?v=e', 'https://youtube.com/watch?v=d',
+        'https://youtube.com/watch?v=c']
+    with pytest.raises(UnrecoverableDownloadError):
+        get_missing_videos(download_order='views', title_include='stream', minimum_duration=1000)
+
+
 @pytest.mark.asyncio
 async def test_channel_download_crud(test_session, async_client, assert_downloads, tag_factory):
     """Test creating more complex Channel Download."""
@@ -1311,48 +1352,111 @@ def test_parse_ytdlp_progress_not_progress_line():
     assert parse_ytdlp_progress('[download] Destination: video.mp4') is None
 
 
-@pytest.mark.asyncio
-async def test_fetch_video_duration_persistent_cache(test_download_cache_config):
-    """Video durations are persisted to the download cache config and reused on subsequent calls."""
-    from modules.videos.downloader import _cache_video_duration
-    from wrolpi.downloader import get_download_cache_config
+def test_video_duration_cache(test_directory):
+    """Video durations are buffered, flushed to the persistent cache, and looked up in bulk."""
+    from modules.videos import duration_cache
 
     url = 'https://www.youtube.com/watch?v=test123'
+    assert duration_cache.get_video_duration(url) is None
+
+    def count_written():
+        with sqlite3.connect(duration_cache.get_video_duration_cache_file()) as conn:
+            return conn.execute('SELECT COUNT(*) FROM video_duration').fetchone()[0]
+
+    duration_cache.put_video_durations({url: 120})
+    # Buffered, but visible to lookups.
+    assert count_written() == 0
+    assert duration_cache.get_video_duration(url) == 120
+
+    duration_cache.flush_video_durations()
+    assert count_written() == 1
+    assert duration_cache.get_video_duration(url) == 120
+
+    # Re-caching the same URL updates the entry.
+    duration_cache.put_video_durations({url: 200, 'https://example.com/other': 5})
+    duration_cache.flush_video_durations()
+    assert duration_cache.get_video_durations([url, 'https://example.com/other', 'https://example.com/unknown']) \
+           == {url: 200, 'https://example.com/other': 5}
+
+
+def test_video_duration_cache_eviction(test_directory):
+    """The least recently used durations are evicted when the cache is full."""
+    from modules.videos import duration_cache
+
+    with mock.patch.object(duration_cache, 'VIDEO_DURATION_CACHE_MAX_SIZE', 3):
+        duration_cache.put_video_durations({'https://example.com/video0': 0, 'https://example.com/video1': 1})
+        duration_cache.flush_video_durations()
+        duration_cache.put_video_durations({'https://example.com/video2': 2})
+        duration_cache.flush_video_durations()
+        # video0 is used, so video1 is the least recently used.
+        assert duration_cache.get_video_duration('https://example.com/video0') == 0
+        duration_cache.put_video_durations({'https://example.com/video3': 3})
+        duration_cache.flush_video_durations()
+
+    assert duration_cache.get_video_durations([f'https://example.com/video{i}' for i in range(4)]) == {
+        'https://example.com/video0': 0,
+        'https://example.com/video2': 2,
+        'https://example.com/video3': 3,
+    }
+
 
-    # Verify cache is initially empty.
-    assert get_download_cache_config().video_durations == []
+def test_video_duration_cache_imports_legacy_config(test_download_cache_config):
+    """The durations of the old `download_cache.yaml` are imported when the cache is created."""
+    from modules.videos import duration_cache
+    from wrolpi.downloader import get_download_cache_config
+
+    get_download_cache_config().video_durations = [['https://example.com/old', 42]]
+
+    assert duration_cache.get_video_duration('https://example.com/old') == 42
+
+
+def test_video_duration_cache_normalizes_urls(test_directory):
+    """A duration is found by any URL of its video, not only the URL it was cached by."""
+    from modules.videos import duration_cache
+    from modules.videos.downloader import cache_catalog_durations
 
-    # Persist a duration directly.
-    _cache_video_duration(url, 120)
-    assert get_download_cache_config().video_durations == [[url, 120]]
+    cache_catalog_durations(dict(entries=[dict(url='https://www.youtube.com/watch?v=SHORT1', duration=30)]))
+    urls = ['https://youtu.be/SHORT1', 'https://www.youtube.com/shorts/SHORT1']
+    assert duration_cache.get_video_durations(urls) == {urls[0]: 30, urls[1]: 30}
 
-    # Re-caching the same URL updates the entry (no duplicate).
-    _cache_video_duration(url, 200)
-    assert get_download_cache_config().video_durations == [[url, 200]]
+    duration_cache.put_video_durations({'https://www.youtube.com/watch?v=OTHER1&list=LIST': 5})
+    duration_cache.flush_video_durations()
+    assert duration_cache.get_video_duration('https://youtu.be/OTHER1') == 5
+    assert duration_cache.get_video_duration('https://www.youtube.com/watch?v=OTHER1') == 5
 
 
 @pytest.mark.asyncio
-async def test_fetch_video_duration_cache_eviction(test_download_cache_config):
-    """Video duration cache evicts oldest entries when over the max size."""
-    from modules.videos.downloader import _cache_video_duration, VIDEO_DURATION_CACHE_MAX_SIZE
-    from wrolpi.downloader import get_download_cache_config
+async def test_fetch_video_duration_is_written(test_session, test_directory):
+    """A fetched duration is written to the cache at once (not only buffered), so a restart does not lose it."""
+    from modules.videos import duration_cache
+    from modules.videos.downloader import fetch_video_duration
+
+    url = 'https://www.youtube.com/watch?v=FETCHED'
+    with mock.patch('modules.videos.downloader.get_youtube_duration', mock.AsyncMock(return_value=123)):
+        assert await fetch_video_duration(url) == 123
+
+    with sqlite3.connect(duration_cache.get_video_duration_cache_file()) as conn:
+        assert conn.execute('SELECT duration FROM video_duration WHERE url = ?', (url,)).fetchall() == [(123,)]
 
-    # Fill to max size.
-    for i in range(VIDEO_DURATION_CACHE_MAX_SIZE):
-        _cache_video_duration(f'https://example.com/video{i}', i)
-    assert len(get_download_cache_config().video_durations) == VIDEO_DURATION_CACHE_MAX_SIZE
-
-    # Adding one more should evict the oldest (video0), keeping it at max size.
-    _cache_video_duration('https://example.com/new_video', 999)
-    durations = get_download_cache_config().video_durations
-    assert len(durations) == VIDEO_DURATION_CACHE_MAX_SIZE
-    # Newest entry is at the end.
-    assert durations[-1] == ['https://example.com/new_video', 999]
-    # Oldest entry (video0) was evicted.
-    durations_dict = dict(durations)
-    assert 'https://example.com/video0' not in durations_dict
-    # Second oldest (video1) is still present.
-    assert durations_dict['https://example.com/video1'] == 1
+
+@pytest.mark.asyncio
+async def test_filter_videos_uses_cached_durations(test_session, test_directory):
+    """RSS videos with cached durations are filtered without fetching their durations."""
+    from modules.videos import duration_cache
+    from modules.videos.downloader import cache_catalog_durations
+    from wrolpi.downloader import RSSDownloader
+
+    cache_catalog_durations(dict(entries=[
+        dict(url='https://www.youtube.com/watch?v=SHORT1', duration=30),
+        dict(url='https://www.youtube.com/shorts/LONG22', duration=3000),
+    ]))
+    duration_cache.put_video_durations({'https://www.youtube.com/watch?v=MEDIUM': 300})
+
+    download = Download(url='https://example.com/feed', settings=dict(minimum_duration=60, maximum_duration=600))
+    urls = ['https://www.youtube.com/watch?v=SHORT1', 'https://www.youtube.com/watch?v=LONG22',
+            'https://www.youtube.com/watch?v=MEDIUM']
+    with mock.patch('modules.videos.downloader.fetch_video_duration', side_effect=AssertionError('fetched')):
+        assert await RSSDownloader.filter_videos(download, urls) == ['https://www.youtube.com/watch?v=MEDIUM']
 
 
 @pytest.mark.asyncio
@@ -8,6 +8,7 @@ from sanic_ext.extensions.openapi import openapi
 from wrolpi.api_utils import json_response
 from wrolpi.common import logger
 from wrolpi.errors import InvalidOrderBy
+from wrolpi.files.lib import search_page_next_cursor
 from wrolpi.schema import JSONErrorResponse
 from . import lib
 from .. import schema
@@ -67,9 +68,11 @@ async def search_videos(_: Request, body: schema.VideoSearchRequest):
         body.headline,
         body.censored,
         body.deep,
+        body.cursor,
     )
 
-    ret = {'file_groups': list(file_groups), 'totals': {'file_groups': videos_total}}
+    ret = {'file_groups': list(file_groups), 'totals': {'file_groups': videos_total},
+           'next_cursor': search_page_next_cursor(file_groups, body.limit)}
     return json_response(ret)
 
 
@@ -13,8 +13,9 @@ from wrolpi.common import logger, limit_concurrent, wrol_mode_check
 from wrolpi.dates import now
 from wrolpi.db import get_db_session
 from wrolpi.downloader import download_manager
-from wrolpi.files.lib import handle_file_group_search_results
+from wrolpi.files.lib import handle_file_group_search_results, get_search_total
 from wrolpi.files.models import FileGroup
+from wrolpi.pagination import Keyset
 from wrolpi.tags import tag_append_sub_select_where
 from wrolpi.vars import VIDEO_COMMENTS_FETCH_COUNT, YTDLP_CACHE_DIR
 from ..cookies import cookies_unlocked, cookies_for_download
@@ -97,7 +98,10 @@ def search_videos(
         headline: bool = False,
         censored: bool = False,
         deep: bool = False,
+        cursor: str = None,
 ) -> Tuple[List[dict], int]:
+    """Search videos and audio-only files.  Continue after the result which has `cursor`, if provided; otherwise
+    skip `offset` results."""
     tag_names = tag_names or []
     # Search videos and audio-only files.
     wheres = ["(fg.mimetype LIKE 'video/%' OR fg.mimetype LIKE 'audio/%')"]
@@ -109,7 +113,8 @@ def search_videos(
 
     # Explicit JSON nulls bypass the schema defaults; SQLite rejects LIMIT/OFFSET NULL.
     limit = int(limit) if limit else 20
-    params = dict(search_str=search_str, offset=int(offset) if offset else 0)
+    offset = int(offset) if offset else 0
+    params = dict(search_str=search_str)
     if channel_id:
         wheres.append('v.channel_id = :channel_id')
         joins.append('LEFT JOIN channel c ON c.id = v.channel_id')
@@ -117,17 +122,20 @@ def search_videos(
         params['channel_id'] = channel_id
 
     # `deep` searches d_text (captions) as well; the default abc search is much smaller and faster.
-    # The subquery join is required: snippet() cannot coexist with COUNT(*) OVER() in one SELECT.
+    # The rank comes from a subquery join so the keyset can compare `fts.ts_rank`.
     fts_search = fts.file_group_search_join(search_str, deep=deep, headlines=bool(headline)) \
         if search_str else None
+    count_joins = list(joins)
     if fts_search:
         # A search_str was provided by the user, modify the query to filter by it.
-        select_columns = f'fg.id, {fts_search.rank_select}, COUNT(*) OVER() AS total'
+        select_columns = f'fg.id, {fts_search.rank_select}'
         joins.append(fts_search.join)
+        # The total does not need the snippets.
+        count_joins.append(fts.file_group_search_join(search_str, deep=deep).join)
         params.update(fts_search.params)
     else:
-        # No (usable) search_str provided.  Get id and total only.
-        select_columns = 'fg.id, COUNT(*) OVER() AS total'
+        # No (usable) search_str provided.  Get id only.
+        select_columns = 'fg.id'
 
     wheres, params = tag_append_sub_select_where(wheres, params, tag_names)
 
@@ -152,23 +160,47 @@ def search_videos(
 
     if join_video:
         joins.insert(0, 'LEFT JOIN video v on v.file_group_id = fg.id')
+        count_joins.insert(0, 'LEFT JOIN video v on v.file_group_id = fg.id')
+
+    # The rank is only selected when searching; otherwise the rank order is by id.
+    keyset = Keyset.from_order_by(order_by, columns={'2': 'fts.ts_rank' if fts_search else None}, cursor=cursor)
+    page_wheres = list(wheres)
+    page_params = dict(params, offset=offset)
+    if keyset.values is not None:
+        # Seek past the previous page instead of counting through it.
+        keyset_where, keyset_params = keyset.where()
+        page_wheres.append(keyset_where)
+        page_params.update(keyset_params, offset=0)
+        # The offset sent with a cursor is the position of the page (for the total), if the client knows it.
+        offset = offset or None
 
     wheres = '\n AND '.join(wheres)
     where = f'WHERE\n{wheres}' if wheres else ''
+    page_wheres = '\n AND '.join(page_wheres)
     join = '\n'.join(joins)
     stmt = f'''
         SELECT
             {select_columns}
+            {keyset.selects()}
             {headline_selects}
         FROM file_group fg
         {join}
-        {where}
-        ORDER BY {order_by}
+        WHERE
+        {page_wheres}
+        ORDER BY {keyset.order_by()}
         LIMIT {int(limit)} OFFSET :offset
     '''.strip()
-    logger.debug(f'{stmt} {params}')
+    logger.debug(f'{stmt} {page_params}')
+
+    results, _ = handle_file_group_search_results(stmt, page_params, keyset)
 
-    results, total = handle_file_group_search_results(stmt, params)
+    count_join = '\n'.join(count_joins)
+    from_where = f'''
+        FROM file_group fg
+        {count_join}
+        {where}
+    '''
+    total = get_search_total(from_where, params, limit, offset, len(results))
     return results, total
 
 
@@ -14,10 +14,11 @@ from sqlalchemy.orm.exc import NoResultFound  # noqa
 from modules.zim import kiwix
 from modules.zim.errors import UnknownZim, UnknownZimSubscription
 from modules.zim.kiwix import KIWIX_CATALOG
-from modules.zim.models import Zim, Zims, TagZimEntry, ZimSubscription
+from modules.zim.models import Zim, Zims, TagZimEntry, ZimSubscription, get_zim_handles, get_zim_search_pool, \
+    zim_estimate, zim_search, zim_suggest, forget_zim_handles, zim_article_text
 from wrolpi import flags
 from wrolpi.cmd import run_command
-from wrolpi.common import register_modeler, logger, extract_html_text, extract_headlines, get_media_directory, walk, \
+from wrolpi.common import register_modeler, logger, extract_headlines, get_media_directory, walk, \
     register_refresh_cleanup, background_task, get_wrolpi_config, unique_by_predicate, aiohttp_post
 from wrolpi.switches import register_switch_handler
 from wrolpi.dates import Seconds
@@ -171,8 +172,27 @@ def get_unique_paths(*paths: str) -> List[str]:
     return list(unique_paths)
 
 
+def find_zim_entries(path: pathlib.Path, search_str: str, offset: int = 0, limit: int = 10) -> Tuple[List[Entry], int]:
+    """Search the titles and the text of a Zim file.  Returns the Entries and the estimated count of matches.
+
+    Only uses libzim, so Zims can be searched at once on threads (see `search_all_zims`)."""
+    # Get suggested results (this searches titles).
+    results = zim_suggest(path, search_str, offset, limit)
+    search_results = zim_search(path, search_str, offset, limit)
+    # Remove duplicate entries (disambiguation or redirect).
+    results = get_unique_paths(*results, *search_results)
+    results = results[:limit]
+    archive = get_zim_handles(path).archive
+    entries = [archive.get_entry_by_path(i) for i in results]
+    estimate = zim_estimate(path, search_str)
+    return entries, estimate
+
+
 def headline_zim(session: Session, search_str: str, zim_id: int, tag_names: List[str] = None, offset: int = 0,
-                 limit: int = 10) -> Dict:
+                 limit: int = 10, found: Tuple[List[Entry], int] = None) -> Dict:
+    """Search a Zim, and headline the matching Entries.
+
+    @param found: The result of `find_zim_entries`, if the Zim was already searched."""
     zim_id = int(zim_id)
     zim = get_zim(session, zim_id)
 
@@ -181,24 +201,25 @@ def headline_zim(session: Session, search_str: str, zim_id: int, tag_names: List
         entries = zim.entries_with_tags(session, tag_names, offset=offset, limit=1_000)
         estimate = 0
     elif search_str:
-        # Get suggested results (this searches titles).
-        results = zim.suggest(search_str, offset, limit)
-        search_results = zim.search(search_str, offset, limit)
-        # Remove duplicate entries (disambiguation or redirect).
-        results = get_unique_paths(*results, *search_results)
-        results = results[:limit]
-        entries = [zim.find_entry(i) for i in results]
-        estimate = zim.estimate(search_str)
+        zim.get_zim()
+        entries, estimate = found or find_zim_entries(zim.path, search_str, offset, limit)
     else:
         raise RuntimeError('Must provide search_str or tag_names.')
 
-    articles = [bytes(i.get_item().content).decode('UTF-8') for i in entries]
-    articles = [extract_html_text(i) for i in articles]
+    # Only the text near the search is extracted from each article.
+    texts = [zim_article_text(zim.path, i, search_str) for i in entries]
 
     entries_tag_names = get_entries_tags([i.path for i in entries], zim_id)
 
     # Always get headlines even if there is no search_str.  Non-matches get the leading text of each article.
-    headlines = extract_headlines(articles, search_str)
+    headlines = extract_headlines([text for text, _ in texts], search_str)
+    if search_str:
+        # The search may match text after the extracted text, headline these articles using all of their text.
+        partial = [idx for idx, ((_, complete), (_, rank)) in enumerate(zip(texts, headlines))
+                   if not complete and rank == 0]
+        articles = [zim_article_text(zim.path, entries[idx], search_str, whole=True)[0] for idx in partial]
+        for idx, headline in zip(partial, extract_headlines(articles, search_str)):
+            headlines[idx] = headline
 
     search = list()
     if search_str:
@@ -252,13 +273,18 @@ def search_all_zims(session: Session, search_str: str, tag_names: List[str] = No
 
     Returns a list of per-zim result dicts, each containing metadata and search results.
     Each search entry includes `zim_id` so callers can fetch the full entry afterward."""
-    zims = Zims.get_all(session)
+    zims = [i for i in Zims.get_all(session) if i.auto_search]
+    # libzim searches the Zims at once on threads, the results are headlined by this thread.
+    founds = dict()
+    if search_str and not tag_names:
+        pool = get_zim_search_pool()
+        founds = {zim.id: pool.submit(find_zim_entries, zim.path, search_str, offset, limit) for zim in zims}
     all_results = []
     for zim in zims:
-        if not zim.auto_search:
-            continue
         try:
-            result = headline_zim(session, search_str, zim.id, tag_names=tag_names, offset=offset, limit=limit)
+            found = founds[zim.id].result() if zim.id in founds else None
+            result = headline_zim(session, search_str, zim.id, tag_names=tag_names, offset=offset, limit=limit,
+                                  found=found)
             if result.get('search'):
                 for entry in result['search']:
                     entry['zim_id'] = zim.id
@@ -590,6 +616,7 @@ async def remove_outdated_zim_files(path: pathlib.Path = None) -> int:
     logger.info(f'Deleting {len(outdated)} outdated Zim files: {outdated}')
     deleted_count = 0
     for file in outdated:
+        forget_zim_handles(file)
         file.unlink()
         deleted_count += 1
 
@@ -1,10 +1,15 @@
+import concurrent.futures
+import contextlib
 import dataclasses
 import functools
+import os
 import pathlib
+import threading
 from collections import OrderedDict
 from datetime import datetime
 from typing import List, Tuple, OrderedDict as OrderedDictType, Dict, Optional, Set
 
+import cachetools
 from libzim import Archive, Searcher, Query, Entry, SuggestionSearcher
 from sqlalchemy import Column, Integer, BigInteger, ForeignKey, Text, tuple_, Boolean, UniqueConstraint
 from sqlalchemy.orm import relationship, Session
@@ -12,7 +17,8 @@ from sqlalchemy.orm.exc import NoResultFound  # noqa
 
 from modules.zim.errors import UnknownZimEntry, UnknownZimTagEntry, UnknownZim
 from wrolpi import dates, tags
-from wrolpi.common import Base, logger, get_relative_to_media_directory, ModelHelper
+from wrolpi.common import Base, logger, get_relative_to_media_directory, ModelHelper, extract_html_text_near, \
+    has_headline_context, HEADLINE_TEXT_LIMIT
 from wrolpi.dates import TZDateTime
 from wrolpi.db import get_db_curs
 from wrolpi.downloader import Download, download_manager
@@ -22,6 +28,156 @@ from wrolpi.tags import Tag, tag_names_to_zim_sub_select
 
 logger = logger.getChild(__name__)
 
+# The most Zim files kept open by a process.
+ZIM_HANDLES_MAX = 16
+# The Zim files searched at once by `Zims`.
+ZIM_SEARCH_WORKERS = 4
+# The characters of article text kept for the headlines of each open Zim.
+ZIM_TEXTS_SIZE = 1_000_000
+
+
+class ZimHandles:
+    """The open Archive of a Zim file, and its searchers (created when first used).
+
+    A Searcher (a Xapian database) must not be used by two threads at once; use `lock`."""
+
+    def __init__(self, path: pathlib.Path, key: tuple):
+        self.path = path
+        self.key = key
+        self.archive = Archive(path)
+        self.lock = threading.Lock()
+        # The text of recently headlined articles: {entry path: (text, complete)}.
+        self.texts = cachetools.LRUCache(ZIM_TEXTS_SIZE, getsizeof=lambda i: len(i[0]) + 1)
+        self.texts_lock = threading.Lock()
+        self._searcher: Optional[Searcher] = None
+        self._suggestion_searcher: Optional[SuggestionSearcher] = None
+
+    @property
+    def searcher(self) -> Searcher:
+        if self._searcher is None:
+            self._searcher = Searcher(self.archive)
+        return self._searcher
+
+    @property
+    def suggestion_searcher(self) -> SuggestionSearcher:
+        if self._suggestion_searcher is None:
+            self._suggestion_searcher = SuggestionSearcher(self.archive)
+        return self._suggestion_searcher
+
+
+# The open Zim files of this process, least recently used first.
+_zim_handles: OrderedDictType[pathlib.Path, ZimHandles] = OrderedDict()
+_zim_handles_lock = threading.Lock()
+_zim_search_pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+
+def _zim_file_key(path: pathlib.Path) -> Optional[tuple]:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def get_zim_handles(path: pathlib.Path) -> ZimHandles:
+    """Return the open Archive (and searchers) of a Zim file.  The Zim is opened again when the file changes."""
+    key = _zim_file_key(path)
+    if key is None:
+        forget_zim_handles(path)
+        raise FileNotFoundError(f'{path} does not exist!')
+
+    with _zim_handles_lock:
+        if (handles := _zim_handles.get(path)) and handles.key == key:
+            _zim_handles.move_to_end(path)
+            return handles
+
+    # Open outside the lock, so other Zims can be used meanwhile.
+    handles = ZimHandles(path, key)
+    with _zim_handles_lock:
+        _zim_handles[path] = handles
+        _zim_handles.move_to_end(path)
+        while len(_zim_handles) > ZIM_HANDLES_MAX:
+            _zim_handles.popitem(last=False)
+    return handles
+
+
+def forget_zim_handles(path: pathlib.Path = None):
+    """Close the handles of a Zim file (all files if no path), so a deleted file's space is released."""
+    with _zim_handles_lock:
+        if path:
+            _zim_handles.pop(path, None)
+        else:
+            _zim_handles.clear()
+
+
+def prune_zim_handles():
+    """Close the handles of Zim files which were deleted or changed (perhaps by another process)."""
+    with _zim_handles_lock:
+        stale = [i for i, handles in _zim_handles.items() if _zim_file_key(i) != handles.key]
+        for path in stale:
+            del _zim_handles[path]
+
+
+def get_zim_search_pool() -> concurrent.futures.ThreadPoolExecutor:
+    global _zim_search_pool
+    if _zim_search_pool is None:
+        _zim_search_pool = concurrent.futures.ThreadPoolExecutor(ZIM_SEARCH_WORKERS, thread_name_prefix='zim_search')
+    return _zim_search_pool
+
+
+def _forget_zim_handles_after_fork():
+    """The handles and threads of the parent are not used by a forked child; it opens its own."""
+    global _zim_handles, _zim_handles_lock, _zim_search_pool
+    _zim_handles = OrderedDict()
+    _zim_handles_lock = threading.Lock()
+    _zim_search_pool = None
+
+
+os.register_at_fork(after_in_child=_forget_zim_handles_after_fork)
+
+
+def zim_estimate(path: pathlib.Path, search_str: str) -> int:
+    """Count the number of Entry(s) of the Zim file that contain the `search_str`."""
+    handles = get_zim_handles(path)
+    with handles.lock:
+        search = handles.searcher.search(Query().set_query(search_str))
+        return search.getEstimatedMatches()
+
+
+def zim_search(path: pathlib.Path, search_str: str, offset: int = 0, limit: int = 10) -> List[str]:
+    """Return the paths of the Entry(s) of the Zim file that contain the `search_str`."""
+    handles = get_zim_handles(path)
+    with handles.lock:
+        search = handles.searcher.search(Query().set_query(search_str))
+        return list(search.getResults(offset, limit))
+
+
+def zim_suggest(path: pathlib.Path, search_str: str, offset: int = 0, limit: int = 10) -> List[str]:
+    """Return the paths of the Entry(s) of the Zim file that contain the `search_str`.  Also searches the titles."""
+    handles = get_zim_handles(path)
+    with handles.lock:
+        suggestions = handles.suggestion_searcher.suggest(search_str)
+        return list(suggestions.getResults(offset, limit))
+
+
+def zim_article_text(path: pathlib.Path, entry: Entry, search_str: str = None, whole: bool = False) \
+        -> Tuple[str, bool]:
+    """Return the text of an article of a Zim file; only enough text for a headline of `search_str` (see
+    `extract_html_text_near`) unless `whole`.  Also returns True if the text is all the text of the article."""
+    handles = get_zim_handles(path)
+    with handles.texts_lock:
+        cached = handles.texts.get(entry.path)
+    if cached and (cached[1] or (not whole and has_headline_context(cached[0], search_str))):
+        return cached
+
+    limit = None if whole else HEADLINE_TEXT_LIMIT
+    text, complete = extract_html_text_near(entry.get_item().content, search_str, limit=limit)
+    if not cached or len(text) > len(cached[0]):
+        with handles.texts_lock, contextlib.suppress(ValueError):
+            # ValueError when the text is larger than the cache.
+            handles.texts[entry.path] = (text, complete)
+    return text, complete
+
 
 @dataclasses.dataclass
 class ZimMetadata:
@@ -130,11 +286,11 @@ class Zim(Base, ModelHelper):
         if not self.path.suffix != 'zim':
             raise FileNotFoundError(f'{self} is not a valid zim file!')
 
-        zim = Archive(self.path)
-        return zim
+        return get_zim_handles(self.path).archive
 
     def delete(self):
         session: Session = Session.object_session(self)
+        forget_zim_handles(self.path)
         self.path.unlink(missing_ok=True)
         session.delete(self)
 
@@ -171,38 +327,20 @@ class Zim(Base, ModelHelper):
         )
         return metadata
 
-    def get_searcher(self) -> Searcher:
-        searcher = Searcher(self.get_zim())
-        return searcher
-
-    def get_search(self, search_str: str):
-        query = Query().set_query(search_str)
-        searcher = self.get_searcher()
-        search = searcher.search(query)
-        return search
-
-    def get_suggestion_searcher(self) -> SuggestionSearcher:
-        searcher = SuggestionSearcher(self.get_zim())
-        return searcher
-
     def estimate(self, search_str: str) -> int:
         """Count the number of Entry(s) that contain the `search_str`."""
-        search = self.get_search(search_str)
-        count = search.getEstimatedMatches()
-        return count
+        self.get_zim()
+        return zim_estimate(self.path, search_str)
 
     def search(self, search_str: str, offset: int = 0, limit: int = 10) -> List[str]:
         """Return the paths of the Entry(s) that contain the `search_str`."""
-        search = self.get_search(search_str)
-        results = list(search.getResults(offset, limit))
-        return results
+        self.get_zim()
+        return zim_search(self.path, search_str, offset, limit)
 
     def suggest(self, search_str: str, offset: int = 0, limit: int = 10) -> List[str]:
         """Return the paths of the Entry(s) that contain the `search_str`.  Also searches the titles."""
-        searcher = self.get_suggestion_searcher()
-        suggestions = searcher.suggest(search_str)
-        results = list(suggestions.getResults(offset, limit))
-        return results
+        self.get_zim()
+        return zim_suggest(self.path, search_str, offset, limit)
 
     def get_entry(self, path: str) -> Optional[Entry]:
         """Search this Zim file for the provided Entry at the `path`."""
@@ -318,6 +456,7 @@ class Zims:
     @staticmethod
     def get_all(session: Session) -> List[Zim]:
         """Returns all Zim records."""
+        prune_zim_handles()
         zims = list()
         for zim in session.query(Zim).order_by(Zim.path):
             try:
@@ -330,11 +469,13 @@ class Zims:
 
     @classmethod
     def estimate(cls, session: Session, search_str: str) -> OrderedDictType[Zim, int]:
-        zims = cls.get_all(session)
+        """Estimate the matches of every auto-search Zim.  The Zims are searched at once on threads."""
+        zims = [i for i in cls.get_all(session) if i.auto_search]
+        # The Zim records are only read by this thread (and its Session).
+        futures = [get_zim_search_pool().submit(zim_estimate, i.path, search_str) for i in zims]
         results = OrderedDict()
-        for zim in zims:
-            if zim.auto_search:
-                results[zim] = zim.estimate(search_str)
+        for zim, future in zip(zims, futures):
+            results[zim] = future.result()
         return results
 
     @classmethod
@@ -1,4 +1,5 @@
 import datetime
+import os
 from http import HTTPStatus
 
 import pytest
@@ -6,7 +7,8 @@ from libzim import Entry
 
 from modules.zim import lib
 from modules.zim.errors import UnknownZim, UnknownZimEntry
-from modules.zim.models import TagZimEntry, ZimSubscription
+from modules.zim.models import TagZimEntry, ZimSubscription, Zims, get_zim_handles, forget_zim_handles, \
+    zim_article_text
 from wrolpi import tags, flags
 from wrolpi.common import DownloadFileInfo, get_wrolpi_config
 from wrolpi.downloader import Download, import_downloads_config, get_download_manager_config
@@ -125,6 +127,39 @@ def test_get_unique_paths():
                                             'A/Thomas_Harvey_Johnston']
 
 
+
+def test_zim_handles(test_session, zim_factory):
+    """Zim archives and searchers are opened once, and opened again when the file changes."""
+    zim1, zim2 = zim_factory('zim1.zim'), zim_factory('zim2.zim')
+    test_session.commit()
+    try:
+        handles = get_zim_handles(zim1.path)
+        assert get_zim_handles(zim1.path) is handles
+        assert zim1.get_zim() is handles.archive
+        assert zim1.estimate('one') == 2
+        assert handles.searcher is get_zim_handles(zim1.path).searcher
+        # The text of headlined articles is kept.
+        text, complete = zim_article_text(zim1.path, zim1.get_entry('one'), 'one')
+        assert complete and 'This is the first item' in text
+        assert handles.texts['one'] == (text, True)
+
+        # The file was replaced.
+        os.utime(zim1.path, ns=(0, 0))
+        assert get_zim_handles(zim1.path) is not handles
+
+        handles = get_zim_handles(zim1.path)
+        forget_zim_handles(zim1.path)
+        assert get_zim_handles(zim1.path) is not handles
+
+        # Both Zims are searched at once.
+        assert list(Zims.estimate(test_session, 'one').values()) == [2, 2]
+        results = lib.search_all_zims(test_session, 'one')
+        assert {i['search'][0]['zim_id'] for i in results} == {zim1.id, zim2.id}
+        assert all(i['estimate'] == 2 and i['search'] for i in results)
+    finally:
+        forget_zim_handles()
+
+
 @pytest.mark.asyncio
 async def test_zim_tags_config(async_client, test_session, test_directory, test_zim, tag_factory, test_tags_config,
                                fake_now, await_switches):
@@ -0,0 +1,89 @@
+#! /usr/bin/env python3
+"""Benchmark downloading the last member of large archives: reading the whole member after finding it with
+`zipfile`/`tarfile` (before), vs. finding it in the member index and reading it in chunks (after).
+
+A zip (stored and deflated members) and a tar.gz with many small members and one large member are created in the
+directory (which acts as the media directory).  The peak memory of the read is measured with tracemalloc.
+
+Usage:
+    python scripts/benchmark_archive_download.py /tmp/bench
+    python scripts/benchmark_archive_download.py /tmp/bench --members 20000 --size 200
+"""
+import argparse
+import io
+import os
+import pathlib
+import sys
+import tarfile
+import time
+import tracemalloc
+import zipfile
+from unittest import mock
+
+sys.path.append(os.getcwd())
+
+from wrolpi.files import lib, index_cache
+
+
+def make_archives(directory: pathlib.Path, members: int, size: int):
+    large = os.urandom(1024 * 1024) * size
+    zip_path = directory / 'bench.zip'
+    if not zip_path.exists():
+        with zipfile.ZipFile(zip_path, 'w') as zf:
+            for idx in range(members):
+                zf.writestr(f'small/{idx}.txt', f'member {idx}')
+            zf.writestr('large.stored', large)
+            zf.writestr('large.deflated', large, compress_type=zipfile.ZIP_DEFLATED)
+    tar_path = directory / 'bench.tar.gz'
+    if not tar_path.exists():
+        with tarfile.open(tar_path, 'w:gz', compresslevel=1) as tf:
+            for idx in range(members):
+                data = f'member {idx}'.encode()
+                info = tarfile.TarInfo(f'small/{idx}.txt')
+                info.size = len(data)
+                tf.addfile(info, io.BytesIO(data))
+            info = tarfile.TarInfo('large.bin')
+            info.size = len(large)
+            tf.addfile(info, io.BytesIO(large))
+
+
+def read_whole(path: pathlib.Path, member: str) -> int:
+    """How a member was read before `ArchiveMember`."""
+    if path.suffix == '.zip':
+        with zipfile.ZipFile(path) as zf:
+            return len(zf.read(zf.getinfo(member)))
+    with tarfile.open(path, 'r:*') as tf:
+        return len(tf.extractfile(tf.getmember(member)).read())
+
+
+def read_chunks(path: pathlib.Path, member: str) -> int:
+    return sum(len(chunk) for chunk in lib.stream_archive_member(path, member).chunks())
+
+
+def main(directory: pathlib.Path, members: int, size: int):
+    directory.mkdir(parents=True, exist_ok=True)
+    make_archives(directory, members, size)
+
+    with mock.patch.object(lib, 'get_media_directory', lambda: directory), \
+            mock.patch.object(index_cache, 'get_media_directory', lambda: directory):
+        for path, member in ((directory / 'bench.zip', 'large.stored'), (directory / 'bench.zip', 'large.deflated'),
+                             (directory / 'bench.tar.gz', 'large.bin'), (directory / 'bench.tar.gz', 'small/0.txt')):
+            # The first listing builds the member index.
+            lib.list_archive_contents(path)
+            for name, read in (('whole', read_whole), ('chunks', read_chunks)):
+                tracemalloc.start()
+                start = time.perf_counter()
+                read(path, member)
+                elapsed = time.perf_counter() - start
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                print(f'{path.name:>12} {member:>14} {name:>6}: {elapsed * 1000:.0f}ms, peak {peak / 1024 ** 2:.1f}MiB')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('directory', type=pathlib.Path)
+    parser.add_argument('--members', type=int, default=10_000)
+    parser.add_argument('--size', type=int, default=100, help='MiB of the large member')
+    args = parser.parse_args()
+    main(args.directory, args.members, args.size)
@@ -0,0 +1,72 @@
+#! /usr/bin/env python3
+"""Benchmark the latency of a simulated API request with and without the connection pool.
+
+A request opens several short sessions (like the API handlers do with `get_db_session`/`get_db_curs`).  Without a
+pool (NullPool) each session opens the database, applies the PRAGMAs and prepares its statements again.
+
+Usage:
+    python scripts/benchmark_db_pool.py /tmp/bench
+    python scripts/benchmark_db_pool.py /tmp/bench --requests 5000 --sessions 5
+"""
+import argparse
+import os
+import pathlib
+import statistics
+import sys
+import time
+
+sys.path.append(os.getcwd())
+
+from sqlalchemy.orm import sessionmaker
+
+from wrolpi.db import create_wrolpi_engine, DB_POOL_SIZE
+
+ROWS = 10_000
+
+
+def make_database(path: pathlib.Path):
+    engine = create_wrolpi_engine(path)
+    with engine.begin() as conn:
+        conn.execute('CREATE TABLE IF NOT EXISTS file_group (id INTEGER PRIMARY KEY, title TEXT, size INTEGER)')
+        if not conn.execute('SELECT COUNT(*) FROM file_group').scalar():
+            conn.execute(f'WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {ROWS})'
+                         f' INSERT INTO file_group (id, title, size) SELECT i, \'file \' || i, i * 7 FROM n')
+    engine.dispose()
+
+
+def run(path: pathlib.Path, pool_size: int, requests: int, sessions: int) -> list:
+    engine = create_wrolpi_engine(path, pool_size=pool_size)
+    maker = sessionmaker(bind=engine)
+    timings = []
+    for request in range(requests):
+        start = time.perf_counter()
+        for idx in range(sessions):
+            session = maker()
+            try:
+                session.execute('SELECT id, title, size FROM file_group WHERE id = :id',
+                                dict(id=(request * sessions + idx) % ROWS + 1)).fetchall()
+            finally:
+                session.close()
+        timings.append(time.perf_counter() - start)
+    engine.dispose()
+    return timings
+
+
+def main(root: pathlib.Path, requests: int, sessions: int):
+    path = root / 'benchmark_db_pool.db'
+    make_database(path)
+    for name, pool_size in (('NullPool', None), (f'pool of {DB_POOL_SIZE}', DB_POOL_SIZE)):
+        timings = sorted(run(path, pool_size, requests, sessions))
+        mean = statistics.mean(timings) * 1000
+        p95 = timings[int(len(timings) * 0.95)] * 1000
+        print(f'{name:>12}: {requests} requests of {sessions} sessions: mean {mean:.2f}ms, p95 {p95:.2f}ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('root', type=pathlib.Path, help='Directory in which the database is created')
+    parser.add_argument('--requests', type=int, default=2_000)
+    parser.add_argument('--sessions', type=int, default=3, help='Sessions opened by each request')
+    args = parser.parse_args()
+    args.root.mkdir(parents=True, exist_ok=True)
+    main(args.root, args.requests, args.sessions)
@@ -0,0 +1,89 @@
+#! /usr/bin/env python3
+"""Benchmark listing a large directory in the FileBrowser (`list_directories_contents`): one Tag query and one
+mimetype read of each file (before), vs. the queries of each directory (after).
+
+The files of the WROLPi media directory are used; run this on a populated (and refreshed) instance.  The mimetype
+cache is emptied before each listing, as if the directory was opened for the first time.
+
+Usage:
+    python scripts/benchmark_file_browser.py videos/some_channel
+    python scripts/benchmark_file_browser.py videos/some_channel --repeat 5
+"""
+import argparse
+import os
+import pathlib
+import sys
+import time
+from typing import Dict
+from unittest import mock
+
+sys.path.append(os.getcwd())
+
+from sqlalchemy import event
+
+from wrolpi.common import get_media_directory
+from wrolpi.db import get_db_session
+from wrolpi.files import lib
+from wrolpi.files.models import FileGroup
+from wrolpi.tags import Tag, TagFile
+
+
+def per_file_dicts(session, files) -> Dict[pathlib.Path, dict]:
+    """How the files of a directory were listed before `_get_file_dicts`."""
+    media_directory = get_media_directory()
+    file_dicts = dict()
+    for file in files:
+        tags = session.query(Tag) \
+            .join(TagFile, Tag.id == TagFile.tag_id) \
+            .join(FileGroup, FileGroup.id == TagFile.file_group_id) \
+            .filter(FileGroup.primary_path == str(file))
+        file_dicts[file] = dict(
+            path=file.relative_to(media_directory),
+            size=file.stat().st_size,
+            mimetype=lib.get_mimetype(file),
+            tags=sorted([tag.name for tag in tags], key=lambda i: i.lower()),
+        )
+    return file_dicts
+
+
+def main(directory: str, repeat: int):
+    count = sum(1 for i in (get_media_directory() / directory).iterdir() if i.is_file())
+    print(f'Listing {directory} ({count} files)')
+
+    with get_db_session() as session:
+        statements = 0
+
+        def count_statement(*args):
+            nonlocal statements
+            statements += 1
+
+        event.listen(session.get_bind(), 'before_cursor_execute', count_statement)
+        magic_reads = 0
+        read_mimetype = lib._read_mimetype
+
+        def count_read_mimetype(path):
+            nonlocal magic_reads
+            magic_reads += 1
+            return read_mimetype(path)
+
+        for name, get_file_dicts in (('per file', per_file_dicts), ('per directory', lib._get_file_dicts)):
+            timings = []
+            with mock.patch.object(lib, '_get_file_dicts', get_file_dicts), \
+                    mock.patch.object(lib, '_read_mimetype', count_read_mimetype):
+                for _ in range(repeat):
+                    lib.clear_mimetype_cache()
+                    statements = magic_reads = 0
+                    start = time.perf_counter()
+                    lib.list_directories_contents(session, [directory])
+                    timings.append(time.perf_counter() - start)
+            best = min(timings)
+            print(f'{name:>13}: best of {repeat}: {best * 1000:.1f}ms, {statements} queries,'
+                  f' {magic_reads} mimetype reads')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('directory', help='A directory, relative to the media directory')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    main(args.directory, args.repeat)
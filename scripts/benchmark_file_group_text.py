@@ -0,0 +1,105 @@
+#! /usr/bin/env python3
+"""Benchmark browse queries with the searched texts inline in `file_group` (before), and in `file_group_text`
+(after).
+
+Two synthetic databases with the same FileGroups are created: "inline" has the a_text..d_text columns in
+`file_group`, "side" has them in `file_group_text`.  Each query is timed on a new connection with a small page cache,
+so the pages must be read again (from the OS cache, unless the caches are dropped between runs).
+
+Usage:
+    python scripts/benchmark_file_group_text.py /tmp/bench                    # 100k FileGroups
+    python scripts/benchmark_file_group_text.py /tmp/bench --file-groups 20000 --text-size 50000
+"""
+import argparse
+import pathlib
+import random
+import sqlite3
+import time
+
+SCHEMAS = dict(
+    inline='''
+        CREATE TABLE file_group (
+            id INTEGER PRIMARY KEY, primary_path TEXT, mimetype TEXT, model TEXT, size INTEGER,
+            effective_datetime TEXT, title TEXT, a_text TEXT, b_text TEXT, c_text TEXT, d_text TEXT);
+        CREATE INDEX file_group_mimetype_effective_idx ON file_group (mimetype, effective_datetime);
+    ''',
+    side='''
+        CREATE TABLE file_group (
+            id INTEGER PRIMARY KEY, primary_path TEXT, mimetype TEXT, model TEXT, size INTEGER,
+            effective_datetime TEXT, title TEXT);
+        CREATE INDEX file_group_mimetype_effective_idx ON file_group (mimetype, effective_datetime);
+        CREATE TABLE file_group_text (
+            file_group_id INTEGER PRIMARY KEY REFERENCES file_group (id) ON DELETE CASCADE,
+            a_text TEXT, b_text TEXT, c_text TEXT, d_text TEXT);
+    ''',
+)
+
+# Browse pages: the filters/orders which are not index-only read the file_group rows.
+QUERIES = dict(
+    browse_by_size='SELECT id, primary_path, title FROM file_group WHERE model = :model ORDER BY size DESC LIMIT 24',
+    count_by_model='SELECT COUNT(*) FROM file_group WHERE model = :model',
+    browse_by_date="SELECT id, primary_path, title FROM file_group WHERE mimetype LIKE 'text/%'"
+                   " ORDER BY effective_datetime DESC LIMIT 24",
+)
+MODELS = ('archive', 'doc', 'video', None)
+
+
+def make_database(path: pathlib.Path, schema: str, file_groups: int, text_size: int):
+    marker = path.with_suffix(f'.{file_groups}-{text_size}')
+    if marker.is_file():
+        print(f'Using existing {path}')
+        return
+    print(f'Creating {path}')
+    path.unlink(missing_ok=True)
+    rand = random.Random(0)
+    words = [''.join(rand.choices('abcdefghijklmnopqrstuvwxyz', k=rand.randint(3, 9))) for _ in range(5_000)]
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMAS[schema])
+    for idx in range(file_groups):
+        model = rand.choice(MODELS)
+        row = (idx + 1, f'/media/wrolpi/file {idx}.html', 'text/html' if model else 'text/plain', model,
+               rand.randint(0, 10 ** 9), f'2020-01-01T00:00:{idx:09d}', f'file {idx}')
+        body = ' '.join(rand.choices(words, k=text_size // 6))
+        texts = (f'file {idx}', None, 'a description', body)
+        if schema == 'inline':
+            conn.execute('INSERT INTO file_group VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', (*row, *texts))
+        else:
+            conn.execute('INSERT INTO file_group VALUES (?, ?, ?, ?, ?, ?, ?)', row)
+            conn.execute('INSERT INTO file_group_text VALUES (?, ?, ?, ?, ?)', (row[0], *texts))
+    conn.commit()
+    conn.execute('VACUUM')
+    conn.close()
+    marker.touch()
+
+
+def run_query(path: pathlib.Path, statement: str) -> float:
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA cache_size = -2000')
+    start = time.perf_counter()
+    conn.execute(statement, dict(model='archive')).fetchall()
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+
+def main(root: pathlib.Path, file_groups: int, text_size: int, repeat: int):
+    paths = {schema: root / f'{schema}.db' for schema in SCHEMAS}
+    for schema, path in paths.items():
+        make_database(path, schema, file_groups, text_size)
+        print(f'{schema:>7}: {path.stat().st_size / 1024 ** 2:,.0f} MiB')
+
+    for name, statement in QUERIES.items():
+        for schema, path in paths.items():
+            best = min(run_query(path, statement) for _ in range(repeat))
+            print(f'{name:>16} {schema:>7}: best of {repeat}: {best * 1000:.1f}ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('root', type=pathlib.Path, help='Directory in which the synthetic databases are created')
+    parser.add_argument('--file-groups', type=int, default=100_000)
+    parser.add_argument('--text-size', type=int, default=10_000, help='Bytes of body text of each FileGroup')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    args.root.mkdir(parents=True, exist_ok=True)
+    main(args.root, args.file_groups, args.text_size, args.repeat)
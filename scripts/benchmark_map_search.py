@@ -0,0 +1,123 @@
+#! /usr/bin/env python3
+"""Benchmark the latency of map place search (autocomplete) with several regions installed.
+
+Each query is searched:
+  - with a new connection to each region's index for every query (the cache is emptied),
+  - with the cached connections to each region's index,
+  - with the cached connection to the merged index.
+The substring queries find nothing with FTS5, so they are searched again with the fuzzy fallback, which uses the
+trigram index (or LIKE, when the trigram index is ignored).
+
+The prefix queries are also searched with a location: ranked by importance then distance, and "near" the location
+(with the R*Tree).
+
+Usage:
+    python scripts/benchmark_map_search.py /tmp/bench
+    python scripts/benchmark_map_search.py /tmp/bench --regions 6 --places 200000
+"""
+import argparse
+import contextlib
+import os
+import pathlib
+import random
+import statistics
+import sys
+import time
+from unittest import mock
+
+sys.path.append(os.getcwd())
+
+from modules.map import search
+from wrolpi.scripts.build_map_search import build_merged_index, write_search_db, MERGED_INDEX_NAME
+
+SYLLABLES = ['ar', 'ba', 'ca', 'den', 'el', 'fi', 'gor', 'ha', 'in', 'jo', 'ka', 'lo', 'mar', 'ne', 'or', 'pe', 'qui',
+             'ro', 'sa', 'ta', 'un', 've', 'wa', 'xi', 'ya', 'zo']
+SUFFIXES = ['ville', 'field', 'ton', 'wood', 'dale', 'burg', 'view', 'land', 'ford', 'haven', ' Lake', ' Park']
+PREFIX_QUERIES = ['Sa', 'Mar', 'Karo', 'Denel', 'Tavi', 'Hajo', 'Pequi', 'Loro']
+SUBSTRING_QUERIES = ['roville', 'afield', 'eford', 'arhav']
+
+
+def _place_name() -> str:
+    word = ''.join(random.choice(SYLLABLES) for _ in range(random.randint(2, 3))).capitalize()
+    return f'{word}{random.choice(SUFFIXES)}'
+
+
+def make_regions(directory: pathlib.Path, regions: int, places: int):
+    random.seed(0)
+    for region in range(regions):
+        path = directory / f'region{region}.search.db'
+        if path.exists():
+            continue
+        rows = []
+        for idx in range(places):
+            name = _place_name()
+            rows.append((name, 'locality', random.uniform(25, 49), random.uniform(-125, -67), random.uniform(4, 14),
+                         path.stem, '', random.randint(0, 100_000), ''))
+        write_search_db(rows, path)
+    if not (directory / MERGED_INDEX_NAME).exists():
+        build_merged_index(directory)
+
+
+def _ignore_trigram(search_connection):
+    search_connection.has_trigram = False
+    return search_connection
+
+
+def run(queries: list, requests: int, cached: bool, merged: bool, trigram: bool, **kwargs) -> list:
+    fuzzy_rows = search._fuzzy_rows
+    with contextlib.ExitStack() as stack:
+        if not merged:
+            stack.enter_context(mock.patch.object(search, 'MERGED_INDEX_NAME', 'missing.db'))
+        if not trigram:
+            stack.enter_context(mock.patch.object(
+                search, '_fuzzy_rows', lambda conn, *args: fuzzy_rows(_ignore_trigram(conn), *args)))
+        timings = []
+        for request in range(requests):
+            query = queries[request % len(queries)]
+            if not cached:
+                search.close_search_connections()
+            start = time.perf_counter()
+            search.search_places(query, **kwargs)
+            timings.append(time.perf_counter() - start)
+    search.close_search_connections()
+    return timings
+
+
+def main(directory: pathlib.Path, regions: int, places: int, requests: int):
+    directory.mkdir(parents=True, exist_ok=True)
+    make_regions(directory, regions, places)
+
+    with mock.patch.object(search, 'get_map_directory', lambda: directory):
+        for queries_name, queries in (('prefix', PREFIX_QUERIES), ('substring', SUBSTRING_QUERIES)):
+            for name, cached, merged, trigram in (
+                    ('uncached per-region', False, False, True),
+                    ('cached per-region, LIKE', True, False, False),
+                    ('cached per-region', True, False, True),
+                    ('cached merged', True, True, True),
+            ):
+                if queries_name == 'prefix' and not trigram:
+                    continue
+                # The first queries of a connection fill the page cache.
+                run(queries, len(queries), cached, merged, trigram)
+                timings = sorted(run(queries, requests, cached, merged, trigram))
+                mean = statistics.mean(timings) * 1000
+                p95 = timings[int(len(timings) * 0.95)] * 1000
+                print(f'{queries_name:>9} {name:>24}: mean {mean:.1f}ms, p95 {p95:.1f}ms')
+
+        for name, kwargs in (('location', dict(lat=40.0, lon=-100.0)),
+                             ('near location', dict(lat=40.0, lon=-100.0, near=True))):
+            run(PREFIX_QUERIES, len(PREFIX_QUERIES), True, False, True, **kwargs)
+            timings = sorted(run(PREFIX_QUERIES, requests, True, False, True, **kwargs))
+            mean = statistics.mean(timings) * 1000
+            p95 = timings[int(len(timings) * 0.95)] * 1000
+            print(f'   prefix {name:>24}: mean {mean:.1f}ms, p95 {p95:.1f}ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('directory', type=pathlib.Path)
+    parser.add_argument('--regions', type=int, default=4)
+    parser.add_argument('--places', type=int, default=100_000, help='Places in each region')
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+    main(args.directory, args.regions, args.places, args.requests)
@@ -0,0 +1,75 @@
+#! /usr/bin/env python3
+"""Benchmark the refresh filesystem scanners (`find` subprocess vs. `os.scandir`) on a synthetic tree.
+
+Each scanner is timed producing everything the refresh comparison needs: the (directory, filename, stem) of every
+file, and its mtime.  The `find` scanner does not provide the mtime, so it is timed with the second `stat` of
+every file which the comparison would then perform.
+
+Usage:
+    python scripts/benchmark_refresh_scanners.py /tmp/bench               # Create a 1M file tree, then benchmark
+    python scripts/benchmark_refresh_scanners.py /tmp/bench --files 100000
+"""
+import argparse
+import asyncio
+import os
+import pathlib
+import sys
+import time
+from unittest import mock
+
+sys.path.append(os.getcwd())
+
+from wrolpi.files import worker
+
+FILES_PER_DIRECTORY = 250
+SUFFIXES = ('.mp4', '.info.json', '.jpg', '.en.vtt')
+
+
+def make_tree(root: pathlib.Path, files: int):
+    """Create `files` empty files, grouped by stem, `FILES_PER_DIRECTORY` per directory."""
+    marker = root / f'.benchmark-{files}'
+    if marker.is_file():
+        print(f'Using existing tree in {root}')
+        return
+    print(f'Creating {files} files in {root}')
+    for idx in range(files):
+        if idx % FILES_PER_DIRECTORY == 0:
+            directory = root / f'channel{idx // 50_000}' / f'dir{idx // FILES_PER_DIRECTORY}'
+            directory.mkdir(parents=True, exist_ok=True)
+        stem, suffix = divmod(idx, len(SUFFIXES))
+        (directory / f'video {stem}{SUFFIXES[suffix]}').touch()
+    marker.touch()
+
+
+async def run_scanner(name: str, root: pathlib.Path) -> tuple[int, float]:
+    start = time.perf_counter()
+    count = 0
+    async for directory, filename, stem, mtime, size in worker.FILESYSTEM_SCANNERS[name](root):
+        if mtime is None:
+            # What `compare_file_groups` must do for files the scanner did not stat.
+            os.stat(os.path.join(directory, filename))
+        count += 1
+    return count, time.perf_counter() - start
+
+
+async def main(root: pathlib.Path, files: int, repeat: int):
+    make_tree(root, files)
+    # No config is loaded; nothing is ignored.
+    with mock.patch('wrolpi.files.worker._get_normalized_ignored_directories', lambda: []):
+        for name in worker.FILESYSTEM_SCANNERS:
+            timings = []
+            for _ in range(repeat):
+                count, elapsed = await run_scanner(name, root)
+                timings.append(elapsed)
+            best = min(timings)
+            print(f'{name:>8}: {count} files, best of {repeat}: {best:.2f}s ({count / best:,.0f} files/s)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('root', type=pathlib.Path, help='Directory in which the synthetic tree is created')
+    parser.add_argument('--files', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    args.root.mkdir(parents=True, exist_ok=True)
+    asyncio.run(main(args.root, args.files, args.repeat))
@@ -0,0 +1,72 @@
+#! /usr/bin/env python3
+"""Benchmark the hydration of a page of search results: the ORM (FileGroup, Video, Archive) query with the
+`__json__` of each model, vs. the single statement of `hydrate_file_group_search_results`.
+
+The FileGroups of the WROLPi database are used; run this on a populated instance.
+
+Usage:
+    python scripts/benchmark_search_hydration.py                 # Pages of 48 results
+    python scripts/benchmark_search_hydration.py --limit 200 --pages 20
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Dict, List
+
+sys.path.append(os.getcwd())
+
+from wrolpi.db import get_db_curs, get_db_session
+from wrolpi.files.lib import hydrate_file_group_search_results
+from wrolpi.files.models import FileGroup
+
+
+def orm_hydration(file_group_ids: List[int]) -> Dict[int, dict]:
+    """How search results were hydrated before `hydrate_file_group_search_results`."""
+    from modules.archive.models import Archive
+    from modules.videos.models import Video
+
+    with get_db_session() as session:
+        results = session.query(FileGroup, Video, Archive) \
+            .filter(FileGroup.id.in_(file_group_ids)) \
+            .outerjoin(Video, Video.file_group_id == FileGroup.id) \
+            .outerjoin(Archive, Archive.file_group_id == FileGroup.id)
+        hydrated = dict()
+        for file_group, video, archive in results:
+            model = video or archive or file_group
+            hydrated[file_group.id] = model.__json__()
+        return hydrated
+
+
+def get_pages(limit: int, pages: int) -> List[List[int]]:
+    with get_db_curs() as curs:
+        curs.execute('SELECT id FROM file_group ORDER BY RANDOM() LIMIT :total', dict(total=limit * pages))
+        ids = [i['id'] for i in curs.fetchall()]
+    return [ids[i:i + limit] for i in range(0, len(ids), limit)]
+
+
+def main(limit: int, pages: int, repeat: int):
+    pages = get_pages(limit, pages)
+    if not pages:
+        print('There are no FileGroups to hydrate')
+        return
+    print(f'Hydrating {len(pages)} pages of {limit} results')
+
+    for name, hydrate in (('orm', orm_hydration), ('sql', hydrate_file_group_search_results)):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for page in pages:
+                hydrate(page)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        print(f'{name:>4}: best of {repeat}: {best:.3f}s ({best / len(pages) * 1000:.1f}ms per page)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--limit', type=int, default=48, help='Results per page')
+    parser.add_argument('--pages', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    main(args.limit, args.pages, args.repeat)
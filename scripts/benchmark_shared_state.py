@@ -0,0 +1,87 @@
+#! /usr/bin/env python3
+"""Count the round-trips to the multiprocessing manager (and the time) of a simulated request which reads the flags
+and a config, with `manager.dict()` proxies (before) and with shared memory (after).
+
+A request is modeled on the status API and the download dispatcher: it reads every Flag (`get_flags`), and several
+values of the WROLPi config.
+
+Usage:
+    python scripts/benchmark_shared_state.py
+    python scripts/benchmark_shared_state.py --requests 5000 --config-reads 20
+"""
+import argparse
+import ctypes
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+from multiprocessing.managers import BaseProxy
+
+sys.path.append(os.getcwd())
+
+from wrolpi.common import WROLPiConfig
+from wrolpi.shared_snapshot import SharedSnapshotDict, new_shared_snapshot
+
+FLAG_NAMES = [f'flag_{i}' for i in range(14)]
+
+ipc_calls = 0
+_callmethod = BaseProxy._callmethod
+
+
+def _counting_callmethod(self, *args, **kwargs):
+    global ipc_calls
+    ipc_calls += 1
+    return _callmethod(self, *args, **kwargs)
+
+
+BaseProxy._callmethod = _counting_callmethod
+
+
+def request(flags, flag_index, config, config_keys):
+    for name in FLAG_NAMES:
+        flags[flag_index(name)]
+    for key in config_keys:
+        config[key]
+
+
+def run(name: str, flags, flag_index, config, requests: int, config_keys: list):
+    global ipc_calls
+    # The first request of a process copies the snapshot.
+    request(flags, flag_index, config, config_keys)
+    ipc_calls = 0
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        request(flags, flag_index, config, config_keys)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    mean = statistics.mean(timings) * 1_000_000
+    p95 = timings[int(len(timings) * 0.95)] * 1_000_000
+    print(f'{name:>14}: {ipc_calls / requests:.1f} manager round-trips per request,'
+          f' mean {mean:.1f}us, p95 {p95:.1f}us')
+
+
+def main(requests: int, config_reads: int):
+    manager = multiprocessing.Manager()
+    default_config = dict(WROLPiConfig.default_config)
+    config_keys = (list(default_config) * config_reads)[:config_reads]
+
+    flags = manager.dict({i: False for i in FLAG_NAMES})
+    config = manager.dict(default_config)
+    run('manager.dict()', flags, lambda i: i, config, requests, config_keys)
+
+    flags = multiprocessing.RawArray(ctypes.c_bool, len(FLAG_NAMES))
+    indexes = {name: idx for idx, name in enumerate(FLAG_NAMES)}
+    config = SharedSnapshotDict(*new_shared_snapshot(manager))
+    config.update(default_config)
+    run('shared memory', flags, indexes.__getitem__, config, requests, config_keys)
+    manager.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=2_000)
+    parser.add_argument('--config-reads', type=int, default=10, help='Config values read by each request')
+    args = parser.parse_args()
+    main(args.requests, args.config_reads)
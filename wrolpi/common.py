@@ -1,7 +1,9 @@
 import asyncio
 import atexit
+import codecs
 import contextlib
 import functools
+import html.parser
 import inspect
 import json
 import logging
@@ -15,6 +17,7 @@ import socket
 import string
 import sys
 import tempfile
+import time
 from asyncio import Task
 from copy import deepcopy
 from dataclasses import dataclass, field, fields
@@ -22,10 +25,9 @@ from datetime import datetime, date
 from decimal import Decimal
 from functools import wraps
 from itertools import islice, filterfalse, tee
-from multiprocessing.managers import DictProxy
 from pathlib import Path
 from types import GeneratorType
-from typing import Optional, List, AsyncGenerator
+from typing import Optional, List, AsyncGenerator, MutableMapping
 from typing import Union, Callable, Tuple, Dict, Iterable, Generator, Any, Set
 from urllib.parse import urlparse, urlunsplit
 
@@ -285,6 +287,7 @@ __all__ = [
     'extract_domain',
     'extract_headlines',
     'extract_html_text',
+    'extract_html_text_near',
     'format_html_string',
     'format_json_file',
     'get_absolute_media_path',
@@ -298,6 +301,7 @@ __all__ = [
     'get_title_from_html',
     'get_warn_once',
     'get_wrolpi_config',
+    'has_headline_context',
     'html_file_screenshot',
     'html_screenshot',
     'insert_parameter',
@@ -503,9 +507,9 @@ class ConfigFile:
     def __json__(self) -> dict:
         return dict(self._config)
 
-    def initialize(self, multiprocessing_dict: Optional[DictProxy] = None):
+    def initialize(self, multiprocessing_dict: Optional[MutableMapping] = None):
         """Initializes this config dict using the default config and the config file."""
-        # Use the provided multiprocessing.Manager().dict() when live, or, dict() for testing.
+        # Use the provided SharedSnapshotDict (shared by all processes) when live, or, dict() for testing.
         self._config = multiprocessing_dict if multiprocessing_dict is not None else dict()
         # Use the default settings to initialize the config.
         self._config.update(deepcopy(self.default_config))
@@ -896,7 +900,7 @@ class MultiFileConfig:
             return []
         return sorted(f.stem for f in directory.glob(self.glob_pattern) if f.is_file())
 
-    def initialize(self, multiprocessing_dict: Optional[DictProxy] = None):
+    def initialize(self, multiprocessing_dict: Optional[MutableMapping] = None):
         """Assign the shared in-memory store, then import every entity file from disk."""
         self._configs = multiprocessing_dict if multiprocessing_dict is not None else dict()
         self._configs.clear()
@@ -1099,11 +1103,13 @@ class WROLPiConfigValidator:
     download_wait: int = None
     download_window_start: str = None
     download_window_end: str = None
+    ffprobe_workers: int = None
     hotspot_device: str = None
     hotspot_on_startup: bool = None
     hotspot_password: str = None
     hotspot_ssid: str = None
     ignore_outdated_zims: bool = None
+    indexer_workers: int = None
     log_level: str = None
     map_default_location: dict = None
     map_destination: str = None
@@ -1298,6 +1304,7 @@ class WROLPiConfig(ConfigFile):
         download_wait=20,
         download_window_start=None,
         download_window_end=None,
+        ffprobe_workers=3,
         hotspot_device='wlan0',
         hotspot_on_startup=True,
         hotspot_password='wrolpi hotspot',
@@ -1305,6 +1312,8 @@ class WROLPiConfig(ConfigFile):
         check_for_upgrades=True,
         ignore_outdated_zims=False,
         ignored_directories=['config', 'tags'],
+        # Tests index in the test process (a worker must import all of WROLPi), unless a test sets workers.
+        indexer_workers=0 if PYTEST else 2,
         log_level='info',
         map_default_location=None,
         map_destination='map',
@@ -1497,6 +1506,25 @@ class WROLPiConfig(ConfigFile):
     def ignore_outdated_zims(self, value: bool):
         self.update({'ignore_outdated_zims': value})
 
+    @property
+    def ffprobe_workers(self) -> int:
+        """The number of ffprobe subprocesses the video modeler runs at once."""
+        return self._config['ffprobe_workers']
+
+    @ffprobe_workers.setter
+    def ffprobe_workers(self, value: int):
+        self.update({'ffprobe_workers': value})
+
+    @property
+    def indexer_workers(self) -> int:
+        """The number of worker processes which extract text from files (see `index_workers`).  0 extracts in the
+        WROLPi process."""
+        return self._config['indexer_workers']
+
+    @indexer_workers.setter
+    def indexer_workers(self, value: int):
+        self.update({'indexer_workers': value})
+
     @property
     def save_ffprobe_json(self) -> bool:
         return self._config['save_ffprobe_json']
@@ -2278,8 +2306,9 @@ async def apply_modelers(progress_callback: callable = None):
     """Run all registered modelers.
 
     Args:
-        progress_callback: Optional callback(processed, total) called after each modeler completes,
-                          or after each batch if the modeler supports progress_callback.
+        progress_callback: Optional callback(processed, total, rates) called after each modeler completes,
+                          or after each batch if the modeler supports progress_callback.  `rates` are the
+                          FileGroups modeled per second by each modeler which has run: {modeler name: rate}.
     """
     from wrolpi.db import get_db_session
     from wrolpi.files.models import FileGroup
@@ -2289,27 +2318,36 @@ async def apply_modelers(progress_callback: callable = None):
     if progress_callback:
         with get_db_session() as session:
             initial_unindexed = session.query(FileGroup).filter(FileGroup.indexed != True).count()
-        progress_callback(0, initial_unindexed)
+        progress_callback(0, initial_unindexed, dict())
 
     # Track cumulative progress across all modelers
     cumulative_processed = 0
+    rates = dict()
+
+    def set_rate(name: str, processed: int, started: float):
+        elapsed = time.monotonic() - started
+        rates[name] = round(processed / elapsed, 2) if elapsed > 0 else 0
 
     for modeler in modelers:
         logger_.info(f'Applying modeler {modeler.__name__}')
+        modeler_started = time.monotonic()
+        modeler_cumulative = cumulative_processed
         try:
             # Check if this modeler accepts a progress_callback parameter
             sig = inspect.signature(modeler)
             if 'progress_callback' in sig.parameters and progress_callback and initial_unindexed > 0:
                 # Create a callback that updates the cumulative progress
-                def make_modeler_callback(current_cumulative):
+                def make_modeler_callback(current_cumulative, name, started):
                     def modeler_progress_callback(batch_processed: int):
                         nonlocal cumulative_processed
                         cumulative_processed = current_cumulative + batch_processed
-                        progress_callback(cumulative_processed, initial_unindexed)
+                        set_rate(name, batch_processed, started)
+                        progress_callback(cumulative_processed, initial_unindexed, dict(rates))
 
                     return modeler_progress_callback
 
-                await modeler(progress_callback=make_modeler_callback(cumulative_processed))
+                await modeler(progress_callback=make_modeler_callback(cumulative_processed, modeler.__name__,
+                                                                      modeler_started))
             else:
                 await modeler()
         except Exception as e:
@@ -2322,7 +2360,8 @@ async def apply_modelers(progress_callback: callable = None):
             with get_db_session() as session:
                 remaining = session.query(FileGroup).filter(FileGroup.indexed != True).count()
             cumulative_processed = initial_unindexed - remaining
-            progress_callback(cumulative_processed, initial_unindexed)
+            set_rate(modeler.__name__, max(cumulative_processed - modeler_cumulative, 0), modeler_started)
+            progress_callback(cumulative_processed, initial_unindexed, dict(rates))
 
         # Sleep to catch cancel.
         await asyncio.sleep(0)
@@ -2782,6 +2821,10 @@ def extract_html_text(html: str) -> str:
     # Use body if it exists, otherwise use the entire soup
     text = soup.body.get_text() if soup.body else soup.get_text()
 
+    return _strip_text_lines(text)
+
+
+def _strip_text_lines(text: str) -> str:
     # break into lines and remove leading and trailing space on each
     lines = (line.strip() for line in text.splitlines())
     # break multi-headlines into a line each
@@ -2792,6 +2835,96 @@ def extract_html_text(html: str) -> str:
     return text
 
 
+# `extract_html_text_near` parses this much HTML at a time.
+HTML_TEXT_CHUNK_SIZE = 8_192
+# The text kept after the searched words, enough for a headline.
+HEADLINE_TEXT_CONTEXT = 1_000
+# `extract_html_text_near` stops after this much text, even if the searched words were not found.
+HEADLINE_TEXT_LIMIT = 32_768
+
+
+class _HTMLTextParser(html.parser.HTMLParser):
+    """Collects the text of an HTML document, except the text of the head, scripts and styles."""
+    SKIP_TAGS = {'head', 'title', 'script', 'style', 'template'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.pieces: List[str] = []
+        self._skipping: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'body':
+            # The head was not closed.
+            self._skipping.clear()
+        elif tag in self.SKIP_TAGS:
+            self._skipping.append(tag)
+
+    def handle_endtag(self, tag):
+        if tag in self._skipping:
+            # Also close any unclosed tag within this tag.
+            while self._skipping.pop() != tag:
+                pass
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self.pieces.append(data)
+
+
+def _headline_words_re(search_str: Optional[str]) -> List[List[re.Pattern]]:
+    """Match the start of each word of each OR group of `search_str`.  The start of the word is matched because the
+    search index matches the stem of a word (`running` matches `runs`)."""
+    from wrolpi import fts
+
+    return [[re.compile(r'\b' + re.escape(word[:max(3, len(word) - 2)]), re.IGNORECASE) for word in words]
+            for words in fts.websearch_words(search_str)]
+
+
+def _headline_context_found(text: str, groups: List[List[re.Pattern]], context: int) -> bool:
+    """Does `text` contain every word of an OR group, and `context` characters after them?"""
+    if not groups:
+        # Without a search, the headline is the leading text.
+        return len(text) >= context
+    for patterns in groups:
+        matches = [i.search(text) for i in patterns]
+        if all(matches) and len(text) >= max(i.end() for i in matches) + context:
+            return True
+    return False
+
+
+def has_headline_context(text: str, search_str: Optional[str], context: int = HEADLINE_TEXT_CONTEXT) -> bool:
+    """Is this text (from `extract_html_text_near`) enough for a headline of `search_str`?"""
+    return _headline_context_found(text, _headline_words_re(search_str), context)
+
+
+def extract_html_text_near(html: Union[bytes, memoryview, str], search_str: Optional[str] = None,
+                          context: int = HEADLINE_TEXT_CONTEXT, limit: Optional[int] = HEADLINE_TEXT_LIMIT) \
+        -> Tuple[str, bool]:
+    """Extract the text of an HTML document like `extract_html_text`, but only as much as a headline of `search_str`
+    needs.  The HTML is parsed in chunks until the words of `search_str` (or the leading text, if there is no
+    `search_str`) and `context` characters after them were found, or until `limit` characters of text.
+
+    Returns the text, and True if it is all the text of the document."""
+    groups = _headline_words_re(search_str)
+    decoder = None if isinstance(html, str) else codecs.getincrementaldecoder('utf-8')(errors='replace')
+    if decoder:
+        html = memoryview(html)
+
+    parser = _HTMLTextParser()
+    for start in range(0, len(html), HTML_TEXT_CHUNK_SIZE):
+        chunk = html[start:start + HTML_TEXT_CHUNK_SIZE]
+        parser.feed(decoder.decode(chunk) if decoder else chunk)
+        if limit is None or start + HTML_TEXT_CHUNK_SIZE >= len(html):
+            continue
+        text = ''.join(parser.pieces)
+        if len(text) >= limit or _headline_context_found(text, groups, context):
+            return _strip_text_lines(text), False
+
+    if decoder:
+        parser.feed(decoder.decode(b'', final=True))
+    parser.close()
+    return _strip_text_lines(''.join(parser.pieces)), True
+
+
 def extract_headlines(entries: List[str], search_str: str) -> List[Tuple[str, float]]:
     """Extract headlines (highlighted snippets) and ranks of the `search_str` from the provided entries.
 
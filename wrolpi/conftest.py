@@ -49,6 +49,7 @@ from wrolpi.db import create_wrolpi_engine
 from wrolpi.downloader import DownloadContext, DownloadManager, DownloadResult, Download, Downloader, \
     downloads_manager_config_context, download_cache_config_context
 from wrolpi.errors import UnrecoverableDownloadError
+from wrolpi.events import EventRing, get_event_ring
 from wrolpi.files.models import Directory, FileGroup
 from wrolpi.switches import await_switches as await_switches_
 from wrolpi.tags import Tag, upsert_tag
@@ -85,6 +86,9 @@ def test_db() -> Tuple[Engine, Session]:
 def test_session(test_directory) -> Generator[Session, Any, None]:
     """Pytest Fixture to get a test database session."""
     test_engine, session = test_db()
+    # Search totals of a previous test's DB are cached.
+    from wrolpi.files.lib import invalidate_search_total_cache
+    invalidate_search_total_cache()
 
     def fake_get_db_session():
         """Get the testing db"""
@@ -833,17 +837,16 @@ class EventsFixture:
     making it safe for parallel test execution.
     """
 
-    def __init__(self, events_history: list):
-        self._history = events_history
-        # Track the starting index to only see new events during this test
-        self._start_index = len(events_history)
+    def __init__(self, event_ring: EventRing):
+        self._ring = event_ring
+        # Track the starting sequence number to only see new events during this test
+        self._start_sequence = event_ring.sequence
 
     @property
     def events(self) -> List[dict]:
         """Return events captured during this test (most recent first)."""
         # Only return events added after fixture creation
-        new_events = list(self._history[self._start_index:])
-        return list(reversed(new_events))
+        return list(reversed(self._ring.read(self._start_sequence)))
 
     def get_by_name(self, event_name: str) -> List[dict]:
         """Get all events with the given name."""
@@ -885,7 +888,7 @@ def events_fixture(async_client) -> EventsFixture:
     Only sees events created after this fixture is instantiated,
     making it safe for parallel test execution.
     """
-    return EventsFixture(api_app.shared_ctx.events_history)
+    return EventsFixture(get_event_ring())
 
 
 FLAGS_LOCK = multiprocessing.Lock()
@@ -5,6 +5,7 @@ import queue
 from sanic import Sanic
 
 from wrolpi.common import logger
+from wrolpi.shared_snapshot import SharedSnapshotDict, new_shared_snapshot
 from wrolpi.vars import LOG_LEVEL_INT
 
 logger = logger.getChild(__name__)
@@ -19,22 +20,22 @@ def attach_shared_contexts(app: Sanic):
     # Many things wait for flags.db_up, initialize before starting.
     from wrolpi import flags
 
-    app.shared_ctx.flags = manager.dict({i: False for i in flags.FLAG_NAMES})
+    app.shared_ctx.flags = multiprocessing.RawArray(ctypes.c_bool, flags.FLAGS_CAPACITY)
 
     # ConfigFile multiprocessing_dict's.
-    # Shared Configs
-    app.shared_ctx.wrolpi_config = manager.dict()
-    app.shared_ctx.tags_config = manager.dict()
-    app.shared_ctx.inventories_config = manager.dict()
-    app.shared_ctx.catalog_config = manager.dict()
-    app.shared_ctx.channels_config = manager.dict()
-    app.shared_ctx.download_manager_config = manager.dict()
-    app.shared_ctx.videos_downloader_config = manager.dict()
-    app.shared_ctx.domains_config = manager.dict()
-    app.shared_ctx.archive_downloader_config = manager.dict()
-    app.shared_ctx.download_cache_config = manager.dict()
-    app.shared_ctx.map_pins_config = manager.dict()
-    app.shared_ctx.flasher_config = manager.dict()
+    # Shared Configs; read from a snapshot in each process, see `wrolpi.shared_snapshot`.
+    app.shared_ctx.wrolpi_config = new_shared_snapshot(manager)
+    app.shared_ctx.tags_config = new_shared_snapshot(manager)
+    app.shared_ctx.inventories_config = new_shared_snapshot(manager)
+    app.shared_ctx.catalog_config = new_shared_snapshot(manager)
+    app.shared_ctx.channels_config = new_shared_snapshot(manager)
+    app.shared_ctx.download_manager_config = new_shared_snapshot(manager)
+    app.shared_ctx.videos_downloader_config = new_shared_snapshot(manager)
+    app.shared_ctx.domains_config = new_shared_snapshot(manager)
+    app.shared_ctx.archive_downloader_config = new_shared_snapshot(manager)
+    app.shared_ctx.download_cache_config = new_shared_snapshot(manager)
+    app.shared_ctx.map_pins_config = new_shared_snapshot(manager)
+    app.shared_ctx.flasher_config = new_shared_snapshot(manager)
     # Shared dicts.
     app.shared_ctx.refresh = manager.dict()
     app.shared_ctx.uploaded_files = manager.dict()
@@ -89,9 +90,9 @@ def attach_shared_contexts(app: Sanic):
     # Count of config entries skipped during each config's import (blocks dumps until re-imported cleanly).
     app.shared_ctx.configs_import_skipped = manager.dict()
 
-    # Events.
-    app.shared_ctx.events_lock = multiprocessing.Lock()
-    app.shared_ctx.events_history = manager.list()
+    # Events; see `wrolpi.events.EventRing`.
+    from wrolpi.events import new_event_ring
+    app.shared_ctx.events = new_event_ring()
 
     app.shared_ctx.file_worker_public_queue = manager.Queue()
     app.shared_ctx.file_worker_status = manager.dict()
@@ -105,16 +106,16 @@ def reset_shared_contexts(app: Sanic):
 
     Should only be called when server is starting, or could start back up."""
     # Should only be called when server is expected to start again.
-    app.shared_ctx.wrolpi_config.clear()
-    app.shared_ctx.tags_config.clear()
-    app.shared_ctx.inventories_config.clear()
-    app.shared_ctx.catalog_config.clear()
-    app.shared_ctx.channels_config.clear()
-    app.shared_ctx.download_manager_config.clear()
-    app.shared_ctx.videos_downloader_config.clear()
-    app.shared_ctx.domains_config.clear()
-    app.shared_ctx.archive_downloader_config.clear()
-    app.shared_ctx.download_cache_config.clear()
+    SharedSnapshotDict(*app.shared_ctx.wrolpi_config).clear()
+    SharedSnapshotDict(*app.shared_ctx.tags_config).clear()
+    SharedSnapshotDict(*app.shared_ctx.inventories_config).clear()
+    SharedSnapshotDict(*app.shared_ctx.catalog_config).clear()
+    SharedSnapshotDict(*app.shared_ctx.channels_config).clear()
+    SharedSnapshotDict(*app.shared_ctx.download_manager_config).clear()
+    SharedSnapshotDict(*app.shared_ctx.videos_downloader_config).clear()
+    SharedSnapshotDict(*app.shared_ctx.domains_config).clear()
+    SharedSnapshotDict(*app.shared_ctx.archive_downloader_config).clear()
+    SharedSnapshotDict(*app.shared_ctx.download_cache_config).clear()
     # Shared dicts.
     app.shared_ctx.refresh.clear()
     app.shared_ctx.uploaded_files.clear()
@@ -131,6 +132,8 @@ def reset_shared_contexts(app: Sanic):
         current_commit=None,
         commits_behind=0,
         git_branch=None,
+        # Progress of the map search index build.
+        map_search_progress=None,
     ))
     app.shared_ctx.cache.clear()
     # Secure cookies
@@ -204,11 +207,13 @@ def reset_shared_contexts(app: Sanic):
         operation_total=0,
         operation_processed=0,
         operation_percent=0,
+        skipped_directories=0,
+        modeling_rates=dict(),
     ))
 
     # Events.
-    # Clear events_history in place to preserve references held by fixtures
-    del app.shared_ctx.events_history[:]
+    from wrolpi.events import EventRing
+    EventRing(*app.shared_ctx.events).clear()
     app.shared_ctx.single_tasks_started.clear()
     app.shared_ctx.flags_initialized.clear()
     app.shared_ctx.perpetual_tasks_started.clear()
@@ -233,67 +238,67 @@ def initialize_configs_contexts(app: Sanic):
 
     try:  # noqa
         # Inventory is config-only (no DB); the shared dict is keyed by inventory slug.
-        get_inventory_configs().initialize(app.shared_ctx.inventories_config)
+        get_inventory_configs().initialize(SharedSnapshotDict(*app.shared_ctx.inventories_config))
     except Exception as e:
         logger.error(f'Failed to initialize in-memory inventories config: {e}')
 
     try:
         from modules.inventory.catalog import get_catalog_config
-        get_catalog_config().initialize(app.shared_ctx.catalog_config)
+        get_catalog_config().initialize(SharedSnapshotDict(*app.shared_ctx.catalog_config))
     except Exception as e:
         logger.error(f'Failed to initialize in-memory food catalog config: {e}')
 
     try:
-        CHANNELS_CONFIG.initialize(app.shared_ctx.channels_config)
+        CHANNELS_CONFIG.initialize(SharedSnapshotDict(*app.shared_ctx.channels_config))
     except Exception as e:
         logger.error(f'Failed to initialize in-memory channels config: {e}')
 
     try:
-        VIDEOS_DOWNLOADER_CONFIG.initialize(app.shared_ctx.videos_downloader_config)
+        VIDEOS_DOWNLOADER_CONFIG.initialize(SharedSnapshotDict(*app.shared_ctx.videos_downloader_config))
     except Exception as e:
         logger.error(f'Failed to initialize in-memory videos downloader config: {e}')
 
     try:  # noqa
-        WROLPI_CONFIG.initialize(app.shared_ctx.wrolpi_config)
+        WROLPI_CONFIG.initialize(SharedSnapshotDict(*app.shared_ctx.wrolpi_config))
     except Exception as e:
         logger.error(f'Failed to initialize in-memory wrolpi config config: {e}')
 
     try:
-        TAGS_CONFIG.initialize(app.shared_ctx.tags_config)
+        TAGS_CONFIG.initialize(SharedSnapshotDict(*app.shared_ctx.tags_config))
     except Exception as e:
         logger.error(f'Failed to initialize in-memory tags config: {e}')
 
     try:
-        DOWNLOAD_MANAGER_CONFIG.initialize(app.shared_ctx.download_manager_config)
+        DOWNLOAD_MANAGER_CONFIG.initialize(SharedSnapshotDict(*app.shared_ctx.download_manager_config))
     except Exception as e:
         logger.error(f'Failed to initialize in-memory download manager config: {e}')
 
     try:
         from modules.archive.lib import domains_config
-        domains_config.initialize(app.shared_ctx.domains_config)
+        domains_config.initialize(SharedSnapshotDict(*app.shared_ctx.domains_config))
     except Exception as e:
         logger.error(f'Failed to initialize in-memory domains config: {e}')
 
     try:
         from modules.archive.lib import ARCHIVE_DOWNLOADER_CONFIG
-        ARCHIVE_DOWNLOADER_CONFIG.initialize(app.shared_ctx.archive_downloader_config)
+        ARCHIVE_DOWNLOADER_CONFIG.initialize(SharedSnapshotDict(*app.shared_ctx.archive_downloader_config))
     except Exception as e:
         logger.error(f'Failed to initialize in-memory archive downloader config: {e}')
 
     try:
         from wrolpi.downloader import DOWNLOAD_CACHE_CONFIG
-        DOWNLOAD_CACHE_CONFIG.initialize(app.shared_ctx.download_cache_config)
+        DOWNLOAD_CACHE_CONFIG.initialize(SharedSnapshotDict(*app.shared_ctx.download_cache_config))
     except Exception as e:
         logger.error(f'Failed to initialize in-memory download cache config: {e}')
 
     try:
         from modules.map.pins import MAP_PINS_CONFIG
-        MAP_PINS_CONFIG.initialize(app.shared_ctx.map_pins_config)
+        MAP_PINS_CONFIG.initialize(SharedSnapshotDict(*app.shared_ctx.map_pins_config))
     except Exception as e:
         logger.error(f'Failed to initialize in-memory map pins config: {e}')
 
     try:
         from modules.flasher.config import FLASHER_CONFIG
-        FLASHER_CONFIG.initialize(app.shared_ctx.flasher_config)
+        FLASHER_CONFIG.initialize(SharedSnapshotDict(*app.shared_ctx.flasher_config))
     except Exception as e:
         logger.error(f'Failed to initialize in-memory flasher config: {e}')
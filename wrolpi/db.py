@@ -3,23 +3,27 @@
 The database file lives at `<media directory>/config/wrolpi.db`, next to the YAML configs it
 complements, so a user's entire library (files + configs + database) travels with the drive.
 
-Engines are created lazily (the media directory must be known first) and use NullPool with a
-fresh session per use.  Every connection gets the same PRAGMAs (WAL, busy_timeout, foreign keys)
+Engines are created lazily (the media directory must be known first) with a fresh session per
+use.  The engine of each process keeps a small pool of connections (see `get_engine`), so a
+session does not reopen the database, re-apply the PRAGMAs, and lose the connection's prepared
+statements.  Every connection gets the same PRAGMAs (WAL, busy_timeout, foreign keys, cache)
 via `create_wrolpi_engine` — use that factory for any engine touching a WROLPi database.
 """
 import contextvars
+import itertools
+import os
 import pathlib
 import sqlite3
 import threading
 import types
 from contextlib import contextmanager
-from typing import Tuple, List, Union, Type, Generator, Any
+from typing import Tuple, List, Union, Type, Generator, Any, Iterable
 
 import sqlalchemy
 import sqlalchemy.exc
 from sqlalchemy import event
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import NullPool, QueuePool
 
 from wrolpi.common import logger, Base
 from wrolpi.vars import PYTEST
@@ -35,6 +39,17 @@ logger = logger.getChild(__name__)
 _immediate_txn = contextvars.ContextVar('wrolpi_immediate_txn', default=False)
 
 
+# Idle connections kept open by the engine of each process.  More are opened (and closed when released) under load;
+# like NullPool, a session never waits for a connection.
+DB_POOL_SIZE = 4
+# Prepared statements cached by each connection (sqlite3's default is 128).
+SQLITE_CACHED_STATEMENTS = 256
+# The page cache of each connection, in KiB (SQLite's default is 2MiB).
+SQLITE_CACHE_SIZE_KIB = 8 * 1024
+# Bytes of the database read through memory-mapped I/O (WAL only), instead of copying pages into the page cache.
+SQLITE_MMAP_SIZE = 64 * 1024 ** 2
+
+
 def _adapt_datetime(value):
     """Store datetimes from raw SQL exactly like SQLAlchemy does: naive UTC with microseconds."""
     from datetime import timezone
@@ -105,26 +120,38 @@ def _configure_sqlite_connection(dbapi_conn, journal_mode: str = None) -> str:
         curs.execute('PRAGMA busy_timeout=30000')
         curs.execute('PRAGMA foreign_keys=ON')
         curs.execute('PRAGMA recursive_triggers=ON')
+        curs.execute(f'PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KIB}')
+        if journal_mode == 'WAL':
+            curs.execute(f'PRAGMA mmap_size={SQLITE_MMAP_SIZE}')
         return journal_mode
     finally:
         curs.close()
 
 
-def create_wrolpi_engine(target: Union[str, pathlib.Path]) -> sqlalchemy.engine.Engine:
+def create_wrolpi_engine(target: Union[str, pathlib.Path], pool_size: int = None) -> sqlalchemy.engine.Engine:
     """Create a SQLAlchemy engine for a WROLPi SQLite database.
 
     The single place every WROLPi engine is built (production, tests, alembic) so that all
-    connections get identical PRAGMAs and transactional behavior."""
+    connections get identical PRAGMAs and transactional behavior.
+
+    Without a `pool_size` every connection is closed when it is released (NullPool); one-off
+    engines (alembic, tests) must not leave connections open on a database which may be deleted.
+    With a `pool_size`, up to `pool_size` released connections are kept open for reuse; a pooled
+    engine must not be used across a fork (see `get_engine`)."""
     uri = str(target) if str(target).startswith('sqlite') else f'sqlite:///{target}'
+    if pool_size:
+        pool_args = dict(poolclass=QueuePool, pool_size=pool_size, max_overflow=-1)
+    else:
+        pool_args = dict(poolclass=NullPool)
     engine = sqlalchemy.create_engine(
         uri,
-        poolclass=NullPool,
-        # NullPool + executor threads mean connections may be closed on another thread.
-        connect_args=dict(check_same_thread=False, timeout=30),
+        **pool_args,
+        # Executor threads mean connections may be used and closed on another thread.
+        connect_args=dict(check_same_thread=False, timeout=30, cached_statements=SQLITE_CACHED_STATEMENTS),
     )
 
     # The journal mode is decided on the first connection and reused for the engine's life, so WAL
-    # is not re-attempted (and re-logged) on every fresh NullPool connection.
+    # is not re-attempted (and re-logged) on every new connection.
     journal_state = {'mode': None}
 
     @event.listens_for(engine, 'connect')
@@ -152,7 +179,8 @@ def get_engine() -> sqlalchemy.engine.Engine:
     """The lazy singleton engine for the WROLPi database.
 
     Created on first use (the media directory must be known by then); recreated automatically if
-    the media directory (and therefore the database file) changes."""
+    the media directory (and therefore the database file) changes.  The engine pools its
+    connections; each process gets its own engine (see `_dispose_engine_before_fork`)."""
     global _engine, _session_maker
     with _engine_lock:
         db_file = get_db_file()
@@ -160,11 +188,39 @@ def get_engine() -> sqlalchemy.engine.Engine:
             if _engine is not None:
                 _engine.dispose()
             logger.info(f'Creating database engine: {db_file}')
-            _engine = create_wrolpi_engine(db_file)
+            _engine = create_wrolpi_engine(db_file, pool_size=DB_POOL_SIZE)
             _session_maker = sessionmaker(bind=_engine)
         return _engine
 
 
+# Engines of the parent process; referenced forever so a forked child never closes their connections.
+_parent_engines: List[sqlalchemy.engine.Engine] = []
+
+
+def _dispose_engine_before_fork():
+    """Close the idle pooled connections before forking (Sanic workers, indexing processes).
+
+    A SQLite connection must never be used by a forked child, not even closed: the child does not
+    hold the parent's locks, so closing what it believes is the last connection may checkpoint and
+    delete the WAL underneath the parent."""
+    if _engine is not None:
+        _engine.dispose()
+
+
+def _forget_engine_after_fork():
+    """The child creates its own engine (and pool) on first use."""
+    global _engine, _session_maker, _engine_lock
+    # Another thread of the parent may have held the lock when it forked.
+    _engine_lock = threading.Lock()
+    if _engine is not None:
+        # Connections checked out by the parent (by the forking thread) remain referenced.
+        _parent_engines.append(_engine)
+    _engine = _session_maker = None
+
+
+os.register_at_fork(before=_dispose_engine_before_fork, after_in_child=_forget_engine_after_fork)
+
+
 def _get_db_session():
     """
     This function allows the database to be wrapped during testing.  See: wrolpi.conftest.test_session
@@ -277,6 +333,38 @@ def get_db_curs(commit: bool = False) -> Generator[sqlite3.Cursor, Any, None]:
             connection.close()
 
 
+def bump_search_generation(curs: Union[sqlite3.Cursor, Session]):
+    """Count a write of the tables which searches count (see `wrolpi.schema_ddl.SEARCH_GENERATION_TABLES`), so no
+    process reuses a search total cached before the write.
+
+    Called once by each transaction (or batch) which writes these tables with raw SQL; flushes of their models are
+    counted by `_bump_search_generation_after_flush`."""
+    from wrolpi.schema_ddl import SEARCH_GENERATION_BUMP
+    curs.execute(SEARCH_GENERATION_BUMP)
+
+
+def _writes_search_tables(tables: Iterable[str]) -> bool:
+    from wrolpi.schema_ddl import SEARCH_GENERATION_TABLES
+    return any(i in SEARCH_GENERATION_TABLES for i in tables)
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_search_generation_after_flush(session: Session, _):
+    """Bump the search generation once for each flush which writes the tables searches count."""
+    objects = itertools.chain(session.new, session.dirty, session.deleted)
+    if _writes_search_tables(getattr(i, '__tablename__', None) for i in objects):
+        bump_search_generation(session)
+
+
+@event.listens_for(Session, 'after_bulk_update')
+@event.listens_for(Session, 'after_bulk_delete')
+def _bump_search_generation_after_bulk(context):
+    """Bump the search generation for a `Query.update` or `Query.delete` of the tables searches count."""
+    table = getattr(context, 'primary_table', None)
+    if table is not None and _writes_search_tables((table.name,)):
+        bump_search_generation(context.session)
+
+
 def get_ranked_models(ranked_primary_keys: List, model: Type[Base], session: Session) -> List[Base]:
     """Get all objects whose primary keys are in the `ranked_primary_keys`, preserve their order."""
     pkey = sqlalchemy.inspect(model).primary_key[0]
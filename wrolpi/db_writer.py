@@ -0,0 +1,180 @@
+"""The single writer of each process: writes are queued and committed together in short transactions.
+
+SQLite has one write lock.  When every subsystem (download dispatch, modelers, bulk tagging) opens its own write
+session they queue on that lock inside `busy_timeout`, each paying a BEGIN IMMEDIATE/COMMIT (and fsync) of its own,
+and each needed its own "database is locked" handling.  Instead, a write is submitted to the writer of the process as
+a function of a Session (`submit_write`/`write`).  The writer thread takes every pending write, runs them in one
+`BEGIN IMMEDIATE` transaction (each in its own SAVEPOINT, so a failing write does not undo the others), commits, and
+then resolves the futures of the writes.
+
+A write function:
+  * runs in the writer thread, never in the event loop, so it must not await or touch asyncio objects;
+  * should be short; do slow work (reading files, extracting text) before submitting;
+  * may be run again when the database is locked (by another process), so it must only write what it returns, not
+    mutate the caller's state;
+  * should return plain values, the ORM objects of the transaction are expired by its commit.
+
+During tests a write runs immediately in the caller's thread (the test session is shared by the whole test).
+"""
+import asyncio
+import concurrent.futures
+import os
+import queue
+import threading
+import time
+from typing import Callable, List, TypeVar
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from wrolpi.common import logger
+from wrolpi.db import get_db_session
+from wrolpi.vars import PYTEST
+
+logger = logger.getChild(__name__)
+
+__all__ = ['DBWriter', 'get_db_writer', 'submit_write', 'write', 'WriteFunction']
+
+T = TypeVar('T')
+WriteFunction = Callable[[Session], T]
+
+# Writes committed by one transaction.  More pending writes wait for the next transaction.
+WRITER_MAX_WRITES = 100
+# A transaction stops taking pending writes after this many seconds so it holds the write lock briefly.
+WRITER_MAX_SECONDS = 0.2
+# Times a write is retried when the database is locked (by another process, after `busy_timeout`).
+WRITER_LOCK_RETRIES = 3
+
+
+def _is_locked_error(error: Exception) -> bool:
+    return isinstance(error, OperationalError) and 'locked' in str(error).lower()
+
+
+class _Write:
+    __slots__ = ('func', 'future', 'attempts', 'result', 'error')
+
+    def __init__(self, func: WriteFunction):
+        self.func = func
+        self.future = concurrent.futures.Future()
+        self.attempts = 0
+        self.result = None
+        self.error = None
+
+
+class DBWriter:
+    """Commits the writes submitted by this process; see the module docstring.
+
+    Writes run in a daemon thread started on the first submit, unless `inline` (then `submit` runs the write in the
+    caller's thread)."""
+
+    def __init__(self, inline: bool = False):
+        self.inline = inline
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: threading.Thread = None
+        self._lock = threading.Lock()
+        # Statistics; the number of committed transactions, and the writes they committed.
+        self.transactions = 0
+        self.writes = 0
+
+    def submit(self, func: WriteFunction) -> concurrent.futures.Future:
+        """Queue `func` to be run (with the Session of a write transaction), returns the future of its result."""
+        write_ = _Write(func)
+        if self.inline:
+            self._run_until_done([write_])
+        else:
+            self._queue.put(write_)
+            self._start()
+        return write_.future
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='wrolpi-db-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        retries: List[_Write] = []
+        while True:
+            writes = retries or [self._queue.get()]
+            start = time.monotonic()
+            while len(writes) < WRITER_MAX_WRITES and time.monotonic() - start < WRITER_MAX_SECONDS:
+                try:
+                    writes.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            retries = self._commit(writes)
+            if retries:
+                time.sleep(0.1)
+
+    def _run_until_done(self, writes: List[_Write]):
+        while writes := self._commit(writes):
+            time.sleep(0.1)
+
+    def _commit(self, writes: List[_Write]) -> List[_Write]:
+        """Run `writes` in one transaction, resolve their futures.  Returns the writes which should be retried."""
+        for write_ in writes:
+            write_.attempts += 1
+            write_.result = write_.error = None
+        try:
+            with get_db_session(commit=True) as session:
+                for write_ in writes:
+                    session.begin_nested()
+                    try:
+                        write_.result = write_.func(session)
+                        session.commit()
+                    except Exception as e:
+                        session.rollback()
+                        write_.error = e
+        except Exception as e:
+            # BEGIN or COMMIT failed; nothing was written.
+            for write_ in writes:
+                write_.error = e
+
+        retries = []
+        committed = 0
+        for write_ in writes:
+            if write_.error is None:
+                write_.future.set_result(write_.result)
+                committed += 1
+            elif _is_locked_error(write_.error) and write_.attempts < WRITER_LOCK_RETRIES:
+                logger.debug(f'Retrying a write, the database is locked (attempt {write_.attempts})')
+                retries.append(write_)
+            else:
+                write_.future.set_exception(write_.error)
+        if committed:
+            self.transactions += 1
+            self.writes += committed
+        return retries
+
+
+_writer: DBWriter = None
+_writer_lock = threading.Lock()
+
+
+def get_db_writer() -> DBWriter:
+    """The writer of this process."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = DBWriter(inline=bool(PYTEST))
+        return _writer
+
+
+def submit_write(func: WriteFunction) -> concurrent.futures.Future:
+    """Queue `func(session)` to be committed by the writer of this process; returns the future of its result."""
+    return get_db_writer().submit(func)
+
+
+async def write(func: WriteFunction) -> T:
+    """Commit `func(session)` with the writer of this process, return its result (or raise its error)."""
+    return await asyncio.wrap_future(submit_write(func))
+
+
+def _forget_writer_after_fork():
+    """The writer thread does not exist in a forked child; the child starts its own on its first write."""
+    global _writer, _writer_lock
+    _writer_lock = threading.Lock()
+    _writer = None
+
+
+os.register_at_fork(after_in_child=_forget_writer_after_fork)
@@ -1,5 +1,6 @@
 import asyncio
 import contextlib
+import functools
 import json
 import logging
 import multiprocessing
@@ -24,7 +25,8 @@ from zoneinfo import ZoneInfo
 import feedparser
 import pytz
 from feedparser import FeedParserDict
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Index, JSON
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Index, JSON, case, func
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session, relationship
 
@@ -36,6 +38,7 @@ from wrolpi.common import Base, ModelHelper, logger, wrol_mode_check, zig_zag, C
     get_download_info, trim_file_name, get_wrolpi_config, TRACE_LEVEL, normalize_domain
 from wrolpi.dates import TZDateTime, now, Seconds
 from wrolpi.db import get_db_session, get_db_curs
+from wrolpi.db_writer import write
 from wrolpi.errors import InvalidDownload, UnrecoverableDownloadError, BotBlockedDownloadError, UnknownDownload, \
     ValidationError, DownloadError
 from wrolpi.events import Events
@@ -351,10 +354,17 @@ class Download(ModelHelper, Base):  # noqa
 
         raise UnrecoverableDownloadError(f'Cannot find downloader for {repr(str(self.url))}')
 
-    @property
+    @hybrid_property
     def domain(self):
         return urlparse(self.url).netloc
 
+    @domain.expression
+    def domain(cls):
+        # The netloc (like `urlparse`): after the scheme, up to the first '/', '?' or '#'.
+        rest = func.substr(cls.url, func.instr(cls.url, '://') + 3)
+        end = func.min(*(func.instr(rest.concat(char), char) for char in '/?#'))
+        return case([(func.instr(cls.url, '://') == 0, '')], else_=func.substr(rest, 1, end - 1))
+
     def filter_excluded(self, urls: List[str]) -> List[str]:
         """Return any URLs that do not match my excluded_urls."""
         if self.settings and (excluded_urls := self.settings.get('excluded_urls')):
@@ -697,6 +707,9 @@ class DownloadManager:
         # once per cycle (which would bury the useful transitions and rotate them out of the logs).
         self._last_block_reason = '<unset>'
         self._last_window_state = None
+        # True while this process is claiming and dispatching downloads.  A claim is committed by the DB writer, so
+        # another dispatch could claim the same domains before this one adds them to `processing_domains`.
+        self._dispatching = False
 
     def __repr__(self):
         return f'<DownloadManager pid={os.getpid()}>'
@@ -1095,147 +1108,51 @@ class DownloadManager:
                 f'Unable to queue downloads because there are more domains than workers: {domains} >= 4')
             return
 
+        if self._dispatching:
+            # The running dispatch will start what can be started.
+            return
+
         # Find download whose domain isn't already being downloaded.
+        self._dispatching = True
         try:
             await self._dispatch_new_downloads()
         except OperationalError as e:
             if 'locked' in str(e).lower():
-                # Transient SQLite write contention (e.g. the burst of RSS catalog refreshes,
-                # download claims, and config saves right after downloading is enabled at startup).
-                # This dispatch cycle is a no-op; the perpetual worker retries on its next cycle, so
-                # don't raise -- a raised error here floods the logs with tracebacks (and trips the
-                # traceback renderer's "Variable inspector failed" noise) for a self-healing condition.
+                # SQLite write contention which outlasted the DB writer's retries (e.g. another
+                # process writing for longer than `busy_timeout`).  This dispatch cycle is a no-op;
+                # the perpetual worker retries on its next cycle, so don't raise -- a raised error
+                # here floods the logs with tracebacks (and trips the traceback renderer's
+                # "Variable inspector failed" noise) for a self-healing condition.
                 self.log_debug('dispatch_downloads skipped: database is locked (will retry next cycle)')
                 return
             raise
+        finally:
+            self._dispatching = False
 
     async def _dispatch_new_downloads(self):
         """Claim and dispatch the next batch of `new` downloads.  Split out from `dispatch_downloads`
         so a transient "database is locked" can be handled there without retrying the signal
         dispatches inside this transaction.
 
-        This is a read-then-write transaction (it reads the `new` downloads, then claims each by
-        setting `last_download_attempt`), so it must hold the write lock from BEGIN -- which
-        `get_db_session(commit=True)` does."""
-        # Downloads claimed this cycle: dicts of (download_id, download_url, domain).  Two things are
-        # deferred until AFTER the immediate (write) transaction below commits:
-        #   * `_add_processing_domain` — it mutates shared, non-transactional state, so adding it
-        #     before commit would leak the domain forever if the transaction fails (dispatch is then
-        #     skipped and no signal handler ever runs to release it);
-        #   * `api_app.dispatch` — dispatching inside the transaction deadlocks, because the awaited
-        #     `signal_download_download` opens its own write session (also `BEGIN IMMEDIATE`,
-        #     inheriting `_immediate_txn`) and blocks on the write lock this transaction still holds,
-        #     timing out after `busy_timeout` with "database is locked" so no download ever starts.
-        # `claimed` tracks the domains taken this cycle so the loop's own dedup / concurrency cap
-        # still holds even though `processing_domains` is not mutated until after commit.
-        to_dispatch = []
-        claimed = []
-        with get_db_session(commit=True) as session:
-            new_downloads = list(session.query(Download).filter(
-                Download.status == 'new',
-                Download.domain not in self.processing_domains,
-            ).order_by(
-                Download.frequency.is_(None),
-                Download.frequency,
-                Download.id))
-            count = 0
-            download_wait = get_wrolpi_config().download_wait
-            # Daily download limits.  A value of None/0 means unlimited.  Recurring downloads (Channel/RSS
-            # catalog updates) are never gated and never counted; only their non-recurring children and
-            # one-off downloads count.
-            #
-            # This is a best-effort soft cap, not a hard quota.  The count is read from the DB and the slot is
-            # claimed (last_download_attempt set) inside this dispatch transaction.  The steady-state dispatcher
-            # (perpetual_download_worker) is single-process and self-serializing, so it never races itself; but
-            # create_downloads fires a background dispatch_downloads() to "start ASAP", which can overlap this
-            # cycle in another worker and read the same pre-commit count.  At a limit boundary that can leak a
-            # small, bounded overshoot (paced at one download per domain per cycle); it self-corrects the next
-            # cycle once last_download_attempt is committed and visible.  Enforcing a strict cap would require
-            # coordinating the count in shared_ctx with cross-process locking, which is not warranted here.
-            limit_per_domain = get_wrolpi_config().download_daily_limit_per_domain or 0
-            limit_global = get_wrolpi_config().download_daily_limit_global or 0
-            global_count, domain_counts = 0, {}
-            if limit_per_domain or limit_global:
-                global_count, domain_counts = self.daily_download_counts(session)
-            rate_limited_domains = {}  # Track domains we've already checked for rate limiting
-            limits_enabled = bool(limit_per_domain or limit_global)
-            # Diagnostic: per-cycle snapshot + a tally of why due downloads were NOT dispatched.  Only
-            # emitted when there is actually due work, so it is bounded (recurring downloads only
-            # appear here once renewed to `new`).  `processing_domains` is the prime suspect for a
-            # stall: a dispatch that dies without cleanup leaks a slot, blocking that domain (and,
-            # once 4 leak, everything) with no other symptom.
-            skip_reasons: Dict[str, int] = {}
-            if new_downloads:
-                self.log_debug(
-                    f'_dispatch_new_downloads: {len(new_downloads)} new download(s); '
-                    f'processing_domains={list(self.processing_domains)}; '
-                    f'daily global_count={global_count}/{limit_global or "unlimited"}; download_wait={download_wait}s')
-            for download in new_downloads:
-                domain = download.domain
-                is_recurring = download.frequency is not None
-                # Non-recurring downloads with limits enabled are grouped by their normalized domain.
-                limit_domain = self._normalize_download_domain(download) \
-                    if (limits_enabled and not is_recurring) else None
-                if domain not in self.processing_domains and domain not in claimed and (
-                        len(self.processing_domains) + len(claimed)) < SIMULTANEOUS_DOWNLOAD_DOMAINS:
-                    # Daily download limits (recurring downloads bypass the gate entirely).
-                    if limit_domain is not None:
-                        if limit_global and global_count >= limit_global:
-                            # Global daily limit reached; skip all remaining counted downloads this cycle.
-                            skip_reasons['global daily limit'] = skip_reasons.get('global daily limit', 0) + 1
-                            continue
-                        if limit_per_domain and domain_counts.get(limit_domain, 0) >= limit_per_domain:
-                            # This domain hit its daily limit; other domains may still have room.
-                            skip_reasons['per-domain daily limit'] = skip_reasons.get('per-domain daily limit', 0) + 1
-                            continue
-
-                    # Per-domain rate limiting.
-                    if download_wait and download_wait > 0:
-                        try:
-                            last_completed = api_app.shared_ctx.domain_last_download.get(domain, 0)
-                            if last_completed > 0:
-                                elapsed = time.time() - last_completed
-                                if elapsed < download_wait:
-                                    # Track this domain as rate-limited (count pending downloads)
-                                    rate_limited_domains[domain] = rate_limited_domains.get(domain, 0) + 1
-                                    continue  # Skip this domain, try next
-                        except (AttributeError, RuntimeError):
-                            pass  # shared_ctx not initialized
-
-                    # Record the attempt time now (in this committed session) so the next dispatch cycle
-                    # counts it even before the download's signal handler marks it started.
-                    download.last_download_attempt = now()
-                    if limit_domain is not None:
-                        global_count += 1
-                        domain_counts[limit_domain] = domain_counts.get(limit_domain, 0) + 1
-
-                    # Claim now (in the DB via last_download_attempt); the shared processing_domain is
-                    # added and the signal dispatched only after this transaction commits.
-                    claimed.append(domain)
-                    to_dispatch.append(dict(download_id=download.id, download_url=download.url, domain=domain))
-                    count += 1
-                else:
-                    # Domain is already being processed (this cycle or a prior one), or all worker
-                    # slots are in use.  A domain that stays here across many cycles points to a
-                    # leaked processing_domains slot.
-                    reason = 'domain already processing' if (domain in self.processing_domains or domain in claimed) \
-                        else 'all download slots in use'
-                    skip_reasons[reason] = skip_reasons.get(reason, 0) + 1
-            if count:
-                self.log_debug(f'Added {count} downloads to queue.')
-            if skip_reasons:
-                self.log_debug(f'_dispatch_new_downloads skipped {sum(skip_reasons.values())} due download(s): '
-                               f'{skip_reasons}')
-            # Log rate-limited domains once per dispatch cycle.
-            for domain, pending_count in rate_limited_domains.items():
-                try:
-                    last_completed = api_app.shared_ctx.domain_last_download.get(domain, 0)
-                    elapsed = time.time() - last_completed
-                    remaining = download_wait - elapsed
-                    self.log_debug(f'Rate limiting {domain}: {remaining:.1f}s remaining ({pending_count} pending)')
-                except (AttributeError, RuntimeError):
-                    pass
-
+        The claim is committed by the DB writer (see `_claim_new_downloads`).  Two things are
+        deferred until AFTER it commits:
+          * `_add_processing_domain` — it mutates shared, non-transactional state, so adding it
+            before commit would leak the domain forever if the transaction fails (dispatch is then
+            skipped and no signal handler ever runs to release it);
+          * `api_app.dispatch` — dispatching inside the transaction deadlocks, because the awaited
+            `signal_download_download` opens its own write session and blocks on the write lock the
+            claim still holds, timing out after `busy_timeout` with "database is locked" so no
+            download ever starts."""
+        # Read the shared state (a Manager, each read is IPC) and the config before the write transaction.
+        processing_domains = list(self.processing_domains)
+        try:
+            domain_last_download = dict(api_app.shared_ctx.domain_last_download)
+        except (AttributeError, RuntimeError):
+            domain_last_download = dict()  # shared_ctx not initialized
+        config = get_wrolpi_config()
+        to_dispatch = await write(functools.partial(
+            self._claim_new_downloads, processing_domains, domain_last_download, config.download_wait,
+            config.download_daily_limit_per_domain or 0, config.download_daily_limit_global or 0))
         # The immediate (write) transaction has now committed and released the write lock.  Claim the
         # shared processing_domain and dispatch each signal: doing both here (not inside the txn)
         # means a failed transaction leaks nothing, and the handler's write session cannot deadlock
@@ -1244,6 +1161,115 @@ class DownloadManager:
             self._add_processing_domain(context.pop('domain'))
             await api_app.dispatch('wrolpi.download.download', context=context)
 
+    def _claim_new_downloads(self, processing_domains: List[str], domain_last_download: Dict[str, float],
+                             download_wait: int, limit_per_domain: int, limit_global: int, session: Session) \
+            -> List[dict]:
+        """Claim the `new` downloads which can start now by setting their `last_download_attempt`.
+        Returns dicts of (download_id, download_url, domain) to dispatch.
+
+        This is a read-then-write transaction, so it runs in the DB writer (which holds the write
+        lock from BEGIN).  It may be run again if the database is locked, so it only returns what
+        it claimed.  `processing_domains`, `domain_last_download` and the config were read by the
+        caller; nothing but the DB is read while the write lock is held.  `claimed` tracks the
+        domains taken this cycle so the loop's own dedup / concurrency cap still holds even though
+        `processing_domains` is not mutated until after commit."""
+        to_dispatch = []
+        claimed = []
+        query = session.query(Download).filter(Download.status == 'new')
+        if processing_domains:
+            query = query.filter(Download.domain.notin_(processing_domains))
+        new_downloads = list(query.order_by(
+            Download.frequency.is_(None),
+            Download.frequency,
+            Download.id))
+        count = 0
+        # Daily download limits.  A value of None/0 means unlimited.  Recurring downloads (Channel/RSS
+        # catalog updates) are never gated and never counted; only their non-recurring children and
+        # one-off downloads count.
+        #
+        # This is a best-effort soft cap, not a hard quota.  The count is read from the DB and the slot is
+        # claimed (last_download_attempt set) inside this dispatch transaction.  The steady-state dispatcher
+        # (perpetual_download_worker) is single-process and self-serializing, so it never races itself; but
+        # create_downloads fires a background dispatch_downloads() to "start ASAP", which can overlap this
+        # cycle in another worker and read the same pre-commit count.  At a limit boundary that can leak a
+        # small, bounded overshoot (paced at one download per domain per cycle); it self-corrects the next
+        # cycle once last_download_attempt is committed and visible.  Enforcing a strict cap would require
+        # coordinating the count in shared_ctx with cross-process locking, which is not warranted here.
+        global_count, domain_counts = 0, {}
+        if limit_per_domain or limit_global:
+            global_count, domain_counts = self.daily_download_counts(session)
+        rate_limited_domains = {}  # Track domains we've already checked for rate limiting
+        limits_enabled = bool(limit_per_domain or limit_global)
+        # Diagnostic: per-cycle snapshot + a tally of why due downloads were NOT dispatched.  Only
+        # emitted when there is actually due work, so it is bounded (recurring downloads only
+        # appear here once renewed to `new`).  `processing_domains` is the prime suspect for a
+        # stall: a dispatch that dies without cleanup leaks a slot, blocking that domain (and,
+        # once 4 leak, everything) with no other symptom.
+        skip_reasons: Dict[str, int] = {}
+        if new_downloads:
+            self.log_debug(
+                f'_dispatch_new_downloads: {len(new_downloads)} new download(s); '
+                f'processing_domains={processing_domains}; '
+                f'daily global_count={global_count}/{limit_global or "unlimited"}; download_wait={download_wait}s')
+        for download in new_downloads:
+            domain = download.domain
+            is_recurring = download.frequency is not None
+            # Non-recurring downloads with limits enabled are grouped by their normalized domain.
+            limit_domain = self._normalize_download_domain(download) \
+                if (limits_enabled and not is_recurring) else None
+            if domain not in processing_domains and domain not in claimed and (
+                    len(processing_domains) + len(claimed)) < SIMULTANEOUS_DOWNLOAD_DOMAINS:
+                # Daily download limits (recurring downloads bypass the gate entirely).
+                if limit_domain is not None:
+                    if limit_global and global_count >= limit_global:
+                        # Global daily limit reached; skip all remaining counted downloads this cycle.
+                        skip_reasons['global daily limit'] = skip_reasons.get('global daily limit', 0) + 1
+                        continue
+                    if limit_per_domain and domain_counts.get(limit_domain, 0) >= limit_per_domain:
+                        # This domain hit its daily limit; other domains may still have room.
+                        skip_reasons['per-domain daily limit'] = skip_reasons.get('per-domain daily limit', 0) + 1
+                        continue
+
+                # Per-domain rate limiting.
+                if download_wait and download_wait > 0:
+                    last_completed = domain_last_download.get(domain, 0)
+                    if last_completed > 0:
+                        elapsed = time.time() - last_completed
+                        if elapsed < download_wait:
+                            # Track this domain as rate-limited (count pending downloads)
+                            rate_limited_domains[domain] = rate_limited_domains.get(domain, 0) + 1
+                            continue  # Skip this domain, try next
+
+                # Record the attempt time now (in this committed session) so the next dispatch cycle
+                # counts it even before the download's signal handler marks it started.
+                download.last_download_attempt = now()
+                if limit_domain is not None:
+                    global_count += 1
+                    domain_counts[limit_domain] = domain_counts.get(limit_domain, 0) + 1
+
+                # Claim now (in the DB via last_download_attempt); the shared processing_domain is
+                # added and the signal dispatched only after this transaction commits.
+                claimed.append(domain)
+                to_dispatch.append(dict(download_id=download.id, download_url=download.url, domain=domain))
+                count += 1
+            else:
+                # Domain is already being processed (this cycle or a prior one), or all worker
+                # slots are in use.  A domain that stays here across many cycles points to a
+                # leaked processing_domains slot.
+                reason = 'domain already processing' if (domain in processing_domains or domain in claimed) \
+                    else 'all download slots in use'
+                skip_reasons[reason] = skip_reasons.get(reason, 0) + 1
+        if count:
+            self.log_debug(f'Added {count} downloads to queue.')
+        if skip_reasons:
+            self.log_debug(f'_dispatch_new_downloads skipped {sum(skip_reasons.values())} due download(s): '
+                           f'{skip_reasons}')
+        # Log rate-limited domains once per dispatch cycle.
+        for domain, pending_count in rate_limited_domains.items():
+            remaining = download_wait - (time.time() - domain_last_download[domain])
+            self.log_debug(f'Rate limiting {domain}: {remaining:.1f}s remaining ({pending_count} pending)')
+        return to_dispatch
+
     async def do_downloads(self):
         """Schedule any downloads that are new.
 
@@ -2282,6 +2308,8 @@ class DownloadCacheConfigValidator:
 
 
 class DownloadCacheConfig(ConfigFile):
+    """Video durations were cached in this config.  They are now cached by `modules.videos.duration_cache`, which
+    imports them from this config when it is created."""
     file_name = 'download_cache.yaml'
     default_config = dict(
         video_durations=list(),
@@ -2545,30 +2573,33 @@ class RSSDownloader(Downloader):
     async def filter_videos(download: Download, urls: list[str]) -> list[str]:
         """Filter Video URLs by comparing the Download's settings."""
         from modules.videos.downloader import fetch_video_duration
+        from modules.videos.duration_cache import get_video_durations, flush_video_durations
         settings = download.settings or dict()
         urls_before = urls.copy()
         maximum_duration: int = settings.get('maximum_duration')
         minimum_duration: int = settings.get('minimum_duration')
         if maximum_duration or minimum_duration:
             # RSS feeds do not have video duration in the XML, so use a cached function to fetch the duration of the
-            # linked videos for filtering.
+            # linked videos for filtering.  The cached durations of the whole feed are looked up at once.
+            durations = await asyncio.to_thread(get_video_durations, urls)
             new_urls = []
             for url in urls:
-                # `fetch_video_duration` is cached so can be called frequently.
-                try:
-                    if maximum_duration and await fetch_video_duration(url) > maximum_duration:
+                if (duration := durations.get(url)) is None:
+                    try:
+                        # `fetch_video_duration` is cached so can be called frequently.
+                        duration = await fetch_video_duration(url)
+                    except Exception as e:
+                        logger.error(f'Failed to fetch duration: {url}', exc_info=e)
+                    # Sleep between fetches to prevent rate limiting.
+                    await asyncio.sleep(random.randint(1, 3))
+                if duration is not None:
+                    if maximum_duration and duration > maximum_duration:
                         continue
-                except Exception as e:
-                    logger.error(f'Failed to fetch duration: {url}', exc_info=e)
-                try:
-                    if minimum_duration and await fetch_video_duration(url) < minimum_duration:
+                    if minimum_duration and duration < minimum_duration:
                         continue
-                except Exception as e:
-                    logger.error(f'Failed to fetch duration: {url}', exc_info=e)
                 # Download videos even if we fail to fetch their duration.
                 new_urls.append(url)
-                # Sleep between fetches to prevent rate limiting.
-                await asyncio.sleep(random.randint(1, 3))
+            await asyncio.to_thread(flush_video_durations)
             urls = new_urls
             if urls_before != urls:
                 logger.info(f'Filtered videos using min/maximum_duration from {len(urls_before)} to {len(urls)}')
@@ -39,6 +39,12 @@ class InvalidOrderBy(ValidationError):
     status_code = HTTPStatus.BAD_REQUEST
 
 
+class InvalidCursor(ValidationError):
+    code = 'INVALID_CURSOR'
+    summary = 'The pagination cursor is invalid or belongs to a different order'
+    status_code = HTTPStatus.BAD_REQUEST
+
+
 class WROLModeEnabled(APIError):
     code = 'WROL_MODE_ENABLED'
     summary = 'This method is disabled while WROL Mode is enabled.'
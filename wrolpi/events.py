@@ -1,6 +1,10 @@
-__all__ = ['Events', 'get_events']
+__all__ = ['Events', 'get_events', 'EventRing', 'get_event_ring', 'new_event_ring']
 
+import ctypes
+import json
+import multiprocessing
 from datetime import datetime
+from typing import List
 
 from wrolpi.common import logger, iterify
 from wrolpi.dates import now
@@ -8,6 +12,108 @@ from wrolpi.dates import now
 logger = logger.getChild(__name__)
 
 HISTORY_SIZE = 100
+# The most bytes of one (JSON encoded) event; longer events are truncated.
+EVENT_SLOT_SIZE = 4096
+# The values of an event which are truncated (or dropped) until it fits its slot.
+EVENT_TRUNCATED_KEYS = ('message', 'url', 'subject', 'action', 'event')
+
+
+def new_event_ring(size: int = HISTORY_SIZE) -> tuple:
+    """Allocate the shared memory of an `EventRing` (see `attach_shared_contexts`): its lock, its latest sequence
+    number, the sequence number of each slot, and the slots."""
+    return (
+        multiprocessing.Lock(),
+        multiprocessing.RawValue(ctypes.c_uint64, 0),
+        multiprocessing.RawArray(ctypes.c_uint64, size),
+        multiprocessing.RawArray(ctypes.c_char, size * EVENT_SLOT_SIZE),
+    )
+
+
+class EventRing:
+    """The most recent events, in a fixed-size ring buffer of shared memory.
+
+    Every event is numbered by a sequence number which only increases (until the server is restarted).  Readers keep
+    the sequence number of the last event they have read, and read only the events after it; reading the latest
+    sequence number (to find there is nothing new) needs no lock.  Sending and reading never talk to the
+    multiprocessing manager."""
+
+    def __init__(self, lock, sequence, slot_sequences, slots):
+        self._lock = lock
+        self._sequence = sequence
+        self._slot_sequences = slot_sequences
+        self._slots = slots
+        self.size = len(slot_sequences)
+
+    @property
+    def sequence(self) -> int:
+        """The sequence number of the latest event (0 when there are no events)."""
+        return self._sequence.value
+
+    def append(self, event: dict) -> int:
+        """Add `event`, overwriting the oldest when the ring is full.  Returns the sequence number of `event`.
+
+        The `dt` of the event is set here, so the events are in time order."""
+        with self._lock:
+            # All events will be in time order, they should never be at the exact same time.
+            data = _encode_event(dict(event, dt=now()))
+            sequence = self._sequence.value + 1
+            idx = sequence % self.size
+            offset = idx * EVENT_SLOT_SIZE
+            self._slot_sequences[idx] = sequence
+            self._slots[offset:offset + EVENT_SLOT_SIZE] = data.ljust(EVENT_SLOT_SIZE, b'\0')
+            self._sequence.value = sequence
+        return sequence
+
+    def read(self, after: int = 0) -> List[dict]:
+        """Get the events after the sequence number `after`, oldest first.  Each event has its `seq`."""
+        latest = self._sequence.value
+        if latest <= after:
+            return []
+
+        first = max(after + 1, latest - self.size + 1)
+        data = []
+        with self._lock:
+            for sequence in range(first, self._sequence.value + 1):
+                idx = sequence % self.size
+                if self._slot_sequences[idx] == sequence:
+                    offset = idx * EVENT_SLOT_SIZE
+                    data.append((sequence, self._slots[offset:offset + EVENT_SLOT_SIZE]))
+        return [_decode_event(sequence, i) for sequence, i in data]
+
+    def clear(self):
+        """Forget all events.  The sequence continues, so readers do not miss the events which follow."""
+        with self._lock:
+            for idx in range(self.size):
+                self._slot_sequences[idx] = 0
+
+
+def _encode_event(event: dict) -> bytes:
+    event['dt'] = event['dt'].isoformat()
+    data = json.dumps(event, separators=(',', ':')).encode()
+    strings = [i for i in EVENT_TRUNCATED_KEYS if isinstance(event.get(i), str)]
+    # The longest value is cut first.
+    for key in sorted(strings, key=lambda i: len(event[i]), reverse=True):
+        if len(data) <= EVENT_SLOT_SIZE:
+            break
+        value = event[key]
+        # Every character removed shortens the JSON by at least one byte, so one cut is enough; a value which is
+        # shorter than the cut is dropped.
+        keep = len(value) - (len(data) - EVENT_SLOT_SIZE) - len('...')
+        event[key] = value[:keep] + '...' if keep > 0 else None
+        data = json.dumps(event, separators=(',', ':')).encode()
+    return data
+
+
+def _decode_event(sequence: int, data: bytes) -> dict:
+    event = json.loads(data.rstrip(b'\0'))
+    event['dt'] = datetime.fromisoformat(event['dt'])
+    event['seq'] = sequence
+    return event
+
+
+def get_event_ring() -> EventRing:
+    from wrolpi.api_utils import api_app
+    return EventRing(*api_app.shared_ctx.events)
 
 
 class Events:
@@ -141,39 +247,28 @@ def log_event(event: str, message: str = None, action: str = None, subject: str
 
 
 def send_event(event: str, message: str = None, action: str = None, subject: str = None, url: str = None):
-    from wrolpi.api_utils import api_app
-    api_app.shared_ctx.events_lock.acquire()
+    e = dict(
+        action=action,
+        event=event,
+        message=message,
+        subject=subject,
+        url=url,
+    )
     try:
-        # All events will be in time order, they should never be at the exact same time.
-        dt = now()
-
-        e = dict(
-            action=action,
-            dt=dt,
-            event=event,
-            message=message,
-            subject=subject,
-            url=url,
-        )
-        api_app.shared_ctx.events_history.append(e)
-
-        # Keep events below limit.
-        while len(api_app.shared_ctx.events_history) > HISTORY_SIZE:
-            api_app.shared_ctx.events_history.pop(0)
-    finally:
-        api_app.shared_ctx.events_lock.release()
+        get_event_ring().append(e)
+    except Exception as e_:
+        # An event is a notification, it should never break the caller.
+        logger.error(f'Failed to send event {event}', exc_info=e_)
 
     log_event(event, message, action, subject)
 
 
 @iterify(list)
-def get_events(after: datetime = None):
-    from wrolpi.api_utils import api_app
-    events_history = api_app.shared_ctx.events_history
-    if not after:
-        events = [i for i in events_history]
-    else:
-        events = [i for i in events_history if i['dt'] > after]
+def get_events(after: datetime = None, after_seq: int = None):
+    """Get the events after the datetime `after`, or after the sequence number `after_seq`, most recent first."""
+    events = get_event_ring().read(after_seq or 0)
+    if after:
+        events = [i for i in events if i['dt'] > after]
 
     # Most recent first.
     return events[::-1]
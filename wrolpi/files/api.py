@@ -1,5 +1,7 @@
+import asyncio
 import pathlib
 from http import HTTPStatus
+from typing import Optional, Tuple
 
 import sanic.request
 import sanic.request
@@ -117,7 +119,8 @@ async def delete_file_groups(request: Request, body: schema.DeleteFileGroupsRequ
 async def refresh(request: Request):
     from wrolpi.files.worker import file_worker
 
-    if request.body:
+    fast = bool(request.json.get('fast')) if request.body else False
+    if request.body and request.json.get('paths') is not None:
         media_directory = get_media_directory()
         if not isinstance(request.json['paths'], list):
             raise ValueError('Can only refresh a list')
@@ -129,7 +132,7 @@ async def refresh(request: Request):
         paths = [get_media_directory()]
         expand_stems = True
 
-    file_worker.queue_refresh(paths, expand_stems=expand_stems)
+    file_worker.queue_refresh(paths, expand_stems=expand_stems, fast=fast)
     return response.empty()
 
 
@@ -155,6 +158,17 @@ async def worker_status(request: Request):
     ))
 
 
+@files_bp.get('/index_cache')
+@openapi.definition(
+    summary='Get the statistics of the cache of text extracted from files'
+)
+async def index_cache_stats(request: Request):
+    from wrolpi.files.index_cache import get_index_cache_stats
+    return json_response(dict(
+        stats=get_index_cache_stats(),
+    ))
+
+
 @files_bp.post('/search')
 @openapi.definition(
     summary='Search Files',
@@ -165,8 +179,13 @@ async def post_search_files(_: Request, body: schema.FilesSearchRequest):
     with timer('Searching all files', 'info', logger__=logger):
         file_groups, total = lib.search_files(body.search_str, body.limit, body.offset, body.mimetypes, body.model,
                                               body.tag_names, body.headline, body.months, body.from_year, body.to_year,
-                                              body.any_tag, body.order, body.url, body.suffix, body.path, body.deep)
-    return json_response(dict(file_groups=file_groups, totals=dict(file_groups=total)))
+                                              body.any_tag, body.order, body.url, body.suffix, body.path, body.deep,
+                                              body.estimate, body.cursor)
+    # An estimated total is a lower bound when counting stopped at the limit.
+    estimated = body.estimate and total >= lib.get_search_total_estimate_limit(body.limit, body.offset)
+    return json_response(dict(file_groups=file_groups, totals=dict(file_groups=total),
+                              estimated_totals=dict(file_groups=estimated),
+                              next_cursor=lib.search_page_next_cursor(file_groups, body.limit)))
 
 
 @files_bp.post('/directories')
@@ -580,9 +599,55 @@ async def get_archive_download(request: Request):
     if not archive_path or not member:
         raise InvalidFile('path and member query parameters are required')
     path = get_media_directory() / archive_path
-    file_bytes, content_type, filename = lib.stream_archive_member(path, member)
-    return response.raw(
-        file_bytes,
-        content_type=content_type,
-        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
-    )
+    member = lib.stream_archive_member(path, member)
+
+    headers = {
+        'Content-Disposition': f'attachment; filename="{member.filename}"',
+        'Accept-Ranges': 'bytes' if member.seekable else 'none',
+    }
+    status, start, end = HTTPStatus.OK, 0, member.size
+    if member.seekable and (range_header := request.headers.get('Range')):
+        try:
+            byte_range = _parse_byte_range(range_header, member.size)
+        except ValueError:
+            return response.empty(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE,
+                                  headers={'Content-Range': f'bytes */{member.size}'})
+        if byte_range:
+            status, (start, end) = HTTPStatus.PARTIAL_CONTENT, byte_range
+            headers['Content-Range'] = f'bytes {start}-{end - 1}/{member.size}'
+    if end is not None:
+        headers['Content-Length'] = str(end - start)
+
+    # The member is read in a thread, one chunk at a time; a large member is never entirely in memory.  The first
+    # chunk is read before responding so an unreadable member is still reported as an error.
+    chunks = member.chunks(start, end)
+    chunk = await asyncio.to_thread(next, chunks, None)
+    stream = await request.respond(status=status, content_type=member.content_type, headers=headers)
+    try:
+        while chunk:
+            await stream.send(chunk)
+            chunk = await asyncio.to_thread(next, chunks, None)
+    finally:
+        chunks.close()
+    await stream.eof()
+
+
+def _parse_byte_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Get the [start, end) of the byte range of a Range header.  Returns None if the header should be ignored (it
+    is malformed, or requests several ranges); raises ValueError if the range cannot be satisfied."""
+    unit, _, byte_range = range_header.partition('=')
+    first, _, last = byte_range.strip().partition('-')
+    if unit.strip() != 'bytes' or ',' in byte_range or not (first or last):
+        return None
+    try:
+        if first:
+            start, end = int(first), min(int(last) + 1, size) if last else size
+            if last and int(last) < start:
+                return None
+        else:
+            start, end = max(size - int(last), 0), size
+    except ValueError:
+        return None
+    if start >= size or start >= end:
+        raise ValueError(f'Range {range_header} cannot be satisfied')
+    return start, end
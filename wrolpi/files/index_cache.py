@@ -0,0 +1,275 @@
+"""A persistent cache of what was extracted from files (indexer texts, modeler metadata), keyed by file contents.
+
+Extracting text from HTML/PDF/EPUB is the slowest part of a refresh.  A FileGroup is extracted again when a refresh
+finds it modified, or when the DB is rebuilt (e.g. from the configs after a reset), even though its bytes are
+usually identical.  An entry is keyed by (kind, file name, size, mtime, fast content hash); an unchanged file is a
+cache hit after a DB reset or a move.  The file name is part of the key because the indexers also index the words of
+the file name.
+
+The cache is a separate SQLite file beside the DB (`<media directory>/config/index_cache.db`) so it survives a DB
+reset.  It is bounded by bytes; the least recently used entries are evicted.
+
+Each process keeps one connection to the cache.  Lookups only read (no write lock is taken); new entries, access
+times and stats are kept in memory and written in one transaction every `INDEX_CACHE_FLUSH_SIZE` entries (or
+`INDEX_CACHE_FLUSH_BYTES`), or when `flush_index_cache` is called.
+"""
+import collections
+import contextlib
+import hashlib
+import json
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Generator, Hashable, Optional, Tuple
+
+from wrolpi.common import logger, get_media_directory
+
+logger = logger.getChild(__name__)
+
+__all__ = ['CacheKey', 'get_cache_key', 'get_cached', 'get_many_cached', 'put_cached', 'put_many_cached',
+           'flush_index_cache', 'get_index_cache_stats', 'INDEX_CACHE_MAX_BYTES']
+
+# The cache is trimmed to 90% of this size when it grows past it.
+INDEX_CACHE_MAX_BYTES = 256 * 1024 ** 2
+# Bytes read from each end of a file for its content hash.
+CONTENT_HASH_CHUNK_SIZE = 64 * 1024
+# New entries (and access times) kept in memory before they are written, and the most bytes of new entries.
+INDEX_CACHE_FLUSH_SIZE = 100
+INDEX_CACHE_FLUSH_BYTES = 8 * 1024 ** 2
+
+# (kind, name, size, mtime, content hash)
+CacheKey = Tuple[str, str, int, float, str]
+
+_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS index_cache (
+        kind         TEXT    NOT NULL,
+        name         TEXT    NOT NULL,
+        size         INTEGER NOT NULL,
+        mtime        REAL    NOT NULL,
+        content_hash TEXT    NOT NULL,
+        value        TEXT    NOT NULL,
+        bytes        INTEGER NOT NULL,
+        accessed     REAL    NOT NULL,
+        PRIMARY KEY (kind, name, size, mtime, content_hash)
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS index_cache_accessed_idx ON index_cache (accessed)',
+    'CREATE TABLE IF NOT EXISTS index_cache_stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)',
+]
+
+
+def get_index_cache_file() -> pathlib.Path:
+    return get_media_directory() / 'config' / 'index_cache.db'
+
+
+# The connection of this process to the cache, and what has not been written to it yet.
+_connection: Optional[Tuple[pathlib.Path, sqlite3.Connection]] = None
+_pending_puts: Dict[CacheKey, str] = dict()
+_pending_accessed: Dict[CacheKey, float] = dict()
+_pending_stats = collections.Counter()
+# Held while the connection or the pending entries are used; the keys of a batch are computed in other threads.
+_lock = threading.RLock()
+
+
+def _reset_after_fork():
+    """A forked child must not use the connection (or the lock) of its parent."""
+    global _connection, _pending_puts, _pending_accessed, _pending_stats, _lock
+    _connection, _pending_puts, _pending_accessed = None, dict(), dict()
+    _pending_stats = collections.Counter()
+    _lock = threading.RLock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _get_connection() -> sqlite3.Connection:
+    """The connection of this process to the cache (`_lock` must be held).  The media directory changes only in
+    tests; what is pending for the previous cache is dropped with its connection."""
+    from wrolpi.db import _configure_sqlite_connection
+
+    global _connection
+    path = get_index_cache_file()
+    if _connection and _connection[0] == path:
+        return _connection[1]
+    if _connection:
+        _connection[1].close()
+        _connection = None
+        _pending_puts.clear()
+        _pending_accessed.clear()
+        _pending_stats.clear()
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    _configure_sqlite_connection(conn)
+    for statement in _SCHEMA:
+        conn.execute(statement)
+    _connection = (path, conn)
+    return conn
+
+
+@contextlib.contextmanager
+def _write_curs(conn: sqlite3.Connection) -> Generator[sqlite3.Cursor, None, None]:
+    """Everything executed is committed as one transaction."""
+    curs = conn.cursor()
+    curs.execute('BEGIN IMMEDIATE')
+    try:
+        yield curs
+    except BaseException:
+        curs.execute('ROLLBACK')
+        raise
+    curs.execute('COMMIT')
+
+
+def fast_content_hash(path: pathlib.Path, size: int) -> str:
+    """Hash the size and the first and last `CONTENT_HASH_CHUNK_SIZE` bytes of a file.
+
+    This reads at most 128KiB no matter how large the file is."""
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with path.open('rb') as fh:
+        digest.update(fh.read(CONTENT_HASH_CHUNK_SIZE))
+        if size > CONTENT_HASH_CHUNK_SIZE * 2:
+            fh.seek(-CONTENT_HASH_CHUNK_SIZE, 2)
+            digest.update(fh.read(CONTENT_HASH_CHUNK_SIZE))
+        elif size > CONTENT_HASH_CHUNK_SIZE:
+            digest.update(fh.read())
+    return digest.hexdigest()
+
+
+def get_cache_key(kind: str, path: pathlib.Path) -> Optional[CacheKey]:
+    """Get the cache key of a file, or None if the file cannot be read."""
+    path = pathlib.Path(path)
+    try:
+        stat = path.stat()
+        return kind, path.name, stat.st_size, stat.st_mtime, fast_content_hash(path, stat.st_size)
+    except OSError as e:
+        logger.debug(f'Cannot get cache key of {path}: {e}')
+        return None
+
+
+def _increment_stats(curs: sqlite3.Cursor, counts: Dict[str, int]):
+    for name, count in counts.items():
+        if count:
+            curs.execute('INSERT INTO index_cache_stats (name, value) VALUES (?, ?)'
+                         ' ON CONFLICT (name) DO UPDATE SET value = value + EXCLUDED.value', (name, count))
+
+
+def get_many_cached(keys: Dict[Hashable, Optional[CacheKey]]) -> Dict[Hashable, Any]:
+    """Get the cached values of `keys` ({id: key}); returns {id: value} of the hits.  Keys which are None are
+    skipped.
+
+    This only reads; the access times of the hits are written later (see `flush_index_cache`)."""
+    keys = {i: key for i, key in keys.items() if key is not None}
+    if not keys:
+        return dict()
+
+    hits = dict()
+    now_ = time.time()
+    with _lock:
+        curs = _get_connection().cursor()
+        for i, key in keys.items():
+            if (value := _pending_puts.get(key)) is None:
+                row = curs.execute('SELECT value FROM index_cache'
+                                   ' WHERE kind = ? AND name = ? AND size = ? AND mtime = ? AND content_hash = ?',
+                                   key).fetchone()
+                value = row[0] if row else None
+            if value is not None:
+                hits[i] = json.loads(value)
+                _pending_accessed[key] = now_
+        _pending_stats.update(hits=len(hits), misses=len(keys) - len(hits))
+        if len(_pending_accessed) >= INDEX_CACHE_FLUSH_SIZE:
+            _write_pending(_get_connection())
+    return hits
+
+
+def get_cached(key: Optional[CacheKey]) -> Optional[Any]:
+    """Get the cached value of `key`, or None."""
+    return get_many_cached({0: key}).get(0)
+
+
+def put_many_cached(items: Dict[CacheKey, Any]):
+    """Store the JSON-serializable values of `items` ({key: value}).  They are written (and the least recently used
+    entries are evicted if the cache is too large) with the next entries, or by `flush_index_cache`."""
+    items = {key: json.dumps(value) for key, value in items.items() if key is not None}
+    if not items:
+        return
+
+    with _lock:
+        conn = _get_connection()
+        _pending_puts.update(items)
+        if len(_pending_puts) >= INDEX_CACHE_FLUSH_SIZE \
+                or sum(map(len, _pending_puts.values())) >= INDEX_CACHE_FLUSH_BYTES:
+            _write_pending(conn)
+
+
+def put_cached(key: Optional[CacheKey], value: Any):
+    put_many_cached({key: value})
+
+
+def _write_pending(conn: sqlite3.Connection):
+    """Write the pending entries, access times and stats in one transaction (`_lock` must be held)."""
+    if not (_pending_puts or _pending_accessed or _pending_stats):
+        return
+
+    now_ = time.time()
+    with _write_curs(conn) as curs:
+        curs.executemany(
+            'INSERT INTO index_cache (kind, name, size, mtime, content_hash, value, bytes, accessed)'
+            ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)'
+            ' ON CONFLICT (kind, name, size, mtime, content_hash)'
+            ' DO UPDATE SET value = EXCLUDED.value, bytes = EXCLUDED.bytes, accessed = EXCLUDED.accessed',
+            [(*key, value, len(value.encode()), now_) for key, value in _pending_puts.items()])
+        curs.executemany('UPDATE index_cache SET accessed = MAX(accessed, ?)'
+                         ' WHERE kind = ? AND name = ? AND size = ? AND mtime = ? AND content_hash = ?',
+                         [(accessed, *key) for key, accessed in _pending_accessed.items()])
+        _increment_stats(curs, _pending_stats)
+        if _pending_puts:
+            _evict(curs)
+    _pending_puts.clear()
+    _pending_accessed.clear()
+    _pending_stats.clear()
+
+
+def flush_index_cache():
+    """Write what is pending in this process to the cache."""
+    with _lock:
+        if _pending_puts or _pending_accessed or _pending_stats:
+            _write_pending(_get_connection())
+
+
+def _evict(curs: sqlite3.Cursor, max_bytes: int = None):
+    """Delete the least recently used entries until the cache is 90% of `max_bytes`, if it is larger than that."""
+    max_bytes = max_bytes or INDEX_CACHE_MAX_BYTES
+    total_bytes = curs.execute('SELECT COALESCE(SUM(bytes), 0) FROM index_cache').fetchone()[0]
+    if total_bytes <= max_bytes:
+        return
+
+    # Keep the most recently used entries which fit.
+    curs.execute('''
+        DELETE FROM index_cache WHERE rowid IN (
+            SELECT rowid FROM (
+                SELECT rowid, SUM(bytes) OVER (ORDER BY accessed DESC, rowid DESC) AS newer_bytes FROM index_cache
+            ) WHERE newer_bytes > ?
+        )
+    ''', (int(max_bytes * 0.9),))
+    logger.info(f'Evicted {curs.rowcount} entries from the index cache ({total_bytes} bytes)')
+    _increment_stats(curs, dict(evictions=curs.rowcount))
+
+
+def get_index_cache_stats() -> dict:
+    with _lock:
+        conn = _get_connection()
+        _write_pending(conn)
+        curs = conn.cursor()
+        entries, total_bytes = curs.execute('SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM index_cache').fetchone()
+        stats = dict(curs.execute('SELECT name, value FROM index_cache_stats').fetchall())
+    return dict(
+        entries=entries,
+        bytes=total_bytes,
+        max_bytes=INDEX_CACHE_MAX_BYTES,
+        hits=stats.get('hits', 0),
+        misses=stats.get('misses', 0),
+        evictions=stats.get('evictions', 0),
+    )
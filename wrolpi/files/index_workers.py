@@ -0,0 +1,121 @@
+"""Extract the texts of files (see `wrolpi.files.indexers`) in worker processes.
+
+Parsing HTML/DOCX/EPUB holds the GIL and can take seconds, so `apply_indexers` sends files to `indexer_workers` of
+these processes.  A worker is not forked from the Sanic worker: that is a daemonic process (which multiprocessing
+refuses to start children from), and forking a process which runs threads can deadlock the child on a lock held by
+another thread.  Each worker is a new interpreter, `python -m wrolpi.files.index_workers`, started only when a file
+must be indexed.
+
+A worker reads one JSON line for each file from stdin, `[id, primary_path, mimetype, title]`, and writes one JSON line
+of the result of `_index_file_group` to stdout, `[id, title, a_text, b_text, c_text, d_text]`, or `{"error": ...}`.
+It exits at the end of stdin.
+"""
+import asyncio
+import contextlib
+import json
+import os
+import pathlib
+import sys
+from typing import List, Optional, Tuple
+
+from wrolpi.common import logger
+from wrolpi.vars import PROJECT_DIR
+
+logger = logger.getChild(__name__)
+
+__all__ = ['IndexWorkers', 'IndexWorkerDied']
+
+# The longest line (the texts of one file) which can be read from a worker.
+INDEX_WORKER_LINE_LIMIT = 1024 ** 3
+
+
+class IndexWorkerDied(Exception):
+    pass
+
+
+class IndexWorkers:
+    """A pool of at most `workers` index worker processes, used with `async with`.  Workers are started when they
+    are first needed, and are stopped when the block exits."""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._idle: Optional[asyncio.Queue] = None
+        self._processes: List[asyncio.subprocess.Process] = []
+
+    async def __aenter__(self) -> 'IndexWorkers':
+        self._idle = asyncio.Queue()
+        for _ in range(self.workers):
+            # None is a worker which has not been started.
+            self._idle.put_nowait(None)
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        for process in self._processes:
+            if process.returncode is not None:
+                continue
+            if exc_type:
+                # Cancelled (or failed): do not wait on the files being indexed.
+                with contextlib.suppress(ProcessLookupError):
+                    process.kill()
+            else:
+                process.stdin.close()
+                await process.wait()
+        self._processes = []
+
+    async def _start_worker(self) -> asyncio.subprocess.Process:
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, '-m', 'wrolpi.files.index_workers',
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, cwd=PROJECT_DIR,
+            limit=INDEX_WORKER_LINE_LIMIT,
+        )
+        self._processes.append(process)
+        return process
+
+    async def index(self, fg_id: int, primary_path: pathlib.Path, mimetype: str, title: str) -> Tuple:
+        """Index one file in the next idle worker; returns what `_index_file_group` returns."""
+        process = await self._idle.get()
+        try:
+            if process is None or process.returncode is not None:
+                process = await self._start_worker()
+            process.stdin.write(json.dumps([fg_id, str(primary_path), mimetype, title]).encode() + b'\n')
+            await process.stdin.drain()
+            line = await process.stdout.readline()
+            if not line:
+                returncode = await process.wait()
+                raise IndexWorkerDied(f'Index worker exited with {returncode}')
+        except BaseException:
+            # The worker may have been interrupted between a file and its result; it cannot be used again.
+            if process is not None and process.returncode is None:
+                with contextlib.suppress(ProcessLookupError):
+                    process.kill()
+            self._idle.put_nowait(None)
+            raise
+        self._idle.put_nowait(process)
+
+        result = json.loads(line)
+        if isinstance(result, dict):
+            raise RuntimeError(result['error'])
+        return tuple(result)
+
+
+def main():
+    # Anything printed by the indexers goes to stderr; stdout is only for results.
+    results = os.fdopen(os.dup(sys.stdout.fileno()), 'w')
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    # Only the indexers are needed, not the API (and every module) of the Sanic workers.
+    from wrolpi.files.lib import _index_file_group
+
+    for line in sys.stdin:
+        fg_id, primary_path, mimetype, title = json.loads(line)
+        try:
+            result = _index_file_group(fg_id, pathlib.Path(primary_path), mimetype, title)
+        except Exception as e:
+            logger.error(f'Failed to index {primary_path}', exc_info=e)
+            result = dict(error=f'{type(e).__name__}: {e}')
+        results.write(json.dumps(result) + '\n')
+        results.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,21 +1,26 @@
 import asyncio
+import bz2
 import dataclasses
 import datetime
 import functools
 import glob
+import gzip
 import json
+import lzma
 import mimetypes
 import os
 import pathlib
 import re
 import shutil
+import struct
 import subprocess
 import tarfile
+import threading
 import urllib.parse
 import zipfile
-from itertools import zip_longest
+import zlib
 from pathlib import Path
-from typing import Callable, List, Tuple, Union, Dict, Generator, Iterable, Set
+from typing import Callable, List, Tuple, Union, Dict, Generator, Iterable, Set, Optional
 
 import cachetools.func
 from sqlalchemy import asc, or_, text as sa_text
@@ -30,13 +35,17 @@ from wrolpi.common import get_media_directory, wrol_mode_check, logger, \
     get_wrolpi_config, \
     unique_by_predicate, get_paths_in_media_directory, TRACE_LEVEL, get_relative_to_media_directory, strip_surrogates
 from wrolpi.dates import now, from_timestamp, months_selector_to_where, date_range_to_where
-from wrolpi.db import get_db_session, get_db_curs, values_clause
+from wrolpi.db import get_db_session, get_db_curs, values_clause, bump_search_generation
+from wrolpi.db_writer import submit_write
 from wrolpi.downloader import download_manager, Download
 from wrolpi.errors import InvalidFile, UnknownDirectory, UnknownFile, UnknownTag, FileConflict, FileGroupIsTagged, \
     NoPrimaryFile, InvalidDirectory, IgnoredDirectoryError, UnsupportedArchive, InvalidArchiveMember
 from wrolpi.events import Events
+from wrolpi.files import indexers, index_cache
+from wrolpi.files.index_workers import IndexWorkers, IndexWorkerDied
 from wrolpi.files.models import FileGroup, Directory
 from wrolpi.lang import ISO_639_CODES, ISO_3166_CODES
+from wrolpi.pagination import Keyset
 from wrolpi.tags import TagFile, Tag, tag_append_sub_select_where, save_tags_config, sync_tags_directory
 from wrolpi.vars import PYTEST, IS_MACOS
 
@@ -56,17 +65,8 @@ __all__ = ['list_directories_contents', 'delete', 'split_path_stem_and_suffix',
            'search_file_suggestion_count', 'glob_shared_stem', 'upsert_file', 'get_unique_files_by_stem',
            'rename', 'delete_directory', 'handle_file_group_search_results', 'get_file_location_href',
            'get_tagged_file_groups_by_ids', 'delete_file_groups', 'get_special_directories',
-           'get_normalized_ignored_directories', 'sanitize_ignored_directories']
-
-
-def get_file_tag_names(session: Session, file: pathlib.Path) -> List[str]:
-    """Returns all Tag names for the provided file path."""
-    tags = session.query(Tag) \
-        .join(TagFile, Tag.id == TagFile.tag_id) \
-        .join(FileGroup, FileGroup.id == TagFile.file_group_id) \
-        .filter(FileGroup.primary_path == str(file))
-    names = sorted([tag.name for tag in tags], key=lambda i: i.lower())
-    return names
+           'get_normalized_ignored_directories', 'sanitize_ignored_directories', 'invalidate_search_total_cache',
+           'get_search_total', 'search_page_next_cursor', 'hydrate_file_group_search_results']
 
 
 def sanitize_filename_surrogates(path: pathlib.Path) -> pathlib.Path:
@@ -111,22 +111,77 @@ def sanitize_filename_surrogates(path: pathlib.Path) -> pathlib.Path:
     return path
 
 
-def _get_file_dict(session: Session, file: pathlib.Path) -> Dict:
+# `file_group_file.mtime` comes from the stored `modification_datetime`, which is accurate to about a millisecond.
+STORED_MTIME_TOLERANCE = 0.002
+
+
+def _get_stored_files_info(session: Session, directory: pathlib.Path, files: List[pathlib.Path]) \
+        -> Tuple[Dict[str, Tuple[int, float, str]], Dict[str, List[str]]]:
+    """Read what the DB knows about the files of a directory, with one query each.
+
+    Returns the stored (size, mtime, mimetype) of each refreshed file by its name, and the Tag names of each primary
+    file by its path."""
+    stored = dict()
+    rows = session.execute(sa_text('''
+        SELECT fgf.filename, fgf.size, fgf.mtime, fgf.mimetype
+        FROM file_group fg
+        JOIN file_group_file fgf ON fgf.file_group_id = fg.id
+        WHERE fg.directory = :directory
+    '''), dict(directory=str(directory)))
+    for filename, size, mtime, mimetype in rows:
+        # Old FileGroups stored the absolute paths of their files.
+        stored[filename.rsplit('/', 1)[-1]] = (size, mtime, mimetype)
+
+    tag_names = dict()
+    rows = session.execute(sa_text('''
+        SELECT fg.primary_path, t.name
+        FROM file_group fg
+        JOIN tag_file tf ON tf.file_group_id = fg.id
+        JOIN tag t ON t.id = tf.tag_id
+        WHERE fg.primary_path IN (SELECT value FROM json_each(:paths))
+    '''), dict(paths=json.dumps([str(i) for i in files])))
+    for primary_path, name in rows:
+        tag_names.setdefault(primary_path, list()).append(name)
+    return stored, tag_names
+
+
+def _get_file_dicts(session: Session, files: List[pathlib.Path]) -> Dict[pathlib.Path, Dict]:
+    """Get the dicts of many files (see `_get_file_dict`).
+
+    The Tags, and the mimetypes of the files which have not changed since they were refreshed, are read from the DB
+    with two queries for each directory.  Only the mimetypes of the other files are read from the files."""
     media_directory = get_media_directory()
-    try:
-        size = file.stat().st_size
-    except PermissionError:
-        size = None
-    try:
-        mimetype = get_mimetype(file)
-    except PermissionError:
-        mimetype = None
-    return dict(
-        path=file.relative_to(media_directory),
-        size=size,
-        mimetype=mimetype,
-        tags=get_file_tag_names(session, file),
-    )
+    by_directory = dict()
+    for file in files:
+        by_directory.setdefault(file.parent, list()).append(file)
+
+    file_dicts = dict()
+    for directory, directory_files in by_directory.items():
+        stored, tag_names = _get_stored_files_info(session, directory, directory_files)
+        for file in directory_files:
+            try:
+                stat = file.stat()
+            except PermissionError:
+                stat = None
+            stored_size, stored_mtime, mimetype = stored.get(file.name, (None, None, None))
+            if not stat or not mimetype or stored_size != stat.st_size or stored_mtime is None \
+                    or abs(stored_mtime - stat.st_mtime) > STORED_MTIME_TOLERANCE:
+                # The file is unknown, or changed since it was refreshed.
+                try:
+                    mimetype = get_mimetype(file)
+                except PermissionError:
+                    mimetype = None
+            file_dicts[file] = dict(
+                path=file.relative_to(media_directory),
+                size=stat.st_size if stat else None,
+                mimetype=mimetype,
+                tags=sorted(tag_names.get(str(file), list()), key=lambda i: i.lower()),
+            )
+    return file_dicts
+
+
+def _get_file_dict(session: Session, file: pathlib.Path) -> Dict:
+    return _get_file_dicts(session, [file])[file]
 
 
 def get_file_dict(session: Session, file: str) -> Dict:
@@ -174,6 +229,7 @@ def _get_recursive_directory_dict(session: Session, directory: pathlib.Path, dir
 
     if directory in directories:
         children = dict()
+        files = list()
         for path in directory.iterdir():
             if not path.is_dir() and path.name in HIDDEN_FILES:
                 # Never show ignored files.
@@ -183,7 +239,10 @@ def _get_recursive_directory_dict(session: Session, directory: pathlib.Path, dir
             elif path.is_dir():
                 children[f'{path.name}/'] = _get_directory_dict(path, directories_cache)
             else:
-                children[path.name] = _get_file_dict(session, path)
+                # Keep the order of the directory, the files are filled in below.
+                children[path.name] = None
+                files.append(path)
+        children.update({path.name: file_dict for path, file_dict in _get_file_dicts(session, files).items()})
         d['children'] = children
     return d
 
@@ -209,6 +268,7 @@ def list_directories_contents(session: Session, directories_: List[str]) -> Dict
     directories = list(directories | parents)
 
     paths = dict()
+    files = list()
     for path in media_directory.iterdir():
         if path.is_dir() and path.name in HIDDEN_DIRECTORIES:
             # Never show ignored directories.
@@ -219,7 +279,10 @@ def list_directories_contents(session: Session, directories_: List[str]) -> Dict
         if path.is_dir():
             paths[f'{path.name}/'] = _get_recursive_directory_dict(session, path, directories)
         else:
-            paths[path.name] = _get_file_dict(session, path)
+            # Keep the order of the directory, the files are filled in below.
+            paths[path.name] = None
+            files.append(path)
+    paths.update({path.name: file_dict for path, file_dict in _get_file_dicts(session, files).items()})
 
     return paths
 
@@ -446,9 +509,31 @@ def _mimetype_suffix_map(path: Path, mimetype: str):
 FILE_BIN = which('file', '/usr/bin/file')
 
 
-@functools.lru_cache(maxsize=10_000)
-def get_mimetype(path: Path) -> str:
-    """Get the mimetype of a file, prefer using `magic`, fallback to builtin `file` command."""
+# The mimetypes of (non-empty) files with these suffixes are not read from the files; the suffix decides.  This is not
+# always what `magic` reports: an XHTML .html file is text/xml to `magic`, but text/html here (like any .html file which
+# `magic` reports as text/plain or a ZIP, see `_mimetype_suffix_map`).
+SUFFIX_MIMETYPES = {
+    '.json': 'application/json',
+    '.vtt': 'text/vtt',
+    '.srt': 'text/srt',
+    '.html': 'text/html',
+    '.htm': 'text/html',
+    '.hgt': 'application/octet-stream',
+}
+# The most mimetypes kept by `get_mimetype`.
+MIMETYPES_CACHE_SIZE = 100_000
+
+# {(path, size, modification datetime): mimetype}
+_mimetypes = cachetools.LRUCache(MIMETYPES_CACHE_SIZE)
+_mimetypes_lock = threading.Lock()
+
+
+def _mimetype_key(path: Path, stat: os.stat_result) -> tuple:
+    # The modification datetime is stored (in `FileGroup.files`) to the microsecond.
+    return str(path), stat.st_size, from_timestamp(stat.st_mtime)
+
+
+def _read_mimetype(path: Path) -> str:
     if magic is None:
         # This method is slow, prefer the speedier `magic` module.
         cmd = (FILE_BIN, '--mime-type', str(path.absolute()))
@@ -461,6 +546,66 @@ def get_mimetype(path: Path) -> str:
     return mimetype
 
 
+def get_mimetype(path: Path) -> str:
+    """Get the mimetype of a file, prefer using `magic`, fallback to builtin `file` command.
+
+    Mimetypes are kept by the path, size and modification datetime of the file, so a changed file is read again.  The
+    mimetypes stored in `FileGroup.files` are used when a refresh remembers them (see `remember_stored_mimetypes`)."""
+    stat = path.stat()
+    key = _mimetype_key(path, stat)
+    with _mimetypes_lock:
+        if mimetype := _mimetypes.get(key):
+            return mimetype
+
+    mimetype = SUFFIX_MIMETYPES.get(path.suffix.lower()) if stat.st_size else None
+    mimetype = mimetype or _read_mimetype(path)
+    with _mimetypes_lock:
+        _mimetypes[key] = mimetype
+    return mimetype
+
+
+def remember_stored_mimetypes(paths: List[Path]):
+    """Remember the mimetypes stored in the `FileGroup.files` of the FileGroups of these (primary) paths, so
+    `get_mimetype` does not read the files which have not changed since."""
+    with get_db_curs() as curs:
+        curs.execute('''
+            SELECT fg.directory, json_extract(j.value, '$.path') AS path, json_extract(j.value, '$.size') AS size,
+                   json_extract(j.value, '$.modification_datetime') AS modification_datetime,
+                   json_extract(j.value, '$.mimetype') AS mimetype
+            FROM file_group fg, json_each(CASE WHEN json_valid(fg.files) THEN fg.files ELSE '[]' END) j
+            WHERE fg.primary_path IN (SELECT value FROM json_each(?))
+              AND j.type = 'object'
+        ''', (json.dumps([str(i) for i in paths]),))
+        rows = curs.fetchall()
+
+    stored = dict()
+    for row in rows:
+        if not (row['path'] and row['mimetype'] and row['modification_datetime']) or row['size'] is None:
+            continue
+        try:
+            modification_datetime = datetime.datetime.fromisoformat(row['modification_datetime'])
+        except ValueError:
+            continue
+        # Old FileGroups stored the absolute paths of their files.
+        path = pathlib.Path(row['directory']) / row['path']
+        stored[(str(path), row['size'], modification_datetime)] = row['mimetype']
+    with _mimetypes_lock:
+        _mimetypes.update(stored)
+
+
+def clear_mimetype_cache():
+    with _mimetypes_lock:
+        _mimetypes.clear()
+
+
+def _reset_mimetypes_after_fork():
+    global _mimetypes_lock
+    _mimetypes_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_mimetypes_after_fork)
+
+
 # Special suffixes within WROLPi.
 SUFFIXES = {
     '.info.json',
@@ -690,6 +835,8 @@ def _upsert_files(files: List[pathlib.Path], idempotency: datetime.datetime,
 
     non_primary_files = set()
     for chunk in chunks_by_stem(files, 500):
+        # The mimetypes of the files which have not changed are not read again.
+        remember_stored_mimetypes(chunk)
         # Group all files by their shared full-stem.  `chunk_by_stem` already sorted the files.
         grouped = group_files_by_stem(chunk, pre_sorted=True)
         # Convert the groups into file_groups.  Extract common information into `file_group.data`.
@@ -789,6 +936,7 @@ def _upsert_files(files: List[pathlib.Path], idempotency: datetime.datetime,
                 # use paths which are not primary.
                 curs.execute('DELETE FROM file_group WHERE primary_path IN (SELECT value FROM json_each(?))',
                              (json.dumps(list(map(str, non_primary_files))),))
+            bump_search_generation(curs)
 
         # Report progress after each chunk
         processed_count += len(chunk)
@@ -903,15 +1051,57 @@ async def refresh_discover_paths(paths: List[pathlib.Path], idempotency: datetim
         '''
         refresh_logger.debug(stmt)
         curs.execute(stmt, params)
+        bump_search_generation(curs)
+
+
+# FileGroups indexed per batch; each batch is written in one short transaction.
+INDEX_BATCH_SIZE = 20
+
+
+def _index_file_group(fg_id: int, primary_path: pathlib.Path, mimetype: str, title: str) -> Tuple:
+    """Index one file like `FileGroup.do_index`, but without a FileGroup: no session, no open transaction, and no
+    models are needed.
+
+    Returns only `(id, title, a_text, b_text, c_text, d_text)`; this may run in an index worker process."""
+    texts = (None, None, None, None)
+    try:
+        start = now()
+        texts = indexers.find_indexer(mimetype).create_index(primary_path)
+        title = title or primary_path.name
+        if (total_seconds := (now() - start).total_seconds()) > 1:
+            logger.info(f'Indexing {primary_path} took {total_seconds} seconds')
+    except Exception as e:
+        logger.error(f'Failed to index {primary_path}', exc_info=e)
+        if PYTEST:
+            raise
+    return fg_id, title, *texts
+
+
+def _index_cache_key(primary_path: pathlib.Path, mimetype: str) -> Optional[index_cache.CacheKey]:
+    """The key of a file's texts in the index cache, or None if the texts are not worth caching."""
+    indexer = indexers.find_indexer(mimetype)
+    if indexer is indexers.DefaultIndexer:
+        # Only the file name is indexed.
+        return None
+    return index_cache.get_cache_key(indexer.__name__, primary_path)
+
+
+def _get_cached_texts(rows: List[Tuple]) -> Tuple[Dict[int, Optional[index_cache.CacheKey]], Dict[int, list]]:
+    """Get the index cache keys of a batch of `(id, primary_path, mimetype, title)`, and the cached texts of
+    those which were indexed before."""
+    cache_keys = {row[0]: _index_cache_key(row[1], row[2]) for row in rows}
+    return cache_keys, index_cache.get_many_cached(cache_keys)
 
 
 async def apply_indexers(progress_callback: Callable[[int, int], None] = None):
     """Indexes any Files that have not yet been indexed by Modelers, or by previous calls of this function.
 
+    Text is extracted by `indexer_workers` worker processes (see `WROLPiConfig` and `index_workers`), so parsing does
+    not block the event loop.  Texts of files which were extracted before are read from the index cache (see `index_cache`).
+
     Args:
         progress_callback: Optional callback(processed, total) called after each batch.
     """
-    from wrolpi.files.models import FileGroup
     refresh_logger.info('Applying indexers')
 
     # Get initial count for progress tracking
@@ -922,75 +1112,110 @@ async def apply_indexers(progress_callback: Callable[[int, int], None] = None):
             total_to_index = session.query(FileGroup).filter(FileGroup.indexed != True).count()
         progress_callback(0, total_to_index)
 
-    update_stmt = ('UPDATE file_group SET "indexed" = 1, title = :title, a_text = :a_text, b_text = :b_text,'
-                   ' c_text = :c_text, d_text = :d_text WHERE id = :id')
+    update_stmts = [
+        'UPDATE file_group SET "indexed" = 1, title = :title WHERE id = :id',
+        # Never INSERT OR REPLACE, see `wrolpi.fts`.
+        'INSERT INTO file_group_text (file_group_id, a_text, b_text, c_text, d_text)'
+        ' VALUES (:id, :a_text, :b_text, :c_text, :d_text)'
+        ' ON CONFLICT (file_group_id) DO UPDATE SET a_text = EXCLUDED.a_text, b_text = EXCLUDED.b_text,'
+        ' c_text = EXCLUDED.c_text, d_text = EXCLUDED.d_text',
+    ]
 
     def _strip_surrogates(value):
         return strip_surrogates(value) if isinstance(value, str) else value
 
-    while True:
-        # Read the next batch as plain columns and let the read transaction end.  Indexers can run
-        # subprocesses for minutes, and SQLite requires short write transactions: a session held
-        # across the batch fails its commit with "database is locked" (SQLITE_BUSY_SNAPSHOT, which
-        # ignores busy_timeout) whenever any other connection commits a write in the meantime.
-        with get_db_session() as session:
-            rows = session.query(FileGroup.id, FileGroup.primary_path, FileGroup.mimetype, FileGroup.title) \
-                .filter(FileGroup.indexed != True).limit(20).all()
-
-        if not rows:
-            break
+    workers = max(0, get_wrolpi_config().indexer_workers or 0)
+    async with IndexWorkers(workers) as pool:
+        while True:
+            # Read the next batch as plain columns and let the read transaction end.  Indexers can run
+            # subprocesses for minutes, and SQLite requires short write transactions: a session held
+            # across the batch fails its commit with "database is locked" (SQLITE_BUSY_SNAPSHOT, which
+            # ignores busy_timeout) whenever any other connection commits a write in the meantime.
+            with get_db_session() as session:
+                rows = session.query(FileGroup.id, FileGroup.primary_path, FileGroup.mimetype, FileGroup.title) \
+                    .filter(FileGroup.indexed != True).limit(INDEX_BATCH_SIZE).all()
+
+            if not rows:
+                break
 
-        # Index each file on a transient FileGroup: no session, no open transaction.
-        processed = 0
-        params = []
-        last_path = None
-        for fg_id, primary_path, mimetype, title in rows:
-            processed += 1
-            file_group = FileGroup(primary_path=primary_path, mimetype=mimetype, title=title)
-            try:
-                file_group.do_index()
-            except Exception:
-                # Error has already been logged in .do_index.  It is still marked as indexed
-                # below; we won't try to index it again.
-                if PYTEST:
-                    raise
-            params.append(dict(id=fg_id, title=file_group.title, a_text=file_group.a_text,
-                               b_text=file_group.b_text, c_text=file_group.c_text, d_text=file_group.d_text))
-            last_path = primary_path
+            # Text extracted from identical files before (e.g. before a DB reset) is not extracted again.  Hashing
+            # the files and reading the cache are done in a thread, not on the event loop.
+            cache_keys, cached = await asyncio.to_thread(_get_cached_texts, rows)
+            to_index = [row for row in rows if row[0] not in cached]
 
-            # Sleep to catch cancel.
-            await asyncio.sleep(0)
-
-        # Write the batch in one short transaction (BEGIN IMMEDIATE via commit=True).
-        try:
-            with get_db_curs(commit=True) as curs:
-                curs.executemany(update_stmt, params)
-        except UnicodeEncodeError as e:
-            # Paths with invalid UTF-8 surrogates produce titles/texts sqlite3 cannot store.
-            refresh_logger.warning(f'UnicodeEncodeError during indexer update, sanitizing batch: {e}')
-            params = [{k: _strip_surrogates(v) for k, v in p.items()} for p in params]
+            # Index each file with no transaction open.
+            if workers:
+                results = await asyncio.gather(*(pool.index(*row) for row in to_index), return_exceptions=True)
+            else:
+                results = []
+                for row in to_index:
+                    try:
+                        results.append(_index_file_group(*row))
+                    except Exception as e:
+                        results.append(e)
+                    # Sleep to catch cancel.
+                    await asyncio.sleep(0)
+            results = dict(zip((row[0] for row in to_index), results))
+
+            params = []
+            new_cache_entries = dict()
+            for fg_id, primary_path, mimetype, title in rows:
+                if fg_id in cached:
+                    # `FileGroup.do_index` always sets the title.
+                    result = (fg_id, title or primary_path.name, *cached[fg_id])
+                else:
+                    result = results[fg_id]
+                if isinstance(result, Exception):
+                    # Error has already been logged in .do_index (unless the index worker died).  It is still
+                    # marked as indexed below; we won't try to index it again.
+                    if PYTEST:
+                        raise result
+                    if isinstance(result, IndexWorkerDied):
+                        refresh_logger.error(f'Index worker died while indexing {primary_path}', exc_info=result)
+                    result = (fg_id, title, None, None, None, None)
+                elif fg_id not in cached and any(result[2:]):
+                    new_cache_entries[cache_keys[fg_id]] = result[2:]
+                params.append(dict(zip(('id', 'title', 'a_text', 'b_text', 'c_text', 'd_text'), result)))
+            await asyncio.to_thread(index_cache.put_many_cached, new_cache_entries)
+            processed = len(rows)
+            last_path = rows[-1][1]
+
+            # Write the batch in one short transaction (BEGIN IMMEDIATE via commit=True).
             try:
                 with get_db_curs(commit=True) as curs:
-                    curs.executemany(update_stmt, params)
-            except UnicodeEncodeError as e2:
-                # Still failing - mark as indexed without the texts so we don't loop forever.
-                refresh_logger.error(f'Failed to fix UnicodeEncodeError, skipping batch: {e2}')
-                with get_db_curs(commit=True) as curs:
-                    curs.execute('UPDATE file_group SET "indexed" = 1 WHERE id IN '
-                                 '(SELECT value FROM json_each(?))',
-                                 (json.dumps([p['id'] for p in params]),))
+                    for update_stmt in update_stmts:
+                        curs.executemany(update_stmt, params)
+                    bump_search_generation(curs)
+            except UnicodeEncodeError as e:
+                # Paths with invalid UTF-8 surrogates produce titles/texts sqlite3 cannot store.
+                refresh_logger.warning(f'UnicodeEncodeError during indexer update, sanitizing batch: {e}')
+                params = [{k: _strip_surrogates(v) for k, v in p.items()} for p in params]
+                try:
+                    with get_db_curs(commit=True) as curs:
+                        for update_stmt in update_stmts:
+                            curs.executemany(update_stmt, params)
+                        bump_search_generation(curs)
+                except UnicodeEncodeError as e2:
+                    # Still failing - mark as indexed without the texts so we don't loop forever.
+                    refresh_logger.error(f'Failed to fix UnicodeEncodeError, skipping batch: {e2}')
+                    with get_db_curs(commit=True) as curs:
+                        curs.execute('UPDATE file_group SET "indexed" = 1 WHERE id IN '
+                                     '(SELECT value FROM json_each(?))',
+                                     (json.dumps([p['id'] for p in params]),))
+                        bump_search_generation(curs)
 
-        if last_path:
             refresh_logger.debug(f'Indexed {processed} files near {last_path}')
 
-        # Update progress
-        total_indexed += processed
-        if progress_callback and total_to_index > 0:
-            progress_callback(total_indexed, total_to_index)
+            # Update progress
+            total_indexed += processed
+            if progress_callback and total_to_index > 0:
+                progress_callback(total_indexed, total_to_index)
+
+            if processed < INDEX_BATCH_SIZE:
+                # Processed less than the limit, don't do the next query.
+                break
 
-        if processed < 20:
-            # Processed less than the limit, don't do the next query.
-            break
+    await asyncio.to_thread(index_cache.flush_index_cache)
 
 
 def upsert_directories(parent_directories, directories):
@@ -1026,6 +1251,41 @@ def upsert_directories(parent_directories, directories):
             curs.execute(stmt, dict(directory=f'{directory.absolute()}%', idempotency=idempotency))
 
 
+def get_directory_journal(root: pathlib.Path) -> Dict[str, Tuple[float, int]]:
+    """Get the fast-refresh journal of `root` and its subdirectories: {path: (mtime, child_count)}.
+
+    The mtime is None for directories which must be listed again (see `upsert_directory_journal`), or which were never
+    listed by a fast refresh.  These are included, they are the subdirectories of an unchanged directory."""
+    root = str(root.absolute())
+    with get_db_curs() as curs:
+        curs.execute('''
+            SELECT path, mtime, child_count FROM directory
+            WHERE path = :root OR path LIKE :root_pattern
+        ''', dict(root=root, root_pattern=f'{root}/%'))
+        return {row['path']: (row['mtime'], row['child_count'] or 0) for row in curs.fetchall()}
+
+
+def upsert_directory_journal(entries: List[Tuple[str, Optional[float], int]]):
+    """Record the (path, mtime, child_count) of each directory listed (or skipped) by a fast refresh.
+
+    A NULL mtime forces the directory to be listed again by the next fast refresh."""
+    if not entries:
+        return
+
+    idempotency = now()
+    values = [(path, pathlib.Path(path).name, idempotency, mtime, child_count)
+              for path, mtime, child_count in entries]
+    with get_db_curs(commit=True) as curs:
+        for chunk in chunks(values, BULK_SQL_CHUNK_SIZE):
+            placeholders, params = values_clause(chunk)
+            stmt = f'''
+                INSERT INTO directory (path, name, idempotency, mtime, child_count) VALUES {placeholders}
+                ON CONFLICT (path) DO UPDATE
+                SET mtime = EXCLUDED.mtime, child_count = EXCLUDED.child_count
+            '''
+            curs.execute(stmt, params)
+
+
 async def search_directories_by_name(session: Session, name: str, excluded: List[str] = None, limit: int = 20) \
         -> List[Directory]:
     """Find the Directories whose names contain the `name` string."""
@@ -1038,10 +1298,86 @@ async def search_directories_by_name(session: Session, name: str, excluded: List
     return directories
 
 
+# Totals of `search_files` queries, keyed by (search generation, query, params).  Paging through a search reuses the
+# total of the first page, so only the first page pays for counting every match.  The search generation is bumped by
+# every write of the searched tables (see `wrolpi.db.bump_search_generation`), so a total is not reused after a write
+# by any process.
+SEARCH_TOTAL_CACHE = cachetools.TTLCache(maxsize=1_000, ttl=30.0)
+# An estimated total stops counting after this many matches.
+SEARCH_TOTAL_ESTIMATE_LIMIT = 1_000
+
+
+def invalidate_search_total_cache():
+    SEARCH_TOTAL_CACHE.clear()
+
+
+def get_search_generation() -> int:
+    """The number of writes to the tables which searches count; it changes whenever a search total may change."""
+    with get_db_curs() as curs:
+        curs.execute('SELECT generation FROM search_generation')
+        row = curs.fetchone()
+    return row['generation'] if row else 0
+
+
+def get_search_total_estimate_limit(limit: int, offset: int) -> int:
+    """The number of matches an estimated total counts to.  Always more than the requested page, so the next page
+    is known to exist."""
+    return max(SEARCH_TOTAL_ESTIMATE_LIMIT, (offset or 0) + (limit or 20) + 1)
+
+
+def get_search_total(from_where: str, params: dict, limit: int, offset: Optional[int], page_count: int,
+                     estimate: bool = False) -> int:
+    """Get the total matches of a search whose page (of `page_count` rows) has already been fetched.
+
+    `from_where` is the FROM/JOIN/WHERE of the search.  A partial page holds the end of the matches, so its total is
+    known without counting.  Otherwise, the total is counted once and cached until the searched tables are written
+    (see `get_search_generation`), or for `SEARCH_TOTAL_CACHE.ttl` seconds.
+    An `estimate` stops counting at `get_search_total_estimate_limit`.  `offset` is None when the page was fetched
+    by a cursor without its position."""
+    params = {k: v for k, v in params.items() if k not in ('limit', 'offset')}
+    key = (get_search_generation(), from_where, tuple(sorted((k, repr(v)) for k, v in params.items())))
+    if offset is not None and page_count < limit and (page_count or not offset):
+        total = offset + page_count
+        SEARCH_TOTAL_CACHE[key] = total
+        return total
+    offset = offset or 0
+
+    total_limit = get_search_total_estimate_limit(limit, offset) if estimate else None
+    estimate_key = (*key, total_limit)
+    for key_ in (key, estimate_key) if estimate else (key,):
+        total = SEARCH_TOTAL_CACHE.get(key_)
+        # A cached total which does not contain this page is stale.
+        if total is not None and total >= offset + page_count:
+            return total
+
+    with get_db_curs() as curs:
+        if estimate:
+            curs.execute(f'SELECT COUNT(*) AS total FROM (SELECT 1 {from_where} LIMIT :total_limit)',
+                         dict(params, total_limit=total_limit))
+        else:
+            curs.execute(f'SELECT COUNT(*) AS total {from_where}', params)
+        total = curs.fetchone()['total']
+
+    if estimate and total < total_limit:
+        # Counting stopped before the limit, this is the exact total.
+        SEARCH_TOTAL_CACHE[key] = total
+    else:
+        SEARCH_TOTAL_CACHE[estimate_key if estimate else key] = total
+    return total
+
+
+def search_page_next_cursor(results: List[dict], limit: int) -> Optional[str]:
+    """The cursor of the page after `results`, or None if `results` is the last page."""
+    if results and len(results) >= (limit or 20):
+        return results[-1].get('cursor')
+    return None
+
+
 def search_files(search_str: str, limit: int, offset: int, mimetypes: List[str] = None, model: str = None,
                  tag_names: List[str] = None, headline: bool = False, months: List[int] = None,
                  from_year: int = None, to_year: int = None, any_tag: bool = False, order: str = None,
-                 url: str = None, suffix: str = None, path: str = None, deep: bool = False) -> \
+                 url: str = None, suffix: str = None, path: str = None, deep: bool = False,
+                 estimate: bool = False, cursor: str = None) -> \
         Tuple[List[dict], int]:
     """Search the FileGroup table.
 
@@ -1053,7 +1389,8 @@ def search_files(search_str: str, limit: int, offset: int, mimetypes: List[str]
     @param from_year: The file must be published on or after this year.
     @param search_str: Search the ts_vector of the file.  Returns all files if this is empty.
     @param limit: Return only this many files.
-    @param offset: Offset the query.
+    @param offset: Offset the query.  When `cursor` is provided, this is only the position of the page (for the
+        total).
     @param mimetypes: Only return files that match these mimetypes.
     @param model: Only return files that match this model.
     @param tag_names: A list of tag names.
@@ -1064,6 +1401,8 @@ def search_files(search_str: str, limit: int, offset: int, mimetypes: List[str]
     @param suffix: Only return files whose primary file has this suffix (e.g. ".bin"), case-insensitive.
     @param path: Filter by primary_path using case-insensitive partial match (ILIKE).
     @param deep: Search all text including captions/body (d_text); slower but more thorough.
+    @param estimate: Stop counting the total at `get_search_total_estimate_limit` matches.
+    @param cursor: Continue after the result which has this `cursor`.
     """
     from wrolpi import fts
 
@@ -1131,38 +1470,160 @@ def search_files(search_str: str, limit: int, offset: int, mimetypes: List[str]
         # Only filter out unviewed files if search_str is not provided.
         wheres.append('viewed IS NOT NULL')
 
+    keyset = Keyset.from_order_by(order_by, columns={'1': 'fg.id', '2': 'fts.ts_rank' if fts_search else None},
+                                  cursor=cursor)
+    page_wheres, page_params = list(wheres), dict(params)
+    if keyset.values is not None:
+        # Seek past the previous page instead of counting through it.
+        keyset_where, keyset_params = keyset.where()
+        page_wheres.append(keyset_where)
+        page_params.update(keyset_params, offset=0)
+        # The offset sent with a cursor is the position of the page (for the total), if the client knows it.
+        offset = offset or None
+
     wheres = '\n AND '.join(wheres)
-    selects = f"{', '.join(selects)}, " if selects else ""
+    page_wheres = '\n AND '.join(page_wheres)
+    selects = ''.join(f', {i}' for i in selects)
     join = '\n'.join(joins)
     stmt = f'''
-        SELECT fg.id, {selects} COUNT(*) OVER() AS total
+        SELECT fg.id {selects} {keyset.selects()}
             {headline}
         FROM file_group fg
         {join}
-        {f"WHERE {wheres}" if wheres else ""}
-        ORDER BY {order_by}
+        {f"WHERE {page_wheres}" if page_wheres else ""}
+        ORDER BY {keyset.order_by()}
         LIMIT :limit OFFSET :offset
     '''
     logger.debug(stmt)
 
-    results, total = handle_file_group_search_results(stmt, params)
+    results, _ = handle_file_group_search_results(stmt, page_params, keyset)
+
+    # Count without the snippets, they are only needed for the page.
+    count_join = fts.file_group_search_join(search_str, deep=deep).join if fts_search else ''
+    from_where = f'''
+        FROM file_group fg
+        {count_join}
+        {f"WHERE {wheres}" if wheres else ""}
+    '''
+    total = get_search_total(from_where, params, limit, offset, len(results), estimate)
     return results, total
 
 
-def handle_file_group_search_results(statement: str, params: dict) -> Tuple[List[dict], int]:
+# Everything the search result cards need: the FileGroup, its Video or Archive, the names of its Tags, Channel and
+# domain.  ffprobe_json is large; only its codecs are extracted.
+_HYDRATE_SEARCH_RESULTS_SQL = '''
+    SELECT fg.id, fg.author, fg.censored, fg.data, fg.directory, fg.download_datetime, fg.files, fg.length,
+           fg.mimetype, fg.model, fg.modification_datetime, fg.primary_path, fg.published_datetime,
+           fg.published_modified_datetime, fg.size, fg.title, fg.url, fg.viewed,
+           (SELECT c_text FROM file_group_text WHERE file_group_id = fg.id) AS c_text,
+           (SELECT json_group_array(t.name)
+            FROM tag_file tf
+                     JOIN tag t ON t.id = tf.tag_id
+            WHERE tf.file_group_id = fg.id)               AS tag_names,
+           v.id                                            AS video_id,
+           v.channel_id,
+           v.source_id,
+           v.view_count,
+           v.have_comments,
+           v.comments_failed,
+           (SELECT json_group_array(json_array(json_extract(s.value, '$.codec_name'),
+                                               json_extract(s.value, '$.codec_type')))
+            FROM json_each(CASE WHEN json_valid(v.ffprobe_json) THEN v.ffprobe_json END, '$.streams') s) AS codecs,
+           c.id                                            AS channel_row_id,
+           channel_collection.name                         AS channel_name,
+           a.id                                            AS archive_id,
+           a.collection_id                                 AS archive_collection_id,
+           CASE WHEN archive_collection.kind = 'domain' THEN archive_collection.name END AS domain
+    FROM file_group fg
+             LEFT JOIN video v ON v.file_group_id = fg.id
+             LEFT JOIN channel c ON c.id = v.channel_id
+             LEFT JOIN collection channel_collection ON channel_collection.id = c.collection_id
+             LEFT JOIN archive a ON a.file_group_id = fg.id
+             LEFT JOIN collection archive_collection ON archive_collection.id = a.collection_id
+    WHERE fg.id IN (SELECT value FROM json_each(:ids))
+'''
+
+
+def _search_result_json(row) -> dict:
+    """The `__json__` of a FileGroup (or its Video/Archive) built from a row of `_HYDRATE_SEARCH_RESULTS_SQL`."""
+    from wrolpi.files.models import file_group_json
+
+    d = file_group_json(row, sorted(i for i in row.tag_names or [] if i is not None))
+    if row.video_id:
+        from modules.videos.models import video_json
+        d['video'] = video_json(
+            row.directory, row.files, row.primary_path, row.c_text,
+            id=row.video_id,
+            channel=dict(id=row.channel_row_id, name=row.channel_name) if row.channel_row_id else None,
+            channel_id=row.channel_id,
+            codecs=row.codecs or [],
+            comments_failed=row.comments_failed,
+            have_comments=row.have_comments,
+            source_id=row.source_id,
+            view_count=row.view_count,
+        )
+    elif row.archive_id:
+        from modules.archive.models import archive_json
+        d['archive'] = archive_json(row.directory, row.files, id=row.archive_id,
+                                    collection_id=row.archive_collection_id, domain=row.domain)
+    return d
+
+
+def hydrate_file_group_search_results(file_group_ids: List[int]) -> Dict[int, dict]:
+    """Get the JSON of the FileGroups (and their Videos or Archives) of a page of search results using one query.
+
+    The JSON is built by the same functions as `FileGroup.__json__`, `Video.__json__` and `Archive.__json__`, but from
+    columns fetched at once; the models lazily load the Tags, Channel and Collection of every result."""
+    if not file_group_ids:
+        return dict()
+
+    from sqlalchemy import text, JSON, Integer, String, Boolean, BigInteger
+    from sqlalchemy.sql import column
+
+    fg = FileGroup.__table__.c
+    statement = text(_HYDRATE_SEARCH_RESULTS_SQL).columns(
+        fg.id, fg.author, fg.censored, fg.data, fg.directory, fg.download_datetime, fg.files, fg.length,
+        fg.mimetype, fg.model, fg.modification_datetime, fg.primary_path, fg.published_datetime,
+        fg.published_modified_datetime, fg.size, fg.title, fg.url, fg.viewed,
+        column('c_text', String),
+        column('tag_names', JSON),
+        column('video_id', Integer),
+        column('channel_id', Integer),
+        column('source_id', String),
+        column('view_count', BigInteger),
+        column('have_comments', Boolean),
+        column('comments_failed', Boolean),
+        column('codecs', JSON),
+        column('channel_row_id', Integer),
+        column('channel_name', String),
+        column('archive_id', Integer),
+        column('archive_collection_id', Integer),
+        column('domain', String),
+    )
+    with get_db_session() as session:
+        rows = session.execute(statement, dict(ids=json.dumps(list(file_group_ids)))).fetchall()
+        return {row.id: _search_result_json(row) for row in rows}
+
+
+def handle_file_group_search_results(statement: str, params: dict, keyset: Keyset = None) \
+        -> Tuple[List[dict], int]:
     """
     Execute the provided SQL statement and fetch the Files returned.
 
     WARNING: This expects specific queries to be executed and shouldn't be used for things not related to file search.
 
+    If `keyset` is provided, the statement must select `keyset.selects()`; each result has the `cursor` of the next
+    page after it.
+
     See: `search`
     """
     with get_db_curs() as curs:
         curs.execute(statement, params)
         results = [dict(i) for i in curs.fetchall()]
-        total = results[0]['total'] if results else 0
+        total = results[0].get('total', 0) if results else 0
         ordered_ids = [i['id'] for i in results]
         extras = [dict(
+            cursor=keyset.cursor_of(i) if keyset else None,
             ts_rank=i.get('ts_rank'),
             # Snippet columns exist only when headlines were requested; `title_headline` is
             # computed below (title is not an FTS5 column).
@@ -1173,32 +1634,23 @@ def handle_file_group_search_results(statement: str, params: dict) -> Tuple[List
             d_headline=i.get('d_headline'),
         ) for i in results]
 
-    with get_db_session() as session:
-        from modules.archive.models import Archive
-        from modules.videos.models import Video
-        results = session.query(FileGroup, Video, Archive) \
-            .filter(FileGroup.id.in_(ordered_ids)) \
-            .outerjoin(Video, Video.file_group_id == FileGroup.id) \
-            .outerjoin(Archive, Archive.file_group_id == FileGroup.id)
-        # Order FileGroups by their location in ordered_ids.  Use dict for O(1) lookups instead of O(n) list.index().
-        id_to_order = {id_: idx for idx, id_ in enumerate(ordered_ids)}
-        file_groups = sorted(results, key=lambda i: id_to_order.get(i[0].id, 0))
-        results = list()
-        for extra, (file_group, video, archive) in zip_longest(extras, file_groups):
-            if video:
-                results.append(video.__json__())
-            elif archive:
-                results.append(archive.__json__())
-            else:
-                results.append(file_group.__json__())
-            # Preserve the ts_ranks, if any.
-            if extra:
-                results[-1]['ts_rank'] = extra['ts_rank']
-                results[-1]['title_headline'] = extra['title_headline']
-                results[-1]['b_headline'] = extra['b_headline']
-                results[-1]['c_headline'] = extra['c_headline']
-                results[-1]['d_headline'] = extra['d_headline']
+    hydrated = hydrate_file_group_search_results(ordered_ids)
+    results = list()
+    for id_, extra in zip(ordered_ids, extras):
+        if (result := hydrated.get(id_)) is None:
+            # Deleted since the search.
+            continue
+        results.append(result)
+        # Preserve the ts_ranks, if any.
+        if keyset:
+            result['cursor'] = extra['cursor']
+        result['ts_rank'] = extra['ts_rank']
+        result['title_headline'] = extra['title_headline']
+        result['b_headline'] = extra['b_headline']
+        result['c_headline'] = extra['c_headline']
+        result['d_headline'] = extra['d_headline']
 
+    with get_db_session() as session:
         search_str = params.get('search_str') if isinstance(params, dict) else None
 
         # When headlines were requested, compute the title headlines in Python (the FTS5 snippet
@@ -1418,6 +1870,9 @@ class RefreshProgress:
     refreshing: bool = False
     total_file_groups: int = 0
     unindexed: int = 0
+    skipped_directories: int = 0
+    # FileGroups modeled per second by each modeler during the current refresh: {modeler name: rate}.
+    modeling_rates: dict = dataclasses.field(default_factory=dict)
 
     def __json__(self) -> dict:
         d = dict(
@@ -1432,6 +1887,8 @@ class RefreshProgress:
             refreshing=self.refreshing,
             total_file_groups=self.total_file_groups,
             unindexed=self.unindexed,
+            skipped_directories=self.skipped_directories,
+            modeling_rates=self.modeling_rates,
         )
         return d
 
@@ -1479,6 +1936,8 @@ def get_refresh_progress() -> RefreshProgress:
             refreshing=flags.file_worker_busy.is_set(),
             total_file_groups=int(results['total_file_groups'] or 0),
             unindexed=int(results['unindexed'] or 0),
+            skipped_directories=api_app.shared_ctx.file_worker_status.get('skipped_directories', 0),
+            modeling_rates=dict(api_app.shared_ctx.file_worker_status.get('modeling_rates') or dict()),
         )
 
     return progress
@@ -1613,6 +2072,7 @@ def _bulk_update_file_groups_db(session: Session, chunk_plan: Dict[pathlib.Path,
         WHERE fg.primary_path = json_extract(v.value, '$[0]')
     '''
     session.execute(sa_text(sql), dict(updates=updates))
+    bump_search_generation(session)
 
 
 def _json_serial(obj):
@@ -1652,6 +2112,7 @@ def _bulk_update_file_groups_reorganize(updates: List[dict]):
                              json.dumps(update['data'], default=_json_serial) if update.get('data') else None,
                              update['id'],
                          ))
+        bump_search_generation(curs)
 
     # Expire SQLAlchemy's session cache so subsequent queries see the raw SQL updates.
     # This is necessary because get_db_curs uses the same connection as get_db_session
@@ -2134,9 +2595,39 @@ BULK_TAG_CHUNK_SIZE = 100  # Files per DB session
 BULK_SQL_CHUNK_SIZE = 1000  # Rows per SQL statement
 
 
-def _bulk_insert_tag_files(tag_files: List[Tuple[int, int]]):
+def _insert_tag_files(chunk: List[Tuple[int, int]], created_at: datetime.datetime, session: Session) -> int:
+    """Insert a chunk of TagFiles, ignoring duplicates.  A write of `_bulk_insert_tag_files`."""
+    values = [(tag_id, file_group_id, created_at) for tag_id, file_group_id in chunk]
+    placeholders, params = values_clause(values)
+    curs = session.connection().connection.cursor()
+    curs.execute(f'''
+        INSERT INTO tag_file (tag_id, file_group_id, created_at)
+        VALUES {placeholders}
+        ON CONFLICT (tag_id, file_group_id) DO NOTHING
+    ''', params)
+    inserted = curs.rowcount
+    bump_search_generation(curs)
+    return inserted
+
+
+def _delete_tag_files(chunk: List[Tuple[int, int]], session: Session) -> int:
+    """Delete a chunk of TagFiles.  A write of `_bulk_delete_tag_files`."""
+    placeholders, params = values_clause(chunk)
+    curs = session.connection().connection.cursor()
+    curs.execute(f'''
+        DELETE FROM tag_file
+        WHERE (tag_id, file_group_id) IN (VALUES {placeholders})
+    ''', params)
+    deleted = curs.rowcount
+    bump_search_generation(curs)
+    return deleted
+
+
+async def _bulk_insert_tag_files(tag_files: List[Tuple[int, int]]):
     """Bulk insert TagFiles, ignoring duplicates.
 
+    The chunks are submitted to the DB writer together, so it can commit them in few transactions.
+
     Args:
         tag_files: List of (tag_id, file_group_id) tuples
     """
@@ -2144,25 +2635,14 @@ def _bulk_insert_tag_files(tag_files: List[Tuple[int, int]]):
         return
 
     now_timestamp = now()
-
     # Process in chunks to avoid overly large SQL statements
-    for i in range(0, len(tag_files), BULK_SQL_CHUNK_SIZE):
-        chunk = tag_files[i:i + BULK_SQL_CHUNK_SIZE]
-        values = [(tag_id, file_group_id, now_timestamp)
-                  for tag_id, file_group_id in chunk]
-
-        with get_db_curs(commit=True) as curs:
-            placeholders, params = values_clause(values)
-            stmt = f'''
-                INSERT INTO tag_file (tag_id, file_group_id, created_at)
-                VALUES {placeholders}
-                ON CONFLICT (tag_id, file_group_id) DO NOTHING
-            '''
-            curs.execute(stmt, params)
-            logger.debug(f'Bulk inserted {len(chunk)} TagFiles')
+    futures = [submit_write(functools.partial(_insert_tag_files, tag_files[i:i + BULK_SQL_CHUNK_SIZE], now_timestamp))
+               for i in range(0, len(tag_files), BULK_SQL_CHUNK_SIZE)]
+    inserted = await asyncio.gather(*map(asyncio.wrap_future, futures))
+    logger.debug(f'Bulk inserted {sum(inserted)} TagFiles')
 
 
-def _bulk_delete_tag_files(tag_files: List[Tuple[int, int]]):
+async def _bulk_delete_tag_files(tag_files: List[Tuple[int, int]]):
     """Bulk delete TagFiles.
 
     Args:
@@ -2172,18 +2652,10 @@ def _bulk_delete_tag_files(tag_files: List[Tuple[int, int]]):
         return
 
     # Process in chunks
-    for i in range(0, len(tag_files), BULK_SQL_CHUNK_SIZE):
-        chunk = tag_files[i:i + BULK_SQL_CHUNK_SIZE]
-        pairs = [(tag_id, file_group_id) for tag_id, file_group_id in chunk]
-
-        with get_db_curs(commit=True) as curs:
-            placeholders, params = values_clause(pairs)
-            stmt = f'''
-                DELETE FROM tag_file
-                WHERE (tag_id, file_group_id) IN (VALUES {placeholders})
-            '''
-            curs.execute(stmt, params)
-            logger.debug(f'Bulk deleted {curs.rowcount} TagFiles')
+    futures = [submit_write(functools.partial(_delete_tag_files, tag_files[i:i + BULK_SQL_CHUNK_SIZE]))
+               for i in range(0, len(tag_files), BULK_SQL_CHUNK_SIZE)]
+    deleted = await asyncio.gather(*map(asyncio.wrap_future, futures))
+    logger.debug(f'Bulk deleted {sum(deleted)} TagFiles')
 
 
 async def _process_bulk_tag_job(job: dict):
@@ -2307,8 +2779,8 @@ async def _process_bulk_tag_job(job: dict):
         await asyncio.sleep(0)
 
     # Phase 2: Bulk database operations
-    _bulk_insert_tag_files(tag_files_to_insert)
-    _bulk_delete_tag_files(tag_files_to_delete)
+    await _bulk_insert_tag_files(tag_files_to_insert)
+    await _bulk_delete_tag_files(tag_files_to_delete)
 
     # Phase 3: Activate switches ONCE at the end
     if tag_files_to_insert or tag_files_to_delete:
@@ -2433,6 +2905,68 @@ def _build_tree(entries: list) -> list:
     return root_children
 
 
+# Members of an archive are read and sent in chunks of this size.
+ARCHIVE_CHUNK_SIZE = 256 * 1024
+# The member index of zip and tar archives is kept in the index cache under this kind.
+ARCHIVE_INDEX_KIND = 'archive_members'
+# signature, version, flags, compression, time, date, CRC-32, compressed size, size, name length, extra length
+_ZIP_LOCAL_HEADER = struct.Struct('<4s5H3L2H')
+_TAR_COMPRESSIONS = ((b'\x1f\x8b', 'gz'), (b'BZh', 'bz2'), (b'\xfd7zXZ\x00', 'xz'))
+_TAR_OPENERS = {'': open, 'gz': gzip.open, 'bz2': bz2.open, 'xz': lzma.open}
+
+
+def _get_tar_compression(path: pathlib.Path) -> str:
+    """Get the compression of a tar from its magic bytes: 'gz', 'bz2', 'xz', or '' if it is not compressed."""
+    with path.open('rb') as fh:
+        magic = fh.read(6)
+    return next((compression for prefix, compression in _TAR_COMPRESSIONS if magic.startswith(prefix)), '')
+
+
+def _build_archive_member_index(path: pathlib.Path, archive_type: str) -> dict:
+    """Read the members of a zip or tar archive, and where their data can be found.
+
+    The members are {name: None} for a directory, otherwise:
+        zip: {name: [size, local header offset, compression, compressed size, CRC-32, flags]}
+        tar: {name: [size, data offset]}; the data offset is in the decompressed tar, it is None for links and other
+             members which are not regular files.
+    """
+    members = dict()
+    if archive_type == 'zip':
+        with zipfile.ZipFile(path, 'r') as zf:
+            for info in zf.infolist():
+                members[info.filename] = None if info.is_dir() else \
+                    [info.file_size, info.header_offset, info.compress_type, info.compress_size, info.CRC,
+                     info.flag_bits]
+        return dict(members=members)
+
+    compression = _get_tar_compression(path)
+    with tarfile.open(path, f'r:{compression}') as tf:
+        for member in tf:
+            if member.isdir():
+                members[member.name] = None
+            elif member.isreg() and not member.issparse():
+                members[member.name] = [member.size, member.offset_data]
+            else:
+                members[member.name] = [member.size, None]
+    return dict(compression=compression, members=members)
+
+
+def get_archive_member_index(path: pathlib.Path, archive_type: str) -> dict:
+    """Get the member index of a zip or tar archive (see `_build_archive_member_index`).
+
+    The index is built when the archive is first listed, then kept in the index cache; a member can then be found
+    (and read) without reading the central directory of a zip, or every header of a (compressed) tar."""
+    key = index_cache.get_cache_key(ARCHIVE_INDEX_KIND, path)
+    if (index := index_cache.get_cached(key)) is not None:
+        return index
+
+    index = _build_archive_member_index(path, archive_type)
+    index_cache.put_cached(key, index)
+    # The index is needed by the next request, which may be served by another process.
+    index_cache.flush_index_cache()
+    return index
+
+
 def list_archive_contents(path: pathlib.Path) -> dict:
     """List the contents of an archive file as a hierarchical tree.
 
@@ -2450,34 +2984,21 @@ def list_archive_contents(path: pathlib.Path) -> dict:
     total_files = 0
 
     try:
-        if archive_type == 'zip':
-            with zipfile.ZipFile(path, 'r') as zf:
-                for info in zf.infolist():
-                    is_dir = info.is_dir()
-                    entry = {
-                        'path': info.filename,
-                        'name': info.filename.rstrip('/').split('/')[-1],
-                        'is_dir': is_dir,
-                        'size': info.file_size,
-                    }
-                    flat_entries.append(entry)
-                    if not is_dir:
-                        total_size += info.file_size
-                        total_files += 1
-        elif archive_type == 'tar':
-            with tarfile.open(path, 'r:*') as tf:
-                for member in tf.getmembers():
-                    is_dir = member.isdir()
-                    entry = {
-                        'path': member.name + ('/' if is_dir else ''),
-                        'name': member.name.rstrip('/').split('/')[-1],
-                        'is_dir': is_dir,
-                        'size': member.size,
-                    }
-                    flat_entries.append(entry)
-                    if not is_dir:
-                        total_size += member.size
-                        total_files += 1
+        if archive_type in ('zip', 'tar'):
+            members = get_archive_member_index(path, archive_type)['members']
+            for name, offsets in members.items():
+                is_dir = offsets is None
+                size = 0 if is_dir else offsets[0]
+                entry = {
+                    'path': name + ('/' if is_dir and not name.endswith('/') else ''),
+                    'name': name.rstrip('/').split('/')[-1],
+                    'is_dir': is_dir,
+                    'size': size,
+                }
+                flat_entries.append(entry)
+                if not is_dir:
+                    total_size += size
+                    total_files += 1
         elif archive_type == 'rar':
             import rarfile
             with rarfile.RarFile(path, 'r') as rf:
@@ -2515,8 +3036,148 @@ def list_archive_contents(path: pathlib.Path) -> dict:
     return {'entries': tree, 'total_size': total_size, 'total_files': total_files}
 
 
-def stream_archive_member(archive_path: pathlib.Path, member_path: str) -> Tuple[bytes, str, str]:
-    """Read a single member from an archive and return its bytes, mimetype, and filename.
+@dataclasses.dataclass
+class ArchiveMember:
+    """A file in an archive, which is read in chunks so it is never entirely in memory."""
+    filename: str
+    content_type: str
+    # None if the size is not known until the member is read (a link in a tar).
+    size: Optional[int]
+    # Generates the chunks of the member; `read(start, end)` generates the bytes [start, end) if `seekable`.
+    read: Callable[..., Generator[bytes, None, None]]
+    # The member can be read from any offset without reading what comes before it (HTTP Range requests).
+    seekable: bool = False
+
+    def chunks(self, start: int = 0, end: int = None) -> Generator[bytes, None, None]:
+        if self.seekable:
+            return self.read(start, self.size if end is None else end)
+        if start != 0 or (end is not None and end != self.size):
+            raise ValueError(f'Cannot read a range of {self.filename}')
+        return self.read()
+
+
+def _read_file_range(fh, start: int, end: int) -> Generator[bytes, None, None]:
+    """Read the bytes [start, end) of a member from `fh`, which is at `start`."""
+    remaining = end - start
+    while remaining > 0:
+        chunk = fh.read(min(ARCHIVE_CHUNK_SIZE, remaining))
+        if not chunk:
+            raise UnsupportedArchive('Archive member is truncated')
+        remaining -= len(chunk)
+        yield chunk
+
+
+def _check_crc(chunks: Iterable[bytes], crc: int) -> Generator[bytes, None, None]:
+    checksum = 0
+    for chunk in chunks:
+        checksum = zlib.crc32(chunk, checksum)
+        yield chunk
+    if checksum != crc:
+        raise UnsupportedArchive('Bad CRC-32 of archive member')
+
+
+def _read_zip_member(path: pathlib.Path, offsets: list, start: int = 0, end: int = None) \
+        -> Generator[bytes, None, None]:
+    """Read a stored or deflated member of a zip from its local header, without reading the central directory."""
+    size, header_offset, compress_type, compress_size, crc, _ = offsets
+    end = size if end is None else end
+    with path.open('rb') as fh:
+        fh.seek(header_offset)
+        header = _ZIP_LOCAL_HEADER.unpack(fh.read(_ZIP_LOCAL_HEADER.size))
+        if header[0] != b'PK\x03\x04':
+            raise UnsupportedArchive('Bad zip member header')
+        data_offset = header_offset + _ZIP_LOCAL_HEADER.size + header[9] + header[10]
+
+        if compress_type == zipfile.ZIP_STORED:
+            fh.seek(data_offset + start)
+            chunks = _read_file_range(fh, start, end)
+            yield from _check_crc(chunks, crc) if (start, end) == (0, size) else chunks
+            return
+
+        def inflate():
+            fh.seek(data_offset)
+            decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            try:
+                for data in _read_file_range(fh, 0, compress_size):
+                    # Limit each chunk, a small deflated chunk can inflate to a very large one.
+                    chunk = decompressor.decompress(data, ARCHIVE_CHUNK_SIZE)
+                    while chunk:
+                        yield chunk
+                        chunk = decompressor.decompress(decompressor.unconsumed_tail, ARCHIVE_CHUNK_SIZE)
+                if chunk := decompressor.flush():
+                    yield chunk
+            except zlib.error as e:
+                raise UnsupportedArchive(f'Cannot inflate archive member: {e}') from e
+
+        yield from _check_crc(inflate(), crc)
+
+
+def _read_zipfile_member(path: pathlib.Path, name: str) -> Generator[bytes, None, None]:
+    """Read a member of a zip which is encrypted, or compressed with something other than deflate."""
+    with zipfile.ZipFile(path, 'r') as zf, zf.open(name) as fh:
+        while chunk := fh.read(ARCHIVE_CHUNK_SIZE):
+            yield chunk
+
+
+def _read_tar_member(path: pathlib.Path, compression: str, data_offset: int, size: int, start: int = 0,
+                     end: int = None) -> Generator[bytes, None, None]:
+    """Read a regular file of a tar from its data offset, without reading the headers of the other members.
+
+    A compressed tar must be decompressed up to the member, an uncompressed tar can be read from any offset."""
+    end = size if end is None else end
+    with _TAR_OPENERS[compression](path, 'rb') as fh:
+        fh.seek(data_offset + start)
+        yield from _read_file_range(fh, start, end)
+
+
+def _read_tarfile_member(path: pathlib.Path, name: str) -> Generator[bytes, None, None]:
+    """Read a link (the file it links to) of a tar."""
+    with tarfile.open(path, 'r:*') as tf:
+        fh = tf.extractfile(name)
+        if fh is None:
+            raise InvalidArchiveMember(f'Cannot extract member: {name}')
+        while chunk := fh.read(ARCHIVE_CHUNK_SIZE):
+            yield chunk
+
+
+def _read_rar_member(path: pathlib.Path, name: str) -> Generator[bytes, None, None]:
+    import rarfile
+    with rarfile.RarFile(path, 'r') as rf, rf.open(name) as fh:
+        while chunk := fh.read(ARCHIVE_CHUNK_SIZE):
+            yield chunk
+
+
+def _read_7z_member(path: pathlib.Path, name: str) -> Generator[bytes, None, None]:
+    """py7zr can only extract a member into memory or into a directory, so it is extracted to a temporary directory,
+    then read from there."""
+    import py7zr
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with py7zr.SevenZipFile(path, 'r') as sz:
+            sz.extract(tmpdir, targets=[name])
+        extracted_path = pathlib.Path(tmpdir) / name
+        if not extracted_path.is_file():
+            raise InvalidArchiveMember(f'Cannot extract member: {name}')
+        with extracted_path.open('rb') as fh:
+            while chunk := fh.read(ARCHIVE_CHUNK_SIZE):
+                yield chunk
+
+
+def _find_indexed_member(members: dict, member_path: str) -> Tuple[str, list]:
+    # Directories of a tar are listed with a trailing slash.
+    name = member_path if member_path in members else member_path.rstrip('/')
+    if name not in members:
+        raise InvalidArchiveMember(f'Member not found in archive: {member_path}')
+    if members[name] is None:
+        raise InvalidArchiveMember(f'Cannot download a directory: {member_path}')
+    return name, members[name]
+
+
+def stream_archive_member(archive_path: pathlib.Path, member_path: str) -> ArchiveMember:
+    """Find a single member of an archive; returns an ArchiveMember which reads the member in chunks.
+
+    Zip and tar members are found using the member index of the archive (see `get_archive_member_index`).  Stored zip
+    members and the files of an uncompressed tar can be read from any offset.
 
     Security: validates member_path has no '..' components.
     """
@@ -2537,26 +3198,23 @@ def stream_archive_member(archive_path: pathlib.Path, member_path: str) -> Tuple
 
     try:
         if archive_type == 'zip':
-            with zipfile.ZipFile(archive_path, 'r') as zf:
-                try:
-                    info = zf.getinfo(member_path)
-                except KeyError:
-                    raise InvalidArchiveMember(f'Member not found in archive: {member_path}')
-                if info.is_dir():
-                    raise InvalidArchiveMember(f'Cannot download a directory: {member_path}')
-                file_bytes = zf.read(member_path)
+            members = get_archive_member_index(archive_path, archive_type)['members']
+            name, offsets = _find_indexed_member(members, member_path)
+            size, _, compress_type, _, _, flag_bits = offsets
+            if flag_bits & 0x1 or compress_type not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+                read = functools.partial(_read_zipfile_member, archive_path, name)
+            else:
+                read = functools.partial(_read_zip_member, archive_path, offsets)
+            return ArchiveMember(filename, content_type, size, read,
+                                 seekable=compress_type == zipfile.ZIP_STORED and not flag_bits & 0x1)
         elif archive_type == 'tar':
-            with tarfile.open(archive_path, 'r:*') as tf:
-                try:
-                    member = tf.getmember(member_path)
-                except KeyError:
-                    raise InvalidArchiveMember(f'Member not found in archive: {member_path}')
-                if member.isdir():
-                    raise InvalidArchiveMember(f'Cannot download a directory: {member_path}')
-                f = tf.extractfile(member)
-                if f is None:
-                    raise InvalidArchiveMember(f'Cannot extract member: {member_path}')
-                file_bytes = f.read()
+            index = get_archive_member_index(archive_path, archive_type)
+            name, (size, data_offset) = _find_indexed_member(index['members'], member_path)
+            if data_offset is None:
+                return ArchiveMember(filename, content_type, None,
+                                     functools.partial(_read_tarfile_member, archive_path, name))
+            read = functools.partial(_read_tar_member, archive_path, index['compression'], data_offset, size)
+            return ArchiveMember(filename, content_type, size, read, seekable=not index['compression'])
         elif archive_type == 'rar':
             import rarfile
             with rarfile.RarFile(archive_path, 'r') as rf:
@@ -2566,20 +3224,17 @@ def stream_archive_member(archive_path: pathlib.Path, member_path: str) -> Tuple
                     raise InvalidArchiveMember(f'Member not found in archive: {member_path}')
                 if info.is_dir():
                     raise InvalidArchiveMember(f'Cannot download a directory: {member_path}')
-                file_bytes = rf.read(member_path)
+            return ArchiveMember(filename, content_type, info.file_size,
+                                 functools.partial(_read_rar_member, archive_path, member_path))
         elif archive_type == '7z':
             import py7zr
-            import tempfile
             with py7zr.SevenZipFile(archive_path, 'r') as sz:
-                if member_path not in sz.getnames():
-                    raise InvalidArchiveMember(f'Member not found in archive: {member_path}')
-                with tempfile.TemporaryDirectory() as tmpdir:
-                    sz.extract(tmpdir, targets=[member_path])
-                    extracted_path = pathlib.Path(tmpdir) / member_path
-                    if not extracted_path.is_file():
-                        raise InvalidArchiveMember(f'Cannot extract member: {member_path}')
-                    file_bytes = extracted_path.read_bytes()
+                info = next((i for i in sz.list() if i.filename == member_path), None)
+            if info is None:
+                raise InvalidArchiveMember(f'Member not found in archive: {member_path}')
+            if info.is_directory:
+                raise InvalidArchiveMember(f'Cannot download a directory: {member_path}')
+            return ArchiveMember(filename, content_type, info.uncompressed,
+                                 functools.partial(_read_7z_member, archive_path, member_path))
     except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError) as e:
         raise UnsupportedArchive(f'Cannot read archive: {e}')
-
-    return file_bytes, content_type, filename
@@ -6,9 +6,10 @@ import urllib.parse
 from datetime import datetime
 from typing import List, Type, Optional, Iterable
 
-from sqlalchemy import Column, String, BigInteger, Boolean, event, Index, Integer, JSON
+from sqlalchemy import Column, String, BigInteger, Boolean, event, Index, Integer, JSON, Float, ForeignKey
 from sqlalchemy import types
-from sqlalchemy.orm import deferred, relationship, Session
+from sqlalchemy.ext.associationproxy import association_proxy
+from sqlalchemy.orm import relationship, Session
 
 from wrolpi.common import Base, ModelHelper, logger, recursive_map, get_media_directory, \
     get_relative_to_media_directory, unique_by_predicate, replace_file
@@ -64,6 +65,69 @@ class FancyJSON(types.TypeDecorator):
         return value
 
 
+def resolve_files(directory: Optional[pathlib.Path], files: List[dict], *mimetypes: str) -> List[dict]:
+    """Return copies of the `files` (of a FileGroup) which match any of the provided mimetypes, with their paths
+    resolved using `directory`."""
+    # Create a new list with resolved paths (don't modify files in place)
+    result = []
+    for file_info in files:
+        # Make a copy of each dict to avoid modifying the original
+        file_copy = dict(file_info)
+        path = pathlib.Path(file_info['path'])
+        if not path.is_absolute() and directory:
+            # New format: relative path, resolve using directory
+            file_copy['path'] = directory / path
+        else:
+            # Old format or already absolute: keep as-is
+            file_copy['path'] = path
+        result.append(file_copy)
+
+    if mimetypes:
+        result = list(filter(lambda j: any(j['mimetype'].startswith(m) for m in mimetypes), result))
+
+    if PYTEST:
+        # Sort files to avoid random order during testing.
+        return sorted(result, key=lambda j: j['path'])
+    return result
+
+
+
+def file_group_json(file_group, tags: List[str]) -> dict:
+    """The JSON of a FileGroup.  `file_group` is a FileGroup, or a row with its columns (see
+    `wrolpi.files.lib.hydrate_file_group_search_results`)."""
+    from wrolpi.files.lib import split_path_stem_and_suffix
+
+    if not file_group.files:
+        logger.error(f'FileGroup {file_group.id} has no files!')
+        raise ValueError(f'FileGroup {file_group.id} has no files!')
+
+    primary_path = file_group.primary_path
+    d = dict(
+        author=file_group.author,
+        censored=file_group.censored,
+        data=file_group.data,
+        directory=file_group.directory,
+        download_datetime=file_group.download_datetime,
+        files=resolve_files(file_group.directory, file_group.files),
+        id=file_group.id,
+        key=primary_path,
+        length=file_group.length,
+        mimetype=file_group.mimetype,
+        model=file_group.model,
+        modified=file_group.modification_datetime or None,
+        name=primary_path.name,
+        primary_path=primary_path,
+        published_datetime=file_group.published_datetime,
+        published_modified_datetime=file_group.published_modified_datetime,
+        size=file_group.size,
+        suffix=split_path_stem_and_suffix(primary_path)[1],
+        tags=tags,
+        title=file_group.title,
+        url=file_group.url,
+        viewed=file_group.viewed,
+    )
+    return d
+
 class FileGroup(ModelHelper, Base):
     __tablename__ = 'file_group'
     __table_args__ = (
@@ -117,21 +181,19 @@ class FileGroup(ModelHelper, Base):
 
     tag_files: Iterable[TagFile] = relationship('TagFile', cascade='all')
 
-    # Full-text search over these columns is provided by the external-content FTS5 table
-    # `file_group_fts` (see `wrolpi.fts`): a=title, b=author-ish, c=description, d=body/captions.
-    a_text = deferred(Column(String))
-    b_text = deferred(Column(String))
-    c_text = deferred(Column(String))
-    d_text = deferred(Column(String))
+    # The searched texts live in their own (narrow) table, see `FileGroupText`.
+    texts: Optional['FileGroupText'] = relationship('FileGroupText', uselist=False, cascade='all, delete-orphan',
+                                                    passive_deletes=True)
+    a_text = association_proxy('texts', 'a_text', creator=lambda i: FileGroupText(a_text=i))
+    b_text = association_proxy('texts', 'b_text', creator=lambda i: FileGroupText(b_text=i))
+    c_text = association_proxy('texts', 'c_text', creator=lambda i: FileGroupText(c_text=i))
+    d_text = association_proxy('texts', 'd_text', creator=lambda i: FileGroupText(d_text=i))
 
     def __repr__(self):
         m = f'model={self.model}' if self.model else f'mimetype={self.mimetype}'
         return f'<FileGroup id={self.id} {m} primary_path={repr(str(self.primary_path))}>'
 
     def __json__(self) -> dict:
-        from wrolpi.files.lib import split_path_stem_and_suffix
-        _, suffix = split_path_stem_and_suffix(self.primary_path)
-
         # Get tag names with error handling
         tag_names = []
         for tag_file in self.tag_files:
@@ -144,32 +206,7 @@ class FileGroup(ModelHelper, Base):
                 # Log the error but continue processing other tags
                 logger.error(
                     f"Found TagFile with problematic tag reference in __json__: {tag_file.id if hasattr(tag_file, 'id') else 'unknown'}")
-        tags = sorted(tag_names)
-        d = dict(
-            author=self.author,
-            censored=self.censored,
-            data=self.data,
-            directory=self.directory,
-            download_datetime=self.download_datetime,
-            files=self.my_files(),
-            id=self.id,
-            key=self.primary_path,
-            length=self.length,
-            mimetype=self.mimetype,
-            model=self.model,
-            modified=self.modification_datetime or None,
-            name=self.primary_path.name,
-            primary_path=self.primary_path,
-            published_datetime=self.published_datetime,
-            published_modified_datetime=self.published_modified_datetime,
-            size=self.size,
-            suffix=suffix,
-            tags=tags,
-            title=self.title,
-            url=self.url,
-            viewed=self.viewed,
-        )
-        return d
+        return file_group_json(self, sorted(tag_names))
 
     @property
     def name(self) -> str:
@@ -266,12 +303,19 @@ class FileGroup(ModelHelper, Base):
         Also updates modification_datetime to include the new files.
         """
         from wrolpi.dates import from_timestamp
-        from wrolpi.files.lib import get_mimetype
+        from wrolpi.files.lib import get_mimetype, split_path_stem_and_suffix
         new_files = list(self.files) if self.files else list()
         for path in paths:
             # Store just the filename, not the full path
-            size = path.stat().st_size if path.exists() else None
-            new_files.append(dict(path=path.name, mimetype=get_mimetype(path), size=size))
+            stat = path.stat() if path.exists() else None
+            _, suffix = split_path_stem_and_suffix(path)
+            new_files.append(dict(
+                path=path.name,
+                mimetype=get_mimetype(path),
+                modification_datetime=str(from_timestamp(stat.st_mtime)) if stat else None,
+                size=stat.st_size if stat else None,
+                suffix=suffix,
+            ))
         self.files = unique_by_predicate(new_files, lambda i: i['path'])
         # Update modification_datetime to include the new files' mtimes
         if paths:
@@ -295,27 +339,7 @@ class FileGroup(ModelHelper, Base):
             logger.error(f'{self} has no files!')
             raise ValueError(f'{self} has no files!')
 
-        # Create a new list with resolved paths (don't modify self.files in place)
-        result = []
-        for file_info in self.files:
-            # Make a copy of each dict to avoid modifying the original
-            file_copy = dict(file_info)
-            path = pathlib.Path(file_info['path'])
-            if not path.is_absolute() and self.directory:
-                # New format: relative path, resolve using directory
-                file_copy['path'] = self.directory / path
-            else:
-                # Old format or already absolute: keep as-is
-                file_copy['path'] = path
-            result.append(file_copy)
-
-        if mimetypes:
-            result = list(filter(lambda j: any(j['mimetype'].startswith(m) for m in mimetypes), result))
-
-        if PYTEST:
-            # Sort files to avoid random order during testing.
-            return sorted(result, key=lambda j: j['path'])
-        return result
+        return resolve_files(self.directory, self.files, *mimetypes)
 
     def my_paths(self, *mimetypes: str) -> List[pathlib.Path]:
         return [i['path'] for i in self.my_files(*mimetypes)]
@@ -562,7 +586,7 @@ class FileGroup(ModelHelper, Base):
         """Find a FileGroup that contains the given file path (primary or not).
 
         This method first checks if the path is a primary_path, and if not,
-        searches for a FileGroup where the file is in the files list.
+        searches for a FileGroup where the file is in the files list (see `FileGroupFile`).
         """
 
         path = pathlib.Path(path)
@@ -573,14 +597,12 @@ class FileGroup(ModelHelper, Base):
         if file_group := cls.get_by_path(session, path):
             return file_group
 
-        # Search for FileGroups in the same directory that contain this file
-        file_groups = session.query(FileGroup).filter(FileGroup.directory == directory).all()
-        for fg in file_groups:
-            for file_info in fg.files:
-                if file_info.get('path') == filename:
-                    return fg
-
-        return None
+        # Search for a FileGroup in the same directory that contains this file.
+        file_group = session.query(FileGroup) \
+            .join(FileGroupFile, FileGroupFile.file_group_id == FileGroup.id) \
+            .filter(FileGroupFile.filename == filename, FileGroup.directory == directory) \
+            .first()
+        return file_group
 
     @staticmethod
     def find_by_path(session: Session, path) -> 'FileGroup':
@@ -791,6 +813,49 @@ def update_effective_datetime(mapper, connection, target):
     target.effective_datetime = target.published_datetime or target.download_datetime
 
 
+class FileGroupFile(Base):
+    """One member file of a FileGroup.
+
+    Mirrors `FileGroup.files` so member files can be found by index.  These rows are maintained by the
+    `file_group_file_*` triggers (see `wrolpi.schema_ddl`), never write them directly."""
+    __tablename__ = 'file_group_file'
+    __table_args__ = (
+        Index('file_group_file_filename_idx', 'filename'),
+        Index('file_group_file_mimetype_idx', 'mimetype'),
+        Index('file_group_file_suffix_idx', 'suffix'),
+    )
+
+    file_group_id = Column(BigInteger().with_variant(Integer, 'sqlite'),
+                           ForeignKey('file_group.id', ondelete='CASCADE'), primary_key=True)
+    filename: str = Column(String, primary_key=True)  # relative to FileGroup.directory
+    suffix = Column(String)  # lowercased, e.g. ".info.json"
+    size = Column(BigInteger)
+    mtime: float = Column(Float)  # Unix epoch of the file's modification_datetime
+    mimetype = Column(String)
+
+    def __repr__(self):
+        return f'<FileGroupFile file_group_id={self.file_group_id} filename={repr(self.filename)}>'
+
+
+class FileGroupText(Base):
+    """The texts of a FileGroup which are searched by the external-content FTS5 table `file_group_fts` (see
+    `wrolpi.fts`): a=title, b=author-ish, c=description, d=body/captions.
+
+    These are kept out of `file_group` so its rows stay small; browsing, sorting and filtering FileGroups never read
+    the (large) texts.  Use `FileGroup.a_text` (etc.) to read and write them."""
+    __tablename__ = 'file_group_text'
+
+    # SQLite requires exactly "INTEGER PRIMARY KEY" for the rowid alias (FTS5 content_rowid).
+    file_group_id = Column(Integer, ForeignKey('file_group.id', ondelete='CASCADE'), primary_key=True)
+    a_text = Column(String)
+    b_text = Column(String)
+    c_text = Column(String)
+    d_text = Column(String)
+
+    def __repr__(self):
+        return f'<FileGroupText file_group_id={self.file_group_id}>'
+
+
 class Directory(ModelHelper, Base):
     """A representation of a file directory in the media directory."""
     __tablename__ = 'directory'
@@ -801,6 +866,10 @@ class Directory(ModelHelper, Base):
     path: pathlib.Path = Column(MediaPathType, primary_key=True)
     name: str = Column(String, nullable=False)
     idempotency = Column(TZDateTime, default=lambda: now())
+    # The fast-refresh journal: the directory's mtime, and how many files it held, when it was last listed.
+    # NULL when the directory has never been listed by a fast refresh (or changed while it was listed).
+    mtime: float = Column(Float)
+    child_count: int = Column(Integer)
 
     def __json__(self) -> dict:
         d = dict(
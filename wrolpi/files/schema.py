@@ -31,7 +31,8 @@ class DeleteFileGroupsRequest:
 class FilesSearchRequest:
     search_str: Optional[str] = None
     limit: Optional[int] = 20
-    offset: Optional[int] = 0
+    cursor: Optional[str] = None  # The `next_cursor` of the previous page; pages are fetched by cursor.
+    offset: Optional[int] = None  # Jumps to a page when there is no cursor; otherwise the position of the page.
     mimetypes: List[str] = field(default_factory=list)
     model: Optional[str] = None
     tag_names: List[str] = field(default_factory=list)
@@ -45,6 +46,7 @@ class FilesSearchRequest:
     suffix: Optional[str] = None  # Filter by primary file suffix (e.g. ".bin"), case-insensitive exact match
     path: Optional[str] = None  # Filter by primary_path (case-insensitive partial match)
     deep: bool = False  # When True, search all text including captions/body (d_text)
+    estimate: bool = False  # When True, stop counting the total after many matches
 
     def __post_init__(self):
         if self.any_tag and self.tag_names:
@@ -54,6 +56,7 @@ class FilesSearchRequest:
 @dataclass
 class FilesRefreshRequest:
     paths: Optional[List[str]] = None
+    fast: Optional[bool] = False  # Skip directories which have not changed since the previous fast refresh.
 
 
 @dataclass
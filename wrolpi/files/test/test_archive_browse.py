@@ -3,6 +3,7 @@ import json
 import tarfile
 import zipfile
 from http import HTTPStatus
+from unittest import mock
 
 import pytest
 
@@ -249,3 +250,75 @@ async def test_list_cbz_dir_contents(test_session, async_client, test_directory,
     assert contents['total_files'] == 4
     entry_names = [e['name'] for e in contents['entries']]
     assert 'images' in entry_names
+
+
+@pytest.mark.asyncio
+async def test_download_member_range(test_session, async_client, test_directory):
+    """A range of a stored zip member, or of a file in an uncompressed tar, can be downloaded."""
+    file_content = bytes(range(256)) * 4_000
+    with zipfile.ZipFile(test_directory / 'test.zip', 'w') as zf:
+        zf.writestr('stored.bin', file_content)
+        zf.writestr('deflated.bin', file_content, compress_type=zipfile.ZIP_DEFLATED)
+    with tarfile.open(test_directory / 'test.tar', 'w') as tf:
+        info = tarfile.TarInfo(name='plain.bin')
+        info.size = len(file_content)
+        tf.addfile(info, io.BytesIO(file_content))
+
+    for path, member in (('test.zip', 'stored.bin'), ('test.tar', 'plain.bin')):
+        url = f'/api/files/zip/download?path={path}&member={member}'
+        _, response = await async_client.get(url, headers={'Range': 'bytes=1000-300999'})
+        assert response.status_code == HTTPStatus.PARTIAL_CONTENT
+        assert response.body == file_content[1000:301_000]
+        assert response.headers['Content-Range'] == f'bytes 1000-300999/{len(file_content)}'
+        assert response.headers['Accept-Ranges'] == 'bytes'
+
+        _, response = await async_client.get(url, headers={'Range': 'bytes=-10'})
+        assert response.status_code == HTTPStatus.PARTIAL_CONTENT
+        assert response.body == file_content[-10:]
+
+        _, response = await async_client.get(url, headers={'Range': f'bytes={len(file_content)}-'})
+        assert response.status_code == HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE
+        assert response.headers['Content-Range'] == f'bytes */{len(file_content)}'
+
+    # A deflated member must be read from the start, the whole member is sent.
+    _, response = await async_client.get('/api/files/zip/download?path=test.zip&member=deflated.bin',
+                                         headers={'Range': 'bytes=1000-1999'})
+    assert response.status_code == HTTPStatus.OK
+    assert response.body == file_content
+    assert response.headers['Accept-Ranges'] == 'none'
+    assert response.headers['Content-Length'] == str(len(file_content))
+
+
+@pytest.mark.asyncio
+async def test_archive_member_index(test_session, async_client, test_directory):
+    """The members of an archive are read once, the index is used to find members after the first listing."""
+    from wrolpi.files import lib
+
+    with tarfile.open(test_directory / 'test.tar.gz', 'w:gz') as tf:
+        for name in ('one.txt', 'dir/two.txt'):
+            data = name.encode() * 1_000
+            info = tarfile.TarInfo(name=name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+        directory = tarfile.TarInfo(name='dir')
+        directory.type = tarfile.DIRTYPE
+        tf.addfile(directory)
+        link = tarfile.TarInfo(name='link.txt')
+        link.type, link.linkname = tarfile.SYMTYPE, 'one.txt'
+        tf.addfile(link)
+
+    with mock.patch.object(lib, '_build_archive_member_index', wraps=lib._build_archive_member_index) as build:
+        _, response = await async_client.post('/api/files/zip/contents', content=json.dumps({'path': 'test.tar.gz'}))
+        assert response.status_code == HTTPStatus.OK
+        assert response.json['contents']['total_files'] == 3
+
+        for member, data in (('dir/two.txt', b'dir/two.txt' * 1_000), ('one.txt', b'one.txt' * 1_000),
+                             ('link.txt', b'one.txt' * 1_000)):
+            _, response = await async_client.get(f'/api/files/zip/download?path=test.tar.gz&member={member}')
+            assert response.status_code == HTTPStatus.OK
+            assert response.body == data
+
+        _, response = await async_client.get('/api/files/zip/download?path=test.tar.gz&member=dir/')
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        assert 'INVALID_ARCHIVE_MEMBER' in response.text
+        build.assert_called_once()
@@ -0,0 +1,133 @@
+import os
+import sqlite3
+from http import HTTPStatus
+
+import mock
+import pytest
+
+from wrolpi.files import index_cache, indexers, lib
+from wrolpi.files.models import FileGroup
+
+
+def test_index_cache_key(test_directory, make_files_structure):
+    """The key follows the file's name, size, mtime and contents."""
+    bar, foo = make_files_structure({'foo.txt': 'contents', 'dir/foo.txt': 'contents'})
+    big = test_directory / 'big.bin'
+    big.write_bytes(os.urandom(index_cache.CONTENT_HASH_CHUNK_SIZE * 3))
+    os.utime(bar, (foo.stat().st_atime, foo.stat().st_mtime))
+
+    # A copy (or a move) with the same name is the same key.
+    assert index_cache.get_cache_key('kind', foo) == index_cache.get_cache_key('kind', bar)
+    assert index_cache.get_cache_key('kind', foo) != index_cache.get_cache_key('other', foo)
+
+    key = index_cache.get_cache_key('kind', big)
+    # The end of a large file is hashed.
+    contents = bytearray(big.read_bytes())
+    contents[-1] = (contents[-1] + 1) % 256
+    big.write_bytes(contents)
+    os.utime(big, (key[3], key[3]))
+    assert index_cache.get_cache_key('kind', big) != key
+
+    assert index_cache.get_cache_key('kind', test_directory / 'does not exist') is None
+
+
+def test_index_cache_get_put(test_directory, make_files_structure):
+    bar, foo = make_files_structure(['foo.txt', 'bar.txt'])
+    foo_key, bar_key = index_cache.get_cache_key('kind', foo), index_cache.get_cache_key('kind', bar)
+
+    assert index_cache.get_cached(foo_key) is None
+    index_cache.put_cached(foo_key, ['foo', None])
+    assert index_cache.get_cached(foo_key) == ['foo', None]
+    assert index_cache.get_many_cached({1: foo_key, 2: bar_key, 3: None}) == {1: ['foo', None]}
+
+    stats = index_cache.get_index_cache_stats()
+    assert stats['entries'] == 1
+    assert stats['hits'] == 2
+    assert stats['misses'] == 2
+
+
+def test_index_cache_eviction(test_directory, make_files_structure):
+    """The least recently used entries are evicted when the cache is larger than its limit."""
+    paths = make_files_structure([f'{i}.txt' for i in range(5)])
+    keys = [index_cache.get_cache_key('kind', i) for i in paths]
+    value = 'x' * 98  # 100 bytes as JSON.
+
+    with mock.patch.object(index_cache, 'INDEX_CACHE_MAX_BYTES', 400):
+        for key in keys[:4]:
+            index_cache.put_cached(key, value)
+            index_cache.flush_index_cache()
+        # Use the first entry, so the second is the least recently used.
+        assert index_cache.get_cached(keys[0]) == value
+        index_cache.put_cached(keys[4], value)
+        index_cache.flush_index_cache()
+
+        assert index_cache.get_many_cached(dict(enumerate(keys))).keys() == {0, 3, 4}
+        stats = index_cache.get_index_cache_stats()
+    assert stats['bytes'] == 300
+    assert stats['evictions'] == 2
+
+
+
+def test_index_cache_batches_writes(test_directory, make_files_structure):
+    """Lookups do not wait for the write lock; new entries are written together."""
+    paths = make_files_structure([f'{i}.txt' for i in range(5)])
+    keys = [index_cache.get_cache_key('kind', i) for i in paths]
+    index_cache.put_cached(keys[0], 'zero')
+    index_cache.flush_index_cache()
+
+    # Another process is writing to the cache.
+    other = sqlite3.connect(index_cache.get_index_cache_file(), timeout=0)
+    try:
+        other.isolation_level = None
+        other.execute('BEGIN IMMEDIATE')
+        with mock.patch.object(index_cache, 'INDEX_CACHE_FLUSH_SIZE', 3):
+            assert index_cache.get_cached(keys[0]) == 'zero'
+            index_cache.put_many_cached({keys[1]: 'one', keys[2]: 'two'})
+            # Pending entries are found in this process.
+            assert index_cache.get_many_cached({1: keys[1], 4: keys[4]}) == {1: 'one'}
+            other.execute('ROLLBACK')
+
+            assert other.execute('SELECT COUNT(*) FROM index_cache').fetchone()[0] == 1
+            # The third new entry writes them all.
+            index_cache.put_cached(keys[3], 'three')
+            assert other.execute('SELECT COUNT(*) FROM index_cache').fetchone()[0] == 4
+    finally:
+        other.close()
+
+
+@pytest.mark.asyncio
+async def test_apply_indexers_index_cache(async_client, test_session, make_files_structure, test_wrolpi_config):
+    """Files are not extracted again after the DB is reset."""
+    from wrolpi.common import get_wrolpi_config
+    get_wrolpi_config().indexer_workers = 0
+    bar, foo = make_files_structure({'foo.txt': 'foo contents', 'bar.txt': 'bar contents'})
+
+    async def index(*paths):
+        for path in paths:
+            FileGroup.from_paths(test_session, path)
+        test_session.commit()
+        with mock.patch.object(indexers.TextIndexer, 'create_index', wraps=indexers.TextIndexer.create_index) as m:
+            await lib.apply_indexers()
+        test_session.expire_all()
+        return sorted(i.args[0].name for i in m.call_args_list)
+
+    assert await index(foo) == ['foo.txt']
+
+    # The DB is reset.
+    test_session.query(FileGroup).delete()
+    test_session.commit()
+    assert await index(foo, bar) == ['bar.txt']
+    foo_fg = test_session.query(FileGroup).filter_by(primary_path=foo).one()
+    assert foo_fg.indexed and foo_fg.title == 'foo.txt'
+    assert foo_fg.d_text == 'foo contents'
+
+
+@pytest.mark.asyncio
+async def test_index_cache_stats_api(async_client, test_session, make_files_structure):
+    foo, = make_files_structure(['foo.txt'])
+    index_cache.put_cached(index_cache.get_cache_key('kind', foo), 'value')
+
+    request, response = await async_client.get('/api/files/index_cache')
+    assert response.status_code == HTTPStatus.OK
+    assert response.json['stats']['entries'] == 1
+    assert response.json['stats']['bytes'] == len('"value"')
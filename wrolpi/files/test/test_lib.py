@@ -10,14 +10,17 @@ from uuid import uuid4
 import mock
 import pytest
 from PIL import Image
+from sqlalchemy import text as sa_text
 
 import wrolpi.common
 from modules.videos import Video
 from wrolpi.common import timer, get_wrolpi_config
 from wrolpi.conftest import await_switches
 from wrolpi.dates import now
+from wrolpi.db import get_db_curs, bump_search_generation
 from wrolpi.errors import InvalidFile, UnknownDirectory, FileGroupIsTagged, NoPrimaryFile
 from wrolpi.files import lib, indexers
+from wrolpi.files.index_workers import IndexWorkers
 from wrolpi.files.models import FileGroup, Directory
 from wrolpi.tags import TagFile
 from wrolpi.test.common import only_macos, skip_circleci
@@ -143,6 +146,38 @@ async def test_delete_tagged(await_switches, test_session, test_directory, make_
     assert not (test_directory / 'foo').exists()
 
 
+@pytest.mark.asyncio
+async def test_list_directories_contents_stored(test_session, test_directory, make_files_structure, tag_factory,
+                                                refresh_files, await_switches):
+    """The Tags, and the mimetypes of refreshed files, are read from the DB.  Only new or changed files are read."""
+    tag = await tag_factory()
+    bar, foo = make_files_structure({'dir/foo.txt': 'foo', 'dir/bar.txt': 'bar'})
+    await refresh_files()
+    test_session.query(FileGroup).filter_by(primary_path=str(foo)).one().add_tag(test_session, tag.id)
+    await await_switches()
+    test_session.commit()
+    # The files were not changed, so their mimetypes were not read again.
+    test_session.execute(sa_text("UPDATE file_group_file SET mimetype = 'text/stored'"))
+    baz, = make_files_structure({'dir/baz.txt': 'baz'})
+
+    def get_files() -> dict:
+        lib.clear_mimetype_cache()
+        return lib.list_directories_contents(test_session, ['dir'])['dir/']['children']
+
+    files = get_files()
+    assert files['foo.txt'] == dict(path=pathlib.Path('dir/foo.txt'), size=3, mimetype='text/stored',
+                                    tags=[tag.name])
+    assert files['bar.txt'] == dict(path=pathlib.Path('dir/bar.txt'), size=3, mimetype='text/stored', tags=[])
+    # The new file is not in the DB.
+    assert files['baz.txt']['mimetype'] == 'text/plain'
+
+    # A changed file is read again.
+    bar.write_text('changed')
+    files = get_files()
+    assert files['bar.txt']['mimetype'] == 'text/plain' and files['bar.txt']['size'] == 7
+    assert files['foo.txt']['mimetype'] == 'text/stored'
+
+
 @pytest.mark.asyncio
 async def test_get_tagged_file_groups_by_ids(test_session, test_directory, make_files_structure, tag_factory,
                                              refresh_files, await_switches):
@@ -705,6 +740,50 @@ def test_get_mimetype(example_epub, example_mobi, example_pdf, image_file, video
     assert lib.get_mimetype(video_file) == 'video/mp4'
 
 
+@pytest.mark.asyncio
+async def test_get_mimetype_cache(test_session, test_directory, make_files_structure, refresh_files):
+    """Mimetypes are read from a file once, then again only when the file changes.  Refreshed mimetypes are reused."""
+    info_json, foo = make_files_structure({'foo.txt': 'foo', 'foo.info.json': '{}'})
+    lib.clear_mimetype_cache()
+
+    with mock.patch.object(lib, '_read_mimetype', wraps=lib._read_mimetype) as mock_read_mimetype:
+        assert lib.get_mimetype(foo) == 'text/plain'
+        assert lib.get_mimetype(foo) == 'text/plain'
+        # The suffix is enough.
+        assert lib.get_mimetype(info_json) == 'application/json'
+        assert mock_read_mimetype.call_count == 1
+
+        # The changed file is read again.
+        foo.write_text('')
+        assert lib.get_mimetype(foo) == 'inode/x-empty'
+        assert mock_read_mimetype.call_count == 2
+
+        # The mimetypes stored by the refresh are used.
+        await refresh_files()
+        lib.clear_mimetype_cache()
+        mock_read_mimetype.reset_mock()
+        lib.remember_stored_mimetypes([foo])
+        assert lib.get_mimetype(foo) == 'inode/x-empty'
+        assert lib.get_mimetype(info_json) == 'application/json'
+        mock_read_mimetype.assert_not_called()
+
+
+def test_get_mimetype_suffix(test_directory, make_files_structure):
+    """The suffix decides the mimetype of a non-empty .html file, even when magic reports XHTML as XML."""
+    empty, xhtml = make_files_structure({
+        'page.html': '<?xml version="1.0" encoding="UTF-8"?>\n'
+                     '<html xmlns="http://www.w3.org/1999/xhtml"><head><title>t</title></head>'
+                     '<body><p>page</p></body></html>\n',
+        'empty.html': '',
+    })
+    lib.clear_mimetype_cache()
+
+    assert lib._read_mimetype(xhtml) == 'text/xml'
+    assert lib.get_mimetype(xhtml) == 'text/html'
+    # An empty file is read.
+    assert lib.get_mimetype(empty) == 'inode/x-empty'
+
+
 def test_get_mimetype_stl(test_directory):
     """.stl files should resolve to model/stl regardless of magic's initial guess."""
     stl_path = test_directory / 'example.stl'
@@ -720,7 +799,7 @@ def test_get_mimetype_stl(test_directory):
         'endfacet\n'
         'endsolid cube\n'
     )
-    lib.get_mimetype.cache_clear()
+    lib.clear_mimetype_cache()
     assert lib.get_mimetype(stl_path) == 'model/stl'
 
 
@@ -739,7 +818,7 @@ def test_get_mimetype_3mf(test_directory):
                     '<model unit="millimeter" xml:lang="en-US"'
                     ' xmlns="http://schemas.microsoft.com/3dmanufacturing/core/2015/02">'
                     '<resources/><build/></model>')
-    lib.get_mimetype.cache_clear()
+    lib.clear_mimetype_cache()
     assert lib.get_mimetype(threemf_path) == 'model/3mf'
 
 
@@ -1264,6 +1343,33 @@ async def test_apply_indexers_concurrent_writer(test_session, make_files_structu
     assert all(fg.d_text for fg in file_groups)
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize('workers', [0, 2])
+async def test_apply_indexers_workers(test_session, make_files_structure, test_wrolpi_config, workers):
+    """Text is extracted by `indexer_workers` worker processes, or in this process when it is 0."""
+    paths = make_files_structure({f'file{i}.txt': f'contents {i}' for i in range(25)})
+    paths.append(make_files_structure({'missing.txt': 'deleted before it is indexed'})[0])
+    for path in paths:
+        FileGroup.from_paths(test_session, path)
+    test_session.commit()
+    paths[-1].unlink()
+    get_wrolpi_config().indexer_workers = workers
+
+    with mock.patch.object(IndexWorkers, '_start_worker', autospec=True,
+                           side_effect=IndexWorkers._start_worker) as start_worker, \
+            mock.patch.object(lib, 'PYTEST', False):
+        await lib.apply_indexers()
+    # Workers are only started when needed, and only as many as the setting.
+    assert start_worker.call_count == workers
+
+    test_session.expire_all()
+    file_groups = test_session.query(FileGroup).order_by(FileGroup.primary_path).all()
+    assert len(file_groups) == 26 and all(fg.indexed for fg in file_groups)
+    texts = {fg.primary_path.name: fg.d_text for fg in file_groups}
+    assert texts.pop('missing.txt') is None
+    assert texts == {f'file{i}.txt': f'contents {i}' for i in range(25)}
+
+
 @pytest.mark.asyncio
 async def test_get_bulk_tag_preview_many_files(test_session, make_files_structure, test_directory):
     """Previewing a directory containing well over 1000 files must not fail.
@@ -1641,6 +1747,147 @@ async def test_file_search_url_with_null(test_session, make_files_structure, ref
     assert files[0]['id'] == foo_fg.id
 
 
+@pytest.mark.asyncio
+async def test_search_files_total(test_session, test_directory, make_files_structure, refresh_files):
+    """The total is counted once for all pages of a search, an estimated total stops counting at its limit."""
+    make_files_structure([f'file {i}.txt' for i in range(7)])
+    await refresh_files()
+
+    with mock.patch.object(lib, 'get_db_curs', wraps=lib.get_db_curs) as mock_curs:
+        files, total = lib.search_files('file', 3, 0)
+        assert len(files) == 3 and total == 7
+        # The page, the search generation, then the total.
+        assert mock_curs.call_count == 3
+        # The next pages use the cached total.
+        files, total = lib.search_files('file', 3, 3)
+        assert len(files) == 3 and total == 7
+        files, total = lib.search_files('file', 3, 6)
+        assert len(files) == 1 and total == 7
+        assert mock_curs.call_count == 7
+
+    # A partial page is the total.
+    files, total = lib.search_files('', 10, 0, suffix='.txt')
+    assert len(files) == 7 and total == 7
+    files, total = lib.search_files('', 10, 20, suffix='.txt')
+    assert files == [] and total == 7
+
+    with mock.patch.object(lib, 'SEARCH_TOTAL_ESTIMATE_LIMIT', 4):
+        files, total = lib.search_files('', 2, 0, estimate=True)
+        assert len(files) == 2 and total == 4
+        files, total = lib.search_files('', 2, 4, estimate=True)
+        assert len(files) == 2 and total == 7, 'The estimate always includes the next page'
+        # An exact total was not cached by the estimates.
+        files, total = lib.search_files('', 2, 0)
+        assert total == 7
+
+    # The refresh invalidates the cached totals.
+    (test_directory / 'file 0.txt').unlink()
+    (test_directory / 'file 1.txt').unlink()
+    await refresh_files()
+    files, total = lib.search_files('file', 3, 0)
+    assert total == 5
+
+    # Any write to the searched tables (by any process) invalidates the cached totals.
+    generation = lib.get_search_generation()
+    with get_db_curs(commit=True) as curs:
+        curs.execute("DELETE FROM file_group WHERE primary_path LIKE '%file 2.txt'")
+        bump_search_generation(curs)
+    assert lib.get_search_generation() == generation + 1
+    files, total = lib.search_files('file', 3, 0)
+    assert total == 4
+
+    # A flush of the searched models bumps the generation once, no matter how many rows it writes.
+    generation = lib.get_search_generation()
+    with test_session.no_autoflush:
+        for file_group in test_session.query(FileGroup).filter(FileGroup.primary_path.like('%file%')):
+            test_session.delete(file_group)
+    test_session.commit()
+    assert lib.get_search_generation() == generation + 1
+    files, total = lib.search_files('file', 3, 0)
+    assert total == 0
+
+
+@pytest.mark.asyncio
+async def test_search_files_cursor(test_session, make_files_structure, refresh_files):
+    """Pages fetched by a cursor are the same as pages fetched by an offset."""
+    make_files_structure({f'file {i}.txt': 'file ' * (i % 3 + 1) for i in range(7)})
+    await refresh_files()
+
+    for search_str in ('', 'file'):
+        expected, total = lib.search_files(search_str, 10, 0)
+        assert total == 7
+
+        files, cursor = [], None
+        for _ in range(3):
+            page, total = lib.search_files(search_str, 3, 0, cursor=cursor)
+            assert total == 7
+            files.extend(page)
+            cursor = lib.search_page_next_cursor(page, 3)
+        assert cursor is None
+        assert [i['id'] for i in files] == [i['id'] for i in expected]
+
+    # With the position of its page, the last page fetched by a cursor is the total; it is not counted.
+    page, _ = lib.search_files('file', 3, 0)
+    page, _ = lib.search_files('file', 3, 3, cursor=lib.search_page_next_cursor(page, 3))
+    lib.invalidate_search_total_cache()
+    with mock.patch.object(lib, 'get_db_curs', wraps=lib.get_db_curs) as mock_curs:
+        page, total = lib.search_files('file', 3, 6, cursor=lib.search_page_next_cursor(page, 3))
+    assert len(page) == 1 and total == 7
+    # The page, then the search generation.
+    assert mock_curs.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_hydrate_file_group_search_results(async_client, test_session, make_files_structure, tag_factory,
+                                                 archive_factory, channel_factory, video_factory):
+    """The search results are the same as the JSON of their models."""
+    foo, = make_files_structure({'foo.txt': 'foo'})
+    file_group = FileGroup.from_paths(test_session, foo)
+    tag1, tag2 = await tag_factory(), await tag_factory()
+    file_group.add_tag(test_session, tag2.id)
+    file_group.add_tag(test_session, tag1.id)
+    archive = archive_factory('example.com', 'https://example.com/one')
+    channel = channel_factory(name='Channel')
+    video = video_factory(channel_id=channel.id, with_info_json={'description': 'the description'},
+                          with_poster_ext='jpg', with_caption_file=True)
+    video.file_group.c_text = 'the description'
+    test_session.commit()
+
+    expected = [file_group.__json__(), archive.__json__(), video.__json__()]
+    hydrated = lib.hydrate_file_group_search_results([i['id'] for i in expected])
+    assert [hydrated[i['id']] for i in expected] == expected
+    assert hydrated[file_group.id]['tags'] == sorted([tag1.name, tag2.name])
+    assert hydrated[archive.file_group_id]['archive']['domain'] == 'example.com'
+    assert hydrated[video.file_group_id]['video']['channel'] == dict(id=channel.id, name='Channel')
+
+    assert lib.hydrate_file_group_search_results([]) == dict()
+
+
+@pytest.mark.asyncio
+async def test_hydrate_file_group_search_results_files(async_client, test_session, test_directory, video_file,
+                                                       archive_factory, channel_factory, image_bytes_factory):
+    """The search results read the same files as the JSON of their models: the description of a Video which was not
+    modeled, and the singlefile of an Archive."""
+    info_json = video_file.with_suffix('.info.json')
+    info_json.write_text(json.dumps({'description': 'the description'}))
+    poster = video_file.with_suffix('.jpg')
+    poster.write_bytes(image_bytes_factory())
+    channel = channel_factory(name='Channel')
+    # The Video is not validated (which needs ffprobe), so its description is not in c_text.
+    video = Video(file_group=FileGroup.from_paths(test_session, video_file, info_json, poster),
+                  channel_id=channel.id, source_id='the id', view_count=3)
+    test_session.add(video)
+    archive = archive_factory('example.com', 'https://example.com/one')
+    test_session.commit()
+
+    expected = [video.__json__(), archive.__json__()]
+    hydrated = lib.hydrate_file_group_search_results([i['id'] for i in expected])
+    assert [hydrated[i['id']] for i in expected] == expected
+    assert hydrated[video.file_group_id]['video']['description'] == 'the description'
+    assert hydrated[video.file_group_id]['video']['poster_path'] == poster
+    assert hydrated[archive.file_group_id]['archive']['singlefile_path'] == archive.singlefile_path.name
+
+
 def test_bulk_update_file_groups_reorganize_handles_datetime(test_session, test_directory):
     """_bulk_update_file_groups_reorganize should handle datetime objects in files JSON.
 
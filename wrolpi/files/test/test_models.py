@@ -4,7 +4,7 @@ import pytest
 
 from wrolpi.common import get_wrolpi_config
 from wrolpi.errors import UnknownFile
-from wrolpi.files.models import FileGroup
+from wrolpi.files.models import FileGroup, FileGroupFile
 
 
 def test_file_group_find_by_id(test_session, make_files_structure):
@@ -132,3 +132,30 @@ def test_file_group_update_wrolpi_json_noop_no_metadata_json(test_session, make_
     fg.update_wrolpi_json({'key': 'value'})
     assert not (get_media_directory() / 'video.info.json').exists()
     assert not (get_media_directory() / 'video.readability.json').exists()
+
+
+def test_file_group_file_sync(test_session, test_directory, make_files_structure):
+    """The `file_group_file` rows follow `FileGroup.files` on insert, update and delete."""
+    video, info_json = make_files_structure(['video.mp4', 'video.info.json'])
+    fg = FileGroup.from_paths(test_session, video)
+    test_session.commit()
+
+    def member_files():
+        return sorted((i.filename, i.suffix) for i in test_session.query(FileGroupFile).filter_by(file_group_id=fg.id))
+
+    assert member_files() == [('video.mp4', '.mp4')]
+    assert FileGroup.get_by_any_file_path(test_session, info_json) is None
+
+    fg.append_files(info_json)
+    test_session.commit()
+    assert member_files() == [('video.info.json', '.info.json'), ('video.mp4', '.mp4')]
+    # A non-primary file can be used to find its FileGroup.
+    assert FileGroup.get_by_any_file_path(test_session, info_json) == fg
+    assert FileGroup.get_by_any_file_path(test_session, test_directory / 'other/video.info.json') is None
+    row = test_session.query(FileGroupFile).filter_by(file_group_id=fg.id, filename='video.mp4').one()
+    assert row.size == video.stat().st_size
+    assert abs(row.mtime - video.stat().st_mtime) < 0.01
+
+    test_session.delete(fg)
+    test_session.commit()
+    assert test_session.query(FileGroupFile).count() == 0
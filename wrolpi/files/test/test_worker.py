@@ -1,13 +1,15 @@
 """Tests for the file comparison worker."""
 import asyncio
+import os
 from unittest import mock
 
 import pytest
 from sqlalchemy import text
 
-from wrolpi.conftest import await_switches
+from wrolpi.conftest import await_switches, await_file_worker
 from wrolpi.dates import from_timestamp
 from wrolpi.files.models import FileGroup
+from wrolpi.test.common import skip_macos
 from wrolpi.files.worker import (
     compare_file_groups,
     count_files,
@@ -16,6 +18,7 @@ from wrolpi.files.worker import (
     FileTask,
     FileTaskType,
     FileWorkerJobFailed,
+    FILESYSTEM_SCANNERS,
     QUEUE_STALL_SECONDS,
 )
 
@@ -326,7 +329,7 @@ async def test_compare_file_groups_survives_concurrent_commit(
     make_files_structure(['docs/file1.txt', 'docs/file2.txt'])
 
     from wrolpi.files import worker as worker_mod
-    original = worker_mod._stream_filesystem_paths
+    original = worker_mod.FILESYSTEM_SCANNERS[worker_mod.DEFAULT_FILESYSTEM_SCANNER]
 
     async def commit_after_first(root):
         first = True
@@ -336,7 +339,7 @@ async def test_compare_file_groups_survives_concurrent_commit(
                 first = False
                 test_session.commit()
 
-    with mock.patch.object(worker_mod, '_stream_filesystem_paths', commit_after_first):
+    with mock.patch.dict(worker_mod.FILESYSTEM_SCANNERS, {worker_mod.DEFAULT_FILESYSTEM_SCANNER: commit_after_first}):
         result = await compare_file_groups(test_directory)
 
     assert len(result.new) == 2
@@ -351,7 +354,7 @@ async def test_compare_file_groups_cleans_up_work_table_on_aborted_tx(
     make_files_structure(['docs/file1.txt'])
 
     from wrolpi.files import worker as worker_mod
-    original = worker_mod._stream_filesystem_paths
+    original = worker_mod.FILESYSTEM_SCANNERS[worker_mod.DEFAULT_FILESYSTEM_SCANNER]
 
     async def commit_then_abort_then_raise(root):
         async for p in original(root):
@@ -364,7 +367,8 @@ async def test_compare_file_groups_cleans_up_work_table_on_aborted_tx(
                 pass
             raise RuntimeError('simulated crash mid-scan')
 
-    with mock.patch.object(worker_mod, '_stream_filesystem_paths', commit_then_abort_then_raise):
+    with mock.patch.dict(worker_mod.FILESYSTEM_SCANNERS,
+                         {worker_mod.DEFAULT_FILESYSTEM_SCANNER: commit_then_abort_then_raise}):
         with pytest.raises(RuntimeError):
             await compare_file_groups(test_directory)
 
@@ -506,6 +510,52 @@ async def test_count_files_ignores_relative_directories(test_directory, make_fil
     assert result == 1  # Only docs/file1.txt, config is ignored
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize('scanner', list(FILESYSTEM_SCANNERS))
+async def test_filesystem_scanners(test_directory, make_files_structure, test_wrolpi_config, await_background_tasks,
+                                   scanner):
+    """Every scanner finds the same files, excluding hidden files and ignored directories."""
+    make_files_structure({
+        'docs/file1.txt': 'hello',
+        'docs/file1.info.json': '{}',
+        'docs/.hidden.txt': 'hidden',
+        '.hidden_dir/file2.txt': 'hidden',
+        'ignored_dir/file3.txt': 'ignored',
+        'deep/er/file4.mp4': 'video',
+    })
+    from wrolpi.common import get_wrolpi_config
+    get_wrolpi_config().ignored_directories = [str(test_directory / 'ignored_dir'), str(test_directory / 'config')]
+    await await_background_tasks()
+
+    files = [i async for i in FILESYSTEM_SCANNERS[scanner](test_directory)]
+    assert sorted((directory, filename, stem) for directory, filename, stem, *_ in files) == [
+        (str(test_directory / 'deep/er'), 'file4.mp4', 'file4'),
+        (str(test_directory / 'docs'), 'file1.info.json', 'file1'),
+        (str(test_directory / 'docs'), 'file1.txt', 'file1'),
+    ]
+    if scanner == 'scandir':
+        # The mtime and size are read while listing.
+        stats = {filename: (mtime, size) for _, filename, _, mtime, size in files}
+        file1 = test_directory / 'docs/file1.txt'
+        assert stats['file1.txt'] == (file1.stat().st_mtime, 5)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('scanner', list(FILESYSTEM_SCANNERS))
+async def test_compare_file_groups_scanner_modified(test_session, test_directory, make_files_structure, scanner):
+    """A FileGroup whose file is newer than the DB is modified, whether or not the scanner read the mtime."""
+    file1, = make_files_structure(['docs/file1.txt'])
+    FileGroup.from_paths(test_session, file1)
+    test_session.commit()
+
+    result = await compare_file_groups(test_directory, scanner=scanner)
+    assert len(result.unchanged) == 1 and not result.modified
+
+    os.utime(file1, (file1.stat().st_atime, file1.stat().st_mtime + 10))
+    result = await compare_file_groups(test_directory, scanner=scanner)
+    assert [i.stem for i in result.modified] == ['file1']
+
+
 @pytest.mark.asyncio
 async def test_file_worker_status_during_count(async_client, test_session, test_directory, make_files_structure):
     """FileWorker updates status during counting phase."""
@@ -1804,3 +1854,151 @@ async def test_refresh_sync_skips_post_processing_when_unchanged(async_client, t
         file_worker._apply_post_processing = original
 
     assert called is False, '_apply_post_processing should be skipped when no files changed'
+
+
+def _age_directories(*directories):
+    """Move directory mtimes into the past so a fast refresh trusts (journals) them."""
+    import time
+    past = time.time() - 60
+    for directory in directories:
+        os.utime(directory, (past, past))
+
+
+@pytest.mark.asyncio
+async def test_fast_refresh_skips_unchanged_directories(async_client, test_session, test_directory,
+                                                         make_files_structure):
+    """A fast refresh only lists directories whose mtime changed since the previous fast refresh."""
+    make_files_structure(['one/a.txt', 'one/b.txt', 'two/c.txt', 'two/deep/d.txt'])
+    _age_directories(test_directory, test_directory / 'one', test_directory / 'two', test_directory / 'two/deep')
+
+    # No journal yet, everything is listed.
+    file_worker.queue_refresh([test_directory], fast=True)
+    await await_file_worker()
+    assert test_session.query(FileGroup).count() == 4
+    assert file_worker.status['skipped_directories'] == 0
+
+    curs = test_session.connection().connection.cursor()
+    journal = dict(curs.execute('SELECT path, child_count FROM directory WHERE mtime IS NOT NULL').fetchall())
+    assert journal == {
+        str(test_directory): 0,
+        str(test_directory / 'one'): 2,
+        str(test_directory / 'two'): 1,
+        str(test_directory / 'two/deep'): 1,
+    }
+
+    # A new file deep in the tree is found, though its ancestors are skipped.
+    (test_directory / 'two/deep/e.txt').write_text('e')
+    result = await compare_file_groups(test_directory, fast=True)
+    assert [i.stem for i in result.new] == ['e']
+    assert not result.deleted and not result.modified
+    assert sorted(result.walk.skipped) == [str(test_directory), str(test_directory / 'one'),
+                                           str(test_directory / 'two')]
+    assert result.walk.skipped_files == 3
+
+    # A deleted directory deletes its FileGroups.
+    (test_directory / 'one/a.txt').unlink()
+    (test_directory / 'one/b.txt').unlink()
+    (test_directory / 'one').rmdir()
+    result = await compare_file_groups(test_directory, fast=True)
+    assert sorted(i.stem for i in result.deleted) == ['a', 'b']
+    assert [i.stem for i in result.new] == ['e']
+
+
+@pytest.mark.asyncio
+async def test_fast_refresh_does_not_journal_racy_directories(test_session, test_directory, make_files_structure):
+    """A directory modified moments ago may change again within its mtime tick; it is listed again next time."""
+    make_files_structure(['recent/a.txt'])
+
+    result = await compare_file_groups(test_directory, fast=True)
+    journal = dict((path, mtime) for path, mtime, _ in result.walk.journal)
+    assert journal[str(test_directory / 'recent')] is None
+
+
+@pytest.mark.asyncio
+async def test_fast_refresh_lists_racy_child_of_skipped_directory(async_client, test_session, test_directory,
+                                                                   make_files_structure):
+    """A racy directory is listed by the next fast refresh, even when its parent is skipped."""
+    make_files_structure(['parent/child/a.txt'])
+    _age_directories(test_directory, test_directory / 'parent')
+
+    file_worker.queue_refresh([test_directory], fast=True)
+    await await_file_worker()
+    assert test_session.query(FileGroup).count() == 1
+    curs = test_session.connection().connection.cursor()
+    journal = dict(curs.execute('SELECT path, mtime FROM directory').fetchall())
+    assert journal[str(test_directory / 'parent')] is not None
+    assert journal[str(test_directory / 'parent/child')] is None
+
+    result = await compare_file_groups(test_directory, fast=True)
+    assert str(test_directory / 'parent') in result.walk.skipped
+    assert not result.deleted and not result.new
+
+
+@pytest.mark.asyncio
+@skip_macos
+async def test_fast_refresh_lists_parent_of_non_utf8_directory(async_client, test_session, test_directory,
+                                                                make_files_structure):
+    """A directory which cannot be journaled (its name is not UTF-8) is listed every time, so is its parent."""
+    make_files_structure(['parent/a.txt'])
+    bad_directory = os.fsencode(test_directory / 'parent') + b'/bad\xff'
+    os.mkdir(bad_directory)
+    _age_directories(test_directory, test_directory / 'parent', os.fsdecode(bad_directory))
+
+    result = await compare_file_groups(test_directory, fast=True)
+    journal = dict((path, mtime) for path, mtime, _ in result.walk.journal)
+    assert journal[str(test_directory)] is not None
+    assert journal[str(test_directory / 'parent')] is None
+    assert os.fsdecode(bad_directory) not in journal
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('scanner', list(FILESYSTEM_SCANNERS))
+async def test_compare_file_groups_sql_diff(test_session, test_directory, make_files_structure, scanner):
+    """Comparing in SQL finds the same changes as comparing in Python, without returning unchanged FileGroups."""
+    unchanged, added, removed, touched, deleted, new = make_files_structure([
+        'docs/unchanged.txt',
+        'docs/added.txt',
+        'docs/removed.txt',
+        'docs/touched.txt',
+        'docs/deleted.txt',
+        'other/new.txt',
+    ])
+    (test_directory / 'docs/removed.json').touch()
+    for path in (unchanged, added, removed, touched, deleted):
+        FileGroup.from_paths(test_session, path)
+    test_session.commit()
+    removed_fg = test_session.query(FileGroup).filter_by(primary_path=removed).one()
+    removed_fg.append_files(test_directory / 'docs/removed.json')
+    docs_dir = str(test_directory / 'docs')
+    # Duplicate of the `unchanged` FileGroup, and an empty FileGroup with nothing on disk.
+    test_session.add(FileGroup(directory=docs_dir, primary_path=str(test_directory / 'docs/unchanged.json'), files=[]))
+    test_session.add(FileGroup(directory=docs_dir, primary_path=str(test_directory / 'docs/empty.txt'), files=[]))
+    test_session.commit()
+
+    (test_directory / 'docs/added.json').touch()
+    (test_directory / 'docs/removed.json').unlink()
+    os.utime(touched, (touched.stat().st_atime, touched.stat().st_mtime + 10))
+    deleted.unlink()
+
+    def summarize(result):
+        return dict(
+            new=sorted((i.stem, tuple(sorted(i.fs_files))) for i in result.new),
+            deleted=sorted((i.stem, i.file_group_id) for i in result.deleted),
+            modified=sorted((i.stem, i.file_group_id, tuple(sorted(i.fs_files))) for i in result.modified),
+            unchanged_count=result.unchanged_count,
+        )
+
+    in_python = await compare_file_groups(test_directory, scanner=scanner)
+    in_sql = await compare_file_groups(test_directory, scanner=scanner, sql_diff=True)
+    assert summarize(in_sql) == summarize(in_python)
+    assert in_sql.unchanged == []
+
+    summary = summarize(in_sql)
+    assert summary['new'] == [('new', ('new.txt',))]
+    assert [stem for stem, _ in summary['deleted']] == ['deleted', 'empty', 'unchanged']
+    assert [(stem, files) for stem, _, files in summary['modified']] == [
+        ('added', ('added.json', 'added.txt')),
+        ('removed', ('removed.txt',)),
+        ('touched', ('touched.txt',)),
+    ]
+    assert summary['unchanged_count'] == 1
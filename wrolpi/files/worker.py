@@ -20,7 +20,7 @@ from datetime import datetime, timezone
 from enum import Enum, auto
 from multiprocessing.queues import Queue
 from pathlib import Path
-from typing import AsyncGenerator, Callable, Set, Dict, List, Tuple
+from typing import AsyncGenerator, Callable, Set, Dict, List, Tuple, Generator
 
 from sqlalchemy import text, or_
 
@@ -28,7 +28,7 @@ from wrolpi import flags
 from wrolpi.common import apply_modelers, apply_refresh_cleanup
 from wrolpi.common import get_media_directory, get_wrolpi_config, logger, walk, chunks, unique_by_predicate
 from wrolpi.dates import now
-from wrolpi.db import get_db_session, get_db_curs
+from wrolpi.db import get_db_session, get_db_curs, bump_search_generation
 from wrolpi.errors import NoPrimaryFile
 from wrolpi.events import Events
 from wrolpi.vars import PYTEST
@@ -51,7 +51,12 @@ QUEUE_STALL_SECONDS = 30
 # 0.5s accommodates SD card / FAT32 / exFAT timestamp granularity on Pi 4.
 MTIME_TOLERANCE_SECONDS = 0.5
 
+# A directory whose mtime is this recent when it is listed may change again within the same mtime tick, so a
+# fast refresh does not journal it (it will be listed again next time).  2s covers FAT32's mtime granularity.
+DIRECTORY_JOURNAL_RACY_SECONDS = 2.0
+
 __all__ = [
+    'DirectoryWalk',
     'FileGroupDiff',
     'FileComparisonResult',
     'FileWorkerJobFailed',
@@ -114,6 +119,28 @@ class FileComparisonResult:
     new: list  # FileGroupDiff where is_new
     deleted: list  # FileGroupDiff where is_deleted
     modified: list  # FileGroupDiff where needs_update
+    walk: 'DirectoryWalk' = None  # Only for fast comparisons.
+    # Comparisons in SQL do not materialize unchanged FileGroups, they are only counted.
+    unchanged_count: int = None
+
+    def __post_init__(self):
+        if self.unchanged_count is None:
+            self.unchanged_count = len(self.unchanged)
+
+
+@dataclass
+class DirectoryWalk:
+    """Bookkeeping of a fast (journal-driven) filesystem walk.  See `_walk_changed_directories`."""
+    # Unchanged directories whose files were not listed.
+    skipped: List[str] = field(default_factory=list)
+    # The files in the skipped directories, according to the journal.
+    skipped_files: int = 0
+    # (path, mtime, child_count) of every directory visited; written to the journal after the refresh.
+    journal: List[Tuple[str, float | None, int]] = field(default_factory=list)
+
+    @property
+    def directories(self) -> Set[Path]:
+        return {Path(i[0]) for i in self.journal}
 
 
 def _deduplicate_db_groups(
@@ -290,6 +317,273 @@ async def _stream_filesystem_paths(root: Path) -> AsyncGenerator[str, None]:
             await proc.wait()
 
 
+# Scanners stream a (directory, filename, stem, mtime, size) tuple for every file to be compared.  A scanner which
+# cannot provide the mtime/size yields None for them, and the comparison will stat those files itself.
+
+async def _find_scanner(root: Path, walk_: 'DirectoryWalk' = None) -> AsyncGenerator[tuple, None]:
+    """Scan using the `find` command (see `_stream_filesystem_paths`).  Does not provide mtime/size."""
+    path_gen = _stream_filesystem_paths(root)
+    try:
+        async for path in path_gen:
+            directory, filename = os.path.split(path)
+            stem, _ = split_path_stem_and_suffix(filename)
+            yield directory, filename, stem, None, None
+    finally:
+        await path_gen.aclose()  # Ensure subprocess is killed on cancellation
+
+
+def _scandir_directory(directory: str, subdirectories: list, ignored_directories: Set[str], db_file: str) \
+        -> list[tuple]:
+    """List the files of one directory as scanner tuples, append its subdirectories to `subdirectories`.
+
+    The mtime and size come from the DirEntry's stat, so the files are stat'd once, while they are listed.
+    Excludes hidden files and ignored directories from config, like `_stream_filesystem_paths`."""
+    files = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            name = entry.name
+            if name.startswith('.'):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.path not in ignored_directories:
+                        subdirectories.append(entry.path)
+                elif entry.is_file(follow_symlinks=False) and not entry.path.startswith(db_file):
+                    stat = entry.stat(follow_symlinks=False)
+                    stem, _ = split_path_stem_and_suffix(name)
+                    files.append((directory, name, stem, stat.st_mtime, stat.st_size))
+            except FileNotFoundError:
+                # Deleted while listing.
+                continue
+    return files
+
+
+def _scandir_exclusions() -> Tuple[Set[str], str]:
+    from wrolpi.db import get_db_file
+    return set(_get_normalized_ignored_directories()), str(get_db_file())
+
+
+async def _scandir_scanner(root: Path, walk_: 'DirectoryWalk' = None) -> AsyncGenerator[tuple, None]:
+    """Scan using `os.scandir`, in one pass, without a subprocess."""
+    ignored_directories, db_file = _scandir_exclusions()
+    stack = [str(root)]
+    while stack:
+        directory = stack.pop()
+        try:
+            files = _scandir_directory(directory, stack, ignored_directories, db_file)
+        except OSError as e:
+            logger.warning(f'Unable to list directory: {directory}', exc_info=e)
+            continue
+        for file in files:
+            yield file
+        await asyncio.sleep(0)  # Cancellation yield point
+
+
+async def _journal_scanner(root: Path, walk_: 'DirectoryWalk') -> AsyncGenerator[tuple, None]:
+    """Scan every directory under `root` which changed since it was journaled (see `get_directory_journal`).
+
+    A directory's mtime changes when an entry is created, deleted or renamed within it, so a directory whose
+    mtime matches the journal still holds the same files (and subdirectories) it held when it was last listed;
+    its files are not listed, and its subdirectories are taken from the journal.  Every directory is still
+    stat'd, because a change deep in the tree does not change the mtime of its ancestors.
+
+    Files modified in-place do not change their directory's mtime; only a full refresh will find those.
+
+    A directory which cannot be journaled (it could not be listed, or its path is not UTF-8) would not be found in the
+    journal below its unchanged parent, so its parent is journaled without an mtime, to be listed every time.
+
+    The skipped and listed directories are recorded in `walk_`.
+    """
+    from wrolpi.files.lib import get_directory_journal
+    journal = get_directory_journal(root)
+    ignored_directories, db_file = _scandir_exclusions()
+
+    journaled_children = defaultdict(list)
+    for path in journal:
+        journaled_children[os.path.dirname(path)].append(path)
+
+    racy_after = time.time() - DIRECTORY_JOURNAL_RACY_SECONDS
+    # The directories which were not journaled.
+    unjournaled = set()
+    stack = [str(root)]
+    while stack:
+        directory = stack.pop()
+        try:
+            mtime = os.stat(directory).st_mtime
+        except OSError:
+            # Deleted during the walk.
+            unjournaled.add(directory)
+            continue
+
+        previous = journal.get(directory)
+        if previous and previous[0] is not None and previous[0] == mtime:
+            walk_.skipped.append(directory)
+            walk_.skipped_files += previous[1]
+            walk_.journal.append((directory, mtime, previous[1]))
+            stack.extend(journaled_children[directory])
+            continue
+
+        try:
+            files = _scandir_directory(directory, stack, ignored_directories, db_file)
+        except OSError as e:
+            logger.warning(f'Unable to list directory: {directory}', exc_info=e)
+            unjournaled.add(directory)
+            continue
+        for file in files:
+            yield file
+
+        try:
+            directory.encode('utf-8')
+        except UnicodeEncodeError:
+            # Cannot be stored in the database; this directory will be listed every time.
+            unjournaled.add(directory)
+            continue
+        walk_.journal.append((directory, mtime if mtime < racy_after else None, len(files)))
+        await asyncio.sleep(0)  # Cancellation yield point
+
+    if unjournaled:
+        parents = {os.path.dirname(i) for i in unjournaled}
+        walk_.journal = [(path, None if path in parents else mtime, child_count)
+                         for path, mtime, child_count in walk_.journal]
+
+
+FILESYSTEM_SCANNERS = {
+    'find': _find_scanner,
+    'scandir': _scandir_scanner,
+}
+DEFAULT_FILESYSTEM_SCANNER = 'scandir'
+
+
+def _stem_of(path: str) -> str | None:
+    """SQL function `wrolpi_stem(path)`: the FileGroup stem of a filename (or path)."""
+    if not path:
+        return None
+    stem, _ = split_path_stem_and_suffix(path)
+    return stem
+
+
+def _iterate_sql_diffs(work_conn, table_name: str, root_str: str, skipped_where: str, counts: dict) \
+        -> Generator[Tuple[FileGroupDiff, float | None, float | None], None, None]:
+    """Compare the filesystem work table to the FileGroups under `root_str` entirely in SQL.
+
+    Yields (diff, fs_mtime, db_mtime) only for the FileGroups which may have changed: new, deleted (including
+    duplicates) and modified.  A FileGroup whose files match by name is yielded only if its newest file is newer
+    than the DB, or if the scanner did not provide the mtime (fs_mtime is None; the caller must stat those).  The
+    number of FileGroups which are in both the DB and the filesystem is stored in `counts['matched']`.
+
+    The files of each FileGroup are read from `file_group_file`.  The work tables created here (`<table_name>_db`,
+    `<table_name>_fsg`) are TEMP tables of `work_conn`."""
+    work_conn.connection.create_function('wrolpi_stem', 1, _stem_of, deterministic=True)
+
+    # The FileGroups in the DB, keyed like the filesystem groups.  Duplicates of a (directory, stem) key rank
+    # after the kept FileGroup: prefer the FileGroup which has files, then the highest ID.
+    work_conn.execute(text(f"""
+        CREATE TEMP TABLE {table_name}_db AS
+        SELECT id, directory, stem, is_empty, mtime,
+               ROW_NUMBER() OVER (PARTITION BY directory, stem ORDER BY is_empty, id DESC) AS rank
+        FROM (SELECT fg.id,
+                     fg.directory,
+                     (fg.files IS NULL OR json_array_length(fg.files) = 0)                 AS is_empty,
+                     wrolpi_stem(CASE
+                                     WHEN fg.files IS NULL OR json_array_length(fg.files) = 0
+                                         THEN fg.primary_path
+                                     ELSE json_extract(fg.files, '$[0].path') END)         AS stem,
+                     -- Epoch with sub-second precision; unixepoch() truncates to whole seconds.
+                     COALESCE((julianday(fg.modification_datetime) - 2440587.5) * 86400.0, 0) AS mtime
+              FROM main.file_group fg
+              WHERE fg.directory IS NOT NULL
+                AND (fg.directory = :root OR fg.directory LIKE :root_pattern)
+                AND (fg.files IS NULL OR json_type(fg.files) = 'array')
+                {skipped_where})
+    """), {"root": root_str, "root_pattern": f"{root_str}/%"})
+    work_conn.execute(text(f'CREATE INDEX {table_name}_db_key_idx ON {table_name}_db (directory, stem, rank)'))
+
+    # The filesystem groups, with their newest mtime (NULL if the scanner did not provide every mtime).
+    work_conn.execute(text(f"""
+        CREATE TEMP TABLE {table_name}_fsg AS
+        SELECT directory,
+               stem,
+               COUNT(*)                                                 AS file_count,
+               CASE WHEN COUNT(mtime) = COUNT(*) THEN MAX(mtime) END    AS mtime
+        FROM {table_name}
+        GROUP BY directory, stem
+    """))
+    work_conn.execute(text(f'CREATE UNIQUE INDEX {table_name}_fsg_key_idx ON {table_name}_fsg (directory, stem)'))
+
+    fs_files_sql = f'(SELECT json_group_array(filename) FROM {table_name} fs' \
+                   f' WHERE fs.directory = {{alias}}.directory AND fs.stem = {{alias}}.stem)'
+
+    def load_files(files) -> Set[str]:
+        files = json.loads(files) if isinstance(files, str) else files
+        return {(i['path'] if isinstance(i, dict) else i) for i in files or []}
+
+    # Duplicates are deleted.
+    result = work_conn.execute(text(f"""
+        SELECT d.id, d.directory, d.stem, fg.files
+        FROM {table_name}_db d JOIN main.file_group fg ON fg.id = d.id
+        WHERE d.rank > 1
+    """))
+    for row in result:
+        yield FileGroupDiff(directory=Path(row.directory), stem=row.stem,
+                            db_files=load_files(row.files) or {'__empty__'}, fs_files=set(),
+                            file_group_id=row.id), None, None
+
+    # New: on the filesystem, but not in the DB.
+    result = work_conn.execute(text(f"""
+        SELECT g.directory, g.stem, {fs_files_sql.format(alias='g')} AS fs_files
+        FROM {table_name}_fsg g
+                 LEFT JOIN {table_name}_db d ON d.directory = g.directory AND d.stem = g.stem AND d.rank = 1
+        WHERE d.id IS NULL
+    """))
+    for row in result:
+        yield FileGroupDiff(directory=Path(row.directory), stem=row.stem, fs_files=load_files(row.fs_files)), \
+            None, None
+
+    # Deleted: in the DB, but nothing is on the filesystem (including empty FileGroups).
+    result = work_conn.execute(text(f"""
+        SELECT d.id, d.directory, d.stem, fg.files
+        FROM {table_name}_db d
+                 JOIN main.file_group fg ON fg.id = d.id
+                 LEFT JOIN {table_name}_fsg g ON g.directory = d.directory AND g.stem = d.stem
+        WHERE d.rank = 1
+          AND g.stem IS NULL
+    """))
+    for row in result:
+        yield FileGroupDiff(directory=Path(row.directory), stem=row.stem, db_files=load_files(row.files),
+                            fs_files=set(), file_group_id=row.id), None, None
+
+    # Modified: in both, but the files differ by name, or the newest file is newer than the DB.
+    matched = f"""
+        SELECT d.id,
+               d.directory,
+               d.stem,
+               d.mtime                                                                  AS db_mtime,
+               g.mtime                                                                  AS fs_mtime,
+               g.file_count,
+               (SELECT COUNT(*) FROM main.file_group_file f WHERE f.file_group_id = d.id) AS db_file_count,
+               (SELECT COUNT(*)
+                FROM main.file_group_file f
+                         JOIN {table_name} fs ON fs.directory = d.directory AND fs.filename = f.filename
+                WHERE f.file_group_id = d.id
+                  AND fs.stem = d.stem)                                                 AS matched_count
+        FROM {table_name}_db d
+                 JOIN {table_name}_fsg g ON g.directory = d.directory AND g.stem = d.stem
+        WHERE d.rank = 1
+    """
+    counts['matched'] = work_conn.execute(text(f'SELECT COUNT(*) FROM ({matched})')).scalar()
+    result = work_conn.execute(text(f"""
+        SELECT m.id, m.directory, m.stem, m.db_mtime, m.fs_mtime, fg.files, {fs_files_sql.format(alias='m')} AS fs_files
+        FROM ({matched}) m
+                 JOIN main.file_group fg ON fg.id = m.id
+        WHERE NOT (m.file_count = m.db_file_count AND m.matched_count = m.file_count)
+           OR m.fs_mtime IS NULL
+           OR m.fs_mtime > m.db_mtime + :tolerance
+    """), {"tolerance": MTIME_TOLERANCE_SECONDS})
+    for row in result:
+        yield FileGroupDiff(directory=Path(row.directory), stem=row.stem, db_files=load_files(row.files),
+                            fs_files=load_files(row.fs_files), file_group_id=row.id), row.fs_mtime, row.db_mtime
+
+
 def _datetime_text_to_epoch(value) -> float:
     """Convert a raw DB datetime (TEXT `YYYY-MM-DD HH:MM:SS.ffffff`, UTC) to a Unix epoch.
 
@@ -310,11 +604,11 @@ def _insert_fs_batch(conn, table_name: str, batch: list):
         return
     conn.execute(
         text(f"""
-             INSERT INTO {table_name} (directory, filename, stem)
-             VALUES (:directory, :filename, :stem)
+             INSERT INTO {table_name} (directory, filename, stem, mtime, size)
+             VALUES (:directory, :filename, :stem, :mtime, :size)
              ON CONFLICT DO NOTHING
              """),
-        [{"directory": b[0], "filename": b[1], "stem": b[2]} for b in batch],
+        [{"directory": b[0], "filename": b[1], "stem": b[2], "mtime": b[3], "size": b[4]} for b in batch],
     )
 
 
@@ -322,6 +616,9 @@ async def compare_file_groups(
         root: Path = None,
         batch_size: int = 10000,
         progress_callback: Callable[[int], None] = None,
+        fast: bool = False,
+        scanner: str = None,
+        sql_diff: bool = False,
 ) -> FileComparisonResult:
     """
     Compare FileGroups in DB to filesystem. Memory efficient for Raspberry Pi.
@@ -331,6 +628,15 @@ async def compare_file_groups(
 
     Returns which FileGroups are new, deleted, modified, or unchanged.
 
+    `scanner` names the FILESYSTEM_SCANNERS entry which lists the files (default DEFAULT_FILESYSTEM_SCANNER).
+
+    When `fast` is True, directories which have not changed since they were journaled are skipped (see
+    `_journal_scanner`); their FileGroups are neither listed nor compared.  The caller should write
+    `result.walk.journal` (see `upsert_directory_journal`) after the changes are applied.
+
+    When `sql_diff` is True, the comparison is done in SQL (see `_iterate_sql_diffs`); only the changed
+    FileGroups are returned to Python, unchanged FileGroups are only counted (`result.unchanged` is empty).
+
     This function is async and cancellable - when cancelled, it will terminate
     the subprocess scanning the filesystem.
     """
@@ -350,6 +656,8 @@ async def compare_file_groups(
                                      directory TEXT NOT NULL,
                                      filename  TEXT NOT NULL,
                                      stem      TEXT NOT NULL,
+                                     mtime     REAL,
+                                     size      INTEGER,
                                      PRIMARY KEY (directory, filename)
                                  )
                                  """))
@@ -357,45 +665,93 @@ async def compare_file_groups(
             # Stream filesystem files into work table with stems
             batch = []
             file_count = 0
-            path_gen = _stream_filesystem_paths(root)
+            walk_ = None
+            if fast:
+                walk_ = DirectoryWalk()
+                path_gen = _journal_scanner(root, walk_)
+            else:
+                path_gen = FILESYSTEM_SCANNERS[scanner or DEFAULT_FILESYSTEM_SCANNER](root)
             try:
-                async for path in path_gen:
-                    p = Path(path)
-                    directory = str(p.parent)
-                    filename = p.name
-                    stem, _ = split_path_stem_and_suffix(p)
-                    batch.append((directory, filename, stem))
+                async for file in path_gen:
+                    batch.append(file)
 
                     if len(batch) >= batch_size:
                         _insert_fs_batch(work_conn, table_name, batch)
                         file_count += len(batch)
                         batch = []
                         if progress_callback:
-                            progress_callback(file_count)
+                            # Skipped directories' files count as compared.
+                            progress_callback(file_count + (walk_.skipped_files if walk_ else 0))
                         await asyncio.sleep(0)  # Cancellation yield point
             finally:
-                await path_gen.aclose()  # Ensure subprocess is killed on cancellation
+                await path_gen.aclose()  # Ensure any subprocess is killed on cancellation
 
             if batch:
                 _insert_fs_batch(work_conn, table_name, batch)
                 file_count += len(batch)
 
             logger.info(f'Scanned {file_count} files from filesystem')
+            skipped_where = ''
+            if walk_:
+                logger.info(f'Skipped {len(walk_.skipped)} unchanged directories'
+                            f' ({walk_.skipped_files} files) using the directory journal')
+                # The FileGroups of skipped directories are not compared; they would all be reported deleted.
+                work_conn.execute(text(f'CREATE TEMP TABLE {table_name}_skipped (path TEXT PRIMARY KEY)'))
+                for chunk in chunks(walk_.skipped, batch_size):
+                    work_conn.execute(text(f'INSERT INTO {table_name}_skipped (path) VALUES (:path)'),
+                                      [{'path': i} for i in chunk])
+                skipped_where = f'AND fg.directory NOT IN (SELECT path FROM temp.{table_name}_skipped)'
 
             # Index for fast grouping
             work_conn.execute(
                 text(f"CREATE INDEX IF NOT EXISTS {table_name}_dir_stem_idx ON {table_name}(directory, stem)"))
             work_conn.execute(text(f"ANALYZE {table_name}"))
 
-            # Get filesystem files grouped by (directory, stem)
+            if sql_diff:
+                new, deleted, modified = [], [], []
+                counts = dict(matched=0)
+                for diff, fs_mtime, db_mtime in _iterate_sql_diffs(work_conn, table_name, str(root),
+                                                                   skipped_where, counts):
+                    if diff.is_new:
+                        new.append(diff)
+                    elif diff.needs_update:
+                        modified.append(diff)
+                    elif diff.is_unchanged:
+                        if fs_mtime is None:
+                            # The scanner did not stat the files.
+                            try:
+                                fs_mtime = max((diff.directory / i).stat().st_mtime for i in diff.fs_files)
+                            except (OSError, ValueError):
+                                continue
+                        if fs_mtime > db_mtime + MTIME_TOLERANCE_SECONDS:
+                            modified.append(diff)
+                    else:
+                        deleted.append(diff)
+                # Matched FileGroups which were not modified are unchanged.
+                unchanged_count = counts['matched'] - len(modified)
+                logger.info(
+                    f'Comparison complete: {unchanged_count} unchanged, {len(new)} new, '
+                    f'{len(deleted)} deleted, {len(modified)} modified'
+                )
+                return FileComparisonResult(unchanged=[], new=new, deleted=deleted, modified=modified, walk=walk_,
+                                            unchanged_count=unchanged_count)
+
+            # Get filesystem files grouped by (directory, stem), with the newest mtime of each group (NULL if the
+            # scanner did not provide the mtime of every file).
             fs_groups: Dict[Tuple[str, str], Set[str]] = {}
+            fs_mtimes: Dict[Tuple[str, str], float | None] = {}
             result = work_conn.execute(text(f"""
-                                          SELECT directory, stem, json_group_array(filename) as files
+                                          SELECT directory,
+                                                 stem,
+                                                 json_group_array(filename) as files,
+                                                 CASE WHEN COUNT(mtime) = COUNT(*) THEN MAX(mtime) END as mtime
                                           FROM {table_name}
                                           GROUP BY directory, stem
                                           """))
             for row in result:
-                fs_groups[(row.directory, row.stem)] = set(json.loads(row.files))
+                key = (row.directory, row.stem)
+                fs_groups[key] = set(json.loads(row.files))
+                fs_mtimes[key] = row.mtime
 
             logger.info(f'Found {len(fs_groups)} file groups on filesystem')
 
@@ -405,7 +761,8 @@ async def compare_file_groups(
             root_str = str(root)
             empty_count = 0
 
-            result = session.execute(text("""
+            # The skipped directories only exist in the work connection.
+            result = (work_conn if walk_ else session).execute(text(f"""
                                           SELECT fg.id,
                                                  fg.directory,
                                                  fg.primary_path,
@@ -417,6 +774,7 @@ async def compare_file_groups(
                                           FROM file_group fg
                                           WHERE fg.directory IS NOT NULL
                                             AND (fg.directory = :root OR fg.directory LIKE :root_pattern)
+                                            {skipped_where}
                                           """), {"root": root_str, "root_pattern": f"{root_str}/%"})
 
             for row in result:
@@ -478,11 +836,14 @@ async def compare_file_groups(
                     # Files match by name - check if content changed via mtime
                     # Get max mtime from filesystem files
                     try:
-                        dir_path = Path(directory)
-                        fs_mtime = max(
-                            (dir_path / filename).stat().st_mtime
-                            for filename in fs_files
-                        )
+                        fs_mtime = fs_mtimes.get(key)
+                        if fs_mtime is None:
+                            # The scanner did not stat the files.
+                            dir_path = Path(directory)
+                            fs_mtime = max(
+                                (dir_path / filename).stat().st_mtime
+                                for filename in fs_files
+                            )
                         # If filesystem mtime is newer than DB mtime, content changed
                         if fs_mtime > float(db_mtime) + MTIME_TOLERANCE_SECONDS:
                             modified.append(diff)
@@ -505,6 +866,7 @@ async def compare_file_groups(
                 new=new,
                 deleted=deleted,
                 modified=modified,
+                walk=walk_,
             )
         finally:
             # Closing the dedicated connection drops its TEMP work table.
@@ -790,6 +1152,7 @@ class FileTask:
     job_id: str = None  # Unique ID for tracking completion
     expand_stems: bool = True  # Whether to expand files to their FileGroup stem-mates
     send_events: bool = True  # Whether to notify the user with Events (automatic refreshes set False)
+    fast: bool = False  # Skip directories which have not changed since the previous fast refresh.
     # For reorganize tasks: list of (source_path, dest_path) tuples
     move_mappings: list[tuple[pathlib.Path, pathlib.Path]] = None
     collection_id: int = None  # Collection being reorganized
@@ -835,6 +1198,8 @@ class FileWorker:
             operation_total=0,
             operation_processed=0,
             operation_percent=0,
+            skipped_directories=0,
+            modeling_rates=dict(),
         )
 
     @property
@@ -924,7 +1289,7 @@ class FileWorker:
             return str(path)
 
     def queue_refresh(self, paths: list[pathlib.Path | str], expand_stems: bool = True,
-                      send_events: bool = True) -> str:
+                      send_events: bool = True, fast: bool = False) -> str:
         """Queue a refresh task for background processing.
 
         Args:
@@ -933,6 +1298,8 @@ class FileWorker:
                          Set to False when API users explicitly select specific files.
             send_events: Whether to notify the user with Events.  Automatic refreshes
                          (like a Channel refresh before downloading) set this to False.
+            fast: Skip directories whose mtime has not changed since the previous fast refresh.
+                  Files modified in-place are not found; a full refresh finds those.
 
         Returns:
             A unique job_id that can be used with wait_for_job() to track completion.
@@ -946,6 +1313,7 @@ class FileWorker:
             job_id=job_id,
             expand_stems=expand_stems,
             send_events=send_events,
+            fast=fast,
         )
         self._set_job_status(job_id, 'pending')
         self.public_queue.put_nowait(task)
@@ -1176,17 +1544,22 @@ class FileWorker:
             def update_count(count: int):
                 self.update_status(operation_processed=count)
 
-            # Count files in directories with progress updates + individual files
-            dir_count = await count_files_with_progress(directories, callback=update_count) if directories else 0
+            found_directories = None
+            journal_count = self._count_journaled_files(directories) if task.fast and directories else None
+            if journal_count is not None:
+                # A fast refresh will walk the directories itself, don't walk them twice.
+                dir_count = journal_count
+            else:
+                # Count files in directories with progress updates + individual files
+                dir_count = await count_files_with_progress(directories, callback=update_count) if directories else 0
+                # Find all directories for tracking in the database
+                found_directories = await find_directories(directories) if directories else set()
             file_count = len(files)
             total_count = dir_count + file_count
 
-            # Find all directories for tracking in the database
-            found_directories = await find_directories(directories) if directories else set()
-
             self.update_status(operation_total=total_count, operation_processed=total_count, operation_percent=100)
-            logger.info(
-                f'Counted {total_count} files in {len(task.paths)} paths, found {len(found_directories)} directories')
+            logger.info(f'Counted {total_count} files in {len(task.paths)} paths,'
+                        f' found {len(found_directories or [])} directories')
 
         if task.next_task_type == FileTaskType.refresh:
             next_task = FileTask(
@@ -1198,11 +1571,24 @@ class FileWorker:
                 job_id=task.job_id,
                 expand_stems=task.expand_stems,
                 send_events=task.send_events,
+                fast=task.fast,
             )
             self.private_queue.put_nowait(next_task)
         else:
             self.reset_status()
 
+    @staticmethod
+    def _count_journaled_files(directories: list[pathlib.Path]) -> int | None:
+        """Estimate the files in `directories` from the directory journal.  None if a directory was never journaled."""
+        from wrolpi.files.lib import get_directory_journal
+        count = 0
+        for directory in directories:
+            journal = get_directory_journal(directory)
+            if str(directory.absolute()) not in journal:
+                return None
+            count += sum(child_count for _, child_count in journal.values())
+        return count
+
     async def handle_refresh(self, task: FileTask):
         from wrolpi.errors import UnknownDirectory
 
@@ -1245,6 +1631,7 @@ class FileWorker:
                 task.paths,
                 next_task_type=FileTaskType.refresh,
                 send_events=task.send_events,
+                fast=task.fast,
             )
             self.private_queue.put_nowait(count_task)
             return
@@ -1268,6 +1655,7 @@ class FileWorker:
         # Process files and directories within discovery flag context
         # This covers comparing, upserting, and deleting phases
 
+        dir_result = None
         with flags.file_worker_discovery:
             # Process files directly (fast path)
             # expand_stems controls whether to expand files to their FileGroup stem-mates.
@@ -1295,22 +1683,26 @@ class FileWorker:
                     operation_total=task.count,
                     operation_processed=0,
                     operation_percent=0,
+                    skipped_directories=0,
                 )
                 logger.info(f'Comparing {task.count} files in {len(dir_paths)} directories')
 
                 def on_compare_progress(count: int):
-                    percent = int((count / task.count) * 100) if task.count > 0 else 0
+                    percent = min(int((count / task.count) * 100), 100) if task.count > 0 else 0
                     self.update_status(operation_processed=count, operation_percent=percent)
 
                 root = dir_paths[0] if len(dir_paths) == 1 else None
-                dir_result = await compare_file_groups(root=root, progress_callback=on_compare_progress)
+                dir_result = await compare_file_groups(root=root, progress_callback=on_compare_progress,
+                                                       fast=task.fast, sql_diff=True)
                 if is_global_refresh:
                     Events.send_global_refresh_discovery_completed()
 
                 logger.info(
                     f'Refresh comparison: {len(dir_result.new)} new, {len(dir_result.modified)} modified, '
-                    f'{len(dir_result.deleted)} deleted, {len(dir_result.unchanged)} unchanged'
+                    f'{len(dir_result.deleted)} deleted, {dir_result.unchanged_count} unchanged'
                 )
+                if dir_result.walk:
+                    self.update_status(skipped_directories=len(dir_result.walk.skipped))
 
                 # Process directory results
                 self._cleanup_modified_models(dir_result.modified)
@@ -1322,11 +1714,17 @@ class FileWorker:
 
         # Track directories in the database (use directories found during count phase)
         if dir_paths:
-            from wrolpi.files.lib import upsert_directories
+            from wrolpi.files.lib import upsert_directories, upsert_directory_journal
             parent_directories = set(dir_paths)
-            found_directories = task.found_directories or set()
-            found_directories = found_directories - parent_directories
+            found_directories = task.found_directories
+            if found_directories is None and dir_result and dir_result.walk:
+                # A fast refresh skipped the count's directory search; the walk found them.
+                found_directories = dir_result.walk.directories
+            found_directories = (found_directories or set()) - parent_directories
             upsert_directories(parent_directories, found_directories)
+            if dir_result and dir_result.walk:
+                # Only journal after the changes were applied, a failed refresh must list these directories again.
+                upsert_directory_journal(dir_result.walk.journal)
 
         # Clean up directory entries for deleted paths
         if deleted_paths:
@@ -1442,6 +1840,7 @@ class FileWorker:
                              AND file_group.primary_path != v.new_path''',
                         {'updates': json.dumps([[fg_id, new_path] for fg_id, new_path in valid_updates])}
                     )
+                    bump_search_generation(curs)
 
         # Collect all file paths from the diffs (fast operation, no progress tracking needed)
         all_paths = []
@@ -1631,6 +2030,9 @@ class FileWorker:
                              ''', params)
                 curs.execute('DELETE FROM doc WHERE id IN (SELECT value FROM json_each(:ids))', params)
 
+            if video_ids_to_delete or archive_ids_to_delete or doc_ids_to_delete:
+                bump_search_generation(curs)
+
     def _validate_move_paths(
             self,
             sources: List[pathlib.Path],
@@ -2001,11 +2403,14 @@ class FileWorker:
         """
         from wrolpi.tags import save_tags_config
 
-        def on_modeling_progress(processed: int, total: int):
+        def on_modeling_progress(processed: int, total: int, rates: dict):
             percent = int((processed / total) * 100) if total > 0 else 0
-            self.update_status(operation_total=total, operation_processed=processed, operation_percent=percent)
+            # FileGroups modeled per second by each modeler (e.g. videos/s of the video_modeler).
+            self.update_status(operation_total=total, operation_processed=processed, operation_percent=percent,
+                               modeling_rates=rates)
 
-        self.update_status(status='modeling', operation_total=0, operation_processed=0, operation_percent=0)
+        self.update_status(status='modeling', operation_total=0, operation_processed=0, operation_percent=0,
+                           modeling_rates=dict())
         with flags.file_worker_modeling:
             await apply_modelers(progress_callback=on_modeling_progress)
         if is_global_refresh:
@@ -22,51 +22,60 @@ logger = logger.getChild(__name__)
 TESTING_LOCK = multiprocessing.Event()
 
 FLAG_NAMES = set()
+# The size of the shared array of flags (`app.shared_ctx.flags`), the most Flags which can be defined.
+FLAGS_CAPACITY = 64
 
 
 class Flag:
-    """A simple wrapper around multiprocessing.Event.
+    """A boolean shared by all processes (a byte in the shared memory `app.shared_ctx.flags`, so reading it does not
+    talk to the multiprocessing manager).
 
     This allows synchronization between the App and this API.
 
     This may store its value in the DB table wrolpi_flag."""
 
     def __init__(self, name: str, store_db: bool = False):
+        if name in FLAG_NAMES:
+            raise ValueError(f'Flag {name} is already defined')
+        if len(FLAG_NAMES) >= FLAGS_CAPACITY:
+            raise RuntimeError(f'Cannot define more than {FLAGS_CAPACITY} flags')
         self.name = name
         self.store_db = store_db
+        # Flags are defined on import, before the processes are forked, so every process has the same index.
+        self.index = len(FLAG_NAMES)
         FLAG_NAMES.add(name)
 
     def __repr__(self):
         return f'<Flag {repr(self.name)}>'
 
     def set(self):
-        """Set the multiprocessing.Event for this Flag."""
+        """Set this Flag."""
         if PYTEST and not TESTING_LOCK.is_set():
             # Testing, but the test does not need flags.
             return
 
         from wrolpi.api_utils import api_app
-        api_app.shared_ctx.flags.update({self.name: True})
+        api_app.shared_ctx.flags[self.index] = True
         self._save(True)
 
     def clear(self):
-        """Clear the multiprocessing.Event for this Flag."""
+        """Clear this Flag."""
         if PYTEST and not TESTING_LOCK.is_set():
             # Testing, but the test does not need flags.
             return
 
         from wrolpi.api_utils import api_app
-        api_app.shared_ctx.flags.update({self.name: False})
+        api_app.shared_ctx.flags[self.index] = False
         self._save(False)
 
     def is_set(self):
-        """Return True if this multiprocessing.Event is set."""
+        """Return True if this Flag is set."""
         if PYTEST and not TESTING_LOCK.is_set():
             # Testing, but the test does not need flags.
             return
 
         from wrolpi.api_utils import api_app
-        return api_app.shared_ctx.flags[self.name]
+        return api_app.shared_ctx.flags[self.index]
 
     def __enter__(self):
         if PYTEST and not TESTING_LOCK.is_set():
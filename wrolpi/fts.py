@@ -7,9 +7,10 @@ call sites, and headline/snippet helpers.
 No other module may contain FTS5 syntax (MATCH, bm25, snippet, highlight).
 
 Design notes:
-  * `file_group_fts` mirrors `file_group.a_text..d_text` (external content, so the text is
-    stored once).  `content_rowid` requires `file_group.id` to be a true rowid alias
-    ("INTEGER PRIMARY KEY" exactly) — see the model.
+  * `file_group_fts` mirrors `file_group_text.a_text..d_text` (external content, so the text is
+    stored once).  The texts are kept out of `file_group` so its rows stay small; browse pages
+    never read them.  `content_rowid` requires `file_group_text.file_group_id` to be a true rowid
+    alias ("INTEGER PRIMARY KEY" exactly), and equal to `file_group.id` — see the models.
   * Ranking uses bm25 weights 10/4/2/1 which reproduce Postgres' A/B/C/D tsvector weighting.
     FTS5 `rank` is smaller-is-better (negative); this module always exposes `-rank AS ts_rank`
     so consumers keep the "higher is better" contract of `ts_rank`.
@@ -35,14 +36,27 @@ TOKENIZER = 'porter unicode61'
 # External-content FTS5 tables + the triggers that keep them in sync.
 #
 # The 'delete' command rows in the triggers must reproduce the OLD values exactly; never use
-# INSERT OR REPLACE on file_group/doc_section (its implicit delete corrupts the FTS index),
+# INSERT OR REPLACE on file_group_text/doc_section (its implicit delete corrupts the FTS index),
 # always ON CONFLICT ... DO UPDATE.
 FTS_DDL = [
+    # The content table of `file_group_fts`; must match `wrolpi.files.models.FileGroupText`.  Its rows
+    # are deleted with their FileGroup (ON DELETE CASCADE), which fires `file_group_text_fts_ad`.
+    '''
+    CREATE TABLE IF NOT EXISTS file_group_text (
+        file_group_id INTEGER NOT NULL,
+        a_text VARCHAR,
+        b_text VARCHAR,
+        c_text VARCHAR,
+        d_text VARCHAR,
+        PRIMARY KEY (file_group_id),
+        FOREIGN KEY (file_group_id) REFERENCES file_group (id) ON DELETE CASCADE
+    )
+    ''',
     f'''
     CREATE VIRTUAL TABLE IF NOT EXISTS file_group_fts USING fts5(
         a_text, b_text, c_text, d_text,
-        content='file_group',
-        content_rowid='id',
+        content='file_group_text',
+        content_rowid='file_group_id',
         tokenize='{TOKENIZER}'
     )
     ''',
@@ -51,24 +65,24 @@ FTS_DDL = [
     INSERT INTO file_group_fts(file_group_fts, rank) VALUES('rank', '{FILE_GROUP_BM25_WEIGHTS}')
     ''',
     '''
-    CREATE TRIGGER IF NOT EXISTS file_group_fts_ai AFTER INSERT ON file_group BEGIN
+    CREATE TRIGGER IF NOT EXISTS file_group_text_fts_ai AFTER INSERT ON file_group_text BEGIN
         INSERT INTO file_group_fts(rowid, a_text, b_text, c_text, d_text)
-        VALUES (new.id, new.a_text, new.b_text, new.c_text, new.d_text);
+        VALUES (new.file_group_id, new.a_text, new.b_text, new.c_text, new.d_text);
     END
     ''',
     '''
-    CREATE TRIGGER IF NOT EXISTS file_group_fts_ad AFTER DELETE ON file_group BEGIN
+    CREATE TRIGGER IF NOT EXISTS file_group_text_fts_ad AFTER DELETE ON file_group_text BEGIN
         INSERT INTO file_group_fts(file_group_fts, rowid, a_text, b_text, c_text, d_text)
-        VALUES ('delete', old.id, old.a_text, old.b_text, old.c_text, old.d_text);
+        VALUES ('delete', old.file_group_id, old.a_text, old.b_text, old.c_text, old.d_text);
     END
     ''',
     '''
-    CREATE TRIGGER IF NOT EXISTS file_group_fts_au
-    AFTER UPDATE OF a_text, b_text, c_text, d_text ON file_group BEGIN
+    CREATE TRIGGER IF NOT EXISTS file_group_text_fts_au
+    AFTER UPDATE OF a_text, b_text, c_text, d_text ON file_group_text BEGIN
         INSERT INTO file_group_fts(file_group_fts, rowid, a_text, b_text, c_text, d_text)
-        VALUES ('delete', old.id, old.a_text, old.b_text, old.c_text, old.d_text);
+        VALUES ('delete', old.file_group_id, old.a_text, old.b_text, old.c_text, old.d_text);
         INSERT INTO file_group_fts(rowid, a_text, b_text, c_text, d_text)
-        VALUES (new.id, new.a_text, new.b_text, new.c_text, new.d_text);
+        VALUES (new.file_group_id, new.a_text, new.b_text, new.c_text, new.d_text);
     END
     ''',
     f'''
@@ -110,30 +124,10 @@ def _render_phrase(words: List[str]) -> str:
     return '"' + ' '.join(words) + '"'
 
 
-def translate_websearch(search_str: Optional[str], columns: Optional[Tuple[str, ...]] = None) -> Optional[str]:
-    """Translate a websearch-style query (Postgres `websearch_to_tsquery` semantics) to FTS5.
-
-    Supported semantics: bare words are ANDed, "double quotes" form phrases, `-term` excludes,
-    a bare OR separates groups.  All user tokens end up inside double-quotes so no FTS5 syntax
-    can be injected; the output either parses or is None (nothing usable to search).
-
-    Punctuation is stripped from terms (`C++` -> `"C"`, `e.g.` -> the phrase `"e g"`).  This is
-    NOT lossy relative to the index: the unicode61 tokenizer strips the same punctuation when
-    indexing, so `C++` is stored as the token `c` — exactly as Postgres's `websearch_to_tsquery`
-    ('C++' -> 'c') and `to_tsvector` did.  Punctuation is unsearchable under either engine's
-    default tokenizer; matching it literally would require a custom FTS5 tokenizer.
-
-    `columns` restricts matching to the given FTS columns (the fast/abc path).
-
-    >>> translate_websearch('two words')
-    '("two" AND "words")'
-    >>> translate_websearch('"a phrase" -excluded')
-    '(("a phrase") NOT "excluded")'
-    >>> translate_websearch('cat OR dog')
-    '("cat") OR ("dog")'
-    """
+def _websearch_groups(search_str: Optional[str]) -> List[List[Tuple[bool, List[str]]]]:
+    """Lex a websearch-style query into its OR groups of (negated, words) items."""
     if not search_str or not search_str.strip():
-        return None
+        return []
 
     # Lex into items: quoted phrases (optionally negated) or bare tokens.
     items = []  # (negated: bool, words: List[str])
@@ -147,7 +141,7 @@ def translate_websearch(search_str: Optional[str], columns: Optional[Tuple[str,
         items.append((negated, words))
 
     if not items:
-        return None
+        return []
 
     # Split on OR (websearch: a bare, un-negated, unquoted "or"; we accept any lone "or" token).
     groups: List[List[Tuple[bool, List[str]]]] = [[]]
@@ -158,6 +152,35 @@ def translate_websearch(search_str: Optional[str], columns: Optional[Tuple[str,
             continue
         groups[-1].append((negated, words))
 
+    return groups
+
+
+def translate_websearch(search_str: Optional[str], columns: Optional[Tuple[str, ...]] = None) -> Optional[str]:
+    """Translate a websearch-style query (Postgres `websearch_to_tsquery` semantics) to FTS5.
+
+    Supported semantics: bare words are ANDed, "double quotes" form phrases, `-term` excludes,
+    a bare OR separates groups.  All user tokens end up inside double-quotes so no FTS5 syntax
+    can be injected; the output either parses or is None (nothing usable to search).
+
+    Punctuation is stripped from terms (`C++` -> `"C"`, `e.g.` -> the phrase `"e g"`).  This is
+    NOT lossy relative to the index: the unicode61 tokenizer strips the same punctuation when
+    indexing, so `C++` is stored as the token `c` — exactly as Postgres's `websearch_to_tsquery`
+    ('C++' -> 'c') and `to_tsvector` did.  Punctuation is unsearchable under either engine's
+    default tokenizer; matching it literally would require a custom FTS5 tokenizer.
+
+    `columns` restricts matching to the given FTS columns (the fast/abc path).
+
+    >>> translate_websearch('two words')
+    '("two" AND "words")'
+    >>> translate_websearch('"a phrase" -excluded')
+    '(("a phrase") NOT "excluded")'
+    >>> translate_websearch('cat OR dog')
+    '("cat") OR ("dog")'
+    """
+    groups = _websearch_groups(search_str)
+    if not groups:
+        return None
+
     rendered_groups = []
     for group in groups:
         positives = [_render_phrase(words) for negated, words in group if not negated]
@@ -180,6 +203,20 @@ def translate_websearch(search_str: Optional[str], columns: Optional[Tuple[str,
     return result
 
 
+def websearch_words(search_str: Optional[str]) -> List[List[str]]:
+    """The words of each OR group of a websearch-style query which must be found for the group to match.
+
+    >>> websearch_words('"a phrase" -excluded OR dog')
+    [['a', 'phrase'], ['dog']]
+    """
+    groups = []
+    for group in _websearch_groups(search_str):
+        words = [word for negated, item_words in group if not negated for word in item_words]
+        if words:
+            groups.append(words)
+    return groups
+
+
 @dataclasses.dataclass
 class FileGroupSearch:
     """SQL fragments for joining file_group against its FTS5 table.
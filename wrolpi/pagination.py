@@ -0,0 +1,160 @@
+"""Keyset (cursor) pagination for the search queries.
+
+`LIMIT :limit OFFSET :offset` makes SQLite produce (and then discard) every skipped row, so each page of a search is
+slower than the last.  A cursor is an opaque token holding the sort key of the last row of a page; the next page
+seeks past that key with a WHERE condition, which can use the same index as the ORDER BY.
+
+The orders of the searches are whitelisted ORDER BY strings (see `VIDEO_ORDERS`, `ARCHIVE_ORDERS`); `Keyset` parses
+one, appends the id as a tiebreaker (a keyset must be unique), and builds the SELECT/WHERE/ORDER BY fragments.
+"""
+import base64
+import binascii
+import dataclasses
+import hashlib
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+
+from wrolpi.errors import InvalidCursor
+
+__all__ = ['OrderTerm', 'Keyset', 'parse_order_by']
+
+_DIRECTION_RE = re.compile(r'\s+(ASC|DESC)(?:\s+NULLS\s+(FIRST|LAST))?\s*$', re.IGNORECASE)
+
+
+@dataclasses.dataclass
+class OrderTerm:
+    expression: str
+    descending: bool = False
+    nulls: Optional[str] = None  # 'FIRST' or 'LAST' when explicit.
+
+    @property
+    def nulls_first(self) -> bool:
+        if self.nulls:
+            return self.nulls == 'FIRST'
+        # SQLite considers NULL smaller than any value.
+        return not self.descending
+
+    def __str__(self):
+        nulls = f' NULLS {self.nulls}' if self.nulls else ''
+        return f'{self.expression} {"DESC" if self.descending else "ASC"}{nulls}'
+
+
+def _split_terms(order_by: str) -> List[str]:
+    """Split an ORDER BY on its top-level commas."""
+    terms, depth, start = [], 0, 0
+    for idx, char in enumerate(order_by):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            terms.append(order_by[start:idx])
+            start = idx + 1
+    terms.append(order_by[start:])
+    return [i.strip() for i in terms if i.strip()]
+
+
+def parse_order_by(order_by: str, columns: Dict[str, Optional[str]] = None) -> List[OrderTerm]:
+    """Parse an ORDER BY string into its terms.
+
+    `columns` replaces positional terms (e.g. `2` of `2 DESC`) with the expression of that result column.  A
+    position which maps to None is dropped (e.g. the rank when nothing was searched).
+
+    >>> parse_order_by('2 DESC, fg.effective_datetime DESC NULLS LAST', {'2': 'fts.ts_rank'})
+    [OrderTerm(expression='fts.ts_rank', descending=True, nulls=None), \
+OrderTerm(expression='fg.effective_datetime', descending=True, nulls='LAST')]
+    """
+    columns = columns or dict()
+    terms = []
+    for term in _split_terms(order_by):
+        descending, nulls = False, None
+        if match := _DIRECTION_RE.search(term):
+            descending = match.group(1).upper() == 'DESC'
+            nulls = match.group(2).upper() if match.group(2) else None
+            term = term[:match.start()].strip()
+        if term in columns:
+            term = columns[term]
+            if term is None:
+                continue
+        terms.append(OrderTerm(term, descending, nulls))
+    return terms
+
+
+@dataclasses.dataclass
+class Keyset:
+    """The sort key of a search, and the position (cursor) of a page within it."""
+    terms: List[OrderTerm]
+    values: Optional[list] = None  # The sort key of the last row of the previous page.
+
+    @classmethod
+    def from_order_by(cls, order_by: str, id_expression: str = 'fg.id', columns: Dict[str, Optional[str]] = None,
+                      cursor: str = None) -> 'Keyset':
+        terms = parse_order_by(order_by, columns)
+        if not terms or terms[-1].expression != id_expression:
+            # The id makes every sort key unique.  Follow the direction of the last term so an index on that term
+            # (which ends with the rowid) still provides the order.
+            terms.append(OrderTerm(id_expression, terms[-1].descending if terms else False))
+        keyset = cls(terms)
+        if cursor:
+            keyset.values = keyset.decode(cursor)
+        return keyset
+
+    @property
+    def fingerprint(self) -> str:
+        """Identifies the order; a cursor cannot be used with another order."""
+        order = ', '.join(map(str, self.terms))
+        return hashlib.blake2b(order.encode(), digest_size=4).hexdigest()
+
+    def order_by(self) -> str:
+        return ', '.join(map(str, self.terms))
+
+    def selects(self) -> str:
+        """SELECT fragments providing the sort key of every row (read by `cursor_of`)."""
+        return ''.join(f', {term.expression} AS keyset_{idx}' for idx, term in enumerate(self.terms))
+
+    def where(self) -> Tuple[Optional[str], dict]:
+        """The condition (and its params) selecting only the rows after the cursor, or None without a cursor."""
+        if self.values is None:
+            return None, dict()
+
+        params = dict()
+        alternatives = []
+        equals = []
+        for idx, (term, value) in enumerate(zip(self.terms, self.values)):
+            expression = term.expression
+            if value is None:
+                after = f'{expression} IS NOT NULL' if term.nulls_first else None
+                equal = f'{expression} IS NULL'
+            else:
+                params[f'keyset_{idx}'] = value
+                after = f'{expression} {"<" if term.descending else ">"} :keyset_{idx}'
+                if not term.nulls_first:
+                    after = f'({after} OR {expression} IS NULL)'
+                equal = f'{expression} = :keyset_{idx}'
+            if after:
+                alternatives.append(' AND '.join([*equals, after]))
+            equals.append(equal)
+
+        if not alternatives:
+            # The cursor is the last possible row.
+            return '0', params
+        return '(' + '\n OR '.join(f'({i})' for i in alternatives) + ')', params
+
+    def encode(self, values: list) -> str:
+        data = json.dumps([self.fingerprint, list(values)], separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+    def decode(self, cursor: str) -> list:
+        try:
+            data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            fingerprint, values = json.loads(data)
+        except (binascii.Error, ValueError, TypeError) as e:
+            raise InvalidCursor(f'Invalid cursor: {cursor}') from e
+        if fingerprint != self.fingerprint or not isinstance(values, list) or len(values) != len(self.terms):
+            raise InvalidCursor('The cursor does not belong to this order')
+        return values
+
+    def cursor_of(self, row: dict) -> str:
+        """The cursor which continues after `row` (which must include the columns of `selects`)."""
+        return self.encode([row[f'keyset_{idx}'] for idx in range(len(self.terms))])
@@ -1,6 +1,8 @@
+import asyncio
 import json
 import pathlib
 import re
+import time
 from http import HTTPStatus
 from zoneinfo import ZoneInfo
 
@@ -21,7 +23,7 @@ from modules.videos.api import videos_bp
 from modules.zim.api import zim_bp
 from wrolpi import flags, schema, dates
 from wrolpi import tags
-from wrolpi.api_utils import json_response, api_app
+from wrolpi.api_utils import json_response, api_app, CustomJSONEncoder
 from wrolpi.collections.api import collection_bp
 from wrolpi.common import logger, get_wrolpi_config, wrol_mode_enabled, get_media_directory, \
     wrol_mode_check, native_only, disable_wrol_mode, enable_wrol_mode, get_global_statistics, url_strip_host, \
@@ -31,7 +33,7 @@ from wrolpi.dates import now
 from wrolpi.db import get_db_session
 from wrolpi.downloader import download_manager
 from wrolpi.errors import WROLModeEnabled, InvalidConfig, ValidationError
-from wrolpi.events import get_events, Events
+from wrolpi.events import get_events, Events, get_event_ring
 from wrolpi.files import files_bp
 from wrolpi.files.lib import get_file_statistics, search_file_suggestion_count
 from wrolpi.log_levels import int_to_name
@@ -169,6 +171,7 @@ def get_settings(_: Request):
         'download_wait': wrolpi_config.download_wait,
         'download_window_start': wrolpi_config.download_window_start,
         'download_window_end': wrolpi_config.download_window_end,
+        'ffprobe_workers': wrolpi_config.ffprobe_workers,
         'hotspot_device': wrolpi_config.hotspot_device,
         'hotspot_on_startup': wrolpi_config.hotspot_on_startup,
         'hotspot_password': wrolpi_config.hotspot_password,
@@ -177,6 +180,7 @@ def get_settings(_: Request):
         'check_for_upgrades': wrolpi_config.check_for_upgrades,
         'ignore_outdated_zims': wrolpi_config.ignore_outdated_zims,
         'ignored_directories': ignored_directories,
+        'indexer_workers': wrolpi_config.indexer_workers,
         'log_level': api_app.shared_ctx.log_level.value,
         'map_default_location': wrolpi_config.map_default_location,
         'map_destination': wrolpi_config.map_destination,
@@ -220,6 +224,12 @@ async def update_settings(_: Request, body: schema.SettingsRequest):
     if body.hotspot_password and len(body.hotspot_password) < 8:
         raise InvalidConfig('Hotspot password must be at least 8 characters')
 
+    if body.ffprobe_workers is not None and body.ffprobe_workers < 1:
+        raise InvalidConfig('ffprobe workers must be at least 1')
+
+    if body.indexer_workers is not None and body.indexer_workers < 0:
+        raise InvalidConfig('Indexer workers cannot be negative')
+
     # Remove any keys with None values, then save the config.
     new_config = {k: v for k, v in body.__dict__.items() if v is not None}
     wrolpi_config = get_wrolpi_config()
@@ -613,10 +623,50 @@ async def feed(request: Request, query: schema.EventsRequest):
     # previous request.  The API decides what the time is, just in case the RPi's clock is wrong, or no NTP is
     # available.
     start = now()
+    sequence = get_event_ring().sequence
 
     after = None if query.after in (None, 'None') else dates.strpdate(query.after)
-    events = get_events(after)
-    return json_response(dict(events=events, now=start))
+    after_seq = query.after_seq
+    if after_seq and after_seq > sequence:
+        # The API was restarted, the client has not seen any of the events.
+        after_seq = 0
+    # The sequence is more precise than the date, use it when the client sent it.
+    events = get_events(None if after_seq is not None else after, after_seq)
+    return json_response(dict(events=events, now=start, sequence=sequence))
+
+
+# How often the event stream checks for new events, and sends a comment to keep the connection alive.
+EVENTS_STREAM_INTERVAL = 0.5
+EVENTS_STREAM_KEEPALIVE = 15
+# The stream ends after this many seconds, the browser reconnects (with the `Last-Event-ID` of the last event).
+EVENTS_STREAM_DURATION = 300
+
+
+@api_bp.get('/events/stream')
+@openapi.description('Stream new events as Server-Sent Events.  Reconnecting clients send the `Last-Event-ID` header'
+                     ' (or `after_seq`) to receive the events they missed.')
+async def events_stream(request: Request):
+    ring = get_event_ring()
+    after_seq = request.headers.get('Last-Event-ID') or request.args.get('after_seq')
+    after_seq = int(after_seq) if after_seq and after_seq.isdigit() else ring.sequence
+    if after_seq > ring.sequence:
+        # The API was restarted, the client has not seen any of the events.
+        after_seq = 0
+
+    stream = await request.respond(content_type='text/event-stream', headers={'Cache-Control': 'no-cache'})
+    await stream.send('retry: 5000\n\n')
+    start = last_sent = time.monotonic()
+    while time.monotonic() - start < EVENTS_STREAM_DURATION:
+        if events := ring.read(after_seq):
+            message = ''.join(f'id: {i["seq"]}\ndata: {json.dumps(i, cls=CustomJSONEncoder)}\n\n' for i in events)
+            await stream.send(message)
+            after_seq = events[-1]['seq']
+            last_sent = time.monotonic()
+        elif time.monotonic() - last_sent >= EVENTS_STREAM_KEEPALIVE:
+            await stream.send(': keepalive\n\n')
+            last_sent = time.monotonic()
+        await asyncio.sleep(EVENTS_STREAM_INTERVAL)
+    await stream.eof()
 
 
 @api_bp.get('/tag')
@@ -23,6 +23,7 @@ class SettingsResponse:
     download_wait: int
     download_window_start: Optional[str]
     download_window_end: Optional[str]
+    ffprobe_workers: int
     hotspot_device: str
     hotspot_on_startup: bool
     hotspot_password: str
@@ -35,6 +36,7 @@ class SettingsResponse:
     check_for_upgrades: bool
     ignore_outdated_zims: bool
     ignored_directories: List[str]
+    indexer_workers: int
     # A Python logging integer (INFO is 20), not a name.  Declared `str` here while
     # SettingsRequest.log_level already said int, and the frontend converts it numerically --
     # so the fixture was carrying 'info', which fromApiLogLevel() maps to undefined.
@@ -88,6 +90,7 @@ class SettingsRequest:
     download_wait: Optional[int] = None
     download_window_start: Optional[str] = None
     download_window_end: Optional[str] = None
+    ffprobe_workers: Optional[int] = None
     hotspot_device: Optional[str] = None
     hotspot_on_startup: Optional[bool] = None
     hotspot_password: Optional[str] = None
@@ -95,6 +98,7 @@ class SettingsRequest:
     hotspot_status: Optional[bool] = None
     check_for_upgrades: Optional[bool] = None
     ignore_outdated_zims: Optional[bool] = None
+    indexer_workers: Optional[int] = None
     log_level: Optional[int] = None
     map_destination: Optional[str] = None
     nav_color: Optional[str] = None
@@ -202,6 +206,12 @@ class DiskBandwidthStatusStat:
     speed: int
 
 
+@dataclass
+class MapSearchProgressStat:
+    name: str
+    percent: int
+
+
 @dataclass
 class DownloadsSummaryResponse:
     """`DownloadManager.get_summary()`, which /api/status returns as `downloads`.
@@ -254,6 +264,8 @@ class StatusResponse:
     git_branch: Optional[str]
     latest_commit: Optional[str]
     update_available: bool
+    # Progress of the map search index build, seeded in contexts.py; None when no build is running.
+    map_search_progress: Optional[MapSearchProgressStat]
 
 
 @dataclass
@@ -410,6 +422,7 @@ class JSONErrorResponse:
 @dataclass
 class EventsRequest:
     after: Optional[str] = None
+    after_seq: Optional[int] = None  # The `sequence` of the previous response.
 
 
 @dataclass
@@ -11,6 +11,57 @@ so tests exercise exactly the schema production runs.
 All statements are idempotent (IF NOT EXISTS).
 """
 
+# `file_group_file` mirrors the JSON `file_group.files` column, one row per member file, so member files can be
+# found by index.  `files` remains the source of truth; these triggers rebuild a FileGroup's rows whenever its
+# `files` are written (by the ORM or raw SQL).  Rows are deleted by the foreign key (ON DELETE CASCADE).
+#
+# `j` is an element of `json_each(file_group.files)`; elements which are not objects are ignored.
+FILE_GROUP_FILE_SELECT = '''
+    SELECT {file_group_id},
+           json_extract(j.value, '$.path'),
+           lower(json_extract(j.value, '$.suffix')),
+           json_extract(j.value, '$.size'),
+           (julianday(json_extract(j.value, '$.modification_datetime')) - 2440587.5) * 86400.0,
+           json_extract(j.value, '$.mimetype')
+    FROM json_each(CASE
+                       WHEN json_valid({files}) AND json_type({files}) = 'array' THEN {files}
+                       ELSE '[]' END) j
+    WHERE j.type = 'object'
+      AND json_extract(j.value, '$.path') IS NOT NULL
+'''
+
+# `search_generation` counts the writes of the tables searches count (see `wrolpi.files.lib.get_search_total`).  The
+# generation is part of the key of a cached total, so a total cached by any process is not used after any process
+# (the file worker, an upload, a tag) writes one of these tables.  The generation is bumped once by each write
+# transaction (or batch) of these tables, never by a row trigger (see `wrolpi.db.bump_search_generation`).
+SEARCH_GENERATION_TABLES = ('file_group', 'file_group_text', 'tag_file', 'tag', 'video', 'archive', 'channel',
+                            'collection')
+SEARCH_GENERATION_DDL = [
+    'CREATE TABLE IF NOT EXISTS search_generation (id INTEGER PRIMARY KEY CHECK (id = 1), generation INTEGER NOT NULL)',
+    'INSERT OR IGNORE INTO search_generation (id, generation) VALUES (1, 0)',
+]
+SEARCH_GENERATION_BUMP = 'UPDATE search_generation SET generation = generation + 1 WHERE id = 1'
+
+FILE_GROUP_FILE_TRIGGER_DDL = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS file_group_file_insert
+    AFTER INSERT ON file_group WHEN new.files IS NOT NULL
+    BEGIN
+        INSERT OR IGNORE INTO file_group_file (file_group_id, filename, suffix, size, mtime, mimetype)
+        {FILE_GROUP_FILE_SELECT.format(file_group_id='new.id', files='new.files')};
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS file_group_file_update
+    AFTER UPDATE OF files ON file_group WHEN old.files IS NOT new.files
+    BEGIN
+        DELETE FROM file_group_file WHERE file_group_id = new.id;
+        INSERT OR IGNORE INTO file_group_file (file_group_id, filename, suffix, size, mtime, mimetype)
+        {FILE_GROUP_FILE_SELECT.format(file_group_id='new.id', files='new.files')};
+    END
+    ''',
+]
+
 # Triggers maintaining the summary columns `channel.video_count`, `channel.total_size`,
 # `channel.minimum_frequency` and `file_group.effective_datetime`.
 #
@@ -124,6 +175,7 @@ TRIGGER_DDL = [
         WHERE id = new.id;
     END
     ''',
+    *FILE_GROUP_FILE_TRIGGER_DDL,
 ]
 
 
@@ -134,5 +186,5 @@ def install_raw_ddl(conn):
     `sqlite3.Connection`.  Idempotent."""
     from wrolpi import fts
 
-    for statement in [*TRIGGER_DDL, *fts.FTS_DDL]:
+    for statement in [*TRIGGER_DDL, *fts.FTS_DDL, *SEARCH_GENERATION_DDL]:
         conn.execute(statement)
@@ -15,10 +15,14 @@ Usage:
     # Customize max zoom (default 10, higher = more POIs but slower):
     python scripts/build_map_search.py test/map/usa.pmtiles --max-zoom 12
 
+    # Merge the indexes of all regions in a directory, so a search reads one index:
+    python scripts/build_map_search.py test/map/ --merge-only
+
 Requirements:
     - tippecanoe-decode (part of felt/tippecanoe) installed and on PATH
 """
 import argparse
+import codecs
 import json
 import os
 import re
@@ -36,6 +40,20 @@ SEARCHABLE_LAYERS = {'places', 'pois'}
 MIN_ZOOM = 2
 DEFAULT_MAX_ZOOM = 10
 
+# The decoded GeoJSON is read this many bytes at a time, and features are inserted this many at a time.
+READ_CHUNK_SIZE = 1024 * 1024
+FEATURE_BATCH_SIZE = 5_000
+
+# Features are the values of the `features` of the layer FeatureCollections, which are nested in the tile
+# FeatureCollections, which are nested in the top FeatureCollection.
+LAYER_DEPTH = 2
+
+# All regions of the map directory merged into one search database by `build_merged_index`.  This does not match
+# `*.search.db`, so it is not searched as a region.
+MERGED_INDEX_NAME = 'merged-search-index.db'
+
+WHITESPACE_RE = re.compile(r'[ \t\n\r]*')
+
 # Planet files are too large to process — they should use regional extracts instead.
 PLANET_RE = re.compile(r'^\d{8}$')
 
@@ -46,10 +64,151 @@ def is_planet_file(name):
     return stem.startswith('planet-') or bool(PLANET_RE.match(stem))
 
 
-def extract_features(pmtiles_path, source_name, min_zoom, max_zoom):
+class _JSONStream:
+    """Reads a JSON document from a binary file one value at a time.
+
+    Only the unread part of the current chunk (plus the value being decoded) is held in memory."""
+
+    def __init__(self, file, chunk_size: int = None, on_read=None):
+        self.file = file
+        self.on_read = on_read
+        self.chunk_size = chunk_size or READ_CHUNK_SIZE
+        self.bytes_read = 0
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        """Read the next chunk; return False at the end of the file."""
+        chunk = self.file.read(self.chunk_size)
+        self.bytes_read += len(chunk)
+        self.eof = not chunk
+        if self.on_read:
+            self.on_read(self.bytes_read)
+        self.buffer = self.buffer[self.pos:] + self._text.decode(chunk, final=self.eof)
+        self.pos = 0
+        return not self.eof
+
+    def peek(self) -> str:
+        """Skip whitespace, return the next character ('' at the end of the file)."""
+        while True:
+            self.pos = WHITESPACE_RE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, *chars: str) -> str:
+        """Consume the next character, which must be one of `chars`."""
+        char = self.peek()
+        if char not in chars:
+            raise ValueError(f'Expected one of {chars} but found {char!r} near byte {self.bytes_read}')
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self.buffer, self.pos)
+                # A number at the end of the buffer may continue in the next chunk.
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+
+def _iter_collection(stream: _JSONStream, depth: int):
+    """Yield (layer_name, feature) from the FeatureCollection at the stream's position."""
+    layer_name = ''
+    stream.expect('{')
+    if stream.peek() == '}':
+        stream.expect('}')
+        return
+    while True:
+        key = stream.value()
+        stream.expect(':')
+        if key == 'features' and stream.peek() == '[':
+            stream.expect('[')
+            if stream.peek() == ']':
+                stream.expect(']')
+            else:
+                while True:
+                    if depth < LAYER_DEPTH:
+                        yield from _iter_collection(stream, depth + 1)
+                    else:
+                        yield layer_name, stream.value()
+                    if stream.expect(',', ']') == ']':
+                        break
+        elif key == 'properties':
+            properties = stream.value()
+            if isinstance(properties, dict):
+                layer_name = properties.get('layer', '')
+        else:
+            stream.value()
+        if stream.expect(',', '}') == '}':
+            return
+
+
+def iter_layer_features(file, on_read=None):
+    """Yield (layer_name, feature) for every feature of the nested GeoJSON output of tippecanoe-decode, without
+    loading the whole document.  `on_read` is called with the count of bytes read after each chunk.
+
+    Structure: FeatureCollection > tile FeatureCollections > layer FeatureCollections > features.
+    """
+    stream = _JSONStream(file, on_read=on_read)
+    if stream.peek():
+        yield from _iter_collection(stream, 0)
+
+
+def feature_row(layer_name, feature, source_name):
+    """Convert a decoded feature to a `places` row, or None if it is not searchable.
+
+    Returns a (name, kind, lat, lon, min_zoom, source, kind_detail, population, wikidata) tuple.
+    """
+    props = feature.get('properties', {})
+    name = props.get('name')
+    if not name:
+        return None
+
+    geom = feature.get('geometry', {})
+    coords = geom.get('coordinates')
+    if not coords:
+        return None
+
+    kind = props.get('kind', layer_name)
+    kind_detail = props.get('kind_detail', '')
+    population = props.get('population')
+    wikidata = props.get('wikidata', '')
+    min_z = props.get('min_zoom', 0)
+
+    # tippecanoe-decode outputs [lon, lat] in real coordinates.
+    geom_type = geom.get('type')
+    if geom_type == 'Point':
+        lon, lat = coords[0], coords[1]
+    elif geom_type == 'MultiPoint' and coords:
+        lon, lat = coords[0][0], coords[0][1]
+    elif geom_type == 'Polygon' and coords and coords[0]:
+        ring = coords[0]
+        lon = sum(c[0] for c in ring) / len(ring)
+        lat = sum(c[1] for c in ring) / len(ring)
+    else:
+        return None
+
+    return name, kind, round(lat, 6), round(lon, 6), min_z, source_name, kind_detail, population, wikidata
+
+
+def extract_features(pmtiles_path, source_name, min_zoom, max_zoom, progress=None):
     """Extract place/POI features from a PMTiles file using tippecanoe-decode.
 
-    Returns a list of (name, kind, lat, lon, min_zoom, source, kind_detail, population, wikidata) tuples.
+    Yields (name, kind, lat, lon, min_zoom, source, kind_detail, population, wikidata) tuples as the decoded
+    GeoJSON is read.  `progress`, if provided, is called with the fraction (0.0-1.0) of the GeoJSON read.
     """
     layers_args = []
     for layer in sorted(SEARCHABLE_LAYERS):
@@ -69,7 +228,7 @@ def extract_features(pmtiles_path, source_name, min_zoom, max_zoom):
     # Stream tippecanoe-decode stdout to a temp file instead of capturing into RAM.
     # The decoded GeoJSON for regional PMTiles can reach hundreds of MB, which would
     # exhaust memory on a Raspberry Pi if held as a Python string alongside the
-    # parsed dict (see PR #405 review).
+    # parsed dict (see PR #405 review).  The file is then parsed one feature at a time.
     tmp_fd, tmp_path = tempfile.mkstemp(suffix='.json', prefix='tippecanoe-decode-')
     try:
         with os.fdopen(tmp_fd, 'w') as out:
@@ -80,75 +239,44 @@ def extract_features(pmtiles_path, source_name, min_zoom, max_zoom):
         elapsed = time.time() - t0
         print(f'  tippecanoe-decode completed in {elapsed:.1f}s', flush=True)
 
-        # Parse the nested GeoJSON output.
-        # Structure: FeatureCollection > tile FeatureCollections > layer FeatureCollections > features.
         t0 = time.time()
-        with open(tmp_path) as f:
-            fc = json.load(f)
+        total_size = os.path.getsize(tmp_path) or 1
+        on_read = (lambda bytes_read: progress(min(bytes_read / total_size, 1.0))) if progress else None
+        count = 0
+        with open(tmp_path, 'rb') as f:
+            for layer_name, feature in iter_layer_features(f, on_read):
+                if layer_name not in SEARCHABLE_LAYERS or not isinstance(feature, dict):
+                    continue
+                row = feature_row(layer_name, feature, source_name)
+                if row:
+                    count += 1
+                    yield row
     finally:
         try:
             os.unlink(tmp_path)
         except OSError:
             pass
 
-    seen = set()
-    features = []
-
-    for tile_fc in fc.get('features', []):
-        for layer_fc in tile_fc.get('features', []):
-            layer_name = layer_fc.get('properties', {}).get('layer', '')
-            if layer_name not in SEARCHABLE_LAYERS:
-                continue
-
-            for feature in layer_fc.get('features', []):
-                props = feature.get('properties', {})
-                name = props.get('name')
-                if not name:
-                    continue
-
-                geom = feature.get('geometry', {})
-                coords = geom.get('coordinates')
-                if not coords:
-                    continue
+    elapsed = time.time() - t0
+    print(f'  Parsed {count} features ({elapsed:.1f}s)', flush=True)
 
-                kind = props.get('kind', layer_name)
-                kind_detail = props.get('kind_detail', '')
-                population = props.get('population')
-                wikidata = props.get('wikidata', '')
-                min_z = props.get('min_zoom', 0)
-
-                # tippecanoe-decode outputs [lon, lat] in real coordinates.
-                geom_type = geom.get('type')
-                if geom_type == 'Point':
-                    lon, lat = coords[0], coords[1]
-                elif geom_type == 'MultiPoint' and coords:
-                    lon, lat = coords[0][0], coords[0][1]
-                elif geom_type == 'Polygon' and coords and coords[0]:
-                    ring = coords[0]
-                    lon = sum(c[0] for c in ring) / len(ring)
-                    lat = sum(c[1] for c in ring) / len(ring)
-                else:
-                    continue
 
-                lat = round(lat, 6)
-                lon = round(lon, 6)
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
-                # Deduplicate: same name+kind within ~1.1km collapses to one entry.
-                # When a duplicate is found, keep the one with higher population (more data).
-                key = (name, kind, round(lat, 2), round(lon, 2))
-                if key not in seen:
-                    seen.add(key)
-                    features.append((name, kind, lat, lon, min_z, source_name, kind_detail, population, wikidata))
 
-    elapsed = time.time() - t0
-    print(f'  Parsed {len(features)} unique features ({elapsed:.1f}s)', flush=True)
-    return features
+PLACES_COLUMNS = 'name, kind, lat, lon, min_zoom, source, kind_detail, population, wikidata, region'
 
 
-def write_search_db(features, output_path):
-    """Write features to a SQLite FTS5 database."""
-    conn = sqlite3.connect(str(output_path))
-    conn.execute('PRAGMA journal_mode=WAL')
+def create_places_tables(conn):
+    """Create the `places` table of a search database, and its (empty) search indexes."""
     conn.execute("""
         CREATE TABLE places (
             id INTEGER PRIMARY KEY,
@@ -169,15 +297,122 @@ def write_search_db(features, output_path):
             name, kind, content=places, content_rowid=id
         )
     """)
+    # Substrings of names, used by the fuzzy (LIKE '%query%') search when no name starts with the query.
+    conn.execute("""
+        CREATE VIRTUAL TABLE places_trigram USING fts5(
+            name, content=places, content_rowid=id, tokenize='trigram', detail=none
+        )
+    """)
+    # The coordinates of places, for searches near a location.
+    conn.execute('CREATE VIRTUAL TABLE places_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon)')
+    # Deduplicate: same name+kind within ~1.1km collapses to one entry.  Only needed while building.
+    conn.execute('CREATE UNIQUE INDEX places_dedup ON places (name, kind, round(lat, 2), round(lon, 2))')
 
-    conn.executemany(
-        'INSERT INTO places (name, kind, lat, lon, min_zoom, source, kind_detail, population, wikidata)'
-        ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
-        features,
-    )
+
+def index_places(conn):
+    """Fill the search indexes after all places were inserted by `create_places_tables`."""
+    conn.execute('DROP INDEX places_dedup')
     conn.execute("INSERT INTO places_fts(places_fts) VALUES('rebuild')")
+    conn.execute("INSERT INTO places_trigram(places_trigram) VALUES('rebuild')")
+    conn.execute('INSERT INTO places_rtree (id, min_lat, max_lat, min_lon, max_lon)'
+                 ' SELECT id, lat, lat, lon, lon FROM places')
     conn.commit()
+
+
+def write_search_db(features, output_path, batch_size=None):
+    """Write features to a SQLite FTS5 database, `batch_size` features at a time.
+
+    Features are deduplicated by the database (the first seen is kept), so memory does not grow with the size of the
+    region.
+
+    Returns the count of unique features written.
+    """
+    conn = sqlite3.connect(str(output_path))
+    try:
+        conn.execute('PRAGMA journal_mode=WAL')
+        create_places_tables(conn)
+
+        for batch in _batches(features, batch_size or FEATURE_BATCH_SIZE):
+            conn.executemany(
+                'INSERT OR IGNORE INTO places (name, kind, lat, lon, min_zoom, source, kind_detail, population,'
+                ' wikidata) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                batch,
+            )
+            conn.commit()
+
+        index_places(conn)
+        count = conn.execute('SELECT COUNT(*) FROM places').fetchone()[0]
+    finally:
+        conn.close()
+    return count
+
+
+def get_merged_index_sources(directory) -> dict:
+    """The region search databases which are merged by `build_merged_index`: {name: (size, mtime_ns)}."""
+    sources = dict()
+    for path in sorted(Path(directory).glob('*.search.db')):
+        stat = path.stat()
+        sources[path.name] = (stat.st_size, stat.st_mtime_ns)
+    return sources
+
+
+def build_merged_index(directory):
+    """Merge the search databases of all regions in a directory into one database, so a search query reads one index
+    instead of one per region.  Places found in more than one region are merged, keeping the highest population.
+
+    The merged database records the size and modification time of each region database, the search only uses it
+    while they match.  Returns the merged database path, or None if there are less than two regions.
+    """
+    directory = Path(directory).resolve()
+    output_path = directory / MERGED_INDEX_NAME
+    sources = get_merged_index_sources(directory)
+    if len(sources) < 2:
+        output_path.unlink(missing_ok=True)
+        return None
+
+    print(f'Merging {len(sources)} search indexes into {output_path.name}...', flush=True)
+    t0 = time.time()
+    tmp_path = output_path.with_name(f'{output_path.name}.tmp')
+    tmp_path.unlink(missing_ok=True)
+    conn = sqlite3.connect(str(tmp_path))
+    try:
+        create_places_tables(conn)
+        conn.execute('CREATE TABLE merged_sources (name TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER)')
+        for name, (size, mtime_ns) in sources.items():
+            conn.execute('ATTACH DATABASE ? AS region', (f'file:{directory / name}?mode=ro',))
+            try:
+                # `WHERE true` is required by the upsert of an INSERT ... SELECT.
+                conn.execute(f"""
+                    INSERT INTO places ({PLACES_COLUMNS})
+                    SELECT {PLACES_COLUMNS} FROM region.places WHERE true
+                    ON CONFLICT (name, kind, round(lat, 2), round(lon, 2)) DO UPDATE SET
+                        lat = excluded.lat, lon = excluded.lon, min_zoom = excluded.min_zoom,
+                        source = excluded.source, kind_detail = excluded.kind_detail,
+                        population = excluded.population, wikidata = excluded.wikidata, region = excluded.region
+                    WHERE COALESCE(excluded.population, 0) > COALESCE(places.population, 0)
+                """)
+                conn.commit()
+            finally:
+                conn.execute('DETACH DATABASE region')
+            conn.execute('INSERT INTO merged_sources (name, size, mtime_ns) VALUES (?, ?, ?)',
+                         (name, size, mtime_ns))
+        index_places(conn)
+        count = conn.execute('SELECT COUNT(*) FROM places').fetchone()[0]
+    except sqlite3.Error as e:
+        print(f'  ERROR: merging search indexes failed: {e}', flush=True)
+        conn.close()
+        tmp_path.unlink(missing_ok=True)
+        return None
     conn.close()
+    os.replace(tmp_path, output_path)
+
+    print(f'  Done: {count} features, {time.time() - t0:.1f}s', flush=True)
+    return output_path
+
+
+def print_progress(name, fraction):
+    """Print a progress line which is parsed by `modules.map.search`."""
+    print(f'  Progress: {name} {int(fraction * 100)}%', flush=True)
 
 
 def build_search_index(pmtiles_path, output_path=None, max_zoom=DEFAULT_MAX_ZOOM):
@@ -208,21 +443,33 @@ def build_search_index(pmtiles_path, output_path=None, max_zoom=DEFAULT_MAX_ZOOM
 
     t_start = time.time()
 
+    last_percent = [-1]
+
+    def progress(fraction):
+        percent = int(fraction * 100)
+        if percent != last_percent[0]:
+            last_percent[0] = percent
+            print_progress(pmtiles_path.name, fraction)
+
+    # Build into a temporary file so an interrupted build does not leave a partial index, which would be skipped above.
+    tmp_path = output_path.with_name(f'{output_path.name}.tmp')
+    tmp_path.unlink(missing_ok=True)
     try:
-        features = extract_features(pmtiles_path, source_name, MIN_ZOOM, max_zoom)
-    except RuntimeError as e:
+        features = extract_features(pmtiles_path, source_name, MIN_ZOOM, max_zoom, progress=progress)
+        count = write_search_db(features, tmp_path)
+        if not count:
+            print(f'  No features found, skipping.', flush=True)
+            return None
+        os.replace(tmp_path, output_path)
+    except (RuntimeError, ValueError) as e:
         print(f'  ERROR: {e}', flush=True)
         return None
-
-    if not features:
-        print(f'  No features found, skipping.', flush=True)
-        return None
-
-    write_search_db(features, output_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
 
     size_mb = output_path.stat().st_size / (1024 * 1024)
     total_elapsed = time.time() - t_start
-    print(f'  Done: {len(features)} features, {size_mb:.1f} MB, {total_elapsed:.1f}s', flush=True)
+    print(f'  Done: {count} features, {size_mb:.1f} MB, {total_elapsed:.1f}s', flush=True)
     return output_path
 
 
@@ -290,8 +537,21 @@ def main():
         '--enrich', action='store_true',
         help='Enrich with Wikidata region names (requires internet)',
     )
+    parser.add_argument(
+        '--merge', action='store_true',
+        help=f'Afterwards, merge all search indexes of the directory into {MERGED_INDEX_NAME}',
+    )
+    parser.add_argument(
+        '--merge-only', action='store_true',
+        help='Only merge the existing search indexes of the directory (does not require tippecanoe-decode)',
+    )
     args = parser.parse_args()
 
+    if args.merge_only:
+        path = args.path.resolve()
+        build_merged_index(path if path.is_dir() else path.parent)
+        return
+
     if not shutil.which('tippecanoe-decode'):
         print('Error: tippecanoe-decode not found on PATH.', file=sys.stderr)
         print('Install tippecanoe: https://github.com/felt/tippecanoe', file=sys.stderr)
@@ -316,6 +576,10 @@ def main():
         print(f'Error: {path} is not a .pmtiles file or directory.', file=sys.stderr)
         sys.exit(1)
 
+    # Merge after the enrichment, which changes the region databases.
+    if args.merge:
+        build_merged_index(path if path.is_dir() else path.parent)
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,88 @@
+"""Read-mostly dicts shared by all processes, read without a round-trip to the multiprocessing manager.
+
+Every read of a `manager.dict()` proxy (`config['videos_destination']`) is a request over a socket to the manager
+process.  Configs are read constantly (dispatching downloads, status, modelers) but written rarely, so
+`SharedSnapshotDict` keeps the dict in the manager, and a version number in shared memory.  Each process reads its own
+snapshot of the dict, and copies the whole dict from the manager again (one round-trip) only after the version
+changed.  A write goes to the manager and then increments the version, so every process sees it on its next read.
+"""
+import collections.abc
+import copy
+import ctypes
+import multiprocessing
+from multiprocessing.managers import DictProxy, SyncManager
+from typing import Any, Iterator, Tuple
+
+__all__ = ['SharedSnapshotDict', 'new_shared_snapshot']
+
+
+def new_shared_snapshot(manager: SyncManager) -> Tuple[DictProxy, Any]:
+    """Allocate the shared parts of a `SharedSnapshotDict`: the dict in the manager, and its version number."""
+    return manager.dict(), multiprocessing.Value(ctypes.c_uint64, 0)
+
+
+class SharedSnapshotDict(collections.abc.MutableMapping):
+    """A dict shared by all processes; see the module docstring.
+
+    Like a proxy, reading a list or dict value returns a copy; change a value by assigning it."""
+
+    def __init__(self, proxy: DictProxy, version):
+        self._proxy = proxy
+        self._version = version
+        # (version, dict) of this process.
+        self._snapshot: Tuple[int, dict] = (-1, dict())
+        # Statistics; the times this process copied the dict from the manager.
+        self.reloads = 0
+
+    def snapshot(self) -> dict:
+        """The dict, as of the latest version.  Do not modify it."""
+        version = self._version.value
+        snapshot_version, snapshot = self._snapshot
+        if version != snapshot_version:
+            # A write during the copy increments the version again, so the next read copies again.
+            snapshot = self._proxy.copy()
+            self._snapshot = (version, snapshot)
+            self.reloads += 1
+        return snapshot
+
+    def _changed(self):
+        with self._version.get_lock():
+            self._version.value += 1
+
+    def __getitem__(self, key):
+        value = self.snapshot()[key]
+        return copy.deepcopy(value) if isinstance(value, (dict, list, set)) else value
+
+    def __contains__(self, key) -> bool:
+        return key in self.snapshot()
+
+    def __iter__(self) -> Iterator:
+        return iter(list(self.snapshot()))
+
+    def __len__(self) -> int:
+        return len(self.snapshot())
+
+    def __setitem__(self, key, value):
+        self._proxy[key] = value
+        self._changed()
+
+    def __delitem__(self, key):
+        del self._proxy[key]
+        self._changed()
+
+    def update(self, *args, **kwargs):
+        self._proxy.update(*args, **kwargs)
+        self._changed()
+
+    def clear(self):
+        self._proxy.clear()
+        self._changed()
+
+    def copy(self) -> dict:
+        return copy.deepcopy(self.snapshot())
+
+    def __deepcopy__(self, memo) -> dict:
+        return copy.deepcopy(self.snapshot(), memo)
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} {self.snapshot()!r}>'
@@ -736,6 +736,32 @@ Another example paragraph
 Paragraph outside an element.'''
 
 
+def test_extract_html_text_near():
+    """Only the text needed for a headline is extracted."""
+    html = '<html><head><title>Title</title><style>p {}</style></head><body>\n<h1>Header</h1>' \
+           + '<p>Filler &amp; words</p>\n' * 2_000 + '<p>Running dogs</p></body></html>'
+    whole_text = common.extract_html_text(html)
+
+    # Small documents are extracted whole, like `extract_html_text`.
+    assert common.extract_html_text_near('<body><p>Hello  world</p></body>') == ('Hello\nworld', True)
+    assert common.extract_html_text_near(html, limit=None) == (whole_text, True)
+    assert common.extract_html_text_near(html.encode(), 'runs', limit=None) == (whole_text, True)
+
+    # The leading text, or the text near the searched words.
+    text, complete = common.extract_html_text_near(html.encode())
+    assert not complete and whole_text.startswith(text) and len(text) < 20_000
+    assert common.has_headline_context(text, None)
+    text, complete = common.extract_html_text_near(html.encode(), 'filler')
+    assert not complete and whole_text.startswith(text)
+    assert common.has_headline_context(text, 'filler') and not common.has_headline_context(text, 'dogs')
+    # The words were not found before the limit.
+    text, complete = common.extract_html_text_near(html.encode(), 'dogs', limit=5_000)
+    assert not complete and 'dogs' not in text
+    # All words of an OR group must be found.
+    text, complete = common.extract_html_text_near(html.encode(), 'header running OR words')
+    assert not complete and 'Running' not in text
+
+
 @pytest.mark.parametrize(
     'bps,expected', [
         (100, '100 bps'),
@@ -1423,3 +1449,31 @@ async def test_verify_gpg_signature_tampered(tmp_path, gpg_test_key):
 
     with mock.patch('wrolpi.common.GPG_PUBLIC_KEY', test_pubkey):
         assert await verify_gpg_signature(data_file, sig_file) is False
+
+
+@pytest.mark.asyncio
+async def test_apply_modelers_rates(test_session, test_directory, make_files_structure):
+    """The modeling rate of each modeler is reported separately."""
+    from wrolpi.files.models import FileGroup
+
+    for path in make_files_structure(['one.txt', 'two.txt']):
+        test_session.add(FileGroup.from_paths(test_session, path))
+    test_session.commit()
+
+    async def slow_modeler(progress_callback=None):
+        await asyncio.sleep(0.1)
+        progress_callback(1)
+
+    async def other_modeler():
+        pass
+
+    reported = []
+    with mock.patch.object(common, 'modelers', [slow_modeler, other_modeler]):
+        await common.apply_modelers(lambda processed, total, rates: reported.append((processed, total, rates)))
+
+    assert reported[0] == (0, 2, dict())
+    processed, total, rates = reported[1]
+    assert (processed, total) == (1, 2)
+    assert list(rates) == ['slow_modeler'] and 0 < rates['slow_modeler'] <= 10
+    # Neither modeler marked the FileGroups indexed, so nothing is counted for the last modeler.
+    assert reported[-1][2]['other_modeler'] == 0
@@ -1,8 +1,10 @@
 import asyncio
+import multiprocessing
 import sqlite3
 
 import pytest
 
+from wrolpi import db
 from wrolpi.conftest import production_like_sessions, probe_write_lock_is_held
 from wrolpi.db import get_db_session, _configure_sqlite_connection
 
@@ -59,6 +61,62 @@ def test_configure_connection_uses_wal_when_supported():
     assert 'PRAGMA foreign_keys=ON' in conn._cursor.executed
 
 
+def test_configure_connection_mmap_only_with_wal():
+    """Memory-mapped I/O is only used with WAL; the page cache is configured either way."""
+    conn = _FakeConnection(fail_wal=False)
+    _configure_sqlite_connection(conn)
+    assert f'PRAGMA cache_size=-{db.SQLITE_CACHE_SIZE_KIB}' in conn._cursor.executed
+    assert f'PRAGMA mmap_size={db.SQLITE_MMAP_SIZE}' in conn._cursor.executed
+
+    conn = _FakeConnection(fail_wal=True)
+    _configure_sqlite_connection(conn)
+    assert f'PRAGMA cache_size=-{db.SQLITE_CACHE_SIZE_KIB}' in conn._cursor.executed
+    assert not any(i.startswith('PRAGMA mmap_size') for i in conn._cursor.executed)
+
+
+def test_pooled_engine_reuses_connections(test_directory):
+    """A pooled engine configures each connection once, then reuses it (and its prepared statements)."""
+    engine = db.create_wrolpi_engine(test_directory / 'pooled.db', pool_size=2)
+    try:
+        with engine.connect() as conn:
+            first = conn.connection.connection
+            assert conn.execute('PRAGMA cache_size').scalar() == -db.SQLITE_CACHE_SIZE_KIB
+        with engine.connect() as conn:
+            assert conn.connection.connection is first
+
+        # Connections beyond the pool size are opened, and closed when released.
+        connections = [engine.connect() for _ in range(4)]
+        assert len({id(i.connection.connection) for i in connections}) == 4
+        for conn in connections:
+            conn.close()
+        assert engine.pool.checkedin() == 2
+    finally:
+        engine.dispose()
+
+
+def _forked_engine_state(_):
+    return db._engine is None, len(db._parent_engines)
+
+
+def test_engine_forgotten_after_fork(test_directory):
+    """A forked child never uses the pooled connections of its parent."""
+    (test_directory / 'config').mkdir(exist_ok=True)
+    engine = db.get_engine()
+    try:
+        with engine.connect() as conn:
+            conn.execute('SELECT 1')
+        assert engine.pool.checkedin() == 1
+
+        parent_engines = len(db._parent_engines)
+        with multiprocessing.get_context('fork').Pool(1) as pool:
+            assert pool.map(_forked_engine_state, [None]) == [(True, parent_engines + 1)]
+        # The idle connections were closed before forking.
+        assert engine.pool.checkedin() == 0
+        assert db.get_engine() is engine
+    finally:
+        engine.dispose()
+
+
 def test_configure_connection_falls_back_to_rollback_journal_on_wal_failure():
     """When WAL raises `disk I/O error` (exFAT/FAT/NTFS), fall back to a crash-safe rollback journal.
 
@@ -66,6 +66,37 @@ def test_compare_db_version_uninitialized_file(test_directory):
     assert db_bootstrap.compare_db_version() == 'current'
 
 
+def test_migrate_file_group_text(test_directory):
+    """The texts of existing FileGroups are moved out of file_group, and are still searchable."""
+    from alembic import command
+
+    db_file = get_db_file()
+    db_file.parent.mkdir(parents=True, exist_ok=True)
+    command.upgrade(db_bootstrap._alembic_config(), '2026_10_16_1200')
+    with sqlite3.connect(db_file) as conn:
+        conn.execute("INSERT INTO file_group (id, directory, primary_path, files, a_text, d_text) VALUES"
+                     " (1, '/media', '/media/foo.txt', '[{\"path\": \"foo.txt\"}]', 'foo', 'the contents'),"
+                     " (2, '/media', '/media/bar.txt', '[{\"path\": \"bar.txt\"}]', NULL, NULL)")
+
+    assert db_bootstrap.ensure_db() is True
+
+    with sqlite3.connect(db_file) as conn:
+        conn.execute('PRAGMA foreign_keys=ON')
+        columns = {i[1] for i in conn.execute('PRAGMA table_info(file_group)')}
+        assert not columns & {'a_text', 'b_text', 'c_text', 'd_text'}
+        assert conn.execute('SELECT file_group_id, a_text, d_text FROM file_group_text').fetchall() \
+               == [(1, 'foo', 'the contents')]
+        # The FileGroups were not deleted by the migration.
+        assert conn.execute('SELECT COUNT(*) FROM file_group_file').fetchone()[0] == 2
+        assert conn.execute("SELECT rowid FROM file_group_fts WHERE file_group_fts MATCH 'contents'").fetchall() \
+               == [(1,)]
+
+        conn.execute('DELETE FROM file_group WHERE id = 1')
+        assert conn.execute('SELECT COUNT(*) FROM file_group_text').fetchone()[0] == 0
+        assert conn.execute("SELECT rowid FROM file_group_fts WHERE file_group_fts MATCH 'contents'").fetchall() \
+               == []
+
+
 def test_bootstrap_lock(test_directory):
     """Only one process can hold the bootstrap lock."""
     with db_bootstrap.bootstrap_lock() as acquired:
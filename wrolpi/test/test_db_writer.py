@@ -0,0 +1,101 @@
+import sqlite3
+import threading
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from wrolpi import db_writer
+from wrolpi.conftest import production_like_sessions
+from wrolpi.db_writer import DBWriter
+
+
+@pytest.fixture
+def writer_table(test_session):
+    test_session.execute('CREATE TABLE writer_test (id INTEGER PRIMARY KEY, name TEXT UNIQUE)')
+    test_session.commit()
+
+
+def _insert(name: str):
+    def insert(session) -> int:
+        return session.execute('INSERT INTO writer_test (name) VALUES (:name)', dict(name=name)).lastrowid
+
+    return insert
+
+
+def _names(test_session) -> list:
+    test_session.rollback()
+    return [i[0] for i in test_session.execute('SELECT name FROM writer_test ORDER BY id')]
+
+
+def _submit_behind_blocked_write(writer: DBWriter, first: str, *names: str) -> list:
+    """Submit the writes of `names` while the writer is busy with the write of `first`, so they queue."""
+    started, release = threading.Event(), threading.Event()
+
+    def blocking(session):
+        started.set()
+        release.wait(5)
+        return _insert(first)(session)
+
+    futures = [writer.submit(blocking)]
+    assert started.wait(5)
+    futures.extend(writer.submit(_insert(name)) for name in names)
+    release.set()
+    return futures
+
+
+def test_writer_commits_pending_writes_together(test_session, writer_table):
+    """The writes pending when the writer is free are committed by one transaction."""
+    writer = DBWriter()
+    with production_like_sessions(test_session):
+        futures = _submit_behind_blocked_write(writer, 'first', *[f'name {i}' for i in range(20)])
+        ids = [future.result(timeout=10) for future in futures]
+
+    assert ids == list(range(1, 22))
+    assert _names(test_session) == ['first'] + [f'name {i}' for i in range(20)]
+    assert writer.writes == 21
+    assert writer.transactions == 2
+
+
+def test_writer_isolates_failing_writes(test_session, writer_table):
+    """A write that fails is rolled back without undoing the other writes of its transaction."""
+    writer = DBWriter()
+    with production_like_sessions(test_session):
+        first, = _submit_behind_blocked_write(writer, 'first')
+        first.result(timeout=10)
+        _, failed, ok = _submit_behind_blocked_write(writer, 'second', 'first', 'third')
+
+        with pytest.raises(Exception) as exc_info:
+            failed.result(timeout=10)
+        assert 'UNIQUE' in str(exc_info.value)
+        assert ok.result(timeout=10) == 3
+
+    assert _names(test_session) == ['first', 'second', 'third']
+    assert writer.transactions == 3
+
+
+def test_writer_retries_locked_writes(test_session, writer_table):
+    """A write which fails because the database is locked is tried again."""
+    writer = DBWriter(inline=True)
+    attempts = []
+
+    def flaky(session):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OperationalError('INSERT', {}, sqlite3.OperationalError('database is locked'))
+        return _insert('flaky')(session)
+
+    with production_like_sessions(test_session):
+        assert writer.submit(flaky).result() == 1
+
+    assert len(attempts) == 2
+    assert _names(test_session) == ['flaky']
+
+
+@pytest.mark.asyncio
+async def test_write(test_session, writer_table):
+    """`write` returns the result of the write, and raises its error."""
+    assert await db_writer.write(_insert('one')) == 1
+    assert _names(test_session) == ['one']
+
+    with pytest.raises(ValueError):
+        await db_writer.write(lambda session: int('not a number'))
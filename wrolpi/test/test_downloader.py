@@ -1874,6 +1874,30 @@ async def test_download_dispatched_outside_immediate_transaction(test_session, t
         'download signal was dispatched while the claim still held the write lock (deadlocks under NullPool)'
 
 
+@pytest.mark.asyncio
+async def test_dispatch_skips_processing_domains_in_sql(test_session, test_download_manager, test_downloader):
+    """The downloads of the domains being downloaded are filtered out by the query; the shared state is read before
+    the claiming write transaction."""
+    name = test_downloader.name
+    urls = ['https://example.com/new', 'https://example.org/new?q=1', 'http://user@example.net:8080#new']
+    test_session.add_all([Download(url=url, downloader=name, status='new') for url in urls])
+    test_session.commit()
+
+    # The SQL `domain` is the domain of each Download.
+    for download in test_session.query(Download):
+        assert test_session.query(Download.domain).filter(Download.id == download.id).scalar() == download.domain
+    assert {i.url for i in test_session.query(Download).filter(Download.domain.notin_(['example.com']))} \
+           == set(urls[1:])
+
+    test_download_manager._add_processing_domain('example.com')
+    with mock.patch.object(type(api_app), 'dispatch', new_callable=mock.AsyncMock) as dispatch:
+        await test_download_manager.dispatch_downloads()
+    assert _dispatched_urls(dispatch) == set(urls[1:])
+    skipped = test_session.query(Download).filter_by(url=urls[0]).one()
+    test_session.refresh(skipped)
+    assert skipped.last_download_attempt is None
+
+
 @pytest.mark.asyncio
 async def test_signal_releases_processing_domain_when_download_missing(test_session, test_download_manager,
                                                                        test_downloader):
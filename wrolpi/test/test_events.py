@@ -1,13 +1,15 @@
 import asyncio
+import json
 from datetime import timedelta
 from http import HTTPStatus
 from itertools import zip_longest
 from typing import Dict, List
+from unittest import mock
 
 import pytest
 
 from wrolpi.dates import now
-from wrolpi.events import HISTORY_SIZE, Events, get_events
+from wrolpi.events import HISTORY_SIZE, EVENT_SLOT_SIZE, Events, get_events, get_event_ring, send_event
 from wrolpi.test.common import assert_dict_contains, skip_circleci
 
 
@@ -78,3 +80,77 @@ async def test_get_events(async_client, events_fixture):
 
     after = after + timedelta(seconds=0.1)
     assert_events([dict(event="ready")], after=after)
+
+
+@pytest.mark.asyncio
+async def test_event_ring(async_client, events_fixture):
+    """Events are numbered; readers get only the events after their sequence number, even after the ring wraps."""
+    ring = get_event_ring()
+    start = ring.sequence
+
+    Events.send_ready('first')
+    assert ring.sequence == start + 1
+    assert [i['message'] for i in ring.read(start)] == ['first']
+    assert ring.read(ring.sequence) == []
+
+    for i in range(HISTORY_SIZE + 5):
+        Events.send_user_notify(f'message {i}')
+    events = ring.read(start)
+    assert len(events) == HISTORY_SIZE
+    assert [i['seq'] for i in events] == list(range(start + 7, ring.sequence + 1))
+    assert events[-1]['message'] == f'message {HISTORY_SIZE + 4}'
+    assert [i['message'] for i in ring.read(ring.sequence - 2)] == \
+           [f'message {HISTORY_SIZE + 3}', f'message {HISTORY_SIZE + 4}']
+
+    # Long messages are truncated to fit their slot.
+    Events.send_user_notify('x' * EVENT_SLOT_SIZE * 2)
+    message = ring.read(ring.sequence - 1)[0]['message']
+    assert message.endswith('...') and len(message) < EVENT_SLOT_SIZE
+
+    # A long url or subject is truncated too, even when the message is short or missing.
+    send_event('long_url', 'short', url='u' * EVENT_SLOT_SIZE * 2)
+    event, = ring.read(ring.sequence - 1)
+    assert event['message'] == 'short'
+    assert event['url'].endswith('...') and len(event['url']) < EVENT_SLOT_SIZE
+    send_event('long_subject', subject='s' * EVENT_SLOT_SIZE * 2)
+    event, = ring.read(ring.sequence - 1)
+    assert event['event'] == 'long_subject'
+    assert event['message'] is None
+    assert event['subject'].endswith('...') and len(event['subject']) < EVENT_SLOT_SIZE
+
+
+@pytest.mark.asyncio
+async def test_events_feed_after_seq(async_client, events_fixture):
+    """The feed returns only the events after the client's sequence number."""
+    Events.send_ready('one')
+    request, response = await async_client.get('/api/events/feed')
+    sequence = response.json['sequence']
+
+    Events.send_ready('two')
+    Events.send_ready('three')
+    request, response = await async_client.get(f'/api/events/feed?after_seq={sequence}')
+    assert response.status_code == HTTPStatus.OK
+    assert [i['message'] for i in response.json['events']] == ['three', 'two']
+    assert response.json['sequence'] == sequence + 2
+
+    # A sequence number from before the API restarted is ignored.
+    request, response = await async_client.get(f'/api/events/feed?after_seq={sequence + 1000}')
+    assert 'one' in [i['message'] for i in response.json['events']]
+
+
+@pytest.mark.asyncio
+async def test_events_stream(async_client, events_fixture):
+    """New events are streamed as Server-Sent Events, starting after `Last-Event-ID`."""
+    Events.send_ready('missed')
+    last_event_id = get_event_ring().sequence - 1
+
+    with mock.patch('wrolpi.root_api.EVENTS_STREAM_DURATION', 0.1):
+        request, response = await async_client.get('/api/events/stream',
+                                                   headers={'Last-Event-ID': str(last_event_id)})
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['content-type'] == 'text/event-stream'
+    messages = [i for i in response.text.split('\n\n') if i.startswith('id: ')]
+    assert len(messages) == 1
+    id_, data = messages[0].split('\n')
+    assert id_ == f'id: {last_event_id + 1}'
+    assert json.loads(data.removeprefix('data: '))['message'] == 'missed'
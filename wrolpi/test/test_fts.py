@@ -49,10 +49,12 @@ def test_translate_websearch_fuzz(garbage):
 
 @pytest.fixture
 def fts_db():
-    """A scratch DB with a minimal file_group/doc_section and the real FTS DDL + triggers."""
+    """A scratch DB with a minimal file_group/doc_section and the real FTS DDL + triggers (which create
+    file_group_text)."""
     conn = sqlite3.connect(':memory:')
     conn.executescript('''
-        CREATE TABLE file_group (id INTEGER PRIMARY KEY, a_text TEXT, b_text TEXT, c_text TEXT, d_text TEXT);
+        PRAGMA foreign_keys=ON;
+        CREATE TABLE file_group (id INTEGER PRIMARY KEY);
         CREATE TABLE doc_section (id INTEGER PRIMARY KEY, content TEXT);
     ''')
     for statement in fts.FTS_DDL:
@@ -62,9 +64,12 @@ def fts_db():
 
 
 def test_fts_sync_triggers(fts_db):
-    """INSERT/UPDATE/DELETE on file_group keep the FTS index in sync."""
-    fts_db.execute("INSERT INTO file_group (id, a_text, d_text) VALUES (1, 'Cooking Rice', 'boil the water')")
-    fts_db.execute("INSERT INTO file_group (id, a_text) VALUES (2, 'Gardening')")
+    """INSERT/UPDATE/DELETE on file_group_text keep the FTS index in sync."""
+    fts_db.execute('INSERT INTO file_group (id) VALUES (1), (2), (3)')
+    fts_db.execute("INSERT INTO file_group_text (file_group_id, a_text, d_text)"
+                   " VALUES (1, 'Cooking Rice', 'boil the water')")
+    fts_db.execute("INSERT INTO file_group_text (file_group_id, a_text) VALUES (2, 'Gardening')")
+    fts_db.execute("INSERT INTO file_group_text (file_group_id, a_text) VALUES (3, 'Gardening Tools')")
 
     def match(query, deep=True):
         columns = None if deep else fts.ABC_COLUMNS
@@ -74,28 +79,33 @@ def test_fts_sync_triggers(fts_db):
 
     assert match('cooking') == [1]
     # Stemming: porter maps "gardens" and "gardening" to the same stem.
-    assert match('gardens') == [2]
+    assert match('gardens') == [2, 3]
     # Fast path does not search d_text.
     assert match('boil', deep=True) == [1]
     assert match('boil', deep=False) == []
 
     # UPDATE of an indexed column.
-    fts_db.execute("UPDATE file_group SET a_text = 'Baking Bread' WHERE id = 1")
+    fts_db.execute("UPDATE file_group_text SET a_text = 'Baking Bread' WHERE file_group_id = 1")
     assert match('cooking') == []
     assert match('baking') == [1]
 
     # DELETE removes from the index.
-    fts_db.execute('DELETE FROM file_group WHERE id = 1')
+    fts_db.execute('DELETE FROM file_group_text WHERE file_group_id = 1')
     assert match('baking') == []
 
+    # Deleting the FileGroup deletes its texts.
+    fts_db.execute('DELETE FROM file_group WHERE id = 3')
+    assert match('gardens') == [2]
+
     # Integrity check passes after all of the above.
     assert fts.fts_integrity_ok(fts_db) is True
 
 
 def test_fts_rank_weights(fts_db):
     """A match in a_text (weight 10) outranks the same match in d_text (weight 1)."""
-    fts_db.execute("INSERT INTO file_group (id, a_text) VALUES (1, 'solar power')")
-    fts_db.execute("INSERT INTO file_group (id, d_text) VALUES (2, 'solar power')")
+    fts_db.execute('INSERT INTO file_group (id) VALUES (1), (2)')
+    fts_db.execute("INSERT INTO file_group_text (file_group_id, a_text) VALUES (1, 'solar power')")
+    fts_db.execute("INSERT INTO file_group_text (file_group_id, d_text) VALUES (2, 'solar power')")
     expr = fts.translate_websearch('solar')
     rows = fts_db.execute(
         'SELECT rowid, -rank FROM file_group_fts WHERE file_group_fts MATCH ? ORDER BY rank',
@@ -171,7 +181,8 @@ def test_stemming(fts_db, query, expected):
     This contract is load-bearing: users search "running" and expect files titled
     "runs"/"run" to match.  The Porter stemmer provides it at index AND query time."""
     for rowid, text in STEMMING_DOCS.items():
-        fts_db.execute('INSERT INTO file_group (id, a_text) VALUES (?, ?)', (rowid, text))
+        fts_db.execute('INSERT INTO file_group (id) VALUES (?)', (rowid,))
+        fts_db.execute('INSERT INTO file_group_text (file_group_id, a_text) VALUES (?, ?)', (rowid, text))
 
     match = fts.translate_websearch(query)
     rows = [row[0] for row in
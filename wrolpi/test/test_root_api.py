@@ -929,6 +929,24 @@ async def test_settings_save_ffprobe_json(async_client, test_wrolpi_config):
     assert config.save_ffprobe_json is True
 
 
+@pytest.mark.asyncio
+async def test_settings_ffprobe_workers(async_client, test_wrolpi_config):
+    """Maintainer can change how many ffprobe subprocesses the video modeler runs at once."""
+    config = get_wrolpi_config()
+    assert config.ffprobe_workers == 3
+
+    data = {'ffprobe_workers': 1}
+    request, response = await async_client.patch('/api/settings', content=json.dumps(data))
+    assert response.status_code == HTTPStatus.NO_CONTENT
+    assert config.ffprobe_workers == 1
+
+    # At least one worker is required.
+    data = {'ffprobe_workers': 0}
+    request, response = await async_client.patch('/api/settings', content=json.dumps(data))
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert config.ffprobe_workers == 1
+
+
 @pytest.mark.asyncio
 async def test_settings_timezone(async_client, test_wrolpi_config):
     """Maintainer can set and clear the timezone setting."""
@@ -0,0 +1,40 @@
+import multiprocessing
+
+from wrolpi.shared_snapshot import SharedSnapshotDict, new_shared_snapshot
+
+
+def _write_in_child(shared: tuple, key, value):
+    SharedSnapshotDict(*shared)[key] = value
+
+
+def test_shared_snapshot_dict():
+    """Reads come from the snapshot of the process, which is copied again only after a write by any process."""
+    manager = multiprocessing.Manager()
+    try:
+        shared = new_shared_snapshot(manager)
+        writer, reader = SharedSnapshotDict(*shared), SharedSnapshotDict(*shared)
+
+        writer.update(dict(a=1, b=[1, 2]))
+        assert reader['a'] == 1 and dict(reader) == dict(a=1, b=[1, 2])
+        assert reader.get('missing') is None and 'b' in reader and len(reader) == 2
+        for _ in range(10):
+            assert reader['a'] == 1
+        assert reader.reloads == 1
+
+        # Like a proxy, changing a value which was read does not change the shared dict.
+        reader['b'].append(3)
+        assert reader['b'] == [1, 2]
+
+        # A write by another process is read after it is done.
+        process = multiprocessing.get_context('fork').Process(target=_write_in_child, args=(shared, 'a', 2))
+        process.start()
+        process.join(10)
+        assert reader['a'] == 2
+        assert reader.reloads == 2
+
+        del writer['b']
+        assert dict(reader) == dict(a=2)
+        writer.clear()
+        assert dict(reader) == dict()
+    finally:
+        manager.shutdown()